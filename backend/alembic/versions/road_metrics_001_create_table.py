@@ -0,0 +1,40 @@
+"""create road_metrics table
+
+Revision ID: road_metrics_001
+Revises: chat_messages_001
+Create Date: 2025-11-20
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'road_metrics_001'
+down_revision = 'chat_messages_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'road_metrics',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('road_name', sa.String(length=100), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('window_end', sa.DateTime(), nullable=False),
+        sa.Column('count_car', sa.Integer(), nullable=False),
+        sa.Column('speed_car', sa.Integer(), nullable=False),
+        sa.Column('count_motor', sa.Integer(), nullable=False),
+        sa.Column('speed_motor', sa.Integer(), nullable=False),
+        sa.Column('frames', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_road_metrics_road_name_window_start', 'road_metrics', ['road_name', 'window_start'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_road_metrics_road_name_window_start', table_name='road_metrics')
+    op.drop_table('road_metrics')
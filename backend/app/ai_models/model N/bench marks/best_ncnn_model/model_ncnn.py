@@ -1,15 +1,18 @@
+import os
 import numpy as np
 import ncnn
 import torch
 
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def test_inference():
     torch.manual_seed(0)
     in0 = torch.rand(1, 3, 640, 640, dtype=torch.float)
     out = []
 
     with ncnn.Net() as net:
-        net.load_param("best_ncnn_model\model.ncnn.param")
-        net.load_model("best_ncnn_model\model.ncnn.bin")
+        net.load_param(os.path.join(MODEL_DIR, "model.ncnn.param"))
+        net.load_model(os.path.join(MODEL_DIR, "model.ncnn.bin"))
 
         with net.create_extractor() as ex:
             ex.input("in0", ncnn.Mat(in0.squeeze(0).numpy()).clone())
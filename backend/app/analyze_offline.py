@@ -0,0 +1,115 @@
+r"""Phân tích offline một file video đã ghi, nhanh hơn thời gian thực.
+
+Video được xử lý đúng một lần (không lặp, không vẽ), chia thành các đoạn chồng lấn nhau và xử lý song
+song trong một process pool; track của các đoạn được nối lại rồi số liệu được chia cửa sổ theo thời gian
+của video và ghi ra CSV/Parquet.
+
+Ví dụ (chạy từ thư mục app):
+    python analyze_offline.py --road "Văn Quán" --video ./recordings/van_quan_0800.mp4 \
+        --start-time 2025-11-20T08:00:00 --workers 4 --output ./data/offline/van_quan.parquet
+"""
+import os
+import sys
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+import cv2
+from core.config import settings_metric_transport
+from utils.transport_utils import get_road_name
+from utils.offline_utils import split_segments, stitch_segments, aggregate_windows, write_windows
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def find_road(road_name: str) -> int:
+    """Tìm vị trí của tuyến đường trong cấu hình (để lấy region và meter_per_pixel của camera đó)"""
+    for i, path in enumerate(settings_metric_transport.PATH_VIDEOS):
+        if get_road_name(path) == road_name:
+            return i
+    raise SystemExit(f"Không tìm thấy tuyến đường '{road_name}' trong SettingMetricTransport.PATH_VIDEOS")
+
+
+def init_worker(threads: int):
+    """Giới hạn số thread suy luận của mỗi process để các process không tranh nhau CPU"""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def run_segment(kwargs: dict) -> dict:
+    """Hàm chạy trong process con: xử lý một đoạn video"""
+    from services.road_services.AnalyzeOnRoadOffline import AnalyzeOnRoadOffline
+    return AnalyzeOnRoadOffline(**kwargs).process_segment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phân tích offline video giao thông nhanh hơn thời gian thực")
+    parser.add_argument("--road", required=True, help="Tên tuyến đường (lấy region, meter_per_pixel từ cấu hình)")
+    parser.add_argument("--video", help="File video cần phân tích. Mặc định là video cấu hình của tuyến đường")
+    parser.add_argument("--meter-per-pixel", type=float, help="Ghi đè meter_per_pixel (sau khi hiệu chỉnh lại)")
+    parser.add_argument("--output", required=True, help="File kết quả .csv hoặc .parquet")
+    parser.add_argument("--start-time", help="Thời điểm bắt đầu ghi video (ISO). Mặc định suy ra từ mtime của file")
+    parser.add_argument("--time-step", type=int, default=30, help="Độ dài cửa sổ thống kê (giây video)")
+    parser.add_argument("--segment-seconds", type=float, default=300, help="Độ dài mỗi đoạn xử lý song song")
+    parser.add_argument("--overlap-seconds", type=float, default=5, help="Độ dài đoạn chồng lấn giữa 2 đoạn")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--model", default=settings_metric_transport.MODELS_PATH)
+    parser.add_argument("--device", default=settings_metric_transport.DEVICE)
+    parser.add_argument("--conf", type=float, default=0.2)
+    parser.add_argument("--iou", type=float, default=0.3)
+    args = parser.parse_args()
+
+    index = find_road(args.road)
+    path_video = args.video or settings_metric_transport.PATH_VIDEOS[index]
+    meter_per_pixel = args.meter_per_pixel or settings_metric_transport.METER_PER_PIXELS[index]
+
+    cam = cv2.VideoCapture(path_video)
+    if not cam.isOpened():
+        raise SystemExit(f"Không thể mở video: {path_video}")
+    fps = cam.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+    cam.release()
+
+    if args.start_time:
+        start_time = datetime.fromisoformat(args.start_time)
+    else:
+        start_time = datetime.fromtimestamp(os.path.getmtime(path_video)) - timedelta(seconds=total_frames / fps)
+
+    overlap_frames = int(args.overlap_seconds * fps)
+    segments = split_segments(total_frames, int(args.segment_seconds * fps), overlap_frames)
+    tasks = [dict(path_video=path_video, meter_per_pixel=meter_per_pixel,
+                  region=settings_metric_transport.REGIONS[index], overlap_frames=overlap_frames, fps=fps,
+                  time_step=args.time_step, model_path=args.model, device=args.device,
+                  iou=args.iou, conf=args.conf, **segment) for segment in segments]
+
+    workers = max(1, min(args.workers, len(tasks)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"{args.road}: {total_frames} frame ({total_frames / fps:.0f}s), {len(tasks)} đoạn, {workers} process")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=init_worker, initargs=(threads,)) as pool:
+        results = list(pool.map(run_segment, tasks))
+    elapsed = time.perf_counter() - t0
+
+    counts, speeds = stitch_segments(results)
+    rows = aggregate_windows(counts, speeds, fps, args.time_step, start_time, args.road)
+    write_windows(rows, args.output)
+
+    processed = sum(r["end_frame"] - r["start_frame"] for r in results)
+    print(f"Xong {len(rows)} cửa sổ -> {args.output} trong {elapsed:.1f}s "
+          f"({processed / max(elapsed, 1e-6):.0f} frame/s, {total_frames / fps / max(elapsed, 1e-6):.1f}x thời gian thực)")
+
+
+if __name__ == "__main__":
+    main()
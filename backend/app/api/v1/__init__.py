@@ -1 +1 @@
-from api.v1 import api_auth, api_chatbot, api_vehicles_frames, state, api_user, api_admin, chat_history
\ No newline at end of file
+from api.v1 import api_auth, api_chatbot, api_vehicles_frames, state, api_user, api_admin, chat_history, api_history, api_health
\ No newline at end of file
@@ -1,8 +1,12 @@
 import asyncio
+import os
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, WebSocketDisconnect, status, WebSocket
 from utils.jwt_handler import get_current_user, get_current_user_ws
 from models.user import User
 from utils.system_metrics import get_system_metrics
+from schemas.Camera import CameraCreate, CameraUpdate
+from api.v1 import state
 
 
 router = APIRouter(prefix="/admin")
@@ -22,6 +26,196 @@ async def get_resources(current_user: User = Depends(get_current_user)):
         )
     return get_system_metrics()
 
+@router.get(
+    path= "/metrics_writer",
+    summary="Trạng thái ghi số liệu vào database",
+    description="API trả về bộ đếm của tác vụ ghi hàng loạt road_metrics (đã nhận, đã ghi, đang chờ, bị bỏ do hàng đợi đầy). Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_metrics_writer(current_user: User = Depends(get_current_user)):
+    """Return batched DB writer counters. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.metric_writer is None:
+        return {"enabled": False}
+    dropped = state.analyzer.metric_dropped.value if state.analyzer is not None else 0
+    return {"enabled": True, **state.metric_writer.get_stats(), "dropped_in_workers": dropped}
+
+@router.get(
+    path= "/workers",
+    summary="Tình trạng các process phân tích video",
+    description="API trả về trạng thái từng tuyến đường (running/starting/stalled/dead/restarting), tuổi của heartbeat và frame gần nhất, số frame đã xử lý và số lần được supervisor khởi động lại. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_workers(current_user: User = Depends(get_current_user)):
+    """Return per-road worker health and restart counts. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.analyzer is None:
+        return {}
+    # Đọc trạng thái supervisor cần khoá của supervisor nên không chạy ở event loop
+    return await asyncio.to_thread(state.analyzer.get_workers_health)
+
+@router.get(
+    path= "/pipeline",
+    summary="Thời gian từng giai đoạn xử lý frame",
+    description="API trả về metrics hệ thống và với mỗi tuyến đường: số lần đo, thời gian trung bình và p50/p90/p99 của từng giai đoạn xử lý frame (decode, resize, inference, tracking, post_processing, draw, publish, encode) trong cửa sổ trượt gần nhất, tỉ lệ thời gian của mỗi giai đoạn và giai đoạn chậm nhất. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_pipeline(current_user: User = Depends(get_current_user)):
+    """Return per-stage frame timing histograms per road with system metrics. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    roads = state.analyzer.get_pipeline_timings() if state.analyzer is not None else {}
+    return {"system": await asyncio.to_thread(get_system_metrics), "roads": roads}
+
+@router.get(
+    path= "/cpu_plan",
+    summary="Phân bổ CPU cho các process phân tích video",
+    description="API trả về các CPU khả dụng, quota CPU của cgroup, các core giữ lại cho API và với mỗi tuyến đường: các core được ghim, số thread suy luận và affinity thực tế của process. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_cpu_plan(current_user: User = Depends(get_current_user)):
+    """Return the per-worker CPU affinity and inference thread plan. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.analyzer is None:
+        return {}
+    return state.analyzer.get_cpu_plan()
+
+@router.get(
+    path= "/scheduler",
+    summary="Phân bổ suy luận giữa các tuyến đường",
+    description="API trả về budget CPU suy luận, SLO độ trễ và với mỗi tuyến đường: độ ưu tiên, số người đang xem, số core được cấp, fps mục tiêu/thực tế, độ trễ mỗi frame và mức giảm chất lượng hiện tại. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_scheduler(current_user: User = Depends(get_current_user)):
+    """Return the inference budget allocation and degradation level per road. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.analyzer is None:
+        return {}
+    return state.analyzer.get_scheduler_status()
+
+@router.get(
+    path= "/inference_backend",
+    summary="Runtime suy luận đang dùng",
+    description="API trả về bản export của model mà các process phân tích đang dùng (OpenVINO, ONNX Runtime, MNN hoặc NCNN) và kết quả đo tốc độ/độ trùng khớp của từng bản export lúc khởi động (khi INFERENCE_BACKEND=auto). Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_inference_backend(current_user: User = Depends(get_current_user)):
+    """Return the selected inference runtime and the startup benchmark results. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.analyzer is None:
+        return {}
+    return state.analyzer.get_backend_selection()
+
+@router.get(
+    path= "/cameras",
+    summary="Danh sách camera đang được giám sát",
+    description="API trả về cấu hình (video, meter_per_pixel, region, paused, max_fps) và trạng thái process của từng camera. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def get_cameras(current_user: User = Depends(get_current_user)):
+    """Return the runtime camera registry with worker states. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.camera_registry is None or state.analyzer is None:
+        return {}
+    health = await asyncio.to_thread(state.analyzer.get_workers_health)
+    return {
+        name: {**camera, "state": health.get(name, {}).get("state")}
+        for name, camera in state.camera_registry.cameras.items()
+    }
+
+@router.post(
+    path= "/cameras",
+    status_code=status.HTTP_201_CREATED,
+    summary="Thêm camera khi hệ thống đang chạy",
+    description="API thêm một tuyến đường và chỉ khởi động process phân tích của tuyến đường đó, các tuyến đường khác không bị ảnh hưởng. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def add_camera(camera: CameraCreate, current_user: User = Depends(get_current_user)):
+    """Add a road and start only its worker. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if any(len(point) != 2 for point in camera.region):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Mỗi điểm của region phải có dạng [x, y].")
+    if "://" not in camera.path_video and not os.path.exists(camera.path_video):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Không tìm thấy video: {camera.path_video}")
+    try:
+        name = state.camera_registry.add(**camera.model_dump())
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Tuyến đường đã tồn tại.")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        await asyncio.to_thread(state.analyzer.add_road, camera.path_video, camera.meter_per_pixel,
+                                np.array(camera.region), camera.paused, camera.max_fps, camera.cascade, name)
+        state.analyzer.set_road_control(name, priority=camera.priority)
+    except Exception as e:
+        state.camera_registry.remove(name)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Không thể khởi động camera: {e}")
+    state.camera_registry.save()
+    return {"road_name": name, **state.camera_registry.cameras[name]}
+
+@router.patch(
+    path= "/cameras/{road_name}",
+    summary="Tạm dừng/tiếp tục, đổi fps, độ ưu tiên hoặc cascade của camera",
+    description="API tạm dừng (giải phóng CPU, model vẫn được giữ trong bộ nhớ để tiếp tục ngay), giới hạn số frame xử lý mỗi giây, đổi độ ưu tiên khi chia CPU suy luận hoặc bật/tắt cascade model N -> model S của một tuyến đường. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def update_camera(road_name: str, update: CameraUpdate, current_user: User = Depends(get_current_user)):
+    """Pause/resume a road or change its fps limit. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.camera_registry is None or road_name not in state.camera_registry.cameras:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy tuyến đường.")
+    state.analyzer.set_road_control(road_name, paused=update.paused, max_fps=update.max_fps, priority=update.priority,
+                                    cascade=update.cascade)
+    camera = state.camera_registry.update(road_name, paused=update.paused, max_fps=update.max_fps,
+                                          priority=update.priority, cascade=update.cascade)
+    state.camera_registry.save()
+    return {"road_name": road_name, **camera}
+
+@router.delete(
+    path= "/cameras/{road_name}",
+    summary="Xoá camera khi hệ thống đang chạy",
+    description="API dừng process phân tích và xoá tuyến đường khỏi danh sách giám sát. Chỉ admin (role_id = 0) mới có quyền truy cập."
+)
+async def remove_camera(road_name: str, current_user: User = Depends(get_current_user)):
+    """Stop a road's worker and remove it from the registry. Admin only (role_id = 0)."""
+    if current_user.role_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được phép truy cập tài nguyên hệ thống.",
+        )
+    if state.camera_registry is None or road_name not in state.camera_registry.cameras:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy tuyến đường.")
+    state.camera_registry.remove(road_name)
+    await asyncio.to_thread(state.analyzer.remove_road, road_name)
+    state.camera_registry.save()
+    return {"road_name": road_name, "removed": True}
+
 @router.websocket(
     path= "/ws/resources",
     name="WebSocket thông báo hệ thống cho admin"
@@ -1,24 +1,49 @@
+import asyncio
 from api.v1 import state
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
 from schemas.ChatRequest import ChatRequest 
 from schemas.ChatResponse import ChatResponse
-from services.chat_services.ChatBotAgent import ChatBotAgent
 from utils.jwt_handler import get_current_user, get_current_user_ws
 from fastapi import Depends
+from core.config import settings_startup
 
 
 router = APIRouter()
+_agent_lock = asyncio.Lock()
+
+def create_agent():
+    # Import ở đây vì langchain/langgraph và client LLM mất vài giây để nạp, không cần cho lúc khởi động server
+    from services.chat_services.ChatBotAgent import ChatBotAgent
+    return ChatBotAgent()
+
+async def get_agent():
+    """Khởi tạo Chat Agent ở lần chat đầu tiên (trong thread riêng để không chặn event loop)
+
+    Raises:
+        HTTPException: 503 khi không khởi tạo được Chat Agent
+    """
+    if state.agent is None:
+        async with _agent_lock:
+            if state.agent is None:
+                print("Đang khởi tạo Chat Agent...")
+                try:
+                    state.agent = await asyncio.to_thread(create_agent)
+                    state.readiness.set("chatbot", state.readiness.READY)
+                    print("Khởi tạo Chat Agent thành công")
+                except Exception as e:
+                    print(f"Không thể khởi tạo Chat Agent: {e}")
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Chat Agent chưa sẵn sàng.",
+                    )
+    return state.agent
 
 @router.on_event("startup")
-def start_up():
-    if not hasattr(state, 'agent') or state.agent is None:
-        print("Đang khởi tạo Chat Agent...")
-        try:
-            state.agent = ChatBotAgent()
-            print("Khởi tạo Chat Agent thành công")
-        except Exception as e:
-            print(f"Không thể khởi tạo Chat Agent: {e}")
-            state.agent = None
+async def start_up():
+    # Không bắt buộc cho /readyz: nếu chưa tạo xong thì lần chat đầu tiên sẽ chờ tạo
+    state.readiness.register("chatbot", required=False)
+    if settings_startup.PRELOAD_CHATBOT:
+        state.readiness.run_stage("chatbot", get_agent, required=False)
 
 @router.post(
     path='/chat',
@@ -27,7 +52,9 @@ def start_up():
     description="API gửi tin nhắn tới AI Chatbot và nhận phản hồi. AI có thể trả lời về giao thông, cung cấp hình ảnh và thông tin liên quan. Yêu cầu JWT authentication."
 )
 async def chat(request: ChatRequest, current_user = Depends(get_current_user)):
-    data = await state.agent.get_response(request.message, id= current_user.id)
+    agent = await get_agent()
+    with state.metrics.time("traffic_chat_seconds", endpoint="chat"):
+        data = await agent.get_response(request.message, id= current_user.id)
     return ChatResponse(
         message=data["message"],
         image=data["image"]
@@ -40,7 +67,9 @@ async def chat(request: ChatRequest, current_user = Depends(get_current_user)):
     description="API gửi tin nhắn tới AI Chatbot KHÔNG yêu cầu authentication. Dùng cho demo hoặc public access. Mặc định sử dụng user_id = 1."
 )
 async def chat_no_auth(request: ChatRequest):
-    data = await state.agent.get_response(request.message, id= 9999)
+    agent = await get_agent()
+    with state.metrics.time("traffic_chat_seconds", endpoint="chat_no_auth"):
+        data = await agent.get_response(request.message, id= 9999)
     return ChatResponse(
         message=data["message"],
         image=data["image"]
@@ -77,7 +106,9 @@ async def websocket_chat(
                 await websocket.send_json({"message": "Bạn chưa nhập tin nhắn.", "image": None})
                 continue
 
-            response = await state.agent.get_response(user_message, id=current_user.id)
+            agent = await get_agent()
+            with state.metrics.time("traffic_chat_seconds", endpoint="ws_chat"):
+                response = await agent.get_response(user_message, id=current_user.id)
             await websocket.send_json({
                 "message": response["message"],
                 "image": response["image"]
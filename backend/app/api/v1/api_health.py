@@ -0,0 +1,62 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
+from api.v1 import state
+from core.config import settings_startup
+
+router = APIRouter()
+
+
+async def check_database() -> dict:
+    """Kiểm tra kết nối database bằng một truy vấn rất nhẹ"""
+    from sqlalchemy import text
+    from db.base import engine
+    try:
+        async def ping():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        await asyncio.wait_for(ping(), timeout=settings_startup.DB_CHECK_TIMEOUT)
+        return {"ok": True}
+    except Exception as e:
+        return {"ok": False, "detail": str(e) or type(e).__name__}
+
+
+@router.get(
+    path="/healthz",
+    summary="Liveness của server",
+    description="API trả về 200 khi event loop của server còn phản hồi, kèm trạng thái khởi động của từng thành phần. Dùng cho liveness probe, không phụ thuộc database hay các process phân tích. Endpoint này KHÔNG yêu cầu xác thực JWT."
+)
+async def healthz():
+    return {"status": "ok", **state.readiness.snapshot()}
+
+
+@router.get(
+    path="/readyz",
+    summary="Readiness của server",
+    description="API trả về 200 khi server đã sẵn sàng phục vụ: database kết nối được, các process phân tích đã khởi động và mỗi tuyến đường đã xử lý xong frame đầu tiên; ngược lại trả về 503 kèm trạng thái từng thành phần (database, analyzer, từng tuyến đường, chatbot). Endpoint này KHÔNG yêu cầu xác thực JWT."
+)
+async def readyz():
+    readiness = state.readiness
+    roads = {}
+    if state.analyzer is not None:
+        # Đọc trạng thái supervisor cần khoá của supervisor nên không chạy ở event loop
+        roads = readiness.roads(await asyncio.to_thread(state.analyzer.get_workers_health))
+    snapshot = readiness.snapshot(roads)
+    if readiness.components.get("database", {}).get("state") == readiness.READY:
+        database = await check_database()
+        snapshot["components"]["database"]["connection"] = database
+        snapshot["ready"] = snapshot["ready"] and database["ok"]
+    snapshot["status"] = "ready" if snapshot["ready"] else "not_ready"
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
+@router.get(
+    path="/metrics",
+    summary="Số liệu cho Prometheus",
+    description="API trả về số liệu theo định dạng text của Prometheus: fps, số frame bị bỏ, histogram thời gian suy luận và thời gian từng giai đoạn của mỗi tuyến đường, số lần khởi động lại process, số client WebSocket, số byte đã gửi, thời gian đọc dữ liệu qua Manager, pool kết nối DB và thời gian trả lời của chatbot. Endpoint này KHÔNG yêu cầu xác thực JWT (giống /healthz, dùng cho Prometheus scrape)."
+)
+async def metrics():
+    from db.base import engine
+    # Đọc trạng thái supervisor cần khoá của supervisor nên không chạy ở event loop
+    text = await asyncio.to_thread(state.metrics.render, state.analyzer, engine)
+    return Response(content=text, media_type=state.metrics.CONTENT_TYPE)
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from api.v1 import state
+from core.config import settings_metric_archive
+from utils.jwt_handler import get_current_user
+
+router = APIRouter(prefix="/history")
+
+
+def get_archive():
+    """Khởi tạo MetricArchive khi cần (import pyarrow muộn để không làm chậm khởi động server)"""
+    if state.metric_archive is None:
+        from services.metric_services.MetricArchive import MetricArchive
+        state.metric_archive = MetricArchive(settings_metric_archive.ARCHIVE_DIR)
+    return state.metric_archive
+
+
+async def compaction_loop():
+    """Định kỳ gộp các file Parquet nhỏ của những ngày đã kết thúc"""
+    while True:
+        try:
+            merged = await asyncio.to_thread(get_archive().compact)
+            if merged:
+                print(f"Đã gộp {merged} phân vùng số liệu lịch sử")
+        except Exception as e:
+            print(f"Lỗi khi gộp dữ liệu lịch sử: {e}")
+        await asyncio.sleep(settings_metric_archive.COMPACT_INTERVAL)
+
+
+@router.on_event("startup")
+async def start_up():
+    if settings_metric_archive.ENABLED and state.archive_compaction_task is None:
+        state.archive_compaction_task = asyncio.create_task(compaction_loop())
+
+
+@router.get(
+    path="",
+    summary="Tổng hợp số liệu lịch sử theo thời gian",
+    description="API tổng hợp số lượng xe và vận tốc trung bình theo giờ/ngày/tuần/tháng từ kho lưu trữ Parquet. Yêu cầu JWT authentication."
+)
+async def get_history_summary(
+    roads: Optional[List[str]] = Query(default=None, description="Danh sách tuyến đường, bỏ trống là tất cả"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: Literal["hour", "day", "week", "month"] = "hour",
+    current_user=Depends(get_current_user),
+):
+    rows = await asyncio.to_thread(get_archive().aggregate, roads, start, end, bucket)
+    return {"bucket": bucket, "data": rows}
+
+
+@router.get(
+    path="/{road_name}",
+    summary="Lấy số liệu lịch sử theo cửa sổ của một tuyến đường",
+    description="API trả về số liệu thô của từng cửa sổ thời gian của tuyến đường, chỉ đọc các cột được yêu cầu. Yêu cầu JWT authentication."
+)
+async def get_history_road(
+    road_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[List[str]] = Query(default=None, description="Các cột cần lấy, ví dụ count_car, speed_car"),
+    limit: int = Query(default=1000, ge=1, le=100000),
+    current_user=Depends(get_current_user),
+):
+    archive = get_archive()
+    unknown = set(columns or []) - set(archive.SCHEMA.names)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cột không hợp lệ: {', '.join(sorted(unknown))}",
+        )
+    table = await asyncio.to_thread(archive.query, [road_name], start, end, columns)
+    if table.num_rows > limit:
+        table = table.slice(table.num_rows - limit)
+    rows = table.to_pylist()
+    for row in rows:
+        for key in ("window_start", "window_end"):
+            if key in row and row[key] is not None:
+                row[key] = row[key].isoformat()
+    return {"road_name": road_name, "data": rows}
@@ -2,20 +2,54 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from api import v1
 import asyncio
-from services.road_services.AnalyzeOnRoadForMultiProcessing import AnalyzeOnRoadForMultiprocessing
+import json
+from services.road_services.CameraRegistry import CameraRegistry
 from fastapi.responses import Response
 from fastapi import WebSocket, WebSocketDisconnect
 from utils.jwt_handler import get_current_user, get_current_user_ws
 from fastapi import Depends
 from utils.transport_utils import enrich_info_with_thresholds
+from core.config import settings_metric_writer, settings_model_cascade
 
 router = APIRouter()
 
+def start_analyzer():
+    """Khởi động các process phân tích và áp dụng lệnh tạm dừng/giới hạn fps/độ ưu tiên/cascade đã lưu của từng
+    camera"""
+    v1.state.analyzer.run_multiprocessing()
+    for name, camera in v1.state.camera_registry.cameras.items():
+        v1.state.analyzer.set_road_control(name, paused=camera["paused"], max_fps=camera["max_fps"],
+                                           priority=camera.get("priority", 1),
+                                           cascade=camera.get("cascade", settings_model_cascade.DEFAULT))
+
+def frame_headers(packet: dict) -> dict:
+    """Header cho biết số thứ tự và thời điểm đọc (unix, giây) của frame để client tự kiểm tra độ trễ"""
+    if not packet.get("seq"):
+        return {}
+    return {"X-Frame-Seq": str(packet["seq"]), "X-Frame-Captured-At": f"{packet['captured_at']:.3f}"}
+
 @router.on_event("startup")
-def start_up():
+async def start_up():
     if v1.state.analyzer is None:
-        v1.state.analyzer = AnalyzeOnRoadForMultiprocessing()
-        v1.state.analyzer.run_multiprocessing()
+        from services.road_services.AnalyzeOnRoadForMultiProcessing import AnalyzeOnRoadForMultiprocessing
+        # Danh sách camera có thể đã bị thay đổi qua API admin ở lần chạy trước
+        v1.state.camera_registry = CameraRegistry.load()
+        regions, path_videos, meter_per_pixels, names = v1.state.camera_registry.as_lists()
+        # Tạo ở event loop (signal handler chỉ đăng ký được ở main thread), còn khởi động các process
+        # (nạp model, forkserver) chạy ở nền để không chặn các giai đoạn khởi động khác
+        v1.state.analyzer = AnalyzeOnRoadForMultiprocessing(
+            regions=regions, path_videos=path_videos, meter_per_pixels=meter_per_pixels, names=names)
+        v1.state.readiness.run_stage("analyzer", start_analyzer)
+
+    if settings_metric_writer.ENABLED and v1.state.metric_writer is None:
+        from services.metric_services.RoadMetricWriter import RoadMetricWriter
+        v1.state.metric_writer = RoadMetricWriter(v1.state.analyzer.metric_queue)
+        v1.state.metric_writer.start()
+
+@router.on_event("shutdown")
+async def shut_down():
+    if v1.state.metric_writer is not None:
+        await v1.state.metric_writer.stop()
 
 @router.get(
     path='/roads_name',
@@ -49,17 +83,31 @@ async def websocket_frames(
         Yêu cầu token qua query params (?token=...), cookie (access_token), hoặc header (Authorization: Bearer ...)
     """
     await websocket.accept()
+    if road_name not in v1.state.analyzer.names:
+        await websocket.close(code=1008, reason="Không có tuyến đường này.")
+        return
+    # Tuyến đường đang có người xem được ưu tiên chia CPU suy luận
+    v1.state.analyzer.scheduler.viewer_joined(road_name)
+    metrics = v1.state.metrics
+    metrics.add_gauge("traffic_websocket_subscribers", 1, stream="frames", road=road_name)
+    # seq của frame gửi lần trước để đếm số frame client bỏ lỡ
+    last_seq = None
     
     try:
         while True:
-            frame_bytes = await asyncio.to_thread(v1.state.analyzer.get_frame_road, road_name)
+            frame_bytes, packet = await asyncio.to_thread(v1.state.analyzer.get_frame_packet, road_name)
             await websocket.send_bytes(frame_bytes)
+            metrics.inc("traffic_bytes_sent_total", len(frame_bytes), endpoint="ws_frames")
+            last_seq = metrics.record_delivery("ws_frames", road_name, packet, last_seq)
             await asyncio.sleep(1/30)
     except WebSocketDisconnect:
         pass
     except Exception as e:
         print(e)
         await websocket.close()
+    finally:
+        v1.state.analyzer.scheduler.viewer_left(road_name)
+        metrics.add_gauge("traffic_websocket_subscribers", -1, stream="frames", road=road_name)
         
 @router.websocket(
     "/ws/info/{road_name}",
@@ -84,6 +132,9 @@ async def websocket_info(
         JSON data chứa thông tin phương tiện, cập nhật mỗi 5 giây
     """
     await websocket.accept()
+    metrics = v1.state.metrics
+    metrics.add_gauge("traffic_websocket_subscribers", 1, stream="info", road=road_name)
+    last_seq = None
     
     try:
         while True:
@@ -94,13 +145,19 @@ async def websocket_info(
             except Exception:
                 enriched = data
 
-            await websocket.send_json(enriched)
+            # Giống send_json nhưng giữ lại nội dung để đếm số byte đã gửi
+            text = json.dumps(enriched, separators=(",", ":"), ensure_ascii=False)
+            await websocket.send_text(text)
+            metrics.inc("traffic_bytes_sent_total", len(text.encode("utf-8")), endpoint="ws_info")
+            last_seq = metrics.record_delivery("ws_info", road_name, data, last_seq)
             await asyncio.sleep(1/50)
     except WebSocketDisconnect:
         pass
     except Exception as e:
         await websocket.send_json({"detail": f"Internal error: {str(e)}"})
         await websocket.close()
+    finally:
+        metrics.add_gauge("traffic_websocket_subscribers", -1, stream="info", road=road_name)
 
 @router.get(
     path='/info/{road_name}',
@@ -122,7 +179,10 @@ async def get_info_road(road_name: str):
     except Exception:
         enriched = data
 
-    return JSONResponse(content=enriched)
+    response = JSONResponse(content=enriched)
+    v1.state.metrics.inc("traffic_bytes_sent_total", len(response.body), endpoint="info")
+    v1.state.metrics.record_delivery("info", road_name, data)
+    return response
 
 @router.get(
     path='/frames/{road_name}',
@@ -143,13 +203,15 @@ async def get_frame_road(road_name: str, current_user=Depends(get_current_user))
     Returns:
         Response: Image JPEG của frame hiện tại
     """
-    frame_bytes = await asyncio.to_thread(v1.state.analyzer.get_frame_road, road_name)
+    frame_bytes, packet = await asyncio.to_thread(v1.state.analyzer.get_frame_packet, road_name)
     if frame_bytes is None:
         return JSONResponse(
             content={"error": "Lỗi: Dữ liệu bị lỗi, kiểm tra core"},
             status_code=500
         )
-    return Response(content=frame_bytes, media_type="image/jpeg")
+    v1.state.metrics.inc("traffic_bytes_sent_total", len(frame_bytes), endpoint="frames")
+    v1.state.metrics.record_delivery("frames", road_name, packet)
+    return Response(content=frame_bytes, media_type="image/jpeg", headers=frame_headers(packet))
 
 
 @router.get(
@@ -158,10 +220,12 @@ async def get_frame_road(road_name: str, current_user=Depends(get_current_user))
     description="API trả về frame hình ảnh (JPEG) hiện tại của tuyến đường. Endpoint này KHÔNG yêu cầu xác thực JWT - dùng cho mục đích demo hoặc public."
 )   
 async def get_frame_road_no_auth(road_name: str):
-    frame_bytes = await asyncio.to_thread(v1.state.analyzer.get_frame_road, road_name)
+    frame_bytes, packet = await asyncio.to_thread(v1.state.analyzer.get_frame_packet, road_name)
     if frame_bytes is None:
         return JSONResponse(
             content={"error": "Lỗi: Dữ liệu bị lỗi, kiểm tra core"},
             status_code=500
         )
-    return Response(content=frame_bytes, media_type="image/jpeg")
+    v1.state.metrics.inc("traffic_bytes_sent_total", len(frame_bytes), endpoint="frames_no_auth")
+    v1.state.metrics.record_delivery("frames_no_auth", road_name, packet)
+    return Response(content=frame_bytes, media_type="image/jpeg", headers=frame_headers(packet))
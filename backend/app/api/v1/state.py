@@ -1,5 +1,12 @@
-from services.road_services.AnalyzeOnRoadForMultiProcessing import AnalyzeOnRoadForMultiprocessing
-from services.chat_services.ChatBotAgent import ChatBotAgent
+from typing import TYPE_CHECKING
+from services.system_services.ReadinessTracker import ReadinessTracker
+from services.system_services.PrometheusMetrics import PrometheusMetrics
+
+# Chỉ import để gợi ý kiểu: các module này nạp ultralytics/torch/langchain (vài giây) nên được import
+# ở nơi dùng đến chúng (startup của api_vehicles_frames, lần chat đầu tiên của api_chatbot)
+if TYPE_CHECKING:
+    from services.road_services.AnalyzeOnRoadForMultiProcessing import AnalyzeOnRoadForMultiprocessing
+    from services.chat_services.ChatBotAgent import ChatBotAgent
 
 # Phần gắn tạm để gợi ý code
 # analyzer = AnalyzeOnRoadForMultiprocessing(show= False,
@@ -9,7 +16,17 @@ from services.chat_services.ChatBotAgent import ChatBotAgent
 
 
 # Phần states chính thức
-analyzer = None
+analyzer: "AnalyzeOnRoadForMultiprocessing" = None
+# Danh sách camera có thể thay đổi khi đang chạy (CameraRegistry)
+camera_registry = None
 # chat_bot = None
-agent = None
-
+agent: "ChatBotAgent" = None
+# Kho lưu trữ số liệu lịch sử (Parquet) và job gộp file nhỏ chạy nền
+metric_archive = None
+archive_compaction_task = None
+# Tác vụ nền ghi hàng loạt số liệu vào bảng road_metrics
+metric_writer = None
+# Trạng thái khởi động của từng thành phần cho /healthz và /readyz
+readiness = ReadinessTracker()
+# Số liệu đo trong process API cho /metrics
+metrics = PrometheusMetrics()
@@ -0,0 +1,72 @@
+r"""Đo tốc độ tất cả bản export trong ai_models (OpenVINO FP/INT8, ONNX, MNN, NCNN) trên một video mẫu.
+
+Ma trận đo gồm số thread x imgsz x batch (mặc định theo SettingModelBenchmark), mỗi ô báo latency p50/p90/p99
+của một batch, throughput (ảnh/giây) và peak RSS. Kết quả được ghi ra JSON và Markdown; với --baseline, mỗi ô
+được so với lần đo đã lưu và lệnh thoát với mã 1 khi có ô chậm hơn quá --tolerance.
+
+Ví dụ (chạy từ thư mục app):
+    python benchmark_models.py --video "./video_test/Văn Quán.mp4" --threads 1 2 4 --imgsz 640 320 --batch 1
+    python benchmark_models.py --video "./video_test/Văn Quán.mp4" --save-baseline
+"""
+import os
+import sys
+import argparse
+import json
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+from core.config import settings_inference_backend, settings_model_benchmark
+from services.model_services.ModelBenchmark import ModelBenchmark
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các bản export của model phát hiện xe")
+    parser.add_argument("--models-dir", default=settings_inference_backend.MODELS_DIR)
+    parser.add_argument("--video", help="Video mẫu. Mặc định là video camera đầu tiên có trên máy")
+    parser.add_argument("--backends", nargs="+", help="Chỉ đo các backend này (vd openvino-int8 onnxruntime-int8)")
+    parser.add_argument("--threads", type=int, nargs="+", default=settings_model_benchmark.THREADS)
+    parser.add_argument("--imgsz", type=int, nargs="+", default=settings_model_benchmark.IMGSZ)
+    parser.add_argument("--batch", type=int, nargs="+", default=settings_model_benchmark.BATCH)
+    parser.add_argument("--frames", type=int, default=settings_model_benchmark.FRAMES)
+    parser.add_argument("--runs", type=int, default=settings_model_benchmark.RUNS)
+    parser.add_argument("--output", default=os.path.join(settings_model_benchmark.OUTPUT_DIR, "benchmark.json"),
+                        help="File JSON kết quả (file .md cùng tên được ghi bên cạnh)")
+    parser.add_argument("--baseline", default=settings_model_benchmark.BASELINE_PATH,
+                        help="Kết quả chuẩn để so sánh")
+    parser.add_argument("--tolerance", type=float, default=settings_model_benchmark.REGRESSION_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả lần này làm baseline")
+    args = parser.parse_args()
+
+    benchmark = ModelBenchmark(models_dir=args.models_dir, video=args.video, threads=args.threads,
+                               imgsz=args.imgsz, batch=args.batch, frames=args.frames, runs=args.runs,
+                               backends=args.backends)
+    report = benchmark.run()
+
+    baseline = None if args.save_baseline else ModelBenchmark.load(args.baseline)
+    regressions = ModelBenchmark.compare(report, baseline, args.tolerance) if baseline else []
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    markdown = ModelBenchmark.to_markdown(report)
+    with open(os.path.splitext(args.output)[0] + ".md", "w", encoding="utf-8") as f:
+        f.write(markdown)
+    print(markdown)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Đã lưu baseline: {args.baseline}")
+    for cell in regressions:
+        print(f"Hồi quy: {cell['model']} threads={cell['threads']} imgsz={cell['imgsz']} batch={cell['batch']} "
+              f"p50 {cell['p50_change']:+.1%}, fps {cell['fps_change']:+.1%}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
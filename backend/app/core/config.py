@@ -36,22 +36,222 @@ class SettingMetricTransport:
                         0.05
                         ]
     MODELS_PATH = r'./ai_models/model N/openvino models/best_int8_openvino_model'
+    # Góc trên trái (x, y) của vùng ROI đưa vào model trên frame 600x400
+    ROI_START = (50, 130)
+    # Tham số suy luận của các process phân tích (kích thước ảnh mặc định, ngưỡng tin cậy và IoU của NMS)
+    IMGSZ = 640
+    CONF = 0.2
+    IOU = 0.3
 
     DEVICE = 'cpu'
 
 class SettingChatBot:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-
-    LLM = ChatGoogleGenerativeAI(model="gemini-2.5-flash",
-                                temperature=0.6, 
-                                max_output_tokens=1024
-                                )
-    # Dùng ollama local api llm
-    
-    # from langchain_openai import OpenAI
-    # LLM = OpenAI(model_name="gemma3:4b",
-    #              temperature=0.6,
-    #              max_tokens=1024)
+    MODEL = "gemini-2.5-flash"
+    TEMPERATURE = 0.6
+    MAX_OUTPUT_TOKENS = 1024
+    _llm = None
+
+    @property
+    def LLM(self):
+        """Client LLM được tạo ở lần dùng đầu tiên: import langchain_google_genai mất hơn 1 giây nên không làm
+        lúc import config (mọi process con và các CLI như bot_tele.py đều import config)"""
+        if SettingChatBot._llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            SettingChatBot._llm = ChatGoogleGenerativeAI(model=self.MODEL,
+                                                         temperature=self.TEMPERATURE,
+                                                         max_output_tokens=self.MAX_OUTPUT_TOKENS
+                                                         )
+            # Dùng ollama local api llm
+
+            # from langchain_openai import OpenAI
+            # SettingChatBot._llm = OpenAI(model_name="gemma3:4b",
+            #                              temperature=0.6,
+            #                              max_tokens=1024)
+        return SettingChatBot._llm
+
+class SettingMetricArchive:
+    # Lưu trữ dài hạn số liệu theo cửa sổ (Parquet, phân vùng theo ngày và tuyến đường)
+    ENABLED = os.getenv("METRIC_ARCHIVE_ENABLED", "true").lower() == "true"
+    ARCHIVE_DIR = os.getenv("METRIC_ARCHIVE_DIR", "./data/metric_archive")
+    ROW_GROUP_SIZE = 64         # số cửa sổ gom lại trước khi ghi ra một row group
+    FLUSH_INTERVAL = 600        # giây, buộc ghi ra đĩa kể cả khi chưa đủ ROW_GROUP_SIZE
+    COMPACT_INTERVAL = 3600     # giây giữa 2 lần chạy job gộp file nhỏ
+    COMPACT_MIN_FILES = 2       # chỉ gộp phân vùng có từ chừng này file trở lên
+
+class SettingMetricWriter:
+    # Ghi hàng loạt số liệu theo cửa sổ vào bảng road_metrics
+    ENABLED = os.getenv("METRIC_DB_WRITER_ENABLED", "true").lower() == "true"
+    QUEUE_SIZE = 10000          # kích thước hàng đợi giữa các process phân tích và writer
+    BATCH_SIZE = 500            # số dòng tối đa mỗi lần ghi
+    FLUSH_INTERVAL = 5          # giây, ghi kể cả khi chưa đủ BATCH_SIZE
+    MAX_PENDING = 20000         # bộ đệm tối đa của writer khi DB chậm
+
+class SettingFrameSource:
+    # Nguồn frame cho các video lặp lại: "decode" giải mã MP4 mỗi vòng lặp, "mmap" giải mã một lần
+    # vào file cache (frame thô 600x400) rồi đọc lại qua memory-map, page cache được chia sẻ giữa các process
+    MODE = os.getenv("FRAME_SOURCE", "decode").lower()
+    CACHE_DIR = os.getenv("FRAME_CACHE_DIR", "./data/frame_cache")
+    MAX_CACHE_MB = int(os.getenv("FRAME_CACHE_MAX_MB", "4096"))  # video lớn hơn sẽ quay về giải mã trực tiếp
+
+class SettingDetectionCache:
+    # Lưu kết quả phát hiện thô của từng frame để chạy lại tracking/ước lượng vận tốc mà không cần suy luận:
+    # "off" tắt, "record" chỉ ghi log, "cache" ghi log ở vòng đầu rồi dùng lại cho các vòng lặp sau của video
+    MODE = os.getenv("DETECTION_CACHE", "off").lower()
+    CACHE_DIR = os.getenv("DETECTION_CACHE_DIR", "./data/detection_cache")
+
+class SettingWorkerSupervisor:
+    # Giám sát các process phân tích: khởi động lại process bị chết hoặc bị treo (không xử lý được frame nào)
+    ENABLED = os.getenv("WORKER_SUPERVISOR_ENABLED", "true").lower() == "true"
+    CHECK_INTERVAL = 2          # giây giữa 2 lần kiểm tra
+    STALL_TIMEOUT = 30          # giây không xử lý được frame nào thì coi là bị treo
+    STARTUP_TIMEOUT = 180       # giây tối đa từ lúc khởi động đến frame đầu tiên (nạp model, mở video)
+    BACKOFF_BASE = 2            # giây chờ trước lần khởi động lại đầu tiên, nhân đôi sau mỗi lần liên tiếp
+    BACKOFF_MAX = 300           # giây chờ tối đa giữa 2 lần khởi động lại
+    HEALTHY_RESET = 300         # chạy ổn định chừng này giây thì thời gian chờ quay về BACKOFF_BASE
+
+class SettingPipelineTiming:
+    # Thời gian từng giai đoạn xử lý frame của mỗi process phân tích (StageTimer), xem /api/v1/admin/pipeline
+    ENABLED = os.getenv("PIPELINE_TIMING", "true").lower() == "true"
+    WINDOW = 60                 # histogram trượt của WINDOW giây gần nhất
+    SLOTS = 6                   # chia cửa sổ thành SLOTS ô, ô cũ nhất bị xoá khi sang ô mới
+    MIN_MS = 0.05               # cận trên của bucket nhỏ nhất (ms), mỗi bucket sau lớn gấp 1.5 lần
+    BUCKETS = 32
+
+class SettingPrometheus:
+    # Endpoint /metrics (định dạng text của Prometheus). Cận trên (giây) các bucket của histogram đo trong
+    # process API; histogram inference dùng bucket của StageTimer
+    IPC_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+    CHAT_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+    # Độ trễ từ lúc đọc frame tới lúc ghi cho process chính và tới lúc gửi xong cho client
+    FRESHNESS_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+class SettingCameraRegistry:
+    # Danh sách camera có thể thay đổi khi server đang chạy (qua API admin). Lần chạy đầu được tạo từ
+    # REGIONS, PATH_VIDEOS, METER_PER_PIXELS, sau đó file này là nguồn cấu hình chính
+    PATH = os.getenv("CAMERA_REGISTRY_PATH", "./data/cameras.json")
+
+class SettingCpuPlanner:
+    # Chia core cho các process phân tích (ghim CPU + giới hạn số thread suy luận) để tránh mỗi process
+    # đều dùng toàn bộ core gây tranh chấp; có tính cả quota CPU của cgroup khi chạy trong Docker
+    ENABLED = os.getenv("CPU_PLANNER_ENABLED", "true").lower() == "true"
+    RESERVED_CPUS = int(os.getenv("CPU_PLANNER_RESERVED", 1))             # core giữ lại cho process API
+    THREADS_PER_WORKER = int(os.getenv("CPU_PLANNER_THREADS", 0))         # 0 là tự tính theo số core được chia
+
+class SettingModelPreload:
+    # "off": mỗi process phân tích tự nạp model; "forkserver": nạp và chạy khởi động model một lần trong
+    # forkserver rồi fork các process từ đó (khởi động lại nhanh, trọng số model dùng chung copy-on-write)
+    MODE = os.getenv("MODEL_PRELOAD", "off").lower()
+    # Cache model OpenVINO đã biên dịch, để trống để tắt
+    OPENVINO_CACHE_DIR = os.getenv("OPENVINO_CACHE_DIR", "./data/openvino_cache")
+
+class SettingInferenceScheduler:
+    # Chia CPU suy luận cho các tuyến đường theo độ ưu tiên và số người đang xem, giảm chất lượng tuyến đường
+    # bị trễ quá SLO (thà mọi camera đều 10 fps còn hơn vài camera 30 fps và số khác bị đứng hình)
+    ENABLED = os.getenv("INFERENCE_SCHEDULER_ENABLED", "true").lower() == "true"
+    INTERVAL = 2                # giây giữa 2 lần phân bổ lại
+    LATENCY_SLO = float(os.getenv("INFERENCE_LATENCY_SLO_MS", 250)) / 1000   # thời gian xử lý tối đa một frame
+    MIN_FPS = 5                 # fps tối thiểu của mỗi tuyến đường đang chạy
+    MAX_FPS = 30                # fps tối đa (bằng fps của camera)
+    VIEWER_WEIGHT = 1.0         # mỗi người đang xem làm trọng số của tuyến đường tăng thêm chừng này lần độ ưu tiên
+    DEGRADE_AFTER = 2           # số lần kiểm tra liên tiếp trễ SLO thì giảm chất lượng một mức
+    RESTORE_AFTER = 5           # số lần kiểm tra liên tiếp còn dư thì tăng chất lượng một mức
+    RESTORE_RATIO = 0.6         # còn dư khi latency dưới RESTORE_RATIO * LATENCY_SLO
+    # Các mức giảm chất lượng: vẽ thông tin lên frame và kích thước ảnh đưa vào model
+    LEVELS = [
+        {"draw": True, "imgsz": 640},
+        {"draw": False, "imgsz": 640},
+        {"draw": False, "imgsz": 480},
+        {"draw": False, "imgsz": 320},
+    ]
+
+class SettingInferenceBackend:
+    # Runtime chạy model phát hiện: "" dùng đúng MODELS_PATH, "auto" đo các bản export trong MODELS_DIR lúc khởi
+    # động và chọn bản nhanh nhất đạt MIN_AGREEMENT, hoặc chỉ định openvino/onnxruntime/mnn/ncnn
+    BACKEND = os.getenv("INFERENCE_BACKEND", "").lower()
+    MODELS_DIR = os.getenv("INFERENCE_MODELS_DIR", "./ai_models/model N")
+    # Độ trùng khớp tối thiểu (F1 của các box) với kết quả của MODELS_PATH
+    MIN_AGREEMENT = float(os.getenv("INFERENCE_BACKEND_MIN_AGREEMENT", 0.9))
+    BENCHMARK_FRAMES = 8        # số frame lấy từ video camera để so sánh độ chính xác
+    BENCHMARK_RUNS = 20         # số lần suy luận để đo tốc độ mỗi backend
+    # Kết quả đo được lưu lại, chỉ đo lại khi đổi máy/model
+    SELECTION_PATH = os.getenv("INFERENCE_BACKEND_SELECTION", "./data/inference_backend.json")
+
+class SettingAsyncInference:
+    # Phát hiện bằng OpenVINO AsyncInferQueue: nhiều infer request chạy song song trong mỗi process (chỉ với model
+    # OpenVINO). Kết quả được sắp xếp lại theo thứ tự frame trước khi đưa vào tracker
+    ENABLED = os.getenv("OPENVINO_ASYNC", "false").lower() == "true"
+    NUM_REQUESTS = int(os.getenv("OPENVINO_ASYNC_REQUESTS", 0))     # 0 là theo OPTIMAL_NUMBER_OF_INFER_REQUESTS
+    PERFORMANCE_HINT = os.getenv("OPENVINO_PERFORMANCE_HINT", "THROUGHPUT")    # THROUGHPUT hoặc LATENCY
+    NUM_STREAMS = int(os.getenv("OPENVINO_NUM_STREAMS", 0))         # 0 là để OpenVINO chọn theo PERFORMANCE_HINT
+    # Model nhận thẳng vùng ROI uint8 BGR, letterbox/đổi màu/đổi layout/chia 255 nằm trong graph (PrePostProcessor)
+    PREPROCESS_IN_GRAPH = os.getenv("OPENVINO_PREPROCESS_IN_GRAPH", "false").lower() == "true"
+    RESULT_TIMEOUT = 10         # giây chờ kết quả của một frame, quá thì quay về suy luận đồng bộ
+
+class SettingQuantization:
+    # Ngưỡng để quantize_model.py được phép thay model INT8 đang dùng trong MODELS_DIR
+    MIN_SPEEDUP = float(os.getenv("QUANT_MIN_SPEEDUP", 1.1))           # fps INT8 / fps bản FP cùng định dạng
+    MAX_FPS_REGRESSION = float(os.getenv("QUANT_MAX_FPS_REGRESSION", 0.1))  # chậm hơn bản đang dùng tối đa 10%
+    MIN_FPS = float(os.getenv("QUANT_MIN_FPS", 0))                     # fps tối thiểu tuyệt đối, 0 là không xét
+    MAX_MAP_DROP = float(os.getenv("QUANT_MAX_MAP_DROP", 0.05))        # mAP50 INT8 thấp hơn bản gốc tối đa
+    CALIBRATION_FRAMES = 300    # số frame lấy từ video camera để hiệu chỉnh INT8
+    EVAL_FRAMES = 100           # số frame của đoạn video giữ riêng để đo fps và mAP
+    EVAL_FRACTION = 0.2         # phần cuối mỗi video được giữ riêng để đánh giá, không dùng để hiệu chỉnh
+    WORK_DIR = "./data/quantization"
+
+class SettingModelBenchmark:
+    # Ma trận đo của benchmark_models.py: mọi bản export trong MODELS_DIR x số thread x imgsz x batch
+    THREADS = [1, 2, 4]
+    IMGSZ = [640, 480, 320]
+    BATCH = [1, 4]
+    FRAMES = 32                 # số vùng ROI lấy từ video mẫu
+    RUNS = 30                   # số lần suy luận (mỗi lần một batch) để tính phân vị latency
+    WARMUP = 3
+    OUTPUT_DIR = "./data/benchmarks"
+    # Kết quả chuẩn để so sánh, chậm hơn quá REGRESSION_TOLERANCE (p50 hoặc throughput) là hồi quy
+    BASELINE_PATH = "./ai_models/model N/bench marks/baseline.json"
+    REGRESSION_TOLERANCE = 0.1
+
+class SettingModelCascade:
+    # Cascade model N -> model S theo từng tuyến đường (bật/tắt qua API admin, DEFAULT áp dụng cho camera mới)
+    DEFAULT = os.getenv("MODEL_CASCADE", "false").lower() == "true"
+    SECONDARY_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", r'./ai_models/model S/openvino models/best_int8_openvino_model')
+    KEYFRAME_INTERVAL = int(os.getenv("CASCADE_KEYFRAME_INTERVAL", 15))     # model S chạy định kỳ mỗi 15 frame
+    MIN_INTERVAL = int(os.getenv("CASCADE_MIN_INTERVAL", 3))               # tối đa 1/3 số frame chạy model S
+    UNCERTAIN_CONF = 0.45       # box của model N có conf thấp hơn là box không chắc chắn
+    MAX_UNCERTAIN_RATIO = 0.3   # tỉ lệ box không chắc chắn để chạy model S ngoài keyframe
+    MERGE_IOU = 0.5             # box của model N trùng box cùng lớp của model S thì bỏ
+    KEEP_PRIMARY_CONF = 0.5     # box model S bỏ sót chỉ được giữ khi model N đủ chắc chắn
+
+class SettingAdaptiveResolution:
+    # Mỗi tuyến đường tự chọn imgsz trong SIZES theo mật độ và kích thước phương tiện (AdaptiveResolution)
+    ENABLED = os.getenv("ADAPTIVE_RESOLUTION", "false").lower() == "true"
+    SIZES = [320, 480, 640]     # các imgsz được biên dịch sẵn lúc khởi động
+    WINDOW = 30                 # số frame gần nhất dùng để tính mật độ/kích thước phương tiện
+    MIN_OBJECT_PX = 16          # cạnh ngắn tối thiểu của phương tiện nhỏ trên ảnh đưa vào model
+    DENSE_COUNT = 20            # trung bình từ 20 phương tiện mỗi frame thì dùng imgsz lớn nhất
+    UP_FRAMES = 3               # tăng imgsz sau 3 frame liên tiếp cần imgsz lớn hơn
+    DOWN_FRAMES = 90            # giảm imgsz sau 90 frame liên tiếp đủ với imgsz nhỏ hơn
+    PROBE_INTERVAL = 30         # mỗi 30 frame chạy một frame ở imgsz lớn nhất để không bỏ sót xe nhỏ
+    MARGIN = 0.25               # khi giảm, phương tiện nhỏ phải lớn hơn MIN_OBJECT_PX thêm 25%
+
+class SettingLoadTest:
+    # Load test API với StubAnalyzer (load_test_api.py): frame và số liệu giả lập, không chạy model
+    FRAME_FPS = 30              # tốc độ đổi frame của mỗi tuyến đường giả lập
+    INFO_INTERVAL = 5.0         # số liệu phương tiện đổi sau mỗi INFO_INTERVAL giây
+    VEHICLES = (10, 20)         # (ô tô, xe máy) trong mỗi frame giả lập
+    # Số client đồng thời của mỗi loại
+    CLIENTS = {"ws_frames": 20, "ws_info": 20, "info": 10, "frames": 10}
+    DURATION = 30               # thời gian đo (giây)
+    PORT = 8010
+    # Server load test dùng SQLite riêng nên không cần Postgres
+    DATABASE_URL = "sqlite+aiosqlite:///./data/loadtest/loadtest.db"
+    OUTPUT_DIR = "./data/loadtest"
+
+class SettingStartup:
+    # Tạo Chat Agent ở nền ngay khi khởi động (song song với các giai đoạn khác) thay vì ở lần chat đầu tiên
+    PRELOAD_CHATBOT = os.getenv("STARTUP_PRELOAD_CHATBOT", "true").lower() == "true"
+    DB_CHECK_TIMEOUT = 2        # giây tối đa cho truy vấn kiểm tra database của /readyz
 
 class SettingNetwork:
     BASE_URL_API = "http://localhost:8000"
@@ -61,7 +261,26 @@ settings_server = SettingServer()
 settings_metric_transport = SettingMetricTransport()
 settings_chat_bot = SettingChatBot()
 settings_network = SettingNetwork()
-setting_chatbot = SettingChatBot()
+settings_metric_archive = SettingMetricArchive()
+settings_metric_writer = SettingMetricWriter()
+settings_frame_source = SettingFrameSource()
+settings_detection_cache = SettingDetectionCache()
+settings_worker_supervisor = SettingWorkerSupervisor()
+settings_pipeline_timing = SettingPipelineTiming()
+settings_prometheus = SettingPrometheus()
+settings_camera_registry = SettingCameraRegistry()
+settings_cpu_planner = SettingCpuPlanner()
+settings_model_preload = SettingModelPreload()
+settings_startup = SettingStartup()
+settings_inference_backend = SettingInferenceBackend()
+settings_async_inference = SettingAsyncInference()
+settings_quantization = SettingQuantization()
+settings_model_benchmark = SettingModelBenchmark()
+settings_model_cascade = SettingModelCascade()
+settings_adaptive_resolution = SettingAdaptiveResolution()
+settings_load_test = SettingLoadTest()
+settings_inference_scheduler = SettingInferenceScheduler()
+setting_chatbot = settings_chat_bot
 
 # ================= Traffic Thresholds (per-road) =================
 # v: average speed threshold (km/h) - >= v => fast, else slow
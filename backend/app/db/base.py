@@ -12,6 +12,7 @@ async def create_tables():
     from models.user import User
     from models.TokenLLM import TokenLLM
     from models.chat_message import ChatMessage
+    from models.road_metric import RoadMetric
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
@@ -0,0 +1,79 @@
+r"""Export model phát hiện xe sang các định dạng suy luận, có thể gắn sẵn NMS và lọc lớp vào graph.
+
+Bản export được đặt tên theo quy ước của ai_models (best_int8.onnx, best_int8_openvino_model...) để
+InferenceBackend tự tìm thấy. Với --nms, model trả về thẳng tensor
+(1, max_det, 6) x1, y1, x2, y2, conf, cls đã qua ngưỡng conf/iou và chỉ gồm các lớp --classes, nên worker
+không phải chạy NMS bằng torch.
+
+Ví dụ (chạy từ thư mục app):
+    # Export từ trọng số gốc
+    python export_model.py --weights "./ai_models/model N/original model/best.pt" --format openvino --int8 \
+        --data ./datasets/xe_may_oto/data.yaml --nms --output "./ai_models/model N/openvino models"
+
+    # Gắn NMS vào một bản OpenVINO đã export (không cần best.pt)
+    python export_model.py --source "./ai_models/model N/openvino models/best_int8_openvino_model" \
+        --conf 0.2 --iou 0.3 --classes 0 1 --max-det 100
+"""
+import os
+import sys
+import argparse
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+from utils.model_export import EXPORT_SUFFIXES, add_nms_to_openvino, export_from_weights
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def validate(model_path: str, data: str):
+    """Đánh giá mAP của bản export trên tập validation (cần ultralytics và dataset)"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(model_path, task="detect").val(data=data, verbose=False)
+    print(f"{model_path}: mAP50={metrics.box.map50:.4f} mAP50-95={metrics.box.map:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model phát hiện xe, có thể gắn NMS và lọc lớp vào graph")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--weights", help="File trọng số .pt cần export")
+    group.add_argument("--source", help="Thư mục *_openvino_model đã export, chỉ gắn thêm NMS")
+    parser.add_argument("--format", default="openvino", choices=sorted(EXPORT_SUFFIXES),
+                        help="Định dạng export khi dùng --weights")
+    parser.add_argument("--output", help="Thư mục ghi bản export. Mặc định là thư mục của --weights/--source")
+    parser.add_argument("--int8", action="store_true", help="Lượng tử hoá INT8")
+    parser.add_argument("--half", action="store_true", help="Trọng số FP16")
+    parser.add_argument("--static", action="store_true", help="Cố định kích thước input (mặc định là động)")
+    parser.add_argument("--data", help="data.yaml dùng để hiệu chỉnh INT8 của OpenVINO")
+    parser.add_argument("--nms", action="store_true", help="Gắn NMS vào graph (luôn bật khi dùng --source)")
+    parser.add_argument("--conf", type=float, default=0.2, help="Ngưỡng điểm nằm trong graph")
+    parser.add_argument("--iou", type=float, default=0.3, help="Ngưỡng IoU của NMS nằm trong graph")
+    parser.add_argument("--classes", type=int, nargs="+", help="Chỉ giữ các lớp này (id theo model, vd 0 1)")
+    parser.add_argument("--max-det", type=int, default=100, help="Số box tối đa mỗi ảnh")
+    parser.add_argument("--val", help="data.yaml để đánh giá mAP của bản export sau khi xuất")
+    args = parser.parse_args()
+
+    if args.source:
+        if not args.source.rstrip("/\\").endswith(EXPORT_SUFFIXES["openvino"]):
+            raise SystemExit("--source phải là thư mục *_openvino_model")
+        output_dir = None
+        if args.output:
+            name = os.path.basename(args.source.rstrip("/\\"))[:-len(EXPORT_SUFFIXES["openvino"])]
+            output_dir = os.path.join(args.output, name + "_nms" + EXPORT_SUFFIXES["openvino"])
+        exported = add_nms_to_openvino(args.source, output_dir, conf=args.conf, iou=args.iou, classes=args.classes,
+                                       max_det=args.max_det)
+    else:
+        exported = export_from_weights(args.weights, args.format, args.output or os.path.dirname(args.weights),
+                                       int8=args.int8, half=args.half, dynamic=not args.static, data=args.data,
+                                       nms=args.nms, conf=args.conf, iou=args.iou, classes=args.classes,
+                                       max_det=args.max_det)
+    print(f"Đã export: {exported}")
+
+    if args.val:
+        validate(exported, args.val)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+r"""Load test API với StubAnalyzer: đo số client dashboard một node API chịu được mà không cần chạy model.
+
+Lệnh khởi động một server riêng (uvicorn, process con) dùng StubAnalyzer thay cho các process phân tích và
+SQLite thay cho Postgres (hoặc --database-url), rồi chạy đồng thời các client /ws/frames, /ws/info, /frames,
+/info trong --duration giây. Kết quả gồm throughput, latency p50/p90/p99 của mỗi loại client và CPU/RSS của
+server, được ghi ra JSON và Markdown (log của server ghi vào file .server.log cùng tên). Với --url, lệnh chỉ
+tạo tải lên server đã chạy sẵn (không đo CPU/RSS trừ khi có --server-pid).
+
+Ví dụ (chạy từ thư mục app):
+    python load_test_api.py --clients ws_frames=50 ws_info=50 frames=10 info=10 --duration 60
+    python load_test_api.py --roads 10 --frame-fps 15 --database-url "postgresql+asyncpg://..."
+    python load_test_api.py --url http://10.0.0.5:8000 --clients ws_frames=200
+"""
+import os
+import sys
+import argparse
+import json
+import subprocess
+import time
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+from core.config import settings_load_test
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def serve(args):
+    """Chạy API với StubAnalyzer (được gọi trong process server)"""
+    import uvicorn
+    import main as server
+    from api import v1
+    from services.road_services.StubAnalyzer import StubAnalyzer
+
+    names = [f"Đường {i + 1}" for i in range(args.roads)] if args.roads else None
+    v1.state.analyzer = StubAnalyzer(names=names, frame_fps=args.frame_fps, info_interval=args.info_interval)
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url,
+        # Server load test chỉ phục vụ các endpoint giao thông
+        "STARTUP_PRELOAD_CHATBOT": "false",
+        "METRIC_ARCHIVE_ENABLED": "false",
+        "METRIC_DB_WRITER_ENABLED": "false",
+    })
+    if args.database_url.startswith("sqlite"):
+        os.makedirs(os.path.dirname(args.database_url.split(":///", 1)[1]) or ".", exist_ok=True)
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+               "--roads", str(args.roads), "--frame-fps", str(args.frame_fps),
+               "--info-interval", str(args.info_interval)]
+    # Log của server (gồm log SQL của engine) ghi riêng để không lẫn với kết quả
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(os.path.splitext(args.output)[0] + ".server.log", "w", encoding="utf-8") as log:
+        return subprocess.Popen(command, cwd=app_path, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server dừng với mã {process.returncode}")
+        try:
+            if httpx.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server chưa sẵn sàng sau {timeout} giây")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test API với dữ liệu giả lập")
+    parser.add_argument("--url", help="Server đã chạy sẵn, bỏ trống thì tự khởi động server với StubAnalyzer")
+    parser.add_argument("--server-pid", type=int, help="pid của server --url để đo CPU/RSS")
+    parser.add_argument("--clients", nargs="+", default=[f"{k}={v}" for k, v in settings_load_test.CLIENTS.items()],
+                        help="Số client mỗi loại, dạng loại=số (ws_frames, ws_info, frames, info)")
+    parser.add_argument("--duration", type=float, default=settings_load_test.DURATION)
+    parser.add_argument("--roads", type=int, default=0, help="Số tuyến đường giả lập, 0 là theo danh sách camera")
+    parser.add_argument("--frame-fps", type=float, default=settings_load_test.FRAME_FPS)
+    parser.add_argument("--info-interval", type=float, default=settings_load_test.INFO_INTERVAL)
+    parser.add_argument("--database-url", default=settings_load_test.DATABASE_URL)
+    parser.add_argument("--port", type=int, default=settings_load_test.PORT)
+    parser.add_argument("--output", default=os.path.join(settings_load_test.OUTPUT_DIR, "load_test.json"),
+                        help="File JSON kết quả (file .md cùng tên được ghi bên cạnh)")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    from services.system_services.ApiLoadTest import ApiLoadTest
+
+    clients = {}
+    for item in args.clients:
+        kind, _, count = item.partition("=")
+        if kind not in ApiLoadTest.KINDS or not count.isdigit():
+            parser.error(f"--clients không hợp lệ: {item}")
+        clients[kind] = int(count)
+
+    server = None
+    url, server_pid = args.url, args.server_pid
+    if url is None:
+        server = start_server(args)
+        url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+    try:
+        if server is not None:
+            wait_ready(url, server)
+        report = ApiLoadTest(url, clients, duration=args.duration, server_pid=server_pid).run()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    markdown = ApiLoadTest.to_markdown(report)
+    with open(os.path.splitext(args.output)[0] + ".md", "w", encoding="utf-8") as f:
+        f.write(markdown)
+    print(markdown)
+
+
+if __name__ == "__main__":
+    main()
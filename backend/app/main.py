@@ -48,6 +48,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Số thứ tự và thời điểm đọc của frame (xem /frames) để frontend đọc được
+    expose_headers=["X-Frame-Seq", "X-Frame-Captured-At"],
 )
 
 def signal_handler(signum, frame):
@@ -63,14 +65,14 @@ signal.signal(signal.SIGTERM, signal_handler)
 
 @app.on_event("startup")
 async def startup_event():
-    """Tạo bảng database khi khởi động"""
-    print("Creating database tables...")
-    try:
+    """Tạo bảng database ở nền, song song với việc khởi động các process phân tích và Chat Agent
+    (trạng thái xem ở /readyz)"""
+    async def create_database():
+        print("Creating database tables...")
         await create_tables()
         print("Tạo xong bảng database.")
-    except Exception as e:
-        print(f"Lỗi tạo bảng database: {e}")
-        raise e
+
+    v1.state.readiness.run_stage("database", create_database)
 
 @app.on_event("shutdown")
 def shutdown():
@@ -87,6 +89,10 @@ def shutdown():
 def direct_home():
     return RedirectResponse(url= settings_network.URL_FRONTEND)
 
+app.include_router(
+    router= v1.api_health.router,
+    tags=["Health"],
+)
 app.include_router(
     router= v1.api_auth.router, 
     prefix="/api/v1", 
@@ -112,6 +118,11 @@ app.include_router(
     prefix="/api/v1/chat",
     tags=["Chat History"],
 )
+app.include_router(
+    router= v1.api_history.router,
+    prefix="/api/v1",
+    tags=["Traffic History"],
+)
 app.include_router(
     router= v1.api_admin.router,
     prefix="/api/v1", 
@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, func
+from db.base import Base
+
+
+class RoadMetric(Base):
+    """Số liệu trung bình của một cửa sổ thời gian (time_step giây) trên một tuyến đường"""
+    __tablename__ = "road_metrics"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    road_name = Column(String(100), nullable=False)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    count_car = Column(Integer, nullable=False, default=0)
+    speed_car = Column(Integer, nullable=False, default=0)
+    count_motor = Column(Integer, nullable=False, default=0)
+    speed_motor = Column(Integer, nullable=False, default=0)
+    frames = Column(Integer, nullable=False, default=0)
+    # server_default để các bản ghi ghi bằng COPY (không truyền cột này) vẫn có giá trị
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Truy vấn chủ yếu là theo tuyến đường trong một khoảng thời gian
+        Index("ix_road_metrics_road_name_window_start", "road_name", "window_start"),
+    )
+
+    def __repr__(self):
+        return f"<RoadMetric(road_name={self.road_name}, window_start={self.window_start})>"
@@ -0,0 +1,60 @@
+r"""Lượng tử hoá INT8 model phát hiện xe từ trọng số đã train, có kiểm tra hồi quy tốc độ và độ chính xác.
+
+Frame hiệu chỉnh được lấy từ video camera (phần đầu mỗi video), fps và mAP50 được đo trên đoạn cuối video
+(hoặc --eval-video) chưa dùng để hiệu chỉnh. Bản INT8 chỉ thay bản đang dùng trong ai_models khi nhanh hơn bản
+FP ít nhất QUANT_MIN_SPEEDUP lần, không chậm hơn bản đang dùng quá QUANT_MAX_FPS_REGRESSION và mAP50 không giảm
+quá QUANT_MAX_MAP_DROP; không đạt thì thoát với mã 1 và giữ các bản ứng viên trong ./data/quantization.
+
+Ví dụ (chạy từ thư mục app):
+    python quantize_model.py --weights "./ai_models/model N/original model/best.pt" --format openvino onnx
+    python quantize_model.py --weights best.pt --format openvino --eval-video ./video_test/held_out.mp4 \
+        --val ./datasets/xe_may_oto/data.yaml --dry-run
+"""
+import os
+import sys
+import argparse
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+from core.config import settings_quantization
+from services.model_services.QuantizationPipeline import PUBLISH_DIRS, QuantizationPipeline
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lượng tử hoá INT8 có kiểm tra fps/mAP trước khi thay model")
+    parser.add_argument("--weights", required=True, help="Trọng số đã train (.pt)")
+    parser.add_argument("--format", nargs="+", default=["openvino"], choices=sorted(PUBLISH_DIRS),
+                        help="Các định dạng cần lượng tử hoá")
+    parser.add_argument("--videos", nargs="+", help="Video lấy frame hiệu chỉnh. Mặc định là video các camera")
+    parser.add_argument("--eval-video", nargs="+", help="Video giữ riêng để đánh giá. Mặc định là phần cuối "
+                                                        "của --videos")
+    parser.add_argument("--val", help="data.yaml có nhãn để tính mAP50 thật (mặc định so với kết quả của .pt)")
+    parser.add_argument("--calibration-frames", type=int, default=settings_quantization.CALIBRATION_FRAMES)
+    parser.add_argument("--eval-frames", type=int, default=settings_quantization.EVAL_FRAMES)
+    parser.add_argument("--threads", type=int, default=0, help="Số thread suy luận khi đo fps, 0 là tất cả")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đo và báo cáo, không thay model đang dùng")
+    args = parser.parse_args()
+
+    kwargs = {"path_videos": args.videos} if args.videos else {}
+    pipeline = QuantizationPipeline(args.weights, formats=args.format, eval_videos=args.eval_video,
+                                    val_data=args.val, calibration_frames=args.calibration_frames,
+                                    eval_frames=args.eval_frames, num_threads=args.threads, **kwargs)
+    report = pipeline.run(publish=not args.dry_run)
+
+    for export_format, result in report["formats"].items():
+        print(f"[{export_format}] FP {result['fp']['fps']} fps, INT8 {result['int8']['fps']} fps, "
+              f"mAP50 {result['int8']['map50']} (gốc {report['original']['map50']})")
+        for failure in report["failures"].get(export_format, []):
+            print(f"  Không đạt: {failure}")
+    print(f"Đã thay: {', '.join(report['published']) or 'không có'}")
+    print(f"Báo cáo: {os.path.join(report['work_dir'], 'report.json')}")
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+r"""Chạy lại tracking và ước lượng vận tốc từ DetectionLog mà không cần suy luận lại YOLO.
+
+DetectionLog được ghi bởi worker khi đặt DETECTION_CACHE=record/cache, hoặc bằng tham số --record của
+chính script này. Dùng để thử nhanh các giá trị conf (chỉ lọc được ngưỡng cao hơn lúc ghi), file cấu hình
+tracker và meter_per_pixel.
+
+Ví dụ (chạy từ thư mục app):
+    python replay_detections.py --road "Văn Quán" --log ./data/detection_cache/van_quan.detlog \
+        --record ./recordings/van_quan_0800.mp4 --output ./data/offline/van_quan.csv
+    python replay_detections.py --road "Văn Quán" --log ./data/detection_cache/van_quan.detlog \
+        --conf 0.35 --meter-per-pixel 0.05 --tracker ./my_bytetrack.yaml --output ./data/offline/van_quan_tuned.csv
+"""
+import os
+import sys
+import argparse
+import time
+from datetime import datetime
+
+app_path = os.path.dirname(os.path.abspath(__file__))
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+from core.config import settings_metric_transport
+from analyze_offline import find_road
+from services.road_services.AnalyzeOnRoadOffline import AnalyzeOnRoadOffline
+from utils.offline_utils import stitch_segments, aggregate_windows, write_windows
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phát lại DetectionLog để thử tham số tracking/vận tốc")
+    parser.add_argument("--road", required=True, help="Tên tuyến đường (lấy region, meter_per_pixel từ cấu hình)")
+    parser.add_argument("--log", required=True, help="File DetectionLog")
+    parser.add_argument("--record", metavar="VIDEO", help="Chạy model trên video này để ghi --log trước khi phát lại")
+    parser.add_argument("--output", required=True, help="File kết quả .csv hoặc .parquet")
+    parser.add_argument("--meter-per-pixel", type=float)
+    parser.add_argument("--conf", type=float, default=0.2, help="Ngưỡng tin cậy (>= ngưỡng lúc ghi log)")
+    parser.add_argument("--iou", type=float, default=0.3, help="Ngưỡng NMS, chỉ có tác dụng khi --record")
+    parser.add_argument("--tracker", default="bytetrack.yaml")
+    parser.add_argument("--time-step", type=int, default=30)
+    parser.add_argument("--start-time", help="Thời điểm bắt đầu của video (ISO). Mặc định 1970-01-01")
+    parser.add_argument("--model", default=settings_metric_transport.MODELS_PATH)
+    parser.add_argument("--device", default=settings_metric_transport.DEVICE)
+    args = parser.parse_args()
+
+    index = find_road(args.road)
+    meter_per_pixel = args.meter_per_pixel or settings_metric_transport.METER_PER_PIXELS[index]
+    region = settings_metric_transport.REGIONS[index]
+
+    if args.record:
+        t0 = time.perf_counter()
+        recorder = AnalyzeOnRoadOffline(args.record, meter_per_pixel, region, time_step=args.time_step,
+                                        model_path=args.model, device=args.device, iou=args.iou, conf=args.conf,
+                                        tracker=args.tracker, detection_mode="record", detection_log_path=args.log)
+        recorded = recorder.process_segment()
+        print(f"Đã ghi {len(recorded['counts'])} frame vào {args.log} trong {time.perf_counter() - t0:.1f}s")
+
+    analyzer = AnalyzeOnRoadOffline(args.record or args.road + ".mp4", meter_per_pixel, region,
+                                    time_step=args.time_step, model_path=args.model, device=args.device,
+                                    conf=args.conf, tracker=args.tracker, replay_log=args.log)
+    t0 = time.perf_counter()
+    result = analyzer.process_segment()
+    elapsed = time.perf_counter() - t0
+
+    start_time = datetime.fromisoformat(args.start_time) if args.start_time else datetime(1970, 1, 1)
+    counts, speeds = stitch_segments([result])
+    rows = aggregate_windows(counts, speeds, result["fps"], args.time_step, start_time, args.road)
+    write_windows(rows, args.output)
+
+    frames = len(result["counts"])
+    print(f"Phát lại {frames} frame -> {len(rows)} cửa sổ trong {elapsed:.1f}s ({frames / max(elapsed, 1e-6):.0f} frame/s)")
+
+
+if __name__ == "__main__":
+    main()
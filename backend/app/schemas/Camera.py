@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from core.config import settings_model_cascade
+
+
+class CameraCreate(BaseModel):
+    path_video: str = Field(..., min_length=5, description="Đường dẫn video/luồng camera, tên file là tên tuyến đường")
+    name: Optional[str] = Field(default=None, min_length=1, description="Tên tuyến đường, bắt buộc với luồng camera không có đuôi file (vd rtsp://host/live)")
+    meter_per_pixel: float = Field(..., gt=0, description="Tỉ lệ 1 mét ngoài đời với 1 pixel (ảnh 600x400)")
+    region: List[List[int]] = Field(..., min_length=3, description="Vùng đa giác theo dõi, mỗi điểm là [x, y]")
+    paused: bool = Field(default=False)
+    max_fps: float = Field(default=0, ge=0, description="Giới hạn số frame xử lý mỗi giây, 0 là không giới hạn")
+    priority: float = Field(default=1, ge=0, description="Độ ưu tiên khi chia CPU suy luận giữa các tuyến đường")
+    cascade: bool = Field(default=settings_model_cascade.DEFAULT, description="Chạy thêm model S ở keyframe/khi model N không chắc chắn")
+
+
+class CameraUpdate(BaseModel):
+    paused: Optional[bool] = None
+    max_fps: Optional[float] = Field(default=None, ge=0)
+    priority: Optional[float] = Field(default=None, ge=0)
+    cascade: Optional[bool] = None
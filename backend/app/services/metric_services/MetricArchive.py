@@ -0,0 +1,225 @@
+import os
+import glob
+import time
+import uuid
+from datetime import datetime, date
+from typing import Iterable, List, Optional
+from urllib.parse import quote
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from core.config import settings_metric_archive
+
+
+class MetricArchive:
+    """Lưu trữ dài hạn số liệu theo cửa sổ thời gian của các tuyến đường dưới dạng Parquet.
+
+    Dữ liệu được phân vùng theo kiểu hive: ``<root>/date=YYYY-MM-DD/road=<tên đường>/part-*.parquet``.
+    Mỗi process phân tích chỉ ghi vào phân vùng của tuyến đường mà nó xử lý nên không cần khoá giữa
+    các process. Mỗi lần flush ghi ra một file mới gồm một row group, job compact sẽ gộp các file nhỏ
+    của những ngày đã kết thúc thành một file duy nhất.
+
+    Examples:
+        >>> archive = MetricArchive("./data/metric_archive")
+        >>> archive.append(analyzer.last_window)
+        >>> archive.flush()
+        >>> archive.aggregate(roads=["Văn Quán"], start=datetime(2025, 1, 1), bucket="day")
+    """
+    SCHEMA = pa.schema([
+        ("window_start", pa.timestamp("ms")),
+        ("window_end", pa.timestamp("ms")),
+        ("count_car", pa.int32()),
+        ("speed_car", pa.int32()),
+        ("count_motor", pa.int32()),
+        ("speed_motor", pa.int32()),
+        ("frames", pa.int32()),
+    ])
+    PARTITIONING = ds.partitioning(
+        pa.schema([("date", pa.string()), ("road", pa.string())]),
+        flavor="hive",
+    )
+    METRIC_COLUMNS = ["count_car", "speed_car", "count_motor", "speed_motor"]
+
+    def __init__(self, root_dir: str = settings_metric_archive.ARCHIVE_DIR,
+                 row_group_size: int = settings_metric_archive.ROW_GROUP_SIZE,
+                 flush_interval: float = settings_metric_archive.FLUSH_INTERVAL):
+        """
+        Args:
+            root_dir (str): Thư mục gốc chứa dữ liệu Parquet
+            row_group_size (int): Số cửa sổ được gom trong bộ đệm trước khi ghi ra một row group
+            flush_interval (float): Số giây tối đa dữ liệu nằm trong bộ đệm trước khi buộc phải ghi ra đĩa
+        """
+        self.root_dir = root_dir
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    # ------------------------------------------------------------------ Ghi dữ liệu
+    def append(self, snapshot: dict):
+        """Thêm số liệu của một cửa sổ (xem AnalyzeOnRoadBase.get_window_snapshot) vào bộ đệm.
+        Bộ đệm tự ghi ra đĩa khi đủ row_group_size hoặc quá flush_interval giây."""
+        if not snapshot:
+            return
+        self._buffer.append(snapshot)
+        if (len(self._buffer) >= self.row_group_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Ghi toàn bộ bộ đệm ra các phân vùng tương ứng.
+
+        Returns:
+            int: Số dòng đã ghi
+        """
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return 0
+
+        rows, self._buffer = self._buffer, []
+        partitions = {}
+        for row in rows:
+            key = (row["window_start"].date().isoformat(), row["road_name"])
+            partitions.setdefault(key, []).append(row)
+
+        for (day, road), part_rows in partitions.items():
+            table = pa.Table.from_pylist(
+                [{name: row.get(name, 0) for name in self.SCHEMA.names} for row in part_rows],
+                schema=self.SCHEMA,
+            )
+            file_name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+            self._write_atomic(table, os.path.join(self._partition_dir(day, road), file_name))
+        return len(rows)
+
+    def _partition_dir(self, day: str, road: str) -> str:
+        # Tên đường có dấu cách và dấu tiếng Việt nên được URI-encode, pyarrow sẽ tự decode khi đọc
+        return os.path.join(self.root_dir, f"date={day}", f"road={quote(road, safe='')}")
+
+    def _write_atomic(self, table: pa.Table, path: str):
+        """Ghi ra file tạm (bắt đầu bằng '.' nên bị dataset bỏ qua) rồi đổi tên để người đọc không thấy file dở dang"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+        pq.write_table(table, tmp_path, row_group_size=max(self.row_group_size, table.num_rows),
+                       compression="zstd")
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------ Truy vấn
+    def _dataset(self) -> Optional[ds.Dataset]:
+        if not os.path.isdir(self.root_dir):
+            return None
+        return ds.dataset(self.root_dir, format="parquet", schema=self.SCHEMA.append(
+            pa.field("date", pa.string())).append(pa.field("road", pa.string())),
+            partitioning=self.PARTITIONING)
+
+    @staticmethod
+    def _build_filter(roads: Optional[Iterable[str]], start: Optional[datetime], end: Optional[datetime]):
+        """Tạo biểu thức lọc: điều kiện trên date/road loại bỏ cả thư mục phân vùng, điều kiện trên
+        window_start được đẩy xuống thống kê min/max của từng row group"""
+        expr = None
+
+        def _and(a, b):
+            return b if a is None else a & b
+
+        if roads:
+            expr = _and(expr, ds.field("road").isin(list(roads)))
+        if start is not None:
+            expr = _and(expr, ds.field("date") >= start.date().isoformat())
+            expr = _and(expr, ds.field("window_start") >= pa.scalar(start, type=pa.timestamp("ms")))
+        if end is not None:
+            expr = _and(expr, ds.field("date") <= end.date().isoformat())
+            expr = _and(expr, ds.field("window_start") < pa.scalar(end, type=pa.timestamp("ms")))
+        return expr
+
+    def query(self, roads: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+              end: Optional[datetime] = None, columns: Optional[List[str]] = None) -> pa.Table:
+        """Đọc số liệu thô theo cửa sổ, chỉ đọc các cột và phân vùng cần thiết.
+
+        Args:
+            roads (Iterable[str], optional): Danh sách tuyến đường, None là tất cả
+            start (datetime, optional): Lấy các cửa sổ bắt đầu từ thời điểm này
+            end (datetime, optional): Lấy các cửa sổ bắt đầu trước thời điểm này
+            columns (List[str], optional): Các cột số liệu cần lấy, None là tất cả
+
+        Returns:
+            pa.Table: Bảng kết quả (luôn có road và window_start), sắp xếp theo road, window_start
+        """
+        columns = list(columns) if columns else self.SCHEMA.names
+        columns = ["road", "window_start"] + [c for c in columns if c not in ("road", "window_start")]
+        dataset = self._dataset()
+        if dataset is None:
+            return pa.table({name: pa.array([], type=self._column_type(name)) for name in columns})
+        table = dataset.to_table(columns=columns, filter=self._build_filter(roads, start, end))
+        return table.sort_by([("road", "ascending"), ("window_start", "ascending")])
+
+    def _column_type(self, name: str) -> pa.DataType:
+        return pa.string() if name in ("road", "date") else self.SCHEMA.field(name).type
+
+    def aggregate(self, roads: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, bucket: str = "hour") -> List[dict]:
+        """Tổng hợp số liệu theo tuyến đường và khoảng thời gian (hour/day/week/month).
+
+        Số lượng xe lấy trung bình và lớn nhất của các cửa sổ; vận tốc lấy trung bình bỏ qua các
+        cửa sổ bằng 0 (giống cách tính của avg_none_zero_batch).
+
+        Returns:
+            List[dict]: Mỗi phần tử là số liệu của một (road, bucket)
+        """
+        table = self.query(roads, start, end, columns=self.METRIC_COLUMNS)
+        if table.num_rows == 0:
+            return []
+
+        table = table.append_column("bucket", pc.floor_temporal(table["window_start"], 1, bucket))
+        for column in ("speed_car", "speed_motor"):
+            speeds = table[column]
+            table = table.set_column(table.schema.get_field_index(column), column,
+                                     pc.if_else(pc.equal(speeds, 0), pa.scalar(None, speeds.type), speeds))
+
+        result = table.group_by(["road", "bucket"]).aggregate([
+            ("count_car", "mean"), ("count_car", "max"),
+            ("count_motor", "mean"), ("count_motor", "max"),
+            ("speed_car", "mean"), ("speed_motor", "mean"),
+            ("window_start", "count"),
+        ]).rename_columns(["road", "bucket", "count_car", "count_car_max", "count_motor", "count_motor_max",
+                           "speed_car", "speed_motor", "windows"])
+        result = result.sort_by([("road", "ascending"), ("bucket", "ascending")])
+
+        rows = result.to_pylist()
+        for row in rows:
+            for column in ("count_car", "count_motor", "speed_car", "speed_motor"):
+                row[column] = round(row[column], 2) if row[column] is not None else 0
+        return rows
+
+    # ------------------------------------------------------------------ Compact
+    def compact(self, before: Optional[date] = None, min_files: int = settings_metric_archive.COMPACT_MIN_FILES) -> int:
+        """Gộp các file nhỏ trong mỗi phân vùng thành một file. Chỉ gộp những ngày trước `before`
+        (mặc định là hôm nay) vì phân vùng của ngày hiện tại vẫn đang được các process ghi vào.
+
+        Nếu bị dừng giữa chừng (đã ghi file gộp nhưng chưa xoá file cũ) thì lần compact sau sẽ
+        loại bỏ các cửa sổ trùng lặp theo window_start.
+
+        Returns:
+            int: Số phân vùng đã được gộp
+        """
+        before = (before or date.today()).isoformat()
+        compacted = 0
+        for partition in sorted(glob.glob(os.path.join(self.root_dir, "date=*", "road=*"))):
+            day = os.path.basename(os.path.dirname(partition))[len("date="):]
+            if day >= before:
+                continue
+            files = sorted(glob.glob(os.path.join(partition, "*.parquet")))
+            if len(files) < min_files:
+                continue
+
+            table = pa.concat_tables([pq.read_table(f, schema=self.SCHEMA) for f in files])
+            table = table.sort_by("window_start")
+            _, first_idx = np.unique(table["window_start"].to_numpy(), return_index=True)
+            table = table.take(pa.array(first_idx))
+
+            target = os.path.join(partition, f"part-compacted-{int(time.time() * 1000)}.parquet")
+            self._write_atomic(table, target)
+            for f in files:
+                os.remove(f)
+            compacted += 1
+        return compacted
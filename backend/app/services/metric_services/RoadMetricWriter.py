@@ -0,0 +1,173 @@
+import asyncio
+import queue
+import time
+from collections import deque
+from typing import Optional
+from sqlalchemy import insert
+from db.base import engine as default_engine
+from models.road_metric import RoadMetric
+from core.config import settings_metric_writer
+
+
+class RoadMetricWriter:
+    """Tác vụ nền gom số liệu theo cửa sổ của tất cả tuyến đường rồi ghi hàng loạt vào bảng road_metrics.
+
+    Các process phân tích chỉ đẩy snapshot vào một hàng đợi dùng chung (Manager().Queue()) có giới hạn
+    kích thước nên không giữ kết nối DB nào. Writer chạy trong event loop của API, gom snapshot vào bộ đệm
+    và ghi khi đủ batch_size dòng hoặc đã quá flush_interval giây, bằng COPY của asyncpg (hoặc INSERT
+    nhiều dòng với driver khác).
+
+    Khi DB chậm, bộ đệm đầy tới max_pending thì writer ngừng lấy thêm từ hàng đợi; hàng đợi đầy thì các
+    process phân tích bỏ snapshot và tăng bộ đếm dropped của chúng (áp lực ngược - backpressure).
+
+    Examples:
+        >>> writer = RoadMetricWriter(analyzer.metric_queue)
+        >>> writer.start()
+        >>> ...
+        >>> await writer.stop()
+    """
+    COLUMNS = ["road_name", "window_start", "window_end", "count_car", "speed_car",
+               "count_motor", "speed_motor", "frames"]
+
+    def __init__(self, source_queue, engine=default_engine,
+                 batch_size: int = settings_metric_writer.BATCH_SIZE,
+                 flush_interval: float = settings_metric_writer.FLUSH_INTERVAL,
+                 max_pending: int = settings_metric_writer.MAX_PENDING,
+                 max_backoff: float = 30.0):
+        """
+        Args:
+            source_queue (Queue): Hàng đợi chứa snapshot (dict) do các process phân tích đẩy vào
+            engine (AsyncEngine): Engine SQLAlchemy dùng để ghi. Defaults to engine của db.base.
+            batch_size (int): Số dòng tối đa của một lần ghi, đủ số này thì ghi ngay
+            flush_interval (float): Số giây tối đa một dòng nằm trong bộ đệm
+            max_pending (int): Số dòng tối đa trong bộ đệm trước khi ngừng lấy từ hàng đợi
+            max_backoff (float): Thời gian chờ tối đa (giây) giữa các lần thử lại khi ghi lỗi
+        """
+        self.queue = source_queue
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+
+        self.pending = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._last_flush = time.monotonic()
+        self._backoff = 0.0
+        self.stats = {
+            "received": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "backpressure_waits": 0,
+            "last_flush_ms": 0.0,
+            "last_error": None,
+        }
+
+    def start(self):
+        """Chạy writer như một task trong event loop hiện tại"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Dừng task nền và ghi nốt dữ liệu còn lại"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.pending.extend(self._drain(timeout=0))
+        while self.pending:
+            if not await self.flush():
+                break
+
+    def _drain(self, timeout: float) -> list:
+        """Lấy snapshot từ hàng đợi (chạy trong thread vì Queue của Manager là lời gọi IPC blocking).
+        Chờ tối đa timeout giây cho snapshot đầu tiên, sau đó lấy không chờ đến khi hết hoặc đủ chỗ."""
+        rows = []
+        room = self.max_pending - len(self.pending)
+        try:
+            if timeout > 0:
+                rows.append(self.queue.get(timeout=timeout))
+            while len(rows) < room:
+                rows.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        except (EOFError, BrokenPipeError, ConnectionError):
+            # Manager đã bị tắt (server đang shutdown)
+            pass
+        return rows
+
+    def _due(self) -> bool:
+        return (len(self.pending) >= self.batch_size
+                or (self.pending and time.monotonic() - self._last_flush >= self.flush_interval))
+
+    async def run(self):
+        """Vòng lặp chính: lấy snapshot, ghi theo kích thước hoặc theo thời gian"""
+        while True:
+            in_backoff = self._backoff and time.monotonic() - self._last_flush < self._backoff
+            if not in_backoff and self._due():
+                await self.flush()
+                continue
+
+            if len(self.pending) >= self.max_pending:
+                # Bộ đệm đầy: không lấy thêm để hàng đợi đầy lên và các process tự bỏ bớt dữ liệu
+                self.stats["backpressure_waits"] += 1
+                await asyncio.sleep(0.1)
+                continue
+
+            deadline = self._last_flush + (self._backoff or self.flush_interval)
+            wait = min(1.0, max(0.05, deadline - time.monotonic()))
+            rows = await asyncio.to_thread(self._drain, wait)
+            self.pending.extend(rows)
+            self.stats["received"] += len(rows)
+
+    async def flush(self) -> bool:
+        """Ghi tối đa batch_size dòng đầu bộ đệm. Nếu lỗi, dữ liệu được giữ lại và thử lại sau
+        với thời gian chờ tăng dần.
+
+        Returns:
+            bool: True nếu ghi thành công (hoặc không có gì để ghi)
+        """
+        self._last_flush = time.monotonic()
+        if not self.pending:
+            return True
+
+        count = min(self.batch_size, len(self.pending))
+        batch = [self.pending[i] for i in range(count)]
+        start = time.perf_counter()
+        try:
+            await self._write_batch(batch)
+        except Exception as e:
+            self.stats["failed_flushes"] += 1
+            self.stats["last_error"] = str(e)
+            self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+            print(f"Lỗi khi ghi {count} dòng road_metrics, thử lại sau {self._backoff:.0f}s: {e}")
+            return False
+
+        for _ in range(count):
+            self.pending.popleft()
+        self._backoff = 0.0
+        self.stats["written"] += count
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return True
+
+    async def _write_batch(self, batch: list):
+        """Ghi một batch: COPY với asyncpg (nhanh nhất với Postgres), INSERT nhiều dòng với driver khác"""
+        records = [tuple(row.get(column, 0) for column in self.COLUMNS) for row in batch]
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.driver == "asyncpg":
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    RoadMetric.__tablename__, records=records, columns=self.COLUMNS
+                )
+            else:
+                await conn.execute(insert(RoadMetric.__table__),
+                                   [dict(zip(self.COLUMNS, record)) for record in records])
+                await conn.commit()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "pending": len(self.pending)}
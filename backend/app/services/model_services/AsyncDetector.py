@@ -0,0 +1,317 @@
+import os
+import threading
+import cv2
+import numpy as np
+import openvino as ov
+import openvino.opset11 as opset
+from openvino.preprocess import PrePostProcessor, ColorFormat
+
+
+def letterbox_geometry(height: int, width: int, size: int, auto: bool, stride: int = 32):
+    """Kích thước sau khi resize và số pixel đệm mỗi cạnh, tính giống LetterBox của ultralytics
+
+    Returns:
+        tuple: (new_h, new_w, top, bottom, left, right)
+    """
+    r = min(size / height, size / width)
+    new_w, new_h = int(round(width * r)), int(round(height * r))
+    dw, dh = size - new_w, size - new_h
+    if auto:
+        dw, dh = np.mod(dw, stride), np.mod(dh, stride)
+    dw, dh = dw / 2, dh / 2
+    return (new_h, new_w, int(round(dh - 0.1)), int(round(dh + 0.1)), int(round(dw - 0.1)),
+            int(round(dw + 0.1)))
+
+
+def letterbox(image: np.ndarray, size: int, auto: bool, stride: int = 32) -> np.ndarray:
+    """Resize giữ tỉ lệ và đệm 114 giống LetterBox của ultralytics"""
+    new_h, new_w, top, bottom, left, right = letterbox_geometry(*image.shape[:2], size, auto, stride)
+    if image.shape[:2] != (new_h, new_w):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+
+def scale_boxes(input_shape, boxes: np.ndarray, image_shape) -> np.ndarray:
+    """Đổi box x1, y1, x2, y2 từ toạ độ ảnh letterbox input_shape về ảnh gốc image_shape (giống
+    ops.scale_boxes của ultralytics)"""
+    gain = min(input_shape[0] / image_shape[0], input_shape[1] / image_shape[1])
+    pad_x = round((input_shape[1] - image_shape[1] * gain) / 2 - 0.1)
+    pad_y = round((input_shape[0] - image_shape[0] * gain) / 2 - 0.1)
+    boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=boxes.dtype)) / gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, image_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, image_shape[0])
+    return boxes
+
+
+class AsyncDetector:
+    """Phát hiện bằng OpenVINO AsyncInferQueue: nhiều infer request chạy song song thay vì một lần predict đồng
+    bộ mỗi frame, các frame được gửi trước (submit) và lấy kết quả theo đúng thứ tự (result) để đưa vào tracker.
+
+    Với PERFORMANCE_HINT=THROUGHPUT, OpenVINO chia CPU thành nhiều stream, mỗi stream chạy một request trên vài
+    core nên trên máy nhiều core tổng số frame/giây tăng gần tuyến tính theo số request (độ trễ mỗi frame tăng
+    thêm tối đa num_requests frame).
+
+    Tiền xử lý (letterbox) và hậu xử lý (NMS, đổi toạ độ) giống predict của ultralytics nên kết quả là mảng
+    (N, 6) x1, y1, x2, y2, conf, cls trên toạ độ ảnh đầu vào, dùng được ngay cho TrackingSpeedEstimator.
+
+    Model export bởi utils/model_export.py có sẵn NMS trong graph (output (1, max_det, 6)) thì hậu xử lý chỉ
+    còn bỏ các dòng đệm và đổi toạ độ bằng numpy, không cần torch.
+
+    Với preprocess_in_graph=True, model nhận thẳng ảnh uint8 BGR NHWC: resize, đệm, đổi màu, đổi layout và
+    chia 255 được gắn vào graph bằng PrePostProcessor nên Python không phải tạo các bản float32/NCHW của frame.
+    Graph được biên dịch theo kích thước ảnh đầu vào (vùng ROI của một tuyến đường không đổi nên chỉ biên dịch
+    một lần cho mỗi imgsz). Tối đa MAX_GRAPHS graph đã biên dịch được giữ lại nên đổi qua lại giữa các imgsz đã
+    dùng (xem AdaptiveResolution) không phải biên dịch lại.
+
+    Examples:
+        >>> detector = AsyncDetector(model_path, num_requests=4, performance_hint="THROUGHPUT")
+        >>> detector.submit(0, frame_0)
+        >>> detector.submit(1, frame_1)
+        >>> detector.result(0)      # chờ nếu frame 0 chưa xong, kể cả khi frame 1 đã xong trước
+    """
+    MAX_GRAPHS = 4
+
+    def __init__(self, model_path: str, device: str = "CPU", num_requests: int = 0,
+                 performance_hint: str = "THROUGHPUT", num_streams: int = 0, num_threads: int = 0,
+                 cache_dir: str = None, imgsz: int = 640, conf: float = 0.2, iou: float = 0.3, classes=None,
+                 preprocess_in_graph: bool = False):
+        """
+        Args:
+            model_path (str): Thư mục model OpenVINO (*_openvino_model) hoặc file .xml
+            device (str): Thiết bị của OpenVINO. Defaults to "CPU".
+            num_requests (int): Số infer request chạy song song, 0 là theo OPTIMAL_NUMBER_OF_INFER_REQUESTS của
+            model đã biên dịch. Defaults to 0.
+            performance_hint (str): "THROUGHPUT" hoặc "LATENCY". Defaults to "THROUGHPUT".
+            num_streams (int): Số stream trên CPU, 0 là để OpenVINO chọn theo performance_hint. Defaults to 0.
+            num_threads (int): Số thread suy luận, 0 là dùng mọi core được phép. Defaults to 0.
+            cache_dir (str, optional): Thư mục cache model đã biên dịch. Defaults to None.
+            preprocess_in_graph (bool): Gắn tiền xử lý vào graph (PrePostProcessor). Defaults to False.
+        """
+        xml = model_path if model_path.endswith(".xml") else next(
+            os.path.join(model_path, f) for f in sorted(os.listdir(model_path)) if f.endswith(".xml"))
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.classes = classes
+        self.stride = 32
+
+        self.xml = xml
+        self.device = device
+        self.core = ov.Core()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.core.set_property({"CACHE_DIR": cache_dir})
+        self.config = {"PERFORMANCE_HINT": performance_hint.upper()}
+        if num_streams:
+            self.config["NUM_STREAMS"] = str(num_streams)
+        if num_threads and device.upper() == "CPU":
+            self.config["INFERENCE_NUM_THREADS"] = int(num_threads)
+        self.requested = num_requests
+
+        model = self.core.read_model(xml)
+        # Output (1, max_det, 6) là model đã có NMS, output thô là (1, 4 + nc, N)
+        output_shape = model.output(0).get_partial_shape()
+        self.end2end = output_shape.rank.get_length() == 3 and output_shape[2].is_static and \
+            output_shape[2].get_length() == 6
+        # Model xuất với dynamic=True nhận được ảnh letterbox tối thiểu (không cần đệm thành 640x640). Riêng
+        # model INT8 có input động chạy sai trên CPU có AMX (giống cách ultralytics xử lý) nên được cố định
+        # về imgsz x imgsz và biên dịch lại khi đổi imgsz
+        self.dynamic = model.input(0).get_partial_shape().is_dynamic and not self.needs_static_shape(model, device)
+        self.in_graph = preprocess_in_graph
+        self.pending = {}
+        self.done = {}
+        self._condition = threading.Condition()
+        # Graph đang dùng được biên dịch cho kích thước nào (None là input động, dùng cho mọi kích thước) và các
+        # graph đã biên dịch: key -> (compiled, queue, kích thước ảnh sau letterbox)
+        self.graph_key = None
+        self.graphs = {}
+        self.queue = None
+        self.graph_input_shape = None
+        if not self.in_graph:
+            key = None if self.dynamic else imgsz
+            self.use_graph(key, lambda: (self.read_model(key), None))
+
+    @staticmethod
+    def needs_static_shape(model, device: str) -> bool:
+        if device.upper() not in ("CPU", "AUTO") or not model.input(0).get_partial_shape().is_dynamic:
+            return False
+        if not any(op.get_type_name() == "FakeQuantize" for op in model.get_ops()):
+            return False
+        try:
+            with open("/proc/cpuinfo", encoding="utf-8") as f:
+                return "amx_int8" in f.read()
+        except OSError:
+            return False
+
+    def read_model(self, size: int = None):
+        """Đọc model, size khác None thì cố định input về size x size"""
+        model = self.core.read_model(self.xml)
+        if size is not None:
+            model.reshape([1, 3, size, size])
+        return model
+
+    def build_in_graph_model(self, height: int, width: int, size: int):
+        """Model nhận ảnh uint8 BGR NHWC (1, height, width, 3), tiền xử lý giống LetterBox nằm trong graph
+
+        Returns:
+            tuple: (model, (input_h, input_w)) với input_h, input_w là kích thước ảnh sau letterbox
+        """
+        # Đệm tối thiểu (bội số của stride) như predict của ultralytics với model động. Graph có kích thước cố
+        # định nên được biên dịch như model tĩnh, cũng tránh được lỗi INT8 động trên CPU có AMX mà không phải
+        # đệm thành size x size
+        new_h, new_w, top, bottom, left, right = letterbox_geometry(height, width, size, True, self.stride)
+        input_shape = (new_h + top + bottom, new_w + left + right)
+        model = self.core.read_model(self.xml)
+        model.reshape([1, 3, *input_shape])
+
+        def letterbox(node):
+            resized = opset.interpolate(node, np.array([new_h, new_w], dtype=np.int64), mode="linear_onnx",
+                                        shape_calculation_mode="sizes", axes=np.array([1, 2], dtype=np.int64),
+                                        coordinate_transformation_mode="half_pixel")
+            return opset.pad(resized, np.array([0, top, left, 0], dtype=np.int64),
+                             np.array([0, bottom, right, 0], dtype=np.int64), "constant",
+                             np.array(114.0, dtype=np.float32)).output(0)
+
+        ppp = PrePostProcessor(model)
+        ppp.input().tensor() \
+            .set_element_type(ov.Type.u8) \
+            .set_layout(ov.Layout("NHWC")) \
+            .set_color_format(ColorFormat.BGR) \
+            .set_shape([1, height, width, 3])
+        ppp.input().model().set_layout(ov.Layout("NCHW"))
+        ppp.input().preprocess() \
+            .convert_element_type(ov.Type.f32) \
+            .custom(letterbox) \
+            .convert_color(ColorFormat.RGB) \
+            .scale(255.0)
+        return ppp.build(), input_shape
+
+    def compile(self, model):
+        """Biên dịch model và tạo hàng đợi request"""
+        compiled = self.core.compile_model(model, self.device, self.config)
+        num_requests = self.requested or compiled.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS")
+        queue = ov.AsyncInferQueue(compiled, num_requests)
+        queue.set_callback(self._on_done)
+        return compiled, queue
+
+    def use_graph(self, key, build):
+        """Chuyển sang graph của key, biên dịch bằng build() (trả về (model, kích thước sau letterbox)) nếu chưa có"""
+        if key == self.graph_key and self.queue is not None:
+            return
+        # Không chờ hàng đợi hiện tại: các hàng đợi được giữ lại chạy song song được vì kết quả lấy theo seq và
+        # pending giữ kích thước đầu vào của từng frame (chờ ở đây sẽ làm rỗng pipeline mỗi lần AdaptiveResolution
+        # chạy thử một frame ở imgsz lớn nhất)
+        if key not in self.graphs:
+            model, input_shape = build()
+            if len(self.graphs) >= self.MAX_GRAPHS:
+                # Chỉ hàng đợi bị bỏ mới phải chờ các request đang chạy xong (kết quả vẫn nằm trong bộ đệm)
+                self.graphs.pop(next(iter(self.graphs)))[1].wait_all()
+            self.graphs[key] = (*self.compile(model), input_shape)
+        self.compiled, self.queue, self.graph_input_shape = self.graphs[key]
+        self.num_requests = len(self.queue)
+        self.graph_key = key
+
+    def preprocess(self, image: np.ndarray, imgsz: int = None):
+        """Chuẩn bị tensor đầu vào cho model
+
+        Returns:
+            tuple: (tensor, (input_h, input_w) kích thước ảnh sau letterbox)
+        """
+        size = imgsz or self.imgsz
+        if self.in_graph:
+            self.use_graph((image.shape[:2], size), lambda: self.build_in_graph_model(*image.shape[:2], size))
+            # Chỉ cần ảnh liền mạch trong bộ nhớ (vùng ROI cắt từ frame thì phải copy một lần, vẫn là uint8)
+            return np.ascontiguousarray(image)[None], self.graph_input_shape
+        if not self.dynamic:
+            self.use_graph(size, lambda: (self.read_model(size), None))
+        # Letterbox (giống LetterBox của ultralytics), BGR -> RGB, HWC -> NCHW, chuẩn hoá về [0, 1]
+        image = letterbox(image, size, self.dynamic, self.stride)
+        image = image[..., ::-1].transpose(2, 0, 1)[None]
+        tensor = np.ascontiguousarray(image, dtype=np.float32) / 255.0
+        return tensor, tensor.shape[2:]
+
+    def submit(self, seq: int, image: np.ndarray, imgsz: int = None):
+        """Gửi một ảnh vào hàng đợi suy luận (chặn khi tất cả request đang bận)
+
+        Args:
+            seq (int): Số thứ tự của frame, dùng để lấy kết quả
+            image (np.ndarray): Ảnh BGR (H, W, 3)
+            imgsz (int, optional): Kích thước ảnh đưa vào model, None là imgsz lúc khởi tạo
+        """
+        tensor, input_shape = self.preprocess(image, imgsz)
+        with self._condition:
+            self.pending[seq] = (input_shape, image.shape[:2])
+        self.queue.start_async({0: tensor}, seq)
+
+    def _on_done(self, request, seq):
+        """Callback của OpenVINO (chạy ở thread của runtime): chỉ copy output, hậu xử lý ở thread lấy kết quả"""
+        output = request.get_output_tensor(0).data.copy()
+        with self._condition:
+            self.done[seq] = output
+            self._condition.notify_all()
+
+    def result(self, seq: int, timeout: float = None) -> np.ndarray:
+        """Chờ và trả về kết quả phát hiện của frame seq
+
+        Returns:
+            np.ndarray: (N, 6) x1, y1, x2, y2, conf, cls trên toạ độ ảnh đã submit
+
+        Raises:
+            KeyError: Frame seq chưa được submit hoặc đã lấy kết quả
+            TimeoutError: Quá timeout giây mà chưa có kết quả
+        """
+        with self._condition:
+            if seq not in self.pending:
+                raise KeyError(seq)
+            if not self._condition.wait_for(lambda: seq in self.done, timeout):
+                raise TimeoutError(f"Frame {seq} chưa có kết quả sau {timeout} giây")
+            output = self.done.pop(seq)
+            input_shape, image_shape = self.pending.pop(seq)
+        return self.postprocess(output, input_shape, image_shape)
+
+    def postprocess(self, output: np.ndarray, input_shape, image_shape) -> np.ndarray:
+        if self.end2end:
+            # NMS và ngưỡng nằm trong graph, các dòng đệm có conf = 0
+            prediction = output[0][output[0][:, 4] > 0].astype(np.float32)
+            prediction = prediction[prediction[:, 4] >= self.conf]
+            if self.classes is not None:
+                prediction = prediction[np.isin(prediction[:, 5], self.classes)]
+        else:
+            import torch
+            try:
+                from ultralytics.utils.nms import non_max_suppression
+            except ImportError:
+                # Các bản ultralytics cũ để NMS trong ops
+                from ultralytics.utils.ops import non_max_suppression
+
+            prediction = non_max_suppression(torch.from_numpy(output), self.conf, self.iou,
+                                             classes=self.classes)[0].numpy().astype(np.float32)
+        if len(prediction):
+            prediction[:, :4] = scale_boxes(tuple(input_shape), prediction[:, :4], tuple(image_shape))
+        return prediction
+
+    def detect(self, image: np.ndarray, imgsz: int = None) -> np.ndarray:
+        """Suy luận đồng bộ một ảnh qua hàng đợi (dùng để chạy khởi động)"""
+        self.submit(-1, image, imgsz)
+        return self.result(-1)
+
+    def in_flight(self) -> int:
+        with self._condition:
+            return len(self.pending)
+
+    def wait_all(self):
+        """Chờ các request đang chạy của mọi hàng đợi (các graph đã biên dịch chạy song song được)"""
+        queues = [queue for _, queue, _ in self.graphs.values()]
+        if self.queue is not None and not any(queue is self.queue for queue in queues):
+            queues.append(self.queue)
+        for queue in queues:
+            queue.wait_all()
+
+    def as_dict(self) -> dict:
+        return {
+            "num_requests": self.num_requests,
+            "performance_hint": str(self.compiled.get_property("PERFORMANCE_HINT")),
+            "num_streams": str(self.compiled.get_property("NUM_STREAMS")),
+            "preprocess_in_graph": self.in_graph,
+            "end2end": self.end2end,
+        }
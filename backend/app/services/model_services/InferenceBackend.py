@@ -0,0 +1,317 @@
+import os
+import json
+import hashlib
+import time
+import platform
+import importlib.util
+import numpy as np
+from typing import List, Optional
+from core.config import settings_inference_backend, settings_metric_transport, settings_model_preload
+from utils.model_preload import openvino_options, warmup
+
+
+class InferenceBackend:
+    """Một bản export của model chạy bằng một runtime (OpenVINO, ONNX Runtime, MNN, NCNN).
+
+    Mọi runtime đều được nạp qua YOLO(path) (AutoBackend của ultralytics nhận dạng runtime theo đuôi file/thư
+    mục) nên có chung một giao diện predict và TrackingSpeedEstimator dùng được ngay mà không phải sửa gì.
+
+    Examples:
+        >>> backend = InferenceBackend.detect("./ai_models/model N/onnx models/best_int8.onnx")
+        >>> backend.name, backend.is_available()
+        ('onnxruntime-int8', True)
+        >>> model = backend.load()
+    """
+    # runtime: (module Python cần có, các file bắt buộc trong thư mục export)
+    RUNTIMES = {
+        "openvino": ("openvino", (".xml", ".bin")),
+        "onnxruntime": ("onnxruntime", ()),
+        "mnn": ("MNN", ()),
+        "ncnn": ("ncnn", (".param", ".bin")),
+    }
+
+    def __init__(self, runtime: str, path: str):
+        self.runtime = runtime
+        self.path = path
+        self.precision = "int8" if "int8" in os.path.basename(os.path.normpath(path)).lower() else "fp"
+        # Bản export có NMS trong graph (utils/model_export.py)
+        self.end2end = "_nms" in os.path.basename(os.path.normpath(path)).lower()
+
+    @property
+    def name(self) -> str:
+        return f"{self.runtime}-{self.precision}" + ("-nms" if self.end2end else "")
+
+    @classmethod
+    def detect(cls, path: str) -> Optional["InferenceBackend"]:
+        """Nhận dạng runtime của một bản export theo tên file/thư mục, None nếu không phải model"""
+        base = os.path.basename(os.path.normpath(path))
+        if os.path.isdir(path) and base.endswith("_openvino_model"):
+            return cls("openvino", path)
+        if os.path.isdir(path) and base.endswith("_ncnn_model"):
+            return cls("ncnn", path)
+        if os.path.isfile(path) and base.endswith(".onnx"):
+            return cls("onnxruntime", path)
+        if os.path.isfile(path) and base.endswith(".mnn"):
+            return cls("mnn", path)
+        return None
+
+    def missing(self) -> List[str]:
+        """Những gì còn thiếu để chạy được: module của runtime hoặc file của bản export"""
+        module, suffixes = self.RUNTIMES[self.runtime]
+        missing = [] if importlib.util.find_spec(module) is not None else [f"module {module}"]
+        if suffixes:
+            files = os.listdir(self.path)
+            missing += [f"*{suffix}" for suffix in suffixes if not any(f.endswith(suffix) for f in files)]
+        return missing
+
+    def is_available(self) -> bool:
+        return not self.missing()
+
+    def load(self):
+        from ultralytics import YOLO
+
+        return YOLO(self.path, task="detect")
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "runtime": self.runtime, "precision": self.precision, "path": self.path,
+                "missing": self.missing()}
+
+
+def discover_backends(models_dir: str = settings_inference_backend.MODELS_DIR) -> List[InferenceBackend]:
+    """Tìm tất cả bản export trong thư mục model (kể cả bản chưa chạy được, để báo lý do)"""
+    backends = []
+    for root, dirs, files in os.walk(models_dir):
+        for name in sorted(dirs) + sorted(files):
+            backend = InferenceBackend.detect(os.path.join(root, name))
+            if backend is not None:
+                backends.append(backend)
+        # Không đi vào bên trong thư mục export
+        dirs[:] = [d for d in dirs if InferenceBackend.detect(os.path.join(root, d)) is None]
+    return backends
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU giữa 2 tập box (N, 4) và (M, 4) dạng x1, y1, x2, y2"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def detection_agreement(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5) -> float:
+    """F1 giữa kết quả phát hiện của một backend và của model tham chiếu trên cùng một ảnh: box được tính là
+    khớp khi cùng lớp và IoU >= iou_threshold (mỗi box chỉ khớp một lần, ưu tiên IoU cao)
+
+    Args:
+        reference (np.ndarray): (N, 6) x1, y1, x2, y2, conf, cls của model tham chiếu
+        candidate (np.ndarray): (M, 6) của backend cần đánh giá
+
+    Returns:
+        float: 1.0 khi trùng khớp hoàn toàn (kể cả khi cả 2 đều không phát hiện gì)
+    """
+    if len(reference) == 0 and len(candidate) == 0:
+        return 1.0
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0.0
+    iou = box_iou(reference[:, :4], candidate[:, :4])
+    iou[reference[:, None, 5] != candidate[None, :, 5]] = 0
+    matched = 0
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        matched += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return 2 * matched / (len(reference) + len(candidate))
+
+
+def load_sample_frames(path_videos: List[str], count: int, shape=(400, 600)) -> List[np.ndarray]:
+    """Lấy count frame rải đều từ các video camera (cùng kích thước 600x400 mà pipeline dùng) để đo độ chính
+    xác, trả về list rỗng nếu không đọc được video nào"""
+    import cv2
+
+    frames = []
+    videos = [path for path in path_videos if os.path.exists(path)]
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
+        per_video = -(-count // len(videos))
+        for index in np.linspace(0, total - 1, per_video + 2)[1:-1].astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(cv2.resize(frame, (shape[1], shape[0])))
+        cap.release()
+    return frames[:count]
+
+
+def host_signature(num_threads: int = 0) -> str:
+    """Định danh phần cứng để biết kết quả chọn backend đã lưu còn dùng được trên máy này hay không"""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return f"{cpu}|{cpus} cpu|{num_threads} thread"
+
+
+class BackendSelector:
+    """Đo nhanh các bản export trên CPU của máy đang chạy và chọn bản nhanh nhất đạt ngưỡng độ chính xác.
+
+    Độ chính xác của mỗi backend là độ trùng khớp (detection_agreement) với model tham chiếu (bản export trong
+    MODELS_PATH) trên các frame lấy từ video camera, tốc độ là thời gian suy luận trung bình một frame sau khi
+    đã chạy khởi động. Kết quả được lưu theo host_signature nên chỉ đo lại khi đổi máy, số thread hoặc model.
+
+    Examples:
+        >>> selector = BackendSelector(num_threads=2)
+        >>> selection = selector.select()
+        >>> selection["selected"]["path"]
+    """
+    def __init__(self, models_dir: str = settings_inference_backend.MODELS_DIR,
+                 reference_path: str = settings_metric_transport.MODELS_PATH,
+                 path_videos: List[str] = settings_metric_transport.PATH_VIDEOS,
+                 min_agreement: float = settings_inference_backend.MIN_AGREEMENT,
+                 frames: int = settings_inference_backend.BENCHMARK_FRAMES,
+                 runs: int = settings_inference_backend.BENCHMARK_RUNS,
+                 device: str = settings_metric_transport.DEVICE, imgsz: int = settings_metric_transport.IMGSZ,
+                 conf: float = settings_metric_transport.CONF, iou: float = settings_metric_transport.IOU,
+                 num_threads: int = 0,
+                 selection_path: str = settings_inference_backend.SELECTION_PATH):
+        self.models_dir = models_dir
+        self.reference_path = reference_path
+        self.path_videos = path_videos
+        self.min_agreement = min_agreement
+        self.frames = frames
+        self.runs = runs
+        self.predict_args = {"device": device, "imgsz": imgsz, "conf": conf, "iou": iou, "verbose": False}
+        self.num_threads = num_threads
+        self.selection_path = selection_path
+
+    def predict(self, model, frame: np.ndarray) -> np.ndarray:
+        return model.predict(frame, **self.predict_args)[0].boxes.data.cpu().numpy()
+
+    def benchmark(self, backend: InferenceBackend, frames: List[np.ndarray],
+                  reference: Optional[List[np.ndarray]]) -> dict:
+        """Đo một backend: latency trung bình (ms/frame) và độ trùng khớp với model tham chiếu"""
+        result = backend.as_dict()
+        if result["missing"]:
+            return result
+        try:
+            with openvino_options(settings_model_preload.OPENVINO_CACHE_DIR, self.num_threads):
+                model = backend.load()
+                warmup(lambda image: self.predict(model, image), shape=frames[0].shape, runs=2)
+                detections = [self.predict(model, frame) for frame in frames]
+                start = time.perf_counter()
+                for i in range(self.runs):
+                    self.predict(model, frames[i % len(frames)])
+                latency = (time.perf_counter() - start) / self.runs
+            result["latency_ms"] = round(latency * 1000, 2)
+            result["fps"] = round(1 / latency, 1)
+            if reference is not None:
+                result["agreement"] = round(float(np.mean(
+                    [detection_agreement(ref, det) for ref, det in zip(reference, detections)])), 3)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    def candidates(self) -> List[InferenceBackend]:
+        backends = discover_backends(self.models_dir)
+        reference = os.path.normpath(self.reference_path)
+        if not any(os.path.normpath(b.path) == reference for b in backends):
+            backend = InferenceBackend.detect(self.reference_path)
+            if backend is not None:
+                backends.insert(0, backend)
+        return backends
+
+    def load_cached(self, signature: str) -> Optional[dict]:
+        try:
+            with open(self.selection_path, encoding="utf-8") as f:
+                selection = json.load(f)
+        except (OSError, ValueError):
+            return None
+        selected = selection.get("selected") or {}
+        if selection.get("signature") != signature or not os.path.exists(selected.get("path", "")):
+            return None
+        return selection
+
+    def signature(self, backends: List[InferenceBackend]) -> str:
+        models = ",".join(f"{b.path}@{int(os.path.getmtime(b.path))}" for b in backends if os.path.exists(b.path))
+        models = hashlib.sha1(f"{self.reference_path}|{models}".encode()).hexdigest()[:12]
+        return f"{host_signature(self.num_threads)}|{self.min_agreement}|{self.predict_args['imgsz']}|{models}"
+
+    def select(self, runtime: str = "auto", use_cache: bool = True) -> dict:
+        """Chọn backend
+
+        Args:
+            runtime (str): "auto" để đo và chọn bản nhanh nhất, hoặc tên runtime (openvino, onnxruntime, mnn,
+            ncnn) để dùng bản export của runtime đó (ưu tiên INT8) mà không cần đo. Defaults to "auto".
+            use_cache (bool): Dùng kết quả đã lưu nếu cùng máy và cùng model. Defaults to True.
+
+        Returns:
+            dict: selected (backend được chọn, None nếu không có bản phù hợp), results (kết quả đo từng backend),
+            reference, min_agreement, signature
+        """
+        backends = self.candidates()
+        if runtime != "auto":
+            matches = sorted((b for b in backends if b.runtime == runtime and b.is_available()),
+                             key=lambda b: b.precision != "int8")
+            return {"selected": matches[0].as_dict() if matches else None, "results": [b.as_dict() for b in backends],
+                    "reference": self.reference_path, "min_agreement": None, "signature": None}
+
+        signature = self.signature(backends)
+        cached = self.load_cached(signature) if use_cache else None
+        if cached is not None:
+            return cached
+
+        frames = load_sample_frames(self.path_videos, self.frames)
+        reference = None
+        if frames:
+            reference_backend = InferenceBackend.detect(self.reference_path)
+            with openvino_options(settings_model_preload.OPENVINO_CACHE_DIR, self.num_threads):
+                model = reference_backend.load() if reference_backend is not None else None
+                if model is not None:
+                    reference = [self.predict(model, frame) for frame in frames]
+        else:
+            # Không có video thì chỉ đo được tốc độ, độ chính xác không được kiểm tra
+            print("Không đọc được video camera nào, chỉ so sánh tốc độ các backend")
+            frames = [np.zeros((400, 600, 3), dtype=np.uint8)]
+
+        results = [self.benchmark(backend, frames, reference) for backend in backends]
+        passed = [r for r in results if "latency_ms" in r
+                  and (reference is None or r.get("agreement", 0) >= self.min_agreement)]
+        selection = {
+            "selected": min(passed, key=lambda r: r["latency_ms"]) if passed else None,
+            "results": results,
+            "reference": self.reference_path,
+            "min_agreement": self.min_agreement if reference is not None else None,
+            "signature": signature,
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.selection_path)), exist_ok=True)
+            with open(self.selection_path, "w", encoding="utf-8") as f:
+                json.dump(selection, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Lỗi khi lưu kết quả chọn backend: {e}")
+        return selection
+
+
+def select_backend(runtime: str = "auto", num_threads: int = 0, cpus: List[int] = None) -> dict:
+    """Chạy BackendSelector (dùng làm target của process riêng để process API không phải nạp các runtime)
+
+    Args:
+        runtime (str): "auto" hoặc tên runtime, xem BackendSelector.select
+        num_threads (int): Số thread suy luận của một process phân tích
+        cpus (List[int], optional): Các core được ghim của một process phân tích. Process đo được ghim vào đúng các
+        core này vì chỉ OpenVINO nhận num_threads, các runtime khác sẽ dùng mọi core và được lợi khi so sánh
+    """
+    if cpus:
+        from utils.cpu_planner import apply_cpu_plan
+        apply_cpu_plan({"cpus": cpus, "threads": num_threads or len(cpus)})
+    return BackendSelector(num_threads=num_threads).select(runtime)
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import List, Optional
+import numpy as np
+from core.config import settings_metric_transport, settings_inference_backend, settings_model_benchmark
+from services.model_services.InferenceBackend import InferenceBackend, discover_backends, host_signature
+
+
+def run_cell(path: str, video: str, frames: int, threads: int, imgsz: int, batch: int, runs: int,
+             warmup_runs: int) -> dict:
+    """Hàm chạy trong process con (mỗi ô của ma trận một process mới để số thread và RSS đỉnh đo được độc lập)
+
+    Returns:
+        dict: latency_ms (p50, p90, p99, mean của một batch), fps (số ảnh/giây), peak_rss_mb, hoặc error
+    """
+    import resource
+    from utils.cpu_planner import apply_cpu_plan, cpus_for_threads
+
+    # Ghim CPU trước khi nạp runtime: onnxruntime, MNN, NCNN không đọc OMP_NUM_THREADS và ultralytics không
+    # truyền số thread cho chúng, nếu không ghim thì các ô của các runtime này chạy trên mọi core
+    apply_cpu_plan({"cpus": cpus_for_threads(threads), "threads": threads})
+    from services.model_services.QuantizationPipeline import sample_video_frames
+    from utils.model_preload import openvino_options
+
+    images = sample_video_frames([video], frames)
+    if not images:
+        return {"error": f"Không đọc được video {video}"}
+    backend = InferenceBackend.detect(path)
+    batches = [[images[(i * batch + j) % len(images)] for j in range(batch)] for i in range(runs + warmup_runs)]
+    latencies = []
+    with openvino_options(None, threads):
+        model = backend.load()
+        for i, images_batch in enumerate(batches):
+            start = time.perf_counter()
+            model.predict(images_batch, imgsz=imgsz, verbose=False)
+            if i >= warmup_runs:
+                latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+    # ru_maxrss tính bằng KB trên Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "latency_ms": {"p50": round(float(np.percentile(latencies, 50)), 2),
+                       "p90": round(float(np.percentile(latencies, 90)), 2),
+                       "p99": round(float(np.percentile(latencies, 99)), 2),
+                       "mean": round(float(latencies.mean()), 2)},
+        "fps": round(batch * 1000 / float(latencies.mean()), 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def cell_key(cell: dict) -> str:
+    # Theo đường dẫn tương đối trong thư mục model (có thể có nhiều bản export cùng runtime và độ chính xác)
+    return f"{cell['model']}|{cell['threads']}|{cell['imgsz']}|{cell['batch']}"
+
+
+class ModelBenchmark:
+    """Đo tất cả bản export trong thư mục model trên cùng một đoạn video mẫu, theo ma trận số thread x imgsz x
+    batch, để việc chọn model/runtime dựa trên số liệu đo lại được trên máy đang chạy.
+
+    Mỗi ô của ma trận chạy trong một process mới (spawn) nên số thread được áp dụng từ đầu và peak RSS là bộ
+    nhớ của riêng model đó. Kết quả được ghi ra JSON và Markdown, và so sánh được với một baseline đã lưu.
+
+    Examples:
+        >>> benchmark = ModelBenchmark(video="./video_test/Văn Quán.mp4", threads=[1, 2], imgsz=[640], batch=[1])
+        >>> report = benchmark.run()
+        >>> regressions = benchmark.compare(report, ModelBenchmark.load(baseline_path))
+    """
+    def __init__(self, models_dir: str = settings_inference_backend.MODELS_DIR, video: str = None,
+                 threads: List[int] = settings_model_benchmark.THREADS,
+                 imgsz: List[int] = settings_model_benchmark.IMGSZ,
+                 batch: List[int] = settings_model_benchmark.BATCH,
+                 frames: int = settings_model_benchmark.FRAMES, runs: int = settings_model_benchmark.RUNS,
+                 warmup: int = settings_model_benchmark.WARMUP, backends: Optional[List[str]] = None):
+        """
+        Args:
+            models_dir (str): Thư mục chứa các bản export (tìm bằng discover_backends)
+            video (str, optional): Video mẫu, None là video camera đầu tiên có trên máy
+            backends (List[str], optional): Chỉ đo các backend có tên này (vd "openvino-int8"), None là tất cả
+        """
+        self.models_dir = models_dir
+        self.video = video or next((path for path in settings_metric_transport.PATH_VIDEOS if os.path.exists(path)),
+                                   None)
+        self.threads = threads
+        self.imgsz = imgsz
+        self.batch = batch
+        self.frames = frames
+        self.runs = runs
+        self.warmup = warmup
+        self.backends = backends
+
+    def run(self) -> dict:
+        if self.video is None or not os.path.exists(self.video):
+            raise RuntimeError("Không có video mẫu để benchmark")
+        cells = []
+        for backend in discover_backends(self.models_dir):
+            if self.backends and backend.name not in self.backends:
+                continue
+            missing = backend.missing()
+            for threads in self.threads:
+                for imgsz in self.imgsz:
+                    for batch in self.batch:
+                        cell = {"backend": backend.name,
+                                "model": os.path.relpath(backend.path, self.models_dir).replace(os.sep, "/"),
+                                "threads": threads, "imgsz": imgsz, "batch": batch}
+                        if missing:
+                            cell["error"] = f"Thiếu {', '.join(missing)}"
+                        else:
+                            cell.update(self.run_cell(backend.path, threads, imgsz, batch))
+                        print(f"{cell['model']} threads={threads} imgsz={imgsz} batch={batch}: "
+                              f"{cell.get('fps', cell.get('error'))}")
+                        cells.append(cell)
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "host": host_signature(),
+            "video": self.video,
+            "frames": self.frames,
+            "runs": self.runs,
+            "cells": cells,
+        }
+
+    def run_cell(self, path: str, threads: int, imgsz: int, batch: int) -> dict:
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                return executor.submit(run_cell, path, self.video, self.frames, threads, imgsz, batch, self.runs,
+                                       self.warmup).result()
+        except Exception as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def load(path: str) -> Optional[dict]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def compare(report: dict, baseline: dict,
+                tolerance: float = settings_model_benchmark.REGRESSION_TOLERANCE) -> List[dict]:
+        """Ghi vào mỗi ô đo được độ thay đổi so với baseline (p50_change, fps_change) và trả về các ô hồi quy
+        (p50 tăng hoặc throughput giảm quá tolerance)"""
+        previous = {cell_key(cell): cell for cell in baseline.get("cells", []) if "fps" in cell}
+        regressions = []
+        for cell in report["cells"]:
+            before = previous.get(cell_key(cell))
+            if before is None or "fps" not in cell:
+                continue
+            cell["p50_change"] = round(cell["latency_ms"]["p50"] / before["latency_ms"]["p50"] - 1, 3)
+            cell["fps_change"] = round(cell["fps"] / before["fps"] - 1, 3)
+            if cell["p50_change"] > tolerance or cell["fps_change"] < -tolerance:
+                regressions.append(cell)
+        if baseline.get("host") != report.get("host"):
+            print(f"Baseline được đo trên máy khác ({baseline.get('host')}), so sánh chỉ mang tính tham khảo")
+        return regressions
+
+    @staticmethod
+    def to_markdown(report: dict) -> str:
+        lines = [
+            f"# Benchmark {report['created_at']}",
+            "",
+            f"- Host: `{report['host']}`",
+            f"- Video: `{report['video']}` ({report['frames']} frame, {report['runs']} lần đo)",
+            "",
+            "| Backend | Model | Threads | imgsz | Batch | p50 (ms) | p90 (ms) | p99 (ms) | FPS | Peak RSS (MB) "
+            "| vs baseline |",
+            "|---|---|---|---|---|---|---|---|---|---|---|",
+        ]
+        for cell in report["cells"]:
+            prefix = f"| {cell['backend']} | {cell['model']} | {cell['threads']} | {cell['imgsz']} | {cell['batch']} |"
+            if "fps" not in cell:
+                lines.append(f"{prefix} - | - | - | - | - | {cell.get('error', '')} |")
+                continue
+            latency = cell["latency_ms"]
+            change = f"{cell['fps_change']:+.1%} fps" if "fps_change" in cell else ""
+            lines.append(f"{prefix} {latency['p50']} | {latency['p90']} | {latency['p99']} | {cell['fps']} | "
+                         f"{cell['peak_rss_mb']} | {change} |")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+from typing import Callable
+import numpy as np
+from core.config import settings_model_cascade
+from services.model_services.InferenceBackend import box_iou
+
+
+def merge_detections(secondary: np.ndarray, primary: np.ndarray, iou_threshold: float = 0.5,
+                     keep_conf: float = 0.5) -> np.ndarray:
+    """Gộp kết quả của model lớn (secondary) với model nhỏ (primary): giữ mọi box của model lớn, thêm các box
+    chắc chắn (conf >= keep_conf) của model nhỏ mà model lớn bỏ sót (không trùng box cùng lớp nào với IoU >=
+    iou_threshold)
+
+    Returns:
+        np.ndarray: (N, 6) x1, y1, x2, y2, conf, cls
+    """
+    if len(primary) == 0:
+        return secondary
+    if len(secondary) == 0:
+        return primary[primary[:, 4] >= keep_conf]
+    iou = box_iou(primary[:, :4], secondary[:, :4])
+    iou[primary[:, None, 5] != secondary[None, :, 5]] = 0
+    missed = (iou.max(axis=1) < iou_threshold) & (primary[:, 4] >= keep_conf)
+    return np.concatenate([secondary, primary[missed]]).astype(np.float32)
+
+
+class ModelCascade:
+    """Cascade 2 cỡ model: model N (primary) chạy mọi frame, model S (secondary) chỉ chạy ở keyframe (mỗi
+    keyframe_interval frame) hoặc khi model N không chắc chắn về vùng ROI (tỉ lệ box có conf < uncertain_conf
+    từ max_uncertain_ratio trở lên). Kết quả của model S được gộp với model N (merge_detections) rồi mới đưa vào
+    tracker, nên các frame được model S xử lý có độ chính xác của model S mà chi phí trung bình gần với model N.
+
+    Giữa 2 lần chạy model S luôn cách ít nhất min_interval frame để giới hạn chi phí khi đường đông liên tục.
+
+    Examples:
+        >>> cascade = ModelCascade(speed_tool.detect, secondary_detect)
+        >>> detections = cascade.refine(roi)            # chạy model N, model S khi cần
+        >>> detections = cascade.refine(roi, primary)   # đã có kết quả model N (suy luận bất đồng bộ)
+    """
+    def __init__(self, primary_detect: Callable[[np.ndarray], np.ndarray],
+                 secondary_detect: Callable[[np.ndarray], np.ndarray],
+                 keyframe_interval: int = settings_model_cascade.KEYFRAME_INTERVAL,
+                 min_interval: int = settings_model_cascade.MIN_INTERVAL,
+                 uncertain_conf: float = settings_model_cascade.UNCERTAIN_CONF,
+                 max_uncertain_ratio: float = settings_model_cascade.MAX_UNCERTAIN_RATIO,
+                 merge_iou: float = settings_model_cascade.MERGE_IOU,
+                 keep_conf: float = settings_model_cascade.KEEP_PRIMARY_CONF):
+        """
+        Args:
+            primary_detect (Callable): Hàm phát hiện của model N, trả về (N, 6)
+            secondary_detect (Callable): Hàm phát hiện của model S, trả về (N, 6)
+            keyframe_interval (int): Chạy model S định kỳ mỗi keyframe_interval frame, 0 là không định kỳ
+            min_interval (int): Số frame tối thiểu giữa 2 lần chạy model S
+            uncertain_conf (float): Box của model N có conf thấp hơn ngưỡng này là box không chắc chắn
+            max_uncertain_ratio (float): Tỉ lệ box không chắc chắn để chạy model S ngoài keyframe
+        """
+        self.primary_detect = primary_detect
+        self.secondary_detect = secondary_detect
+        self.keyframe_interval = keyframe_interval
+        self.min_interval = max(1, min_interval)
+        self.uncertain_conf = uncertain_conf
+        self.max_uncertain_ratio = max_uncertain_ratio
+        self.merge_iou = merge_iou
+        self.keep_conf = keep_conf
+        self.frames = 0
+        self.secondary_frames = 0
+        # Số frame kể từ lần chạy model S gần nhất (bắt đầu bằng keyframe)
+        self.since_secondary = None
+
+    def should_run_secondary(self, primary: np.ndarray) -> bool:
+        if self.since_secondary is None:
+            return True
+        if self.since_secondary < self.min_interval:
+            return False
+        if self.keyframe_interval and self.since_secondary >= self.keyframe_interval:
+            return True
+        if len(primary) == 0:
+            return False
+        return float(np.mean(primary[:, 4] < self.uncertain_conf)) >= self.max_uncertain_ratio
+
+    def refine(self, image: np.ndarray, primary: np.ndarray = None) -> np.ndarray:
+        """Kết quả phát hiện của một frame (vùng ROI)
+
+        Args:
+            image (np.ndarray): Ảnh BGR đưa vào model
+            primary (np.ndarray, optional): Kết quả đã có của model N, None thì chạy model N
+
+        Returns:
+            np.ndarray: (N, 6) x1, y1, x2, y2, conf, cls
+        """
+        if primary is None:
+            primary = self.primary_detect(image)
+        self.frames += 1
+        if not self.should_run_secondary(primary):
+            self.since_secondary += 1
+            return primary
+        self.since_secondary = 1
+        self.secondary_frames += 1
+        return merge_detections(self.secondary_detect(image), primary, self.merge_iou, self.keep_conf)
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "secondary_frames": self.secondary_frames,
+            "secondary_ratio": round(self.secondary_frames / self.frames, 3) if self.frames else 0.0,
+        }
@@ -0,0 +1,330 @@
+import os
+import json
+import shutil
+import time
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from core.config import settings_metric_transport, settings_inference_backend, settings_quantization
+from services.model_services.InferenceBackend import box_iou
+from utils.model_export import EXPORT_SUFFIXES, export_from_weights, read_metadata, write_metadata
+from utils.model_preload import openvino_options, warmup
+
+# Thư mục con trong MODELS_DIR chứa bản INT8 đang dùng của từng định dạng
+PUBLISH_DIRS = {"openvino": "openvino models", "onnx": "onnx models"}
+
+
+def sample_video_frames(path_videos: List[str], count: int, start: float = 0.0, end: float = 1.0,
+                        shape=(400, 600)) -> List[np.ndarray]:
+    """Lấy count vùng ROI rải đều trong khoảng [start, end) (tỉ lệ độ dài) của các video camera, giống ảnh mà
+    pipeline đưa vào model
+
+    Args:
+        path_videos (List[str]): Các video camera (video không tồn tại bị bỏ qua)
+        count (int): Tổng số ảnh cần lấy
+        start (float): Vị trí bắt đầu (0 - 1). Defaults to 0.0.
+        end (float): Vị trí kết thúc (0 - 1). Defaults to 1.0.
+    """
+    import cv2
+
+    # Cùng vùng ROI mà AnalyzeOnRoadBase đưa vào model
+    roi_x, roi_y = settings_metric_transport.ROI_START
+    frames = []
+    videos = [path for path in path_videos if os.path.exists(path)]
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
+        per_video = -(-count // len(videos))
+        first, last = int(total * start), max(int(total * end) - 1, int(total * start))
+        for index in np.unique(np.linspace(first, last, per_video).astype(int)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = cap.read()
+            if ok:
+                frame = cv2.resize(frame, (shape[1], shape[0]))
+                frames.append(np.ascontiguousarray(frame[roi_y:, roi_x:]))
+        cap.release()
+    return frames[:count]
+
+
+def remove_path(path: str):
+    """Xoá file hoặc thư mục nếu có"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def write_calibration_dataset(frames: List[np.ndarray], output_dir: str, names: dict) -> str:
+    """Ghi các ảnh hiệu chỉnh thành dataset dạng YOLO (chỉ có ảnh) để export INT8 của ultralytics dùng làm data
+
+    Returns:
+        str: Đường dẫn data.yaml
+    """
+    import cv2
+    import yaml
+
+    images_dir = os.path.join(output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    for i, frame in enumerate(frames):
+        cv2.imwrite(os.path.join(images_dir, f"{i:05d}.jpg"), frame)
+    data_yaml = os.path.join(output_dir, "data.yaml")
+    with open(data_yaml, "w", encoding="utf-8") as f:
+        yaml.safe_dump({"path": os.path.abspath(output_dir), "train": "images", "val": "images",
+                        "names": {int(k): v for k, v in names.items()}}, f, allow_unicode=True)
+    return data_yaml
+
+
+def quantize_onnx_static(model_path: str, output_path: str, frames: List[np.ndarray], imgsz: int = 640):
+    """Lượng tử hoá tĩnh ONNX (QDQ, activation được hiệu chỉnh trên frames) bằng onnxruntime"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from services.model_services.AsyncDetector import letterbox
+
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            image = letterbox(frame, imgsz, False)[..., ::-1].transpose(2, 0, 1)[None]
+            return {input_name: np.ascontiguousarray(image, dtype=np.float32) / 255.0}
+
+    quantize_static(model_path, output_path, FrameReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+
+def average_precision_50(ground_truth: List[np.ndarray], detections: List[np.ndarray]) -> float:
+    """mAP50: trung bình AP (IoU >= 0.5, nội suy 101 điểm như ultralytics) theo các lớp có trong ground truth
+
+    Args:
+        ground_truth (List[np.ndarray]): Mỗi ảnh (N, >=6) x1, y1, x2, y2, _, cls
+        detections (List[np.ndarray]): Mỗi ảnh (M, 6) x1, y1, x2, y2, conf, cls
+    """
+    classes = np.unique(np.concatenate([gt[:, 5] for gt in ground_truth])) if ground_truth else np.array([])
+    if len(classes) == 0:
+        return 1.0 if not any(len(det) for det in detections) else 0.0
+    aps = []
+    for cls in classes:
+        scores, correct, total = [], [], 0
+        for gt, det in zip(ground_truth, detections):
+            gt, det = gt[gt[:, 5] == cls], det[det[:, 5] == cls]
+            total += len(gt)
+            det = det[np.argsort(-det[:, 4])]
+            matched = np.zeros(len(gt), dtype=bool)
+            iou = box_iou(det[:, :4], gt[:, :4]) if len(gt) and len(det) else np.zeros((len(det), len(gt)))
+            for i in range(len(det)):
+                candidates = np.where(~matched & (iou[i] >= 0.5))[0] if len(gt) else []
+                if len(candidates):
+                    matched[candidates[np.argmax(iou[i, candidates])]] = True
+                scores.append(det[i, 4])
+                correct.append(bool(len(candidates)))
+        if not scores:
+            aps.append(0.0)
+            continue
+        order = np.argsort(-np.array(scores))
+        tp = np.cumsum(np.array(correct, dtype=float)[order])
+        recall = tp / max(total, 1)
+        precision = tp / np.arange(1, len(tp) + 1)
+        # Đường precision đơn điệu giảm (về 0 ngay sau recall cao nhất) rồi lấy mẫu 101 điểm recall
+        mrec = np.concatenate(([0.0], recall, [recall[-1]], [1.0]))
+        mpre = np.flip(np.maximum.accumulate(np.flip(np.concatenate(([1.0], precision, [0.0], [0.0])))))
+        y = np.interp(np.linspace(0, 1, 101), mrec, mpre)
+        aps.append(float(np.sum((y[1:] + y[:-1]) / 2) / 100))
+    return float(np.mean(aps))
+
+
+class QuantizationPipeline:
+    """Lượng tử hoá INT8 có kiểm tra hồi quy: export bản FP và INT8 từ trọng số đã train, hiệu chỉnh INT8 trên
+    frame lấy từ video camera, đo fps và mAP50 trên một đoạn video giữ riêng rồi chỉ thay model đang dùng khi
+    đạt các ngưỡng trong SettingQuantization.
+
+    Khi không có tập nhãn (val_data), mAP50 được tính so với kết quả của chính trọng số gốc (.pt) trên đoạn video
+    giữ riêng, tức là đo mức INT8 làm lệch kết quả của model gốc.
+
+    Examples:
+        >>> pipeline = QuantizationPipeline("best.pt", formats=["openvino", "onnx"])
+        >>> report = pipeline.run()
+        >>> report["published"]
+    """
+    def __init__(self, weights: str, formats: List[str] = ("openvino",),
+                 path_videos: List[str] = settings_metric_transport.PATH_VIDEOS,
+                 eval_videos: Optional[List[str]] = None, val_data: str = None,
+                 models_dir: str = settings_inference_backend.MODELS_DIR,
+                 work_dir: str = settings_quantization.WORK_DIR,
+                 calibration_frames: int = settings_quantization.CALIBRATION_FRAMES,
+                 eval_frames: int = settings_quantization.EVAL_FRAMES,
+                 eval_fraction: float = settings_quantization.EVAL_FRACTION,
+                 min_speedup: float = settings_quantization.MIN_SPEEDUP,
+                 max_fps_regression: float = settings_quantization.MAX_FPS_REGRESSION,
+                 min_fps: float = settings_quantization.MIN_FPS,
+                 max_map_drop: float = settings_quantization.MAX_MAP_DROP,
+                 imgsz: int = settings_metric_transport.IMGSZ, conf: float = settings_metric_transport.CONF,
+                 iou: float = settings_metric_transport.IOU, num_threads: int = 0):
+        """
+        Args:
+            weights (str): Trọng số đã train (.pt)
+            formats (List[str]): Các định dạng cần lượng tử hoá ("openvino", "onnx")
+            path_videos (List[str]): Video camera để lấy frame hiệu chỉnh
+            eval_videos (List[str], optional): Video giữ riêng để đánh giá, None là dùng phần cuối (eval_fraction)
+            của path_videos
+            val_data (str, optional): data.yaml có nhãn, khi có thì mAP50 được tính bằng model.val của ultralytics
+            models_dir (str): Thư mục chứa các bản export đang dùng
+            work_dir (str): Thư mục ghi các bản export ứng viên và báo cáo
+        """
+        self.weights = weights
+        self.formats = list(formats)
+        self.path_videos = path_videos
+        self.eval_videos = eval_videos
+        self.val_data = val_data
+        self.models_dir = models_dir
+        self.work_dir = os.path.join(work_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.calibration_frames = calibration_frames
+        self.eval_frames = eval_frames
+        self.eval_fraction = eval_fraction
+        self.min_speedup = min_speedup
+        self.max_fps_regression = max_fps_regression
+        self.min_fps = min_fps
+        self.max_map_drop = max_map_drop
+        self.predict_args = {"imgsz": imgsz, "conf": conf, "iou": iou, "verbose": False}
+        self.num_threads = num_threads
+
+    def published_path(self, export_format: str) -> str:
+        return os.path.join(self.models_dir, PUBLISH_DIRS[export_format], "best_int8" + EXPORT_SUFFIXES[export_format])
+
+    def load_frames(self):
+        """Frame hiệu chỉnh (phần đầu video) và frame đánh giá (phần cuối video hoặc eval_videos)"""
+        if self.eval_videos:
+            calibration = sample_video_frames(self.path_videos, self.calibration_frames)
+            evaluation = sample_video_frames(self.eval_videos, self.eval_frames)
+        else:
+            calibration = sample_video_frames(self.path_videos, self.calibration_frames, 0.0, 1 - self.eval_fraction)
+            evaluation = sample_video_frames(self.path_videos, self.eval_frames, 1 - self.eval_fraction, 1.0)
+        if not calibration or not evaluation:
+            raise RuntimeError("Không đọc được video camera nào để hiệu chỉnh/đánh giá INT8")
+        return calibration, evaluation
+
+    def evaluate(self, model_path: str, frames: List[np.ndarray], reference: Optional[List[np.ndarray]]) -> dict:
+        """Đo fps (suy luận tuần tự từng frame như worker) và mAP50 của một model
+
+        Returns:
+            dict: path, fps, latency_ms, map50 và detections (kết quả từng frame, không ghi vào báo cáo)
+        """
+        from ultralytics import YOLO
+
+        result = {"path": model_path}
+        with openvino_options(None, self.num_threads):
+            model = YOLO(model_path, task="detect")
+            warmup(lambda image: model.predict(image, **self.predict_args), shape=frames[0].shape, runs=3)
+            start = time.perf_counter()
+            detections = [model.predict(frame, **self.predict_args)[0].boxes.data.cpu().numpy() for frame in frames]
+            latency = (time.perf_counter() - start) / len(frames)
+            result["latency_ms"] = round(latency * 1000, 2)
+            result["fps"] = round(1 / latency, 1)
+            if self.val_data:
+                result["map50"] = round(float(model.val(data=self.val_data, verbose=False, plots=False).box.map50), 4)
+        if not self.val_data:
+            result["map50"] = round(average_precision_50(reference, detections), 4) if reference is not None else 1.0
+        result["detections"] = detections
+        return result
+
+    def quantize(self, export_format: str, calibration: List[np.ndarray], data_yaml: str) -> dict:
+        """Export bản FP và INT8 của một định dạng vào thư mục làm việc"""
+        output_dir = os.path.join(self.work_dir, export_format)
+        fp = export_from_weights(self.weights, export_format, output_dir, dynamic=True)
+        if export_format == "onnx":
+            int8 = os.path.join(output_dir, "best_int8.onnx")
+            quantize_onnx_static(fp, int8, calibration, self.predict_args["imgsz"])
+        else:
+            int8 = export_from_weights(self.weights, export_format, output_dir, int8=True, dynamic=True,
+                                       data=data_yaml)
+        return {"fp": fp, "int8": int8}
+
+    def check(self, int8: dict, fp: dict, published: Optional[dict], reference_map: float) -> List[str]:
+        """Các lý do không đạt ngưỡng (list rỗng là đạt)"""
+        failures = []
+        if int8["fps"] < fp["fps"] * self.min_speedup:
+            failures.append(f"fps {int8['fps']} < {self.min_speedup} x fps bản FP ({fp['fps']})")
+        if published is not None and int8["fps"] < published["fps"] * (1 - self.max_fps_regression):
+            failures.append(f"fps {int8['fps']} chậm hơn bản đang dùng ({published['fps']}) quá "
+                            f"{self.max_fps_regression:.0%}")
+        if self.min_fps and int8["fps"] < self.min_fps:
+            failures.append(f"fps {int8['fps']} < {self.min_fps}")
+        if int8["map50"] < reference_map - self.max_map_drop:
+            failures.append(f"mAP50 {int8['map50']} thấp hơn model gốc ({reference_map}) quá {self.max_map_drop}")
+        return failures
+
+    def publish(self, export_format: str, int8_path: str, report: dict) -> str:
+        """Thay bản INT8 đang dùng bằng bản mới và ghi báo cáo bên cạnh"""
+        target = self.published_path(export_format)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Chép sang đường dẫn tạm cạnh target (cùng filesystem) rồi đổi tên, để process phân tích khởi động lại
+        # hoặc forkserver nạp sẵn model trong lúc publish không bao giờ thấy model bị thiếu hoặc chép dở
+        tmp, old = f"{target}.tmp-{os.getpid()}", f"{target}.old-{os.getpid()}"
+        for path in (tmp, old):
+            remove_path(path)
+        (shutil.copytree if os.path.isdir(int8_path) else shutil.copy2)(int8_path, tmp)
+        if os.path.isdir(target):
+            # os.replace không ghi đè được thư mục khác rỗng: dời bản cũ sang bên rồi đổi tên bản mới vào
+            os.replace(target, old)
+        os.replace(tmp, target)
+        remove_path(old)
+        with open(os.path.join(os.path.dirname(target), "quantization_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return target
+
+    def run(self, publish: bool = True) -> dict:
+        """Chạy toàn bộ pipeline
+
+        Args:
+            publish (bool): Thay model đang dùng khi đạt ngưỡng. False là chỉ đo và báo cáo. Defaults to True.
+
+        Returns:
+            dict: Báo cáo, published là list các định dạng đã được thay, failures là lý do không đạt theo định dạng
+        """
+        from ultralytics import YOLO
+
+        os.makedirs(self.work_dir, exist_ok=True)
+        calibration, evaluation = self.load_frames()
+        data_yaml = write_calibration_dataset(calibration, os.path.join(self.work_dir, "calibration"),
+                                              YOLO(self.weights).names)
+
+        original = self.evaluate(self.weights, evaluation, None)
+        reference = original.pop("detections")
+        report = {"weights": self.weights, "work_dir": self.work_dir, "calibration_frames": len(calibration),
+                  "eval_frames": len(evaluation), "map_source": "val_data" if self.val_data else "weights",
+                  "original": original, "formats": {}, "published": [], "failures": {}}
+
+        for export_format in self.formats:
+            paths = self.quantize(export_format, calibration, data_yaml)
+            fp = self.evaluate(paths["fp"], evaluation, reference)
+            int8 = self.evaluate(paths["int8"], evaluation, reference)
+            published = None
+            if os.path.exists(self.published_path(export_format)):
+                try:
+                    published = self.evaluate(self.published_path(export_format), evaluation, reference)
+                except Exception as e:
+                    print(f"Lỗi khi đo model INT8 đang dùng: {e}")
+            for result in (fp, int8, published):
+                if result is not None:
+                    result.pop("detections")
+            failures = self.check(int8, fp, published, original["map50"])
+            report["formats"][export_format] = {"fp": fp, "int8": int8, "published": published,
+                                                "passed": not failures}
+            if failures:
+                report["failures"][export_format] = failures
+            elif publish:
+                # Bản đang dùng được ghi lại metadata nguồn gốc để biết nó được tạo từ lần chạy nào
+                if os.path.isdir(paths["int8"]):
+                    metadata = read_metadata(paths["int8"])
+                    metadata["quantization"] = {"work_dir": self.work_dir, "fps": int8["fps"], "map50": int8["map50"]}
+                    write_metadata(paths["int8"], metadata)
+                report["published"].append(export_format)
+                self.publish(export_format, paths["int8"], report)
+
+        with open(os.path.join(self.work_dir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
@@ -0,0 +1,120 @@
+from collections import deque
+from typing import List
+import numpy as np
+from core.config import settings_adaptive_resolution
+
+
+class AdaptiveResolution:
+    """Chọn kích thước ảnh đưa vào model (imgsz) cho một tuyến đường theo mật độ và kích thước phương tiện phát
+    hiện được trong window frame gần nhất.
+
+    imgsz nhỏ nhất được chọn sao cho phương tiện nhỏ (phân vị 20 cạnh ngắn của box) sau khi resize vẫn có ít nhất
+    min_object_px pixel; khi trung bình từ dense_count phương tiện trở lên thì dùng imgsz lớn nhất. Để không đổi
+    qua lại liên tục (trễ):
+        - tăng imgsz khi up_frames frame liên tiếp cần imgsz lớn hơn (tăng nhanh để không bỏ sót xe)
+        - giảm imgsz khi down_frames frame liên tiếp vẫn đủ với ngưỡng cao hơn margin (giảm chậm)
+    Ở imgsz nhỏ các xe nhỏ có thể không được phát hiện nên mỗi probe_interval frame có một frame chạy ở imgsz lớn
+    nhất để số liệu không bị lệch.
+
+    Examples:
+        >>> resolution = AdaptiveResolution([320, 480, 640])
+        >>> imgsz = resolution.next_size()                 # trước khi suy luận frame
+        >>> resolution.update(detections, roi.shape[:2])   # sau khi có kết quả phát hiện của frame
+    """
+    def __init__(self, sizes: List[int] = settings_adaptive_resolution.SIZES,
+                 window: int = settings_adaptive_resolution.WINDOW,
+                 min_object_px: float = settings_adaptive_resolution.MIN_OBJECT_PX,
+                 dense_count: float = settings_adaptive_resolution.DENSE_COUNT,
+                 up_frames: int = settings_adaptive_resolution.UP_FRAMES,
+                 down_frames: int = settings_adaptive_resolution.DOWN_FRAMES,
+                 probe_interval: int = settings_adaptive_resolution.PROBE_INTERVAL,
+                 margin: float = settings_adaptive_resolution.MARGIN):
+        """
+        Args:
+            sizes (List[int]): Các imgsz được phép (đã biên dịch sẵn)
+            window (int): Số frame gần nhất dùng để tính mật độ và kích thước phương tiện
+            min_object_px (float): Cạnh ngắn tối thiểu (pixel trên ảnh đưa vào model) của phương tiện nhỏ
+            dense_count (float): Số phương tiện trung bình mỗi frame để coi là đông (dùng imgsz lớn nhất)
+            up_frames (int): Số frame liên tiếp cần imgsz lớn hơn để tăng
+            down_frames (int): Số frame liên tiếp đủ với imgsz nhỏ hơn để giảm
+            probe_interval (int): Mỗi probe_interval frame chạy một frame ở imgsz lớn nhất, 0 là không chạy
+            margin (float): Ngưỡng khi giảm imgsz cao hơn min_object_px bao nhiêu phần
+        """
+        self.sizes = sorted(set(int(size) for size in sizes))
+        self.min_object_px = min_object_px
+        self.dense_count = dense_count
+        self.up_frames = up_frames
+        self.down_frames = down_frames
+        self.probe_interval = probe_interval
+        self.margin = margin
+        # Mỗi frame: (số phương tiện, cạnh ngắn của các box)
+        self.history = deque(maxlen=window)
+        # Bắt đầu ở imgsz lớn nhất cho đến khi có đủ số liệu
+        self.size = self.sizes[-1]
+        self.frames = 0
+        self.switches = 0
+        self.up_count = 0
+        self.down_count = 0
+
+    def next_size(self) -> int:
+        """imgsz cho frame tiếp theo"""
+        self.frames += 1
+        if self.probe_interval and self.frames % self.probe_interval == 0:
+            return self.sizes[-1]
+        return self.size
+
+    def target(self, shape, min_object_px: float) -> int:
+        """imgsz nhỏ nhất đủ cho các phương tiện trong window với ảnh có kích thước shape (h, w)"""
+        if not self.history:
+            return self.size
+        if np.mean([count for count, _ in self.history]) >= self.dense_count:
+            return self.sizes[-1]
+        sides = np.concatenate([sides for _, sides in self.history])
+        if len(sides) == 0:
+            return self.sizes[0]
+        small = float(np.percentile(sides, 20))
+        for size in self.sizes:
+            # Tỉ lệ resize của letterbox
+            if small * min(size / shape[0], size / shape[1]) >= min_object_px:
+                return size
+        return self.sizes[-1]
+
+    def update(self, detections: np.ndarray, shape) -> int:
+        """Ghi nhận kết quả phát hiện của một frame và đổi imgsz nếu cần
+
+        Args:
+            detections (np.ndarray): (N, >=4) x1, y1, x2, y2... trên toạ độ ảnh đưa vào model
+            shape (tuple): Kích thước (h, w) của ảnh đưa vào model
+
+        Returns:
+            int: imgsz đang dùng sau khi cập nhật
+        """
+        sides = np.minimum(detections[:, 2] - detections[:, 0], detections[:, 3] - detections[:, 1]) \
+            if len(detections) else np.empty(0)
+        self.history.append((len(detections), sides))
+
+        up = self.target(shape, self.min_object_px)
+        down = self.target(shape, self.min_object_px * (1 + self.margin))
+        if up > self.size:
+            self.down_count = 0
+            self.up_count += 1
+            if self.up_count >= self.up_frames:
+                self.switch(up)
+        elif down < self.size:
+            self.up_count = 0
+            self.down_count += 1
+            if self.down_count >= self.down_frames:
+                self.switch(down)
+        else:
+            self.up_count = 0
+            self.down_count = 0
+        return self.size
+
+    def switch(self, size: int):
+        self.size = size
+        self.switches += 1
+        self.up_count = 0
+        self.down_count = 0
+
+    def as_dict(self) -> dict:
+        return {"imgsz": self.size, "sizes": self.sizes, "switches": self.switches}
@@ -1,7 +1,11 @@
 import os
+import time
+import queue
 from overrides import override
 from services.road_services.AnalyzeOnRoadBase import AnalyzeOnRoadBase
-from core.config import settings_metric_transport
+from utils import cpu_planner
+from core.config import settings_metric_transport, settings_inference_scheduler, settings_model_cascade, \
+    settings_model_preload
 # Đặt như này để tránh trường hợp lỗi do dùng chung thư viện AI 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
@@ -11,7 +15,8 @@ class AnalyzeOnRoad(AnalyzeOnRoadBase):
     khác vừa có thể truy xuất thông tin về kết quả mà không bị hiện tượng tranh chấp dữ liệu    
     """    
     def __init__(self, path_video, meter_per_pixel, info_dict, frame_dict, region, model_path = settings_metric_transport.MODELS_PATH, time_step=30,
-                 is_draw=True, device= settings_metric_transport.DEVICE, iou=0.3, conf=0.2, show=True):
+                 is_draw=True, device= settings_metric_transport.DEVICE, iou=settings_metric_transport.IOU, conf=settings_metric_transport.CONF, show=True, archive=None,
+                 metric_queue=None, metric_dropped=None, status=None, timer=None, name=None):
         """Class này kế thừa từ class Base (xử lý tuần tự). Class con này chưa phải là code để multiprocessing\
         mà chỉ là một chút cải tiến từ code base (class Base) để có thể vừa xử lý video đầu vào ở một process\
         khác vừa có thể truy xuất thông tin về kết quả mà không bị hiện tượng tranh chấp dữ liệu
@@ -32,6 +37,15 @@ class AnalyzeOnRoad(AnalyzeOnRoadBase):
             conf (float): Ngưỡng tin cậy về nhãn được dự đoán. Defaults to 0.2.
             show (bool): Hiển thị video xử lý qua opencv, đặt là False khi tích làm server tránh lãng phí tài nguyên.\
             Defaults to True.
+            archive (MetricArchive, optional): Nơi lưu trữ dài hạn số liệu của mỗi cửa sổ thời gian. Defaults to None.
+            metric_queue (Manager().Queue(), optional): Hàng đợi gửi số liệu mỗi cửa sổ cho RoadMetricWriter\
+            ở process chính để ghi vào DB. Defaults to None.
+            metric_dropped (Value, optional): Bộ đếm chia sẻ số snapshot bị bỏ khi hàng đợi đầy. Defaults to None.
+            status (WorkerStatus, optional): Heartbeat và thời điểm xử lý xong frame gần nhất để WorkerSupervisor\
+            ở process chính phát hiện process bị treo. Defaults to None.
+            timer (StageTimer, optional): Histogram thời gian từng giai đoạn xử lý frame dùng chung với process\
+            chính. Defaults to None.
+            name (str, optional): Tên tuyến đường, None thì lấy theo tên file video. Defaults to None.
             
         Examples:`
         Hướng dẫn chạy xử lý 1 video đơn
@@ -45,16 +59,111 @@ class AnalyzeOnRoad(AnalyzeOnRoadBase):
         >>> analyzer.process_on_single_video()
         """
         super().__init__(path_video, meter_per_pixel, model_path, time_step,
-                 is_draw, device, iou, conf, show, region)
+                 is_draw, device, iou, conf, show, region, name=name)
         self.info_dict = info_dict
         self.frame_dict = frame_dict
+        self.archive = archive
+        self.metric_queue = metric_queue
+        self.metric_dropped = metric_dropped
+        self.status = status
+        self.timer = timer
+        self.time_pre_throttle = 0.0
+        # Mức chất lượng đang áp dụng theo lệnh của InferenceScheduler (0 là đầy đủ)
+        self.level = 0
+        self.default_is_draw = is_draw
+        # Model S không nạp được thì không thử lại ở mỗi frame
+        self.cascade_failed = False
+
+    @override
+    def heartbeat(self):
+        if self.status is not None:
+            self.status.beat()
+
+    @override
+    def frame_dropped(self):
+        if self.status is not None:
+            self.status.frame_dropped()
+
+    @override
+    def throttle(self):
+        """Thực hiện lệnh điều khiển từ process chính: chờ khi bị tạm dừng (vẫn gửi heartbeat, model vẫn nằm
+        trong bộ nhớ nên tiếp tục được ngay) và ngủ bù để không vượt quá max_fps (của admin hoặc của scheduler)"""
+        if self.status is None:
+            return
+        while self.status.paused:
+            self.status.beat()
+            time.sleep(0.2)
+        max_fps = self.status.effective_max_fps
+        if max_fps > 0:
+            wait = self.time_pre_throttle + 1 / max_fps - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.time_pre_throttle = time.monotonic()
+
+    def apply_level(self, level: int):
+        """Áp dụng mức chất lượng do InferenceScheduler chọn: tắt vẽ thông tin lên frame và giới hạn kích thước
+        ảnh đưa vào model (model OpenVINO có input động nên đổi được ngay, không phải nạp lại)"""
+        levels = settings_inference_scheduler.LEVELS
+        level = max(0, min(level, len(levels) - 1))
+        if level == self.level:
+            return
+        self.level = level
+        self.is_draw = self.default_is_draw and levels[level]["draw"]
+        self.imgsz_cap = levels[level]["imgsz"]
+
+    def apply_cascade(self, enabled: bool):
+        """Bật/tắt cascade model N -> model S theo lệnh của process chính. Model S chỉ được nạp khi bật lần đầu
+        và được giải phóng khi tắt"""
+        if not enabled:
+            self.cascade = None
+            self.cascade_failed = False
+            return
+        if self.cascade is not None or self.cascade_failed:
+            return
+        model_path = settings_model_cascade.SECONDARY_MODEL_PATH
+        if not os.path.exists(model_path):
+            print(f"Không tìm thấy model S của cascade: {model_path}")
+            self.cascade_failed = True
+            return
+        try:
+            from utils.model_preload import load_model
+            from services.model_services.ModelCascade import ModelCascade
+
+            device = self.speed_tool.predict_args.get("device") or settings_metric_transport.DEVICE
+            model = load_model(model_path, device, settings_model_preload.OPENVINO_CACHE_DIR,
+                               (cpu_planner.current_plan or {}).get("threads", 0))
+            args = {"device": device, "conf": self.conf, "iou": self.iou, "classes": self.speed_tool.classes,
+                    "verbose": False}
+
+            def secondary_detect(image):
+                self.status.secondary_done()
+                return model.predict(image, **args)[0].boxes.data.cpu().numpy().astype("float32")
+
+            self.cascade = ModelCascade(self.speed_tool.detect, secondary_detect)
+        except Exception as e:
+            print(f"Lỗi khi nạp model S cho cascade của {self.name}: {e}")
+            self.cascade_failed = True
+
+    @override
+    def process_single_frame(self, frame_input, frame_index=None, detections=None):
+        if self.status is not None:
+            self.apply_level(self.status.level)
+            self.apply_cascade(self.status.cascade)
+        if detections is None:
+            self.time_frame_start = time.perf_counter()
+        super().process_single_frame(frame_input, frame_index, detections)
 
     @override
     def update_for_frame(self):
         """Cập nhật frame đang xử lý hiện tại gán vào Manage.dict() để chia sẽ dữ liệu các process với nhau dễ dàng. 
         """
         try: 
-           self.frame_dict["frame"] = self.frame_output
+           # Một lần gọi Manager cho cả frame và số thứ tự, thời điểm đọc, thời điểm ghi của frame
+           self.frame_dict.update(frame=self.frame_output, seq=self.frame_seq, captured_at=self.captured_at,
+                                  published_at=time.time())
+           if self.status is not None:
+               self.status.frame_done(latency=time.perf_counter() - self.time_frame_start,
+                                      imgsz=self.speed_tool.predict_args.get("imgsz"))
         except Exception as e:
             print(f"Lỗi khi cập nhật frame mới nhất của {self.name}: {e}")
 
@@ -62,13 +171,41 @@ class AnalyzeOnRoad(AnalyzeOnRoadBase):
     def update_for_vehicle(self):
         """Hàm cập nhật thông tin về processing đang xử lý hiện tại và gán vào Manage.dict() để chia sẽ với nhau."""
         try:
-            self.info_dict["count_car"] = self.count_car_display
-            self.info_dict["count_motor"] = self.count_motor_display
-            self.info_dict["speed_car"] = self.speed_car_display
-            self.info_dict["speed_motor"] = self.speed_motor_display
+            # Một lần gọi Manager thay vì mỗi trường một lần; captured_at là thời điểm đọc frame cuối của cửa sổ
+            self.info_seq += 1
+            self.info_dict.update(count_car=self.count_car_display, count_motor=self.count_motor_display,
+                                  speed_car=self.speed_car_display, speed_motor=self.speed_motor_display,
+                                  seq=self.info_seq, captured_at=self.captured_at, published_at=time.time())
         except Exception as e:
             print(f"Lỗi khi update thông tin phương tiện của {self.name}: {e}")
 
+        if self.metric_queue is not None:
+            try:
+                # Không chờ: khi DB chậm hàng đợi đầy thì bỏ snapshot này thay vì làm nghẽn vòng xử lý video
+                self.metric_queue.put_nowait(self.last_window)
+            except queue.Full:
+                if self.metric_dropped is not None:
+                    with self.metric_dropped.get_lock():
+                        self.metric_dropped.value += 1
+            except Exception as e:
+                print(f"Lỗi khi gửi số liệu của {self.name} tới DB writer: {e}")
+
+        if self.archive is not None:
+            try:
+                self.archive.append(self.last_window)
+            except Exception as e:
+                print(f"Lỗi khi lưu trữ số liệu của {self.name}: {e}")
+
+    @override
+    def close(self):
+        """Ghi nốt số liệu còn trong bộ đệm ra đĩa trước khi process kết thúc"""
+        super().close()
+        if self.archive is not None:
+            try:
+                self.archive.flush()
+            except Exception as e:
+                print(f"Lỗi khi lưu trữ số liệu của {self.name}: {e}")
+
 #************************************************************************ Script for testing *******************************************************
 if __name__ == "__main__":
     from multiprocessing import Manager
@@ -2,11 +2,20 @@ from abc import abstractmethod
 import cvzone
 import cv2
 import os
+import time
+import hashlib
 import numpy as np
+from collections import deque
 from datetime import datetime
-from ultralytics import solutions
 from utils.transport_utils import *
-from core.config import settings_metric_transport
+from core.config import settings_metric_transport, settings_detection_cache, settings_model_preload, \
+    settings_async_inference, settings_adaptive_resolution
+from utils import cpu_planner
+from utils.model_preload import get_preloaded_model, openvino_options, warmup
+from services.road_services.FrameSource import open_frame_source
+from services.road_services.TrackingSpeedEstimator import TrackingSpeedEstimator
+from services.road_services.DetectionLog import DetectionLogReader, DetectionLogWriter
+from services.road_services.AdaptiveResolution import AdaptiveResolution
 # Thêm cái này để tránh xung đột
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
@@ -17,7 +26,7 @@ class AnalyzeOnRoadBase:
             speed_car_display (int): trung bình tốc độ tức thời của oto
             count_moto_display (int): số lượng xe xe máy trung bình
             speed_moto_display (int): trung bình tốc độ tức thời của xe máy
-            speed_tool (solutions.SpeedEstimator()): đối tượng SpeedEstimator của YOLO
+            speed_tool (TrackingSpeedEstimator): đối tượng SpeedEstimator của YOLO (tách riêng phát hiện và theo dõi)
             frame_output (np.array): ảnh đã qua xử lý được vẽ hoặc không vẽ (tuỳ vào biến is_draw)\
             các thông tin được chuẩn đoán
         Examples:
@@ -34,8 +43,10 @@ class AnalyzeOnRoadBase:
     """
     def __init__(self, path_video = "./video_test/Đường Láng.mp4", meter_per_pixel = 0.06,
                  model_path= settings_metric_transport.MODELS_PATH, time_step=30,
-                 is_draw=True, device= settings_metric_transport.DEVICE, iou=0.3, conf=0.2, show=False,
-                 region = np.array([[50, 400], [50, 265], [370, 130], [600, 130], [600, 400]])):
+                 is_draw=True, device= settings_metric_transport.DEVICE, iou=settings_metric_transport.IOU, conf=settings_metric_transport.CONF, show=False,
+                 region = np.array([[50, 400], [50, 265], [370, 130], [600, 130], [600, 400]]),
+                 tracker='bytetrack.yaml', detection_mode=settings_detection_cache.MODE, detection_log_path=None,
+                 name=None):
         """Hàm xử lý tuần tự như một Script đơn giản áp dụng YOLO và cải tiến hơn là ở việc gói gọn trong 1 class
 
         Args:
@@ -50,10 +61,17 @@ class AnalyzeOnRoadBase:
             show (bool): Hiển thị video xử lý qua opencv, đặt là False khi tích hợp làm server tránh lãng phí tài nguyên.\
             Defaults to True.
             max_buffer_size (int): Kích thước tối đa của buffer cho deque. Defaults to 900.
+            tracker (str): File cấu hình tracker. Defaults to 'bytetrack.yaml'.
+            detection_mode (str): "off", "record" (ghi kết quả phát hiện ra DetectionLog) hoặc "cache" (ghi ở vòng\
+            đầu và dùng lại cho các vòng lặp sau của video). Defaults to settings_detection_cache.MODE.
+            detection_log_path (str, optional): Đường dẫn DetectionLog, None thì tự đặt trong DETECTION_CACHE_DIR.
+            name (str, optional): Tên tuyến đường, bắt buộc với luồng camera không có đuôi file (vd rtsp://host/live).\
+            None thì lấy theo tên file video.
         """
-        self.speed_tool = solutions.SpeedEstimator(
-            model=model_path,
-            tracker = 'bytetrack.yaml',
+        self.speed_tool = TrackingSpeedEstimator(
+            # Dùng model đã nạp sẵn trong forkserver nếu có (xem utils.model_preload)
+            model=get_preloaded_model(model_path) or model_path,
+            tracker = tracker,
             verbose=False,
             show=False,
             device=device,
@@ -70,7 +88,7 @@ class AnalyzeOnRoadBase:
 
         self.show = show
         self.path_video = path_video
-        self.name = path_video.split('/')[-1][:-4]
+        self.name = get_road_name(path_video, name)
 
         self.count_car_display = 0
         self.list_count_car = []
@@ -82,7 +100,9 @@ class AnalyzeOnRoadBase:
         self.speed_motor_display = 0
         self.list_speed_motor = []
 
-        self.time_pre = datetime.now()
+        self.time_pre = self.now()
+        # Thống kê của cửa sổ thời gian gần nhất (xem get_window_snapshot)
+        self.last_window = None
         self.frame_output = None
         self.time_step = time_step
         self.frame_predict = None
@@ -91,8 +111,7 @@ class AnalyzeOnRoadBase:
         self.time_pre_for_fps = datetime.now()
 
         # ROI
-        self.roi_y_start = 130
-        self.roi_x_start = 50
+        self.roi_x_start, self.roi_y_start = settings_metric_transport.ROI_START
 
         # Draw
         self.font = cv2.FONT_HERSHEY_SIMPLEX
@@ -108,6 +127,47 @@ class AnalyzeOnRoadBase:
         self.boxes = None
         self.classes = None
         self.ids_old = set()
+
+        # Detection cache
+        self.model_path = model_path
+        self.iou = iou
+        self.conf = conf
+        self.detection_mode = detection_mode
+        self.detection_log = None
+        self.detection_writer = None
+        self.detection_log_path = detection_log_path
+        if detection_mode in ("record", "cache"):
+            self.setup_detection_cache()
+
+        # Suy luận bất đồng bộ (xem setup_async_detector): các frame đã gửi vào model nhưng chưa xử lý tiếp
+        self.async_detector = None
+        self.async_pending = deque()
+        self.async_seq = 0
+        self.time_frame_start = 0.0
+
+        # Cascade model N -> model S (ModelCascade), None là chỉ dùng model N
+        self.cascade = None
+
+        # imgsz của mỗi frame: theo AdaptiveResolution (nếu bật), không vượt quá imgsz_cap (mức giảm chất lượng
+        # của InferenceScheduler)
+        self.default_imgsz = self.speed_tool.predict_args.get("imgsz") or settings_metric_transport.IMGSZ
+        self.imgsz_cap = None
+        self.resolution = AdaptiveResolution() if settings_adaptive_resolution.ENABLED else None
+
+        # Thời gian từng giai đoạn xử lý frame (StageTimer), None là không đo
+        self.timer = None
+        # Thời gian gửi frame và chờ kết quả suy luận bất đồng bộ (tính vào giai đoạn inference) và thời
+        # gian vẽ FPS lên frame trong vòng lặp đọc frame (tính vào giai đoạn draw)
+        self.async_wait = 0.0
+        self.overlay_time = 0.0
+
+        # Số frame đã đọc, số thứ tự và thời điểm đọc (time.time()) của frame đang xử lý: đi kèm frame và số
+        # liệu ghi cho process chính để API đo độ trễ tới client. info_seq là số thứ tự của snapshot số liệu
+        self.frames_read = 0
+        self.frame_seq = 0
+        self.captured_at = 0.0
+        self.info_seq = 0
+
     @abstractmethod
     def update_for_frame(self):
         pass
@@ -116,6 +176,218 @@ class AnalyzeOnRoadBase:
     def update_for_vehicle(self):
         pass
 
+    def heartbeat(self):
+        """Được gọi ở đầu mỗi vòng lặp đọc frame (mặc định không làm gì), lớp con dùng để báo process còn sống"""
+        pass
+
+    def throttle(self):
+        """Được gọi trước khi đọc mỗi frame (mặc định không làm gì), lớp con dùng để tạm dừng hoặc giới hạn fps"""
+        pass
+
+    def frame_dropped(self):
+        """Được gọi khi xử lý một frame bị lỗi (mặc định không làm gì), lớp con dùng để đếm số frame bị bỏ"""
+        pass
+
+    def warmup_model(self):
+        """Nạp/biên dịch model và chạy suy luận khởi động trên ảnh cỡ vùng ROI để frame đầu tiên không bị chậm.
+        Model OpenVINO được biên dịch với cache và số thread theo kế hoạch CPU của process (nếu có).
+        Bỏ qua khi kết quả phát hiện được lấy từ DetectionLog"""
+        if self.detection_log is not None:
+            return
+        shape = (400 - self.roi_y_start, 600 - self.roi_x_start, 3)
+        threads = (cpu_planner.current_plan or {}).get("threads", 0)
+        # Với AdaptiveResolution, mọi imgsz được chạy thử (và biên dịch sẵn với model có input cố định) để đổi
+        # imgsz lúc chạy không làm chậm frame
+        sizes = self.resolution.sizes if self.resolution is not None else [self.default_imgsz]
+        try:
+            with openvino_options(settings_model_preload.OPENVINO_CACHE_DIR, threads):
+                for size in sizes:
+                    if self.async_detector is not None:
+                        warmup(lambda image: self.async_detector.detect(image, imgsz=size), shape=shape)
+                    else:
+                        self.speed_tool.predict_args["imgsz"] = size
+                        warmup(self.speed_tool.detect, shape=shape)
+            self.speed_tool.predict_args["imgsz"] = self.default_imgsz
+        except Exception as e:
+            print(f"Lỗi khi khởi động model của {self.name}: {e}")
+
+    def time_stage(self, stage: str, start: float) -> float:
+        """Ghi thời gian từ start (time.perf_counter) đến hiện tại vào giai đoạn stage của StageTimer
+
+        Returns:
+            float: Thời điểm hiện tại (time.perf_counter), dùng làm start của giai đoạn tiếp theo
+        """
+        now = time.perf_counter()
+        if self.timer is not None:
+            self.timer.add(stage, now - start)
+        return now
+
+    def select_imgsz(self):
+        """Đặt imgsz cho frame sắp đưa vào model (gọi một lần trước mỗi lần suy luận)"""
+        size = self.resolution.next_size() if self.resolution is not None else self.default_imgsz
+        if self.imgsz_cap:
+            size = min(size, self.imgsz_cap)
+        self.speed_tool.predict_args["imgsz"] = size
+
+    def setup_async_detector(self):
+        """Tạo AsyncDetector (OpenVINO AsyncInferQueue) khi OPENVINO_ASYNC=true và model là bản OpenVINO. Khi
+        đó vòng lặp đọc frame gửi trước tối đa num_requests frame vào model, trong lúc model chạy thì frame cũ
+        nhất được theo dõi/vẽ, kết quả luôn được lấy theo đúng thứ tự frame"""
+        if not settings_async_inference.ENABLED or self.detection_log is not None:
+            return
+        if not os.path.isdir(self.model_path) or not self.model_path.rstrip("/\\").endswith("_openvino_model"):
+            print(f"{self.name}: suy luận bất đồng bộ chỉ hỗ trợ model OpenVINO, dùng suy luận đồng bộ")
+            return
+        # Cùng quy ước với ultralytics: "intel:gpu", "intel:npu"... là thiết bị của OpenVINO, còn lại chạy trên CPU
+        device = str(self.speed_tool.predict_args.get("device") or "cpu")
+        try:
+            from services.model_services.AsyncDetector import AsyncDetector
+
+            self.async_detector = AsyncDetector(
+                self.model_path,
+                device=device.split(":", 1)[1].upper() if device.startswith("intel:") else "CPU",
+                num_requests=settings_async_inference.NUM_REQUESTS,
+                performance_hint=settings_async_inference.PERFORMANCE_HINT,
+                num_streams=settings_async_inference.NUM_STREAMS,
+                num_threads=(cpu_planner.current_plan or {}).get("threads", 0),
+                cache_dir=settings_model_preload.OPENVINO_CACHE_DIR,
+                imgsz=self.speed_tool.predict_args.get("imgsz") or settings_metric_transport.IMGSZ,
+                conf=self.conf, iou=self.iou, classes=self.speed_tool.classes,
+                preprocess_in_graph=settings_async_inference.PREPROCESS_IN_GRAPH,
+            )
+        except Exception as e:
+            print(f"Lỗi khi tạo suy luận bất đồng bộ cho {self.name}, dùng suy luận đồng bộ: {e}")
+
+    def process_frame_async(self, frame_input, frame_index=None, captured=None):
+        """Gửi frame vào AsyncDetector, rồi xử lý tiếp (theo dõi, thống kê, vẽ) frame cũ nhất khi đã có đủ
+        num_requests frame đang chạy trong model. Quá RESULT_TIMEOUT giây không có kết quả thì quay về suy luận
+        đồng bộ cho các frame còn lại. captured là (số thứ tự, thời điểm đọc) của frame, được giữ đến khi xử lý tiếp"""
+        detector = self.async_detector
+        seq = self.async_seq
+        self.async_seq += 1
+        self.select_imgsz()
+        start = time.perf_counter()
+        detector.submit(seq, frame_input[self.roi_y_start:, self.roi_x_start:],
+                        imgsz=self.speed_tool.predict_args.get("imgsz"))
+        # Tiền xử lý khi gửi frame cũng thuộc giai đoạn inference
+        self.async_wait += time.perf_counter() - start
+        self.async_pending.append((seq, frame_input, frame_index, captured))
+        while len(self.async_pending) > detector.num_requests:
+            self.process_next_async()
+
+    def process_next_async(self):
+        seq, frame, frame_index, captured = self.async_pending.popleft()
+        if captured is not None:
+            self.frame_seq, self.captured_at = captured
+        detections = None
+        if self.async_detector is not None:
+            # Thời gian chờ kết quả cũng là thời gian xử lý của frame (phần suy luận không chạy song song được)
+            self.time_frame_start = time.perf_counter()
+            try:
+                detections = self.async_detector.result(seq, timeout=settings_async_inference.RESULT_TIMEOUT)
+            except TimeoutError as e:
+                print(f"Lỗi suy luận bất đồng bộ của {self.name}, chuyển sang suy luận đồng bộ: {e}")
+                self.async_detector = None
+            self.async_wait += time.perf_counter() - self.time_frame_start
+        self.process_single_frame(frame, frame_index, detections=detections)
+
+    def flush_async(self):
+        """Xử lý nốt các frame đang chờ kết quả (giữ đúng thứ tự trước khi quay lại xử lý đồng bộ)"""
+        while self.async_pending:
+            self.process_next_async()
+
+    def close(self):
+        """Giải phóng tài nguyên khi dừng xử lý video. Ở chế độ record log đang ghi vẫn được giữ lại,
+        ở chế độ cache log chưa đủ một vòng video sẽ bị bỏ"""
+        if self.detection_writer is not None:
+            if self.detection_mode == "record":
+                self.detection_writer.finalize()
+            else:
+                self.detection_writer.discard()
+            self.detection_writer = None
+
+    def get_detection_log_path(self) -> str:
+        """Đường dẫn DetectionLog mặc định: phụ thuộc video, model, ngưỡng và vùng ROI nên log cũ tự hết
+        hiệu lực khi một trong các yếu tố này thay đổi"""
+        stat = os.stat(self.path_video)
+        source = (f"{os.path.abspath(self.path_video)}|{stat.st_size}|{stat.st_mtime_ns}|{self.model_path}|"
+                  f"{self.conf}|{self.iou}|{self.roi_x_start}|{self.roi_y_start}")
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(settings_detection_cache.CACHE_DIR, f"{self.name}-{key}.detlog")
+
+    def setup_detection_cache(self):
+        """Mở DetectionLog đã có (chế độ cache) hoặc bắt đầu ghi log mới"""
+        try:
+            self.detection_log_path = self.detection_log_path or self.get_detection_log_path()
+            if self.detection_mode == "cache" and os.path.exists(self.detection_log_path):
+                self.detection_log = DetectionLogReader(self.detection_log_path)
+                print(f"{self.name}: dùng lại {len(self.detection_log)} frame trong {self.detection_log_path}")
+                return
+            cam = cv2.VideoCapture(self.path_video)
+            metadata = {
+                "video": os.path.abspath(self.path_video),
+                "fps": cam.get(cv2.CAP_PROP_FPS) or 30,
+                "total_frames": int(cam.get(cv2.CAP_PROP_FRAME_COUNT)),
+                "model": self.model_path,
+                "conf": self.conf,
+                "iou": self.iou,
+                "roi": [self.roi_x_start, self.roi_y_start],
+            }
+            cam.release()
+            self.detection_writer = DetectionLogWriter(self.detection_log_path, metadata)
+        except Exception as e:
+            print(f"Lỗi khi khởi tạo detection cache của {self.name}: {e}")
+            self.detection_mode = "off"
+
+    def get_cached_detections(self, frame_index):
+        """Lấy kết quả phát hiện đã lưu của frame (None nếu phải chạy model).
+
+        Ở chế độ cache, khi video quay lại frame đầu thì log của vòng đầu đã đủ nên được đóng lại và dùng
+        cho các vòng sau."""
+        if frame_index is None:
+            return None
+        writer = self.detection_writer
+        if writer is not None and writer.frames and frame_index == 0:
+            writer.finalize()
+            self.detection_writer = None
+            if self.detection_mode == "cache":
+                self.detection_log = DetectionLogReader(writer.path)
+                print(f"{self.name}: đã lưu {len(self.detection_log)} frame, chuyển sang dùng detection cache")
+        if self.detection_log is None:
+            return None
+        return self.detection_log.get(frame_index, conf=self.conf)
+
+    def record_detections(self, frame_index):
+        """Ghi kết quả phát hiện của frame vừa xử lý vào DetectionLog (nếu đang ghi)"""
+        if self.detection_writer is not None and frame_index is not None:
+            self.detection_writer.write(frame_index, self.speed_tool.last_detections)
+
+    def now(self) -> datetime:
+        """Thời điểm hiện tại dùng để chia cửa sổ thống kê. Mặc định là giờ hệ thống,
+        lớp con có thể ghi đè (ví dụ dùng thời gian của video khi xử lý offline)"""
+        return datetime.now()
+
+    def get_window_snapshot(self, window_start: datetime, window_end: datetime) -> dict:
+        """Đóng gói số liệu trung bình của một cửa sổ thời gian thành dict để lưu trữ/gửi đi
+
+        Args:
+            window_start (datetime): Thời điểm bắt đầu cửa sổ
+            window_end (datetime): Thời điểm kết thúc cửa sổ
+
+        Returns:
+            dict: Số liệu của cửa sổ (tên đường, thời gian, số lượng và vận tốc trung bình)
+        """
+        return {
+            "road_name": self.name,
+            "window_start": window_start,
+            "window_end": window_end,
+            "count_car": self.count_car_display,
+            "speed_car": self.speed_car_display,
+            "count_motor": self.count_motor_display,
+            "speed_motor": self.speed_motor_display,
+            "frames": len(self.list_count_car),
+        }
+
     def update_data(self):
         """Hàm này sẽ được gọi để cập nhật dữ liệu cho frame và thông tin phương tiện sau một khoảng thời gian
             đã thiết lập là time_step"""
@@ -124,11 +396,12 @@ class AnalyzeOnRoadBase:
         self.update_for_frame()
 
         # Tính toán thời gian đã trôi qua kể từ lần cập nhật trước
-        time_now = datetime.now()
+        time_now = self.now()
         self.delta_time = (time_now - self.time_pre).total_seconds()
 
         # Khi đủ thời gian đã thiết lập, cập nhật thông tin phương tiện
         if self.delta_time >= self.time_step:
+            window_start = self.time_pre
             self.time_pre = time_now
 
             # Tính toán trung bình các giá trị theo chu kỳ (bỏ qua 0)
@@ -144,6 +417,8 @@ class AnalyzeOnRoadBase:
                 self.list_speed_motor,
             )
 
+            self.last_window = self.get_window_snapshot(window_start, time_now)
+
             # Cập nhật thông tin phương tiện vào info_dict
             self.update_for_vehicle()
 
@@ -154,10 +429,13 @@ class AnalyzeOnRoadBase:
             self.list_speed_motor.clear()
             self.ids_old.clear()
 
-    def process_single_frame(self, frame_input):
+    def process_single_frame(self, frame_input, frame_index=None, detections=None):
         """Hàm này xử lý từng frame một
         Args:
             frame_input (np.array): Ảnh được đọc từ opencv
+            frame_index (int, optional): Số thứ tự frame trong video, dùng cho detection cache. Defaults to None.
+            detections (np.ndarray, optional): Kết quả phát hiện đã có của vùng ROI (suy luận bất đồng bộ), None
+            thì chạy model. Defaults to None.
         """
         try:
             # Tránh copy toàn bộ frame, chỉ tạo view
@@ -167,22 +445,46 @@ class AnalyzeOnRoadBase:
             self.frame_predict = self.frame_output[self.roi_y_start:, self.roi_x_start:]
 
             # Cần dùng bản copy để tránh công cụ ghi đè label lên ảnh đầu vào
-            self.speed_tool.process(self.frame_predict.copy())
+            start = time.perf_counter()
+            cached = self.get_cached_detections(frame_index)
+            if cached is None and detections is None:
+                self.select_imgsz()
+            if cached is None and self.cascade is not None:
+                detections = self.cascade.refine(self.frame_predict, detections)
+            refined = time.perf_counter()
+            self.speed_tool.process(self.frame_predict.copy(), detections=cached if cached is not None else detections)
+            if cached is None:
+                self.record_detections(frame_index)
+                if self.resolution is not None:
+                    self.resolution.update(self.speed_tool.last_detections, self.frame_predict.shape[:2])
+            now = time.perf_counter()
+            if self.timer is not None:
+                # speed_tool.process gồm cả chạy model (khi chưa có detections) và theo dõi
+                detect_time = self.speed_tool.detect_time
+                self.timer.add("inference", refined - start + detect_time + self.async_wait)
+                self.timer.add("tracking", max(0.0, now - refined - detect_time))
+            self.async_wait = 0.0
 
             self.post_processing()
+            now = self.time_stage("post_processing", now)
 
             # Vẽ đè lên hình các thông tin
             if self.is_draw:
                 self.draw_info_to_frame_output()
+            # Tính cả thời gian vẽ FPS lên frame trong vòng lặp đọc frame
+            now = self.time_stage("draw", now - self.overlay_time)
+            self.overlay_time = 0.0
             # p = Thread(target= lambda : self.post_processing())
             # p.start()
 
 
-            # Cập nhật data
+            # Cập nhật data (ghi frame và số liệu cho process chính)
             self.update_data()
+            self.time_stage("publish", now)
 
         except Exception as e:
             print(f"Lỗi khi xử lý với file {self.name}: {e}")
+            self.frame_dropped()
 
     def post_processing(self):
         if self.speed_tool.track_data is not None:
@@ -310,28 +612,47 @@ class AnalyzeOnRoadBase:
             print(f"Lỗi khi vẽ: {e}")
 
     def process_on_single_video(self):
-        """Hàm này sẽ được gọi để xử lý video bằng việc đọc từng frame và xử lý từng frame một"""
-        cam = cv2.VideoCapture(self.path_video)
+        """Hàm này sẽ được gọi để xử lý video bằng việc đọc từng frame và xử lý từng frame một.
+        Nguồn frame (giải mã trực tiếp hoặc cache memory-map) được chọn theo settings_frame_source.MODE"""
+        target_size = (600, 400)
+        cam = open_frame_source(self.path_video, target_size=target_size, loop=True)
 
         if not cam.isOpened():
             print(f'Không thể mở video: {self.path_video}')
             return
 
-        target_size = (600, 400)
+        self.setup_async_detector()
+        self.warmup_model()
+        # Frame từ cache memory-map là vùng nhớ chỉ đọc nên được copy vào buffer này trước khi vẽ
+        frame_buffer = None
 
         try:
             while True:
+                self.heartbeat()
+                self.throttle()
+                start = time.perf_counter()
                 check, cap = cam.read()
 
                 if not check:
-                    print(f'Kết thúc video: {self.path_video}')
-                    # Restart video để loop
-                    cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-
-                cap = cv2.resize(cap, target_size)
+                    print(f'Không đọc được frame: {self.path_video}')
+                    break
+                self.frames_read += 1
+                captured = (self.frames_read, time.time())
+
+                if not cap.flags.writeable and self.async_detector is not None:
+                    # Nhiều frame cùng chờ kết quả nên mỗi frame cần vùng nhớ riêng
+                    cap = cap.copy()
+                elif not cap.flags.writeable:
+                    if frame_buffer is None:
+                        frame_buffer = np.empty_like(cap)
+                    np.copyto(frame_buffer, cap)
+                    cap = frame_buffer
+                if self.timer is not None:
+                    self.timer.add("decode", time.perf_counter() - start - cam.resize_time)
+                    self.timer.add("resize", cam.resize_time)
 
                 # FPS calculation - optimized
+                start = time.perf_counter()
                 time_now = datetime.now()
                 delta_time = (time_now - self.time_pre_for_fps).total_seconds()
                 fps = round(1 / delta_time) if delta_time > 0 else 0
@@ -344,9 +665,15 @@ class AnalyzeOnRoadBase:
                                  colorR=(50, 50, 50),
                                  border=2,
                                  colorB=(255, 255, 255))
+                self.overlay_time += time.perf_counter() - start
 
-                # Xử lý từng frame
-                self.process_single_frame(cap)
+                # Xử lý từng frame (khi suy luận bất đồng bộ thì frame được xử lý là frame cũ hơn đã có kết quả)
+                if self.async_detector is not None and self.detection_log is None:
+                    self.process_frame_async(cap, cam.frame_index, captured)
+                else:
+                    self.flush_async()
+                    self.frame_seq, self.captured_at = captured
+                    self.process_single_frame(cap, cam.frame_index)
 
                 # Hiển thị frame nếu show là True
                 if self.show:
@@ -359,8 +686,14 @@ class AnalyzeOnRoadBase:
         except Exception as e:
             print(f"Lỗi khi xử lý {self.name}: {e}")
         finally:
+            # Xử lý nốt các frame còn đang suy luận bất đồng bộ để không mất kết quả phát hiện và số liệu của chúng
+            try:
+                self.flush_async()
+            except Exception as e:
+                print(f"Lỗi khi xử lý nốt các frame đang chờ của {self.name}: {e}")
             # Giải phóng tài nguyên
             cam.release()
+            self.close()
             if self.show:
                 cv2.destroyAllWindows()
 
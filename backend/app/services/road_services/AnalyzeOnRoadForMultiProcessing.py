@@ -1,11 +1,23 @@
 from multiprocessing import Process, Manager, freeze_support
+import multiprocessing
 import os
-from services.road_services.AnalyzeOnRoad import AnalyzeOnRoad
-from core.config import settings_metric_transport
-from utils.transport_utils import convert_frame_to_byte, log
+from services.road_services.WorkerStatus import WorkerStatus
+from services.road_services.StageTimer import StageTimer
+from services.road_services.WorkerSupervisor import WorkerSupervisor
+from services.road_services.InferenceScheduler import InferenceScheduler
+from services.system_services.PrometheusMetrics import Histogram
+from core.config import settings_metric_transport, settings_metric_archive, settings_metric_writer, settings_worker_supervisor, \
+    settings_cpu_planner, settings_model_preload, settings_inference_scheduler, settings_inference_backend, \
+    settings_pipeline_timing, settings_prometheus
+from utils.transport_utils import convert_frame_to_byte, log, get_road_name
+from utils.cpu_planner import plan_cpus, apply_cpu_plan, get_cgroup_cpu_limit, get_affinity, get_available_cpus
+from utils.model_preload import start_preload_server
 import signal
 import sys
+import concurrent.futures
+import threading
 import atexit
+import time
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
@@ -22,10 +34,18 @@ class AnalyzeOnRoadForMultiprocessing():
         của các process với nhau
         shared_data (Manager().dict()): dict quản lý các Lock và các kiểu dữ liệu chia sẽ chung khác
         của các process với nhau chặt chẽ hơn
-        processes (list): các process con đang chạy 
+        processes (dict): các process con đang chạy theo tên tuyến đường (do supervisor quản lý, process\
+        được khởi động lại sẽ thay thế process cũ)
+        supervisor (WorkerSupervisor): theo dõi heartbeat của các process và khởi động lại process chết/treo
+        cpu_plan (dict): các core và số thread suy luận của từng process (xem utils.cpu_planner.plan_cpus)
+        scheduler (InferenceScheduler): chia budget suy luận cho các tuyến đường theo độ ưu tiên/số người xem\
+        và giảm chất lượng khi trễ SLO
+        model_path (str): bản export của model mà các process dùng (MODELS_PATH hoặc backend được chọn lúc khởi\
+        động, xem services.model_services.InferenceBackend)
     """
     def __init__(self, regions = settings_metric_transport.REGIONS, path_videos = settings_metric_transport.PATH_VIDEOS,
-        meter_per_pixels = settings_metric_transport.METER_PER_PIXELS, show_log = False, show = False, is_join_processes = False):
+        meter_per_pixels = settings_metric_transport.METER_PER_PIXELS, show_log = False, show = False, is_join_processes = False,
+        names = None):
         """Khi tích hợp API vào thiết kế do cơ chế envent loop vòng lặp bất tận nên không cần join
         các process lại để tránh bị kill. Do đó phải đặt is_join_processes = False nếu không nó sẽ chặn
         envent loop của api khiến server nghẽn
@@ -44,21 +64,52 @@ class AnalyzeOnRoadForMultiprocessing():
             show (bool, optional): hiển thị video bằng cv2 hoặc không. Defaults to False.
             is_join_processes (bool, optional): join các process con lại (nên tắt đi khi tích hợp api). 
             Defaults to True.
+            names (list, optional): Tên từng tuyến đường, None thì lấy theo tên file video. Defaults to None.
         """
         self.path_videos = path_videos
         self.meter_per_pixels = meter_per_pixels
         self.regions = regions
+        self.road_names = names or [None] * len(path_videos)
         self.manager = Manager()
         self.shared_data = self.manager.dict()  # Dùng để lưu trữ thông tin chung giữa các process
         self.show_log = show_log
         self.show = show
-        self.processes = []
         self.names = []
+        # Tham số khởi động process của từng tuyến đường, dùng lại khi supervisor khởi động lại process
+        self.worker_args = {}
+        self.statuses = {}
+        # Histogram thời gian từng giai đoạn xử lý frame của mỗi tuyến đường (StageTimer)
+        self.timers = {}
+        self.timers_lock = threading.Lock()
+        # Thời gian đọc frame/số liệu của process con qua Manager (cho /metrics)
+        self.ipc_latency = {"frame": Histogram(settings_prometheus.IPC_BUCKETS),
+                            "info": Histogram(settings_prometheus.IPC_BUCKETS)}
+        self.supervisor = WorkerSupervisor(self._start_worker, self.statuses)
+        self.processes = self.supervisor.processes
+        self.cpu_plan = {}
+        self.scheduler = InferenceScheduler(self.statuses, self.get_inference_budget,
+                                            lambda: self.cpu_plan.get("workers"))
+        self.model_path = settings_metric_transport.MODELS_PATH
+        self.backend_selection = None
+        # Các process được tạo từ forkserver (đã import sẵn ultralytics/torch, và nạp sẵn model nếu
+        # MODEL_PRELOAD=forkserver) chứ không fork trực tiếp từ process API: process API có nhiều thread
+        # (các giai đoạn khởi động chạy song song), fork từ đó có thể làm process con kẹt ở khoá do thread
+        # khác đang giữ. Các đối tượng có khoá truyền cho process con phải được tạo từ cùng context
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.mp_context = multiprocessing.get_context("forkserver")
+        else:
+            self.mp_context = multiprocessing.get_context()
         self.is_join_processes = is_join_processes
+
+        # Hàng đợi số liệu mỗi cửa sổ gửi về process chính cho RoadMetricWriter ghi vào DB
+        self.metric_queue = self.manager.Queue(settings_metric_writer.QUEUE_SIZE) if settings_metric_writer.ENABLED else None
+        self.metric_dropped = self.mp_context.Value('L', 0)
         
-        # Đăng ký signal handler để xử lý Ctrl+C
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        # Đăng ký signal handler để xử lý Ctrl+C (chỉ làm được ở main thread, ví dụ khi chạy trong TestClient
+        # thì event loop nằm ở thread khác và việc dọn dẹp do atexit/shutdown đảm nhận)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
         
         # Đăng ký cleanup khi exit
         atexit.register(self.cleanup_processes)
@@ -71,21 +122,18 @@ class AnalyzeOnRoadForMultiprocessing():
 
     def cleanup_processes(self):
         """Dừng tất cả processes một cách an toàn"""
-        if hasattr(self, 'processes'):
-            for p in self.processes:
-                if p.is_alive():
-                    print(f"Đang terminate process {p.pid}...")
-                    p.terminate()
-                    p.join(timeout=5)  # Chờ tối đa 5 giây
-                    if p.is_alive():
-                        print(f"Force kill process {p.pid}...")
-                        p.kill()
+        if hasattr(self, 'supervisor'):
+            # Dừng supervisor trước để nó không khởi động lại các process đang bị dừng
+            self.scheduler.stop()
+            self.supervisor.stop()
             print("Tất cả processes đã được dừng.")
 
     # hàm bình thường bỏ vào để tổ chức code Có thể gọi thông qua class hoặc instance, nhưng không thể truy cập 
     # trực tiếp vào thuộc tính của class hay instance, trừ khi được truyền vào.
     @staticmethod 
-    def run_analyze_process(region, path_video, meter_per_pixel, info_dict, frame_dict, show):
+    def run_analyze_process(region, path_video, meter_per_pixel, info_dict, frame_dict, show,
+                            metric_queue=None, metric_dropped=None, status=None, cpu_plan=None, model_path=None,
+                            timer=None, name=None):
         """Hàm chạy trong process riêng, làm hàm kích hoạt cho Multiprocessing. Đặt hàm này là static method vì
         để tránh việc sử dụng multiprocessing bị lỗi do nó sẽ picke các biến liên quan đến hàm để chuyển dữ liệu
         sang process con, đặc biệt là self chứa các tool của YOLO và các biến khác không thể picke được do đó 
@@ -104,59 +152,113 @@ class AnalyzeOnRoadForMultiprocessing():
             frame_dict (Manager().dict()): Tương tự info_dict nhưng dùng để chứa thông tin ảnh byte code đã được encode
             do dữ liệu dạng bytecode mà manager không có kiểu này nên ta nó vào một dict trung gian
             show (bool): Hiển thị video hay không
+            metric_queue (Manager().Queue(), optional): Hàng đợi gửi số liệu mỗi cửa sổ cho DB writer
+            metric_dropped (Value, optional): Bộ đếm số snapshot bị bỏ khi hàng đợi đầy
+            status (WorkerStatus, optional): Heartbeat gửi về cho WorkerSupervisor
+            cpu_plan (dict, optional): Các core được ghim và số thread suy luận của process này
+            model_path (str, optional): Bản export của model, None thì dùng MODELS_PATH
+            timer (StageTimer, optional): Histogram thời gian từng giai đoạn xử lý frame
+            name (str, optional): Tên tuyến đường, None thì lấy theo tên file video
         """
+        # Khi bị terminate (SIGTERM) thì thoát bằng SystemExit để các khối finally kịp ghi nốt dữ liệu
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         try:
+            if cpu_plan:
+                # Phải áp dụng trước khi nạp model vì số thread của OpenVINO/torch được cố định lúc khởi tạo
+                apply_cpu_plan(cpu_plan)
+            # Import trong process con để process chính (API) không phải nạp ultralytics/torch
+            from services.road_services.AnalyzeOnRoad import AnalyzeOnRoad
+
+            archive = None
+            if settings_metric_archive.ENABLED:
+                # Import trong process con để process chính không phải nạp pyarrow khi không cần
+                from services.metric_services.MetricArchive import MetricArchive
+                archive = MetricArchive(settings_metric_archive.ARCHIVE_DIR)
+
             analyzer = AnalyzeOnRoad(
                 path_video=path_video,
                 meter_per_pixel=meter_per_pixel,
                 info_dict=info_dict,
                 frame_dict=frame_dict,
                 show= show, 
-                region= region
+                region= region,
+                archive= archive,
+                metric_queue= metric_queue,
+                metric_dropped= metric_dropped,
+                status= status,
+                timer= timer,
+                name= name,
+                model_path= model_path or settings_metric_transport.MODELS_PATH
             )
             analyzer.process_on_single_video()
         except Exception as e:
             print(f"Lỗi khi xử lý {path_video}: {e}")
+            # Thoát với mã lỗi để supervisor ghi nhận lý do
+            sys.exit(1)
+
+    def _start_worker(self, name: str) -> Process:
+        """Tạo và start process phân tích cho một tuyến đường (được WorkerSupervisor gọi cả khi khởi động lại)"""
+        region, path_video, meter_per_pixel = self.worker_args[name]
+        data = self.shared_data[name]
+        p = self.mp_context.Process(
+            target=self.run_analyze_process,
+            args=(
+                region, path_video, meter_per_pixel, data['info'], data['frame'],
+                self.show
+            ),
+            kwargs={'metric_queue': self.metric_queue, 'metric_dropped': self.metric_dropped,
+                    'status': self.statuses[name], 'cpu_plan': self.cpu_plan.get("workers", {}).get(name),
+                    'model_path': self.model_path, 'timer': self.timers.get(name), 'name': name},
+            name=f"analyze-{name}"
+        )
+        p.start()
+        return p
+
+    def _register_road(self, path_video, meter_per_pixel, region, name=None) -> str:
+        """Tạo dữ liệu dùng chung và trạng thái cho một tuyến đường (chưa start process)"""
+        name = get_road_name(path_video, name)
+        if name in self.names:
+            raise KeyError(name)
+
+        # Tạo các manager objects
+        info_dict = self.manager.dict({
+            "count_car": 0,
+            "count_motor": 0,
+            "speed_car": 0,
+            "speed_motor": 0,
+        })
+        frame_dict = self.manager.dict({"frame": ""})
+
+        # Lưu các khoá và các biến quản lý dữ liệu vào dict shared data để dễ quản lý. Việc láy data cũng 
+        # đơn giản hơn do các thông tin như khoá và dữ liệu được phân bố vào dict để quản lý giúp chặt chẽ hơn
+        self.shared_data[name] = {
+            'info': info_dict,
+            'frame': frame_dict,
+        }
+        self.worker_args[name] = (region, path_video, meter_per_pixel)
+        self.statuses[name] = WorkerStatus()
+        if settings_pipeline_timing.ENABLED:
+            self.timers[name] = StageTimer()
+        self.names.append(name)
+        return name
 
     def run_multiprocessing(self):
         """Hàm kích hoạt chạy multi processing"""
         freeze_support()
         
         # Lặp qua để xử lý từng video với từng đường dẫn và tham số meter_per_pixel một 
-        for path_video, meter_per_pixel, region in zip(self.path_videos, self.meter_per_pixels, self.regions):
-            name = path_video.split('/')[-1][:-4]
-            self.names.append(name)
-            
-            # Tạo các manager objects
-            info_dict = self.manager.dict({
-                "count_car": 0,
-                "count_motor": 0,
-                "speed_car": 0,
-                "speed_motor": 0,
-            })
-            frame_dict = self.manager.dict({"frame": ""})
-
-            # Lưu các khoá và các biến quản lý dữ liệu vào dict shared data để dễ quản lý. Việc láy data cũng 
-            # đơn giản hơn do các thông tin như khoá và dữ liệu được phân bố vào dict để quản lý giúp chặt chẽ hơn
-            self.shared_data[name] = {
-                'info': info_dict,
-                'frame': frame_dict,
-            }
-            
-            # Tạo process với target là static method
-            p = Process(
-                target=self.run_analyze_process, 
-                args=(
-                    region, path_video, meter_per_pixel, info_dict, frame_dict, 
-                    self.show
-                ), 
-                # kwargs={'show': True}
-            )
-            self.processes.append(p)
-      
-        # Start all self.processes
-        for p in self.processes:
-            p.start()
+        for path_video, meter_per_pixel, region, name in zip(self.path_videos, self.meter_per_pixels, self.regions,
+                                                             self.road_names):
+            self._register_road(path_video, meter_per_pixel, region, name)
+
+        self.update_cpu_plan()
+        self.select_backend()
+        if self.mp_context.get_start_method() == "forkserver":
+            self.start_preload_server()
+        # Start các process (target là static method) và luồng giám sát
+        self.supervisor.start(self.names, supervise=settings_worker_supervisor.ENABLED)
+        if settings_inference_scheduler.ENABLED:
+            self.scheduler.start()
         
         if self.show_log:
             Process(target= log, args=(self.names, self.shared_data)).start()
@@ -166,7 +268,7 @@ class AnalyzeOnRoadForMultiprocessing():
     
     def join_process(self):   
         """ Hàm để join các process với timeout""" 
-        for p in self.processes:
+        for p in list(self.processes.values()):
             if p.is_alive():
                 p.join(timeout=10)  # Timeout 10 giây
                 if p.is_alive():
@@ -177,17 +279,179 @@ class AnalyzeOnRoadForMultiprocessing():
                         p.kill()
         print("All processes stopped.")
     
-    def get_frame_road(self, road_name : str):
-        data = b""
+    def get_frame_packet(self, road_name : str):
+        """Frame mới nhất (JPEG) của tuyến đường cùng seq, captured_at (thời điểm process con đọc frame) và
+        published_at (thời điểm ghi cho process chính) để đo độ trễ tới client
+
+        Returns:
+            tuple: (bytes, dict), tuyến đường không tồn tại thì là (b"", {})
+        """
         if road_name not in self.names:
-            return data
-        data = convert_frame_to_byte(self.shared_data[road_name]['frame'].get('frame', b""))
-        return data
+            return b"", {}
+        start = time.perf_counter()
+        packet = self.shared_data[road_name]['frame'].copy()
+        self.ipc_latency["frame"].observe(time.perf_counter() - start)
+        frame = packet.pop('frame', b"")
+        start = time.perf_counter()
+        data = convert_frame_to_byte(frame)
+        timer = self.timers.get(road_name)
+        if timer is not None and data is not None:
+            # Được gọi từ nhiều thread của API cùng lúc
+            with self.timers_lock:
+                timer.add("encode", time.perf_counter() - start)
+        return data, packet
+
+    def get_frame_road(self, road_name : str):
+        return self.get_frame_packet(road_name)[0]
     
     def get_info_road(self, road_name : str):
         if road_name not in self.names:
             return {}
-        return dict(self.shared_data[road_name]['info'])
+        start = time.perf_counter()
+        info = dict(self.shared_data[road_name]['info'])
+        self.ipc_latency["info"].observe(time.perf_counter() - start)
+        return info
+
+    def add_road(self, path_video, meter_per_pixel, region, paused=False, max_fps=0, cascade=False, name=None) -> str:
+        """Thêm một tuyến đường khi hệ thống đang chạy, chỉ start process của tuyến đường này
+
+        Raises:
+            KeyError: Tuyến đường đã tồn tại
+            ValueError: Luồng camera không có đuôi file mà không đặt tên
+        """
+        name = self._register_road(path_video, meter_per_pixel, region, name)
+        self.statuses[name].set_control(paused=paused, max_fps=max_fps, cascade=cascade)
+        self.update_cpu_plan()
+        self.supervisor.start([name], supervise=settings_worker_supervisor.ENABLED)
+        return name
+
+    def remove_road(self, road_name: str):
+        """Dừng process và xoá dữ liệu của một tuyến đường, các tuyến đường khác không bị ảnh hưởng
+
+        Raises:
+            KeyError: Không có tuyến đường này
+        """
+        if road_name not in self.names:
+            raise KeyError(road_name)
+        self.names.remove(road_name)
+        self.supervisor.remove(road_name)
+        self.worker_args.pop(road_name, None)
+        self.statuses.pop(road_name, None)
+        self.timers.pop(road_name, None)
+        self.shared_data.pop(road_name, None)
+        self.update_cpu_plan()
+
+    def set_road_control(self, road_name: str, paused=None, max_fps=None, priority=None, cascade=None):
+        """Tạm dừng/tiếp tục, đổi giới hạn fps, độ ưu tiên hoặc bật/tắt cascade model N -> model S của một tuyến
+        đường mà không khởi động lại process (model vẫn nằm trong bộ nhớ của process nên tiếp tục được ngay)
+
+        Raises:
+            KeyError: Không có tuyến đường này
+        """
+        if road_name not in self.names:
+            raise KeyError(road_name)
+        self.statuses[road_name].set_control(paused=paused, max_fps=max_fps, cascade=cascade)
+        if priority is not None:
+            self.scheduler.set_priority(road_name, priority)
+
+    def start_preload_server(self):
+        """Khởi động forkserver đã import sẵn các thư viện (và nạp sẵn model nếu MODEL_PRELOAD=forkserver), các
+        process phân tích (kể cả khi được supervisor khởi động lại) được fork từ đó nên không phải import thư
+        viện và biên dịch model lại"""
+        threads = self.worker_threads()
+        try:
+            start_preload_server(
+                self.model_path if settings_model_preload.MODE == "forkserver" else None,
+                device=settings_metric_transport.DEVICE,
+                cache_dir=settings_model_preload.OPENVINO_CACHE_DIR,
+                num_threads=threads,
+            )
+        except Exception as e:
+            print(f"Lỗi khi khởi động forkserver: {e}")
+
+    def worker_threads(self) -> int:
+        """Số thread suy luận lớn nhất của một process theo kế hoạch CPU (0 là để runtime tự chọn)"""
+        return (self.largest_worker_plan() or {}).get("threads", 0)
+
+    def largest_worker_plan(self):
+        """Kế hoạch CPU (cpus, threads) của process có nhiều thread suy luận nhất, None nếu không có kế hoạch"""
+        return max(self.cpu_plan.get("workers", {}).values(), key=lambda w: w["threads"], default=None)
+
+    def select_backend(self):
+        """Chọn bản export (OpenVINO, ONNX Runtime, MNN, NCNN) cho các process theo INFERENCE_BACKEND. Việc đo
+        chạy trong process riêng (spawn) để process API không phải nạp các runtime và không giữ lại bộ nhớ của
+        chúng, kết quả được lưu lại nên các lần khởi động sau trên cùng máy không phải đo lại"""
+        mode = settings_inference_backend.BACKEND
+        if not mode:
+            return
+        try:
+            from services.model_services.InferenceBackend import select_backend
+
+            context = multiprocessing.get_context("spawn")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                # Đo trên đúng các core và số thread mà một process phân tích được cấp
+                plan = self.largest_worker_plan() or {}
+                self.backend_selection = executor.submit(select_backend, mode, plan.get("threads", 0),
+                                                         plan.get("cpus")).result()
+            selected = self.backend_selection["selected"]
+            if selected is None:
+                print(f"Không có backend phù hợp ({mode}), dùng {self.model_path}")
+                return
+            self.model_path = selected["path"]
+            print(f"Dùng backend {selected['name']}: {self.model_path}")
+        except Exception as e:
+            print(f"Lỗi khi chọn backend suy luận, dùng {self.model_path}: {e}")
+
+    def get_backend_selection(self):
+        """Bản export đang dùng và kết quả đo các backend lúc khởi động"""
+        return {"mode": settings_inference_backend.BACKEND or "fixed", "model_path": self.model_path,
+                **(self.backend_selection or {})}
+
+    def update_cpu_plan(self):
+        """Chia lại core khi số tuyến đường thay đổi. Các process đang chạy được ghim lại từ process chính;
+        số thread suy luận chỉ đổi được khi process khởi động lại (đã cố định lúc nạp model)"""
+        if not settings_cpu_planner.ENABLED:
+            return
+        self.cpu_plan = plan_cpus(
+            self.names,
+            cpu_limit=get_cgroup_cpu_limit(),
+            reserved=settings_cpu_planner.RESERVED_CPUS,
+            threads_per_worker=settings_cpu_planner.THREADS_PER_WORKER,
+        )
+        for name, entry in self.cpu_plan["workers"].items():
+            process = self.processes.get(name)
+            if process is not None and process.is_alive():
+                try:
+                    os.sched_setaffinity(process.pid, entry["cpus"])
+                except (AttributeError, OSError) as e:
+                    print(f"Lỗi khi ghim CPU cho process {name}: {e}")
+
+    def get_cpu_plan(self):
+        """Kế hoạch chia core cùng affinity thực tế của từng process (để đối chiếu trên API admin)"""
+        if not self.cpu_plan:
+            return {"enabled": settings_cpu_planner.ENABLED, "workers": {}}
+        plan = {**self.cpu_plan, "enabled": True, "workers": {}}
+        for name, entry in self.cpu_plan["workers"].items():
+            process = self.processes.get(name)
+            pid = process.pid if process is not None and process.is_alive() else None
+            plan["workers"][name] = {**entry, "pid": pid, "affinity": get_affinity(pid) if pid else None}
+        return plan
+
+    def get_inference_budget(self) -> float:
+        """Số core dành cho suy luận: theo kế hoạch CPU nếu có, ngược lại là toàn bộ core được phép dùng"""
+        return self.cpu_plan.get("budget") or len(get_available_cpus())
+
+    def get_scheduler_status(self):
+        """Budget, fps mục tiêu và mức chất lượng hiện tại của từng tuyến đường"""
+        return {"enabled": settings_inference_scheduler.ENABLED, **self.scheduler.snapshot()}
+
+    def get_pipeline_timings(self):
+        """Thời gian từng giai đoạn xử lý frame của mỗi tuyến đường trong cửa sổ trượt (xem StageTimer)"""
+        return {name: timer.snapshot() for name, timer in list(self.timers.items())}
+
+    def get_workers_health(self):
+        """Trạng thái từng process phân tích (heartbeat, số lần khởi động lại...)"""
+        return self.supervisor.health()
 
 #***********************************************************Script for testing************************************************************************
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+import os
+import cv2
+import numpy as np
+from datetime import datetime, timedelta
+from overrides import override
+from services.road_services.AnalyzeOnRoadBase import AnalyzeOnRoadBase
+from services.road_services.DetectionLog import DetectionLogReader
+from core.config import settings_metric_transport
+# Thêm cái này để tránh xung đột
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+class AnalyzeOnRoadOffline(AnalyzeOnRoadBase):
+    """Xử lý một đoạn của file video đã ghi đúng một lần và nhanh nhất có thể (không vẽ, không hiển thị,
+    không lặp lại video). Thời gian dùng để chia cửa sổ là thời gian của video (số thứ tự frame / fps)
+    thay vì giờ hệ thống.
+
+    Kết quả không được chia cửa sổ ngay trong process này mà được trả về dạng mảng numpy theo từng frame
+    để process chính ghép các đoạn lại (xem utils.offline_utils):
+        - counts: (frame, số oto, số xe máy) của các frame thuộc đoạn chính
+        - speeds: (cửa sổ, track id, class, vận tốc) mỗi cặp (cửa sổ, track) một dòng
+        - head/tail: (frame, track id, x1, y1, x2, y2) của các frame chồng lấn đầu/cuối đoạn để nối track
+
+    Nếu truyền replay_log (DetectionLog đã ghi trước đó) thì video không được giải mã và model không được
+    chạy: kết quả phát hiện đã lưu được đưa thẳng vào tracker, dùng để thử lại các tham số conf, tracker,
+    meter_per_pixel với tốc độ hàng nghìn frame/s.
+
+    Examples:
+        >>> analyzer = AnalyzeOnRoadOffline(path_video, meter_per_pixel, region, start_frame=0,
+        >>>                                 nominal_start=0, end_frame=9000, overlap_frames=150)
+        >>> result = analyzer.process_segment()
+        >>> replay = AnalyzeOnRoadOffline(path_video, 0.05, region, replay_log="./data/detection_cache/x.detlog")
+        >>> result = replay.process_segment()
+    """
+    def __init__(self, path_video, meter_per_pixel, region, start_frame=0, nominal_start=0, end_frame=None,
+                 overlap_frames=0, fps=None, time_step=30, model_path=settings_metric_transport.MODELS_PATH,
+                 device=settings_metric_transport.DEVICE, iou=settings_metric_transport.IOU, conf=settings_metric_transport.CONF, tracker='bytetrack.yaml',
+                 replay_log=None, detection_mode="off", detection_log_path=None):
+        """
+        Args:
+            path_video (str): Đường dẫn đến video
+            meter_per_pixel (float): Tỉ lệ 1 mét ngoài đời với 1 pixel
+            region (np.array): Vùng đa giác cần theo dõi
+            start_frame (int): Frame bắt đầu đọc (gồm cả đoạn khởi động cho tracker). Defaults to 0.
+            nominal_start (int): Frame bắt đầu của đoạn chính, các frame trước đó chỉ dùng để khởi động\
+            tracker và nối track với đoạn trước. Defaults to 0.
+            end_frame (int, optional): Frame kết thúc (không bao gồm). Defaults to None (hết video).
+            overlap_frames (int): Số frame chồng lấn cuối đoạn cần ghi lại để nối với đoạn sau. Defaults to 0.
+            fps (float, optional): FPS của video, None thì đọc từ file. Defaults to None.
+            time_step (int): Độ dài cửa sổ thống kê (giây theo thời gian video). Defaults to 30.
+            tracker (str): File cấu hình tracker. Defaults to 'bytetrack.yaml'.
+            replay_log (str, optional): DetectionLog dùng để phát lại thay cho video. Defaults to None.
+            detection_mode (str): "off" hoặc "record" để ghi DetectionLog trong lúc xử lý. Defaults to "off".
+            detection_log_path (str, optional): Đường dẫn DetectionLog khi ghi. Defaults to None.
+        """
+        self.replay = DetectionLogReader(replay_log) if replay_log else None
+        if self.replay is not None:
+            # Không cần đến file video, lấy thông tin từ metadata của log
+            self.fps = fps or self.replay.metadata.get("fps", 30)
+            indices = self.replay.frame_indices()
+            total = indices[-1] + 1 if indices else 0
+        else:
+            cam = cv2.VideoCapture(path_video)
+            self.fps = fps or cam.get(cv2.CAP_PROP_FPS) or 30
+            total = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+            cam.release()
+
+        # Cần có trước khi gọi hàm khởi tạo của lớp cha vì nó dùng self.now()
+        self.frame_index = start_frame
+        self.video_start = datetime(1970, 1, 1)
+        super().__init__(path_video=path_video, meter_per_pixel=meter_per_pixel, model_path=model_path,
+                         time_step=time_step, is_draw=False, device=device, iou=iou, conf=conf,
+                         show=False, region=region, tracker=tracker, detection_mode=detection_mode,
+                         detection_log_path=detection_log_path)
+
+        self.start_frame = start_frame
+        self.nominal_start = nominal_start
+        self.end_frame = total if end_frame is None else min(end_frame, total)
+        self.tail_start = self.end_frame - overlap_frames
+        # Vận tốc được tính theo số frame nên phải dùng đúng fps của video
+        self.speed_tool.fps = self.fps
+
+        self._counts = []
+        self._speeds = {}
+        self._head = []
+        self._tail = []
+
+    @override
+    def now(self) -> datetime:
+        """Thời gian theo video: vị trí frame hiện tại chia cho fps"""
+        return self.video_start + timedelta(seconds=self.frame_index / self.fps)
+
+    @override
+    def update_for_frame(self):
+        pass
+
+    @override
+    def update_for_vehicle(self):
+        pass
+
+    @override
+    def get_cached_detections(self, frame_index):
+        if self.replay is None:
+            return super().get_cached_detections(frame_index)
+        detections = self.replay.get(frame_index, conf=self.conf)
+        # Frame không có trong log (ví dụ process ghi log bị dừng giữa chừng) coi như không có phương tiện
+        return detections if detections is not None else np.empty((0, 6), dtype=np.float32)
+
+    @override
+    def post_processing(self):
+        track_data = self.speed_tool.track_data
+        if track_data is None or track_data.id is None:
+            # Frame không có phương tiện nào được track
+            self.ids = np.empty((0,), dtype=np.int32)
+            self.classes = np.empty((0,), dtype=np.int32)
+            self.boxes = np.empty((0, 4), dtype=np.int32)
+            self.speeds = self.speed_tool.spd
+        else:
+            super().post_processing()
+        self._record_frame()
+
+    def _record_frame(self):
+        """Ghi lại kết quả của frame hiện tại phục vụ việc ghép các đoạn video"""
+        frame = self.frame_index
+        ids, classes, boxes = self.ids, self.classes, self.boxes
+
+        if frame < self.nominal_start or frame >= self.tail_start:
+            rows = np.column_stack([np.full(len(ids), frame, dtype=np.int32), ids, boxes]).astype(np.int32)
+            (self._head if frame < self.nominal_start else self._tail).append(rows)
+        if frame < self.nominal_start:
+            return
+
+        self._counts.append((frame, int(np.sum(classes == 0)), int(np.sum(classes == 1))))
+        window = int(frame / self.fps // self.time_step)
+        for track_id, class_id in zip(ids.tolist(), classes.tolist()):
+            speed = self.speeds.get(track_id, 0)
+            if speed > 0 and (window, track_id) not in self._speeds:
+                self._speeds[(window, track_id)] = (class_id, int(speed))
+
+    def process_segment(self) -> dict:
+        """Đọc và xử lý các frame trong [start_frame, end_frame) đúng một lần
+
+        Returns:
+            dict: Các mảng numpy counts, speeds, head, tail và thông tin đoạn (xem mô tả class)
+        """
+        target_size = (600, 400)
+        if self.replay is not None:
+            self._replay_frames(target_size)
+        else:
+            self._decode_frames(target_size)
+
+        self.close()
+        speeds = np.array([(w, t, c, s) for (w, t), (c, s) in self._speeds.items()], dtype=np.int32)
+        return {
+            "start_frame": self.start_frame,
+            "nominal_start": self.nominal_start,
+            "end_frame": self.end_frame,
+            "fps": self.fps,
+            "counts": np.array(self._counts, dtype=np.int32).reshape(-1, 3),
+            "speeds": speeds.reshape(-1, 4),
+            "head": np.concatenate(self._head) if self._head else np.empty((0, 6), dtype=np.int32),
+            "tail": np.concatenate(self._tail) if self._tail else np.empty((0, 6), dtype=np.int32),
+        }
+
+    def _decode_frames(self, target_size):
+        cam = cv2.VideoCapture(self.path_video)
+        if not cam.isOpened():
+            raise FileNotFoundError(f"Không thể mở video: {self.path_video}")
+        cam.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        self.warmup_model()
+        try:
+            for self.frame_index in range(self.start_frame, self.end_frame):
+                check, cap = cam.read()
+                if not check:
+                    break
+                self.process_single_frame(cv2.resize(cap, target_size), self.frame_index)
+        finally:
+            cam.release()
+
+    def _replay_frames(self, target_size):
+        # Frame đen chỉ để giữ nguyên luồng xử lý (ROI, vẽ của SpeedEstimator), không dùng để suy luận
+        blank = np.zeros((target_size[1], target_size[0], 3), dtype=np.uint8)
+        for self.frame_index in range(self.start_frame, self.end_frame):
+            self.process_single_frame(blank, self.frame_index)
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+from typing import Dict, List
+import numpy as np
+from core.config import settings_metric_transport, settings_camera_registry, settings_model_cascade
+from utils.transport_utils import get_road_name
+
+
+class CameraRegistry:
+    """Danh sách camera (tuyến đường) đang được giám sát, lưu ra file JSON để các thay đổi qua API admin
+    (thêm, xoá, tạm dừng, đổi fps) vẫn còn sau khi khởi động lại server.
+
+    Mỗi camera gồm: path_video, meter_per_pixel, region (list các điểm [x, y]), paused, max_fps, priority, cascade.
+    Tên tuyến đường được lấy từ tên file video giống AnalyzeOnRoadBase, luồng camera không có đuôi file
+    (vd rtsp://host/live) thì phải đặt tên riêng.
+
+    Examples:
+        >>> registry = CameraRegistry.load()
+        >>> registry.add("./video_test/Cầu Giấy.mp4", 0.05, [[50, 400], [50, 300], [500, 130], [550, 400]])
+        >>> registry.update("Cầu Giấy", paused=True)
+    """
+    def __init__(self, path: str = settings_camera_registry.PATH, cameras: Dict[str, dict] = None):
+        self.path = path
+        self.cameras: Dict[str, dict] = cameras or {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def road_name(path_video: str, name: str = None) -> str:
+        return get_road_name(path_video, name)
+
+    @classmethod
+    def from_settings(cls, path: str = settings_camera_registry.PATH) -> "CameraRegistry":
+        """Tạo danh sách camera từ các list cố định trong SettingMetricTransport"""
+        registry = cls(path)
+        for path_video, meter_per_pixel, region in zip(settings_metric_transport.PATH_VIDEOS,
+                                                       settings_metric_transport.METER_PER_PIXELS,
+                                                       settings_metric_transport.REGIONS):
+            registry.cameras[cls.road_name(path_video)] = cls.make_camera(path_video, meter_per_pixel, region)
+        return registry
+
+    @classmethod
+    def load(cls, path: str = settings_camera_registry.PATH) -> "CameraRegistry":
+        """Đọc file JSON nếu có, nếu không thì tạo từ cấu hình mặc định"""
+        if not os.path.exists(path):
+            return cls.from_settings(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Lỗi khi đọc danh sách camera {path}, dùng cấu hình mặc định: {e}")
+            return cls.from_settings(path)
+
+    @staticmethod
+    def make_camera(path_video: str, meter_per_pixel: float, region, paused: bool = False,
+                    max_fps: float = 0, priority: float = 1, cascade: bool = settings_model_cascade.DEFAULT) -> dict:
+        return {
+            "path_video": path_video,
+            "meter_per_pixel": float(meter_per_pixel),
+            "region": np.asarray(region, dtype=int).tolist(),
+            "paused": bool(paused),
+            "max_fps": float(max_fps),
+            "priority": float(priority),
+            "cascade": bool(cascade),
+        }
+
+    def save(self):
+        """Ghi ra file tạm rồi đổi tên để không làm hỏng file khi bị dừng giữa chừng"""
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.cameras, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def add(self, path_video: str, meter_per_pixel: float, region, paused: bool = False,
+            max_fps: float = 0, priority: float = 1, cascade: bool = settings_model_cascade.DEFAULT,
+            name: str = None) -> str:
+        """Thêm camera, trả về tên tuyến đường
+
+        Raises:
+            KeyError: Tuyến đường đã tồn tại
+            ValueError: Luồng camera không có đuôi file mà không đặt tên
+        """
+        name = self.road_name(path_video, name)
+        if name in self.cameras:
+            raise KeyError(name)
+        self.cameras[name] = self.make_camera(path_video, meter_per_pixel, region, paused, max_fps, priority,
+                                               cascade)
+        return name
+
+    def remove(self, name: str) -> dict:
+        return self.cameras.pop(name)
+
+    def update(self, name: str, paused: bool = None, max_fps: float = None, priority: float = None,
+               cascade: bool = None) -> dict:
+        camera = self.cameras[name]
+        if paused is not None:
+            camera["paused"] = bool(paused)
+        if max_fps is not None:
+            camera["max_fps"] = float(max_fps)
+        if priority is not None:
+            camera["priority"] = float(priority)
+        if cascade is not None:
+            camera["cascade"] = bool(cascade)
+        return camera
+
+    def as_lists(self):
+        """Trả về (regions, path_videos, meter_per_pixels, names) theo định dạng của AnalyzeOnRoadForMultiprocessing"""
+        cameras: List[dict] = list(self.cameras.values())
+        return ([np.array(c["region"]) for c in cameras],
+                [c["path_video"] for c in cameras],
+                [c["meter_per_pixel"] for c in cameras],
+                list(self.cameras))
@@ -0,0 +1,136 @@
+import os
+import json
+import struct
+import numpy as np
+
+# Một detection: box (float32) + độ tin cậy (float16) + class (uint8) = 19 byte
+DETECTION_DTYPE = np.dtype([("box", "<f4", (4,)), ("conf", "<f2"), ("cls", "u1")])
+MAGIC = b"DETLOG1\n"
+HEADER = struct.Struct("<I")         # độ dài phần metadata JSON
+RECORD = struct.Struct("<iH")        # số thứ tự frame, số detection
+
+
+def to_records(detections: np.ndarray) -> np.ndarray:
+    """Chuyển mảng (N, 6) x1, y1, x2, y2, conf, cls sang mảng có cấu trúc DETECTION_DTYPE"""
+    records = np.empty(len(detections), dtype=DETECTION_DTYPE)
+    if len(detections):
+        records["box"] = detections[:, :4]
+        records["conf"] = detections[:, 4]
+        records["cls"] = detections[:, 5]
+    return records
+
+
+def from_records(records: np.ndarray) -> np.ndarray:
+    """Chuyển ngược mảng DETECTION_DTYPE về (N, 6) float32"""
+    detections = np.empty((len(records), 6), dtype=np.float32)
+    detections[:, :4] = records["box"]
+    detections[:, 4] = records["conf"]
+    detections[:, 5] = records["cls"]
+    return detections
+
+
+class DetectionLogWriter:
+    """Ghi kết quả phát hiện thô của từng frame ra file nhị phân gọn nhẹ.
+
+    Định dạng file: MAGIC, độ dài + JSON metadata (video, model, ngưỡng...), sau đó là các bản ghi
+    (frame, n) + n detection kiểu DETECTION_DTYPE. File được ghi vào ``<path>.tmp`` và chỉ được đổi tên
+    thành ``path`` khi gọi finalize(), vì vậy file tồn tại ở ``path`` luôn là một log hoàn chỉnh.
+
+    Examples:
+        >>> writer = DetectionLogWriter("./data/detection_cache/van_quan.detlog", {"model": model_path})
+        >>> writer.write(frame_index, speed_tool.last_detections)
+        >>> writer.finalize()
+    """
+    def __init__(self, path: str, metadata: dict = None):
+        """
+        Args:
+            path (str): Đường dẫn file log
+            metadata (dict, optional): Thông tin đi kèm để kiểm tra log có khớp cấu hình hay không
+        """
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.frames = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = json.dumps(metadata or {}, ensure_ascii=False).encode("utf-8")
+        self._file = open(self.tmp_path, "wb")
+        self._file.write(MAGIC + HEADER.pack(len(meta)) + meta)
+
+    def write(self, frame_index: int, detections: np.ndarray):
+        """Ghi kết quả phát hiện (N, 6) của một frame"""
+        records = to_records(detections)
+        self._file.write(RECORD.pack(frame_index, len(records)))
+        self._file.write(records.tobytes())
+        self.frames += 1
+
+    def finalize(self) -> str:
+        """Đóng file và đổi tên thành file log hoàn chỉnh
+
+        Returns:
+            str: Đường dẫn file log
+        """
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def discard(self):
+        """Đóng và xoá file đang ghi dở (ví dụ khi dừng giữa chừng trong chế độ cache)"""
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class DetectionLogReader:
+    """Đọc toàn bộ DetectionLog vào bộ nhớ, tra cứu theo số thứ tự frame.
+
+    Examples:
+        >>> log = DetectionLogReader("./data/detection_cache/van_quan.detlog")
+        >>> detections = log.get(120, conf=0.3)   # (N, 6) hoặc None nếu frame không có trong log
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"File không phải DetectionLog: {path}")
+
+        offset = len(MAGIC)
+        (meta_len,) = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        self.metadata = json.loads(data[offset:offset + meta_len].decode("utf-8"))
+        offset += meta_len
+
+        self._frames = {}
+        size = DETECTION_DTYPE.itemsize
+        while offset + RECORD.size <= len(data):
+            frame_index, count = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if offset + count * size > len(data):
+                # Bản ghi cuối bị cắt ngang (process bị dừng khi đang ghi)
+                break
+            self._frames[frame_index] = from_records(
+                np.frombuffer(data, dtype=DETECTION_DTYPE, count=count, offset=offset))
+            offset += count * size
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __contains__(self, frame_index: int) -> bool:
+        return frame_index in self._frames
+
+    def frame_indices(self):
+        return sorted(self._frames)
+
+    def get(self, frame_index: int, conf: float = None):
+        """Lấy kết quả phát hiện của một frame
+
+        Args:
+            frame_index (int): Số thứ tự frame trong video
+            conf (float, optional): Chỉ lấy các detection có độ tin cậy >= conf (dùng khi thử ngưỡng cao hơn
+            ngưỡng lúc ghi log). Defaults to None.
+
+        Returns:
+            np.ndarray | None: (N, 6) x1, y1, x2, y2, conf, cls hoặc None nếu frame không có trong log
+        """
+        detections = self._frames.get(frame_index)
+        if detections is not None and conf is not None:
+            detections = detections[detections[:, 4] >= conf]
+        return detections
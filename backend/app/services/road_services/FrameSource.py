@@ -0,0 +1,211 @@
+import os
+import json
+import mmap
+import uuid
+import time
+import hashlib
+import cv2
+import numpy as np
+from core.config import settings_frame_source
+
+
+class VideoFrameSource:
+    """Đọc frame bằng cách giải mã trực tiếp file video (hành vi mặc định), frame được resize về target_size.
+    Khi hết video sẽ tự quay lại frame đầu nếu loop=True.
+
+    Examples:
+        >>> source = VideoFrameSource("./video_test/Văn Quán.mp4")
+        >>> check, frame = source.read()
+        >>> source.release()
+    """
+    def __init__(self, path_video: str, target_size=(600, 400), loop: bool = True):
+        """
+        Args:
+            path_video (str): Đường dẫn đến video
+            target_size (tuple): Kích thước (rộng, cao) của frame trả về. Defaults to (600, 400).
+            loop (bool): Quay lại đầu video khi hết. Defaults to True.
+        """
+        self.path_video = path_video
+        self.target_size = target_size
+        self.loop = loop
+        self.cam = cv2.VideoCapture(path_video)
+        self.fps = self.cam.get(cv2.CAP_PROP_FPS) or 30
+        # Số thứ tự trong video của frame vừa đọc
+        self.frame_index = -1
+        # Thời gian resize của frame vừa đọc (giây), phần còn lại của read là thời gian giải mã
+        self.resize_time = 0.0
+
+    def isOpened(self) -> bool:
+        return self.cam.isOpened()
+
+    def read(self):
+        """Đọc frame tiếp theo, trả về (check, frame) giống cv2.VideoCapture.read"""
+        check, frame = self.cam.read()
+        self.frame_index += 1
+        if not check and self.loop:
+            print(f'Kết thúc video: {self.path_video}')
+            self.cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            check, frame = self.cam.read()
+            self.frame_index = 0
+        if not check:
+            return False, None
+        start = time.perf_counter()
+        frame = cv2.resize(frame, self.target_size)
+        self.resize_time = time.perf_counter() - start
+        return True, frame
+
+    def release(self):
+        self.cam.release()
+
+
+class MmapFrameSource:
+    """Đọc frame từ file cache chứa frame thô (uint8, đã resize về target_size) qua memory-map.
+
+    Lần đầu mở, video được giải mã đúng một lần vào file cache; các lần sau (và các process khác) chỉ
+    map file này nên gần như không tốn CPU giải mã, page cache của hệ điều hành được chia sẻ giữa các
+    process. Frame trả về là view chỉ đọc trên vùng nhớ được map (không copy), người dùng cần copy
+    nếu muốn vẽ lên frame.
+
+    File cache gồm ``<key>.u8`` (frame thô liên tiếp) và ``<key>.json`` (số frame, kích thước, fps);
+    key được tạo từ đường dẫn, kích thước và thời gian sửa đổi của video nên cache tự hết hiệu lực
+    khi video thay đổi.
+
+    Examples:
+        >>> source = MmapFrameSource("./video_test/Văn Quán.mp4", cache_dir="./data/frame_cache")
+        >>> check, frame = source.read()
+    """
+    def __init__(self, path_video: str, target_size=(600, 400), loop: bool = True,
+                 cache_dir: str = settings_frame_source.CACHE_DIR,
+                 max_cache_mb: int = settings_frame_source.MAX_CACHE_MB):
+        """
+        Args:
+            path_video (str): Đường dẫn đến video
+            target_size (tuple): Kích thước (rộng, cao) của frame. Defaults to (600, 400).
+            loop (bool): Quay lại frame đầu khi hết. Defaults to True.
+            cache_dir (str): Thư mục chứa file cache
+            max_cache_mb (int): Dung lượng tối đa của file cache, vượt quá sẽ báo lỗi MemoryError
+
+        Raises:
+            FileNotFoundError: Không mở được video
+            MemoryError: Video quá lớn để cache
+        """
+        self.path_video = path_video
+        self.target_size = target_size
+        self.loop = loop
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_mb * 1024 * 1024
+        self.index = 0
+        # Số thứ tự trong video của frame vừa đọc
+        self.frame_index = -1
+        # Frame đã được resize sẵn trong cache
+        self.resize_time = 0.0
+
+        data_path, meta_path = self.cache_paths()
+        if not (os.path.exists(meta_path) and os.path.exists(data_path)):
+            self.build_cache(data_path, meta_path)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.fps = meta["fps"]
+
+        with open(data_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mmap, "madvise"):
+            self._mmap.madvise(mmap.MADV_WILLNEED)
+        self.frames = np.frombuffer(self._mmap, dtype=np.uint8).reshape(
+            meta["frames"], meta["height"], meta["width"], 3)
+
+    def cache_paths(self):
+        """Đường dẫn file dữ liệu và file metadata của cache cho video này"""
+        stat = os.stat(self.path_video)
+        source = f"{os.path.abspath(self.path_video)}|{stat.st_size}|{stat.st_mtime_ns}|{self.target_size}"
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(self.path_video))[0]
+        prefix = os.path.join(self.cache_dir, f"{name}-{key}")
+        return prefix + ".u8", prefix + ".json"
+
+    def build_cache(self, data_path: str, meta_path: str):
+        """Giải mã toàn bộ video một lần và ghi frame thô ra file cache.
+
+        Ghi ra file tạm rồi đổi tên nên nhiều process cùng tạo cache một lúc cũng không đọc phải file dở
+        dang (process nào xong sau sẽ ghi đè bằng nội dung giống hệt). File metadata được đổi tên sau cùng
+        nên sự tồn tại của nó đánh dấu cache đã hoàn chỉnh.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cam = cv2.VideoCapture(self.path_video)
+        if not cam.isOpened():
+            raise FileNotFoundError(f"Không thể mở video: {self.path_video}")
+        fps = cam.get(cv2.CAP_PROP_FPS) or 30
+
+        suffix = f".{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        tmp_data, tmp_meta = data_path + suffix, meta_path + suffix
+        frames, written = 0, 0
+        try:
+            with open(tmp_data, "wb") as f:
+                while True:
+                    check, frame = cam.read()
+                    if not check:
+                        break
+                    frame = np.ascontiguousarray(cv2.resize(frame, self.target_size))
+                    written += frame.nbytes
+                    if written > self.max_cache_bytes:
+                        raise MemoryError(f"Video {self.path_video} vượt quá {self.max_cache_bytes // 2**20} MB cache")
+                    f.write(frame.data)
+                    frames += 1
+            if frames == 0:
+                raise FileNotFoundError(f"Video không có frame nào: {self.path_video}")
+
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({"frames": frames, "width": self.target_size[0], "height": self.target_size[1],
+                           "fps": fps, "source": os.path.abspath(self.path_video)}, f)
+            os.replace(tmp_data, data_path)
+            os.replace(tmp_meta, meta_path)
+        finally:
+            cam.release()
+            for path in (tmp_data, tmp_meta):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def isOpened(self) -> bool:
+        return self.frames is not None
+
+    def read(self):
+        """Đọc frame tiếp theo (view chỉ đọc, không copy), trả về (check, frame)"""
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return False, None
+            self.index = 0
+        frame = self.frames[self.index]
+        self.frame_index = self.index
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.frames = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Vẫn còn frame đang được tham chiếu, vùng nhớ sẽ được giải phóng khi các frame đó bị thu hồi
+            pass
+
+
+def open_frame_source(path_video: str, target_size=(600, 400), loop: bool = True,
+                      mode: str = settings_frame_source.MODE):
+    """Tạo nguồn frame theo cấu hình FRAME_SOURCE. Nếu không tạo được cache (video quá lớn, hết dung
+    lượng đĩa...) thì quay về giải mã trực tiếp.
+
+    Args:
+        path_video (str): Đường dẫn đến video
+        target_size (tuple): Kích thước (rộng, cao) của frame. Defaults to (600, 400).
+        loop (bool): Quay lại đầu video khi hết. Defaults to True.
+        mode (str): "decode" hoặc "mmap". Defaults to settings_frame_source.MODE.
+
+    Returns:
+        VideoFrameSource | MmapFrameSource: Đối tượng có các hàm isOpened, read, release và thuộc tính
+        frame_index (số thứ tự trong video của frame vừa đọc)
+    """
+    if mode == "mmap":
+        try:
+            return MmapFrameSource(path_video, target_size=target_size, loop=loop)
+        except (OSError, MemoryError, ValueError) as e:
+            print(f"Không thể dùng cache frame cho {path_video}, chuyển sang giải mã trực tiếp: {e}")
+    return VideoFrameSource(path_video, target_size=target_size, loop=loop)
@@ -0,0 +1,231 @@
+import time
+import threading
+from typing import Callable, Dict
+from core.config import settings_inference_scheduler
+from services.road_services.WorkerStatus import WorkerStatus
+
+
+def allocate_budget(demands: Dict[str, float], weights: Dict[str, float], budget: float) -> Dict[str, float]:
+    """Chia budget (số core) theo trọng số kiểu max-min fairness: tuyến đường cần ít hơn phần của mình thì
+    nhận đúng phần cần, phần dư được chia tiếp cho các tuyến đường còn lại theo trọng số
+
+    Args:
+        demands (Dict[str, float]): Số core mỗi tuyến đường cần để chạy ở fps tối đa
+        weights (Dict[str, float]): Trọng số (độ ưu tiên, số người xem)
+        budget (float): Tổng số core dành cho suy luận
+
+    Returns:
+        Dict[str, float]: Số core được cấp cho mỗi tuyến đường
+    """
+    allocation = {}
+    remaining = budget
+    pending = {name for name, demand in demands.items() if weights.get(name, 0) > 0}
+    while pending:
+        total_weight = sum(weights[name] for name in pending)
+        shares = {name: remaining * weights[name] / total_weight for name in pending}
+        satisfied = [name for name in pending if demands[name] <= shares[name]]
+        if not satisfied:
+            allocation.update(shares)
+            return allocation
+        for name in satisfied:
+            allocation[name] = demands[name]
+            remaining -= demands[name]
+            pending.discard(name)
+    return allocation
+
+
+class InferenceScheduler:
+    """Phân bổ CPU suy luận cho các process phân tích và giảm/khôi phục chất lượng theo SLO độ trễ.
+
+    Mỗi chu kỳ, với mỗi tuyến đường đang chạy:
+        - Trọng số = độ ưu tiên * (1 + VIEWER_WEIGHT * số người đang xem)
+        - Nhu cầu = số thread * latency của một frame * MAX_FPS (số core cần để chạy ở fps tối đa), không quá\\
+        số thread vì mỗi process chỉ xử lý một frame tại một thời điểm
+        - Chỉ các tuyến đường được ghim vào cùng nhóm core (xem utils.cpu_planner.plan_cpus) mới chia core cho
+        nhau: lấy core của tuyến đường ít ưu tiên không giúp tuyến đường được ghim ở nhóm core khác chạy nhanh
+        hơn. Mỗi nhóm có số core bằng số thread của process trong nhóm, các tuyến đường chưa được ghim dùng chung
+        budget (số core theo kế hoạch CPU)
+        - Số core của mỗi nhóm được chia theo allocate_budget, fps = số core được cấp / (số thread * latency)\\
+        (không nhỏ hơn MIN_FPS). Tuyến đường đủ budget thì không bị giới hạn fps
+        - Trễ SLO (latency > LATENCY_SLO hoặc fps thực tế thấp hẳn dưới MIN_FPS) DEGRADE_AFTER lần liên tiếp thì giảm
+        chất lượng một mức (tắt vẽ, giảm kích thước ảnh đưa vào model, xem LEVELS); còn dư RESTORE_AFTER lần
+        liên tiếp thì khôi phục một mức
+
+    Lệnh được ghi vào WorkerStatus (sched_fps, level), process con đọc ở mỗi vòng lặp.
+
+    Examples:
+        >>> scheduler = InferenceScheduler(statuses, get_budget=lambda: 4, get_workers=lambda: plan["workers"])
+        >>> scheduler.start()
+        >>> scheduler.viewer_joined("Văn Quán")
+        >>> scheduler.snapshot()
+    """
+    def __init__(self, statuses: Dict[str, WorkerStatus], get_budget: Callable[[], float],
+                 get_workers: Callable[[], Dict[str, dict]] = None,
+                 interval: float = settings_inference_scheduler.INTERVAL,
+                 latency_slo: float = settings_inference_scheduler.LATENCY_SLO,
+                 min_fps: float = settings_inference_scheduler.MIN_FPS,
+                 max_fps: float = settings_inference_scheduler.MAX_FPS,
+                 viewer_weight: float = settings_inference_scheduler.VIEWER_WEIGHT,
+                 degrade_after: int = settings_inference_scheduler.DEGRADE_AFTER,
+                 restore_after: int = settings_inference_scheduler.RESTORE_AFTER,
+                 restore_ratio: float = settings_inference_scheduler.RESTORE_RATIO,
+                 max_level: int = len(settings_inference_scheduler.LEVELS) - 1):
+        """
+        Args:
+            statuses (Dict[str, WorkerStatus]): Trạng thái dùng chung của từng tuyến đường
+            get_budget (Callable[[], float]): Trả về số core dành cho suy luận
+            get_workers (Callable[[], Dict[str, dict]], optional): Trả về các core được ghim và số thread của\
+            từng process (plan["workers"] của plan_cpus). None thì mọi tuyến đường dùng chung budget
+        """
+        self.statuses = statuses
+        self.get_budget = get_budget
+        self.get_workers = get_workers
+        self.interval = interval
+        self.latency_slo = latency_slo
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.viewer_weight = viewer_weight
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.restore_ratio = restore_ratio
+        self.max_level = max_level
+
+        self.priorities: Dict[str, float] = {}
+        self.viewers: Dict[str, int] = {}
+        self.levels: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.headroom: Dict[str, int] = {}
+        self.last: Dict[str, tuple] = {}
+        self.report: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def set_priority(self, name: str, priority: float):
+        with self._lock:
+            self.priorities[name] = max(0.0, float(priority))
+
+    def viewer_joined(self, name: str):
+        with self._lock:
+            # Bỏ qua tên không phải tuyến đường đang chạy để client không thêm được khoá tuỳ ý
+            if name in self.statuses:
+                self.viewers[name] = self.viewers.get(name, 0) + 1
+
+    def viewer_left(self, name: str):
+        with self._lock:
+            if name in self.viewers:
+                self.viewers[name] = max(0, self.viewers[name] - 1)
+
+    def weight(self, name: str) -> float:
+        return self.priorities.get(name, 1.0) * (1 + self.viewer_weight * self.viewers.get(name, 0))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Lỗi khi phân bổ suy luận cho các tuyến đường: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def tick(self, now: float = None):
+        """Một chu kỳ: đo fps/latency của từng tuyến đường, chia lại budget và cập nhật mức chất lượng"""
+        now = time.time() if now is None else now
+        with self._lock:
+            statuses = dict(self.statuses)
+            for data in (self.levels, self.misses, self.headroom, self.last, self.report):
+                for name in [name for name in data if name not in statuses]:
+                    data.pop(name)
+
+            measured = {}
+            for name, status in statuses.items():
+                snapshot = status.snapshot()
+                frames, at = self.last.get(name, (snapshot["frames"], now))
+                self.last[name] = (snapshot["frames"], now)
+                fps = (snapshot["frames"] - frames) / (now - at) if now > at and snapshot["frames"] >= frames else None
+                if snapshot["paused"] or snapshot["latency"] <= 0:
+                    continue
+                measured[name] = (snapshot["latency"], fps)
+
+            workers = (self.get_workers() if self.get_workers else None) or {}
+            threads = {name: max(1, workers.get(name, {}).get("threads", 1)) for name in measured}
+            demands = {name: threads[name] * min(1.0, latency * self.max_fps)
+                       for name, (latency, _) in measured.items()}
+            weights = {name: self.weight(name) for name in measured}
+            allocation = {}
+            for cpus, names in self.group_by_cpus(measured, workers).items():
+                if cpus is None:
+                    cores = float(self.get_budget() or 1)
+                else:
+                    cores = float(max(threads[name] for name in names))
+                allocation.update(allocate_budget({name: demands[name] for name in names},
+                                                  {name: weights[name] for name in names}, cores))
+
+            for name, (latency, fps) in measured.items():
+                if allocation.get(name, 0) >= demands[name] - 1e-9:
+                    target = 0.0
+                else:
+                    target = max(self.min_fps,
+                                 min(self.max_fps, allocation.get(name, 0) / (threads[name] * latency)))
+                level = self.update_level(name, latency, fps, target)
+                statuses[name].set_schedule(target, level)
+                self.report[name] = {
+                    "priority": self.priorities.get(name, 1.0),
+                    "viewers": self.viewers.get(name, 0),
+                    "weight": round(weights[name], 2),
+                    "cores": round(allocation.get(name, 0), 2),
+                    "threads": threads[name],
+                    "target_fps": round(target, 1),
+                    "fps": round(fps, 1) if fps is not None else None,
+                    "latency_ms": round(latency * 1000, 1),
+                    "level": level,
+                }
+
+    @staticmethod
+    def group_by_cpus(names, workers: Dict[str, dict]) -> Dict[tuple, list]:
+        """Nhóm các tuyến đường theo các core được ghim (plan_cpus chia các nhóm core riêng hoặc trùng hẳn
+        nhau), tuyến đường chưa được ghim nằm ở nhóm None"""
+        groups = {}
+        for name in names:
+            cpus = workers.get(name, {}).get("cpus")
+            groups.setdefault(tuple(sorted(cpus)) if cpus else None, []).append(name)
+        return groups
+
+    def update_level(self, name: str, latency: float, fps: float, target: float) -> int:
+        level = self.levels.get(name, 0)
+        # fps đo trong một chu kỳ ngắn nên có sai số, chỉ coi là trễ khi thấp hẳn dưới MIN_FPS
+        missed = latency > self.latency_slo or (fps is not None and fps < 0.8 * self.min_fps)
+        if missed:
+            self.headroom[name] = 0
+            self.misses[name] = self.misses.get(name, 0) + 1
+            if self.misses[name] >= self.degrade_after and level < self.max_level:
+                level += 1
+                self.misses[name] = 0
+                print(f"{name}: trễ SLO ({latency * 1000:.0f}ms/frame), giảm chất lượng xuống mức {level}")
+        else:
+            self.misses[name] = 0
+            fps_ok = fps is None or target == 0 or fps >= 0.9 * target
+            if latency < self.restore_ratio * self.latency_slo and fps_ok:
+                self.headroom[name] = self.headroom.get(name, 0) + 1
+                if self.headroom[name] >= self.restore_after and level > 0:
+                    level -= 1
+                    self.headroom[name] = 0
+                    print(f"{name}: đủ tài nguyên, khôi phục chất lượng lên mức {level}")
+            else:
+                self.headroom[name] = 0
+        self.levels[name] = level
+        return level
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "budget": self.get_budget(),
+                "latency_slo_ms": round(self.latency_slo * 1000),
+                "roads": {name: dict(report) for name, report in self.report.items()},
+            }
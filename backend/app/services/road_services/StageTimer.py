@@ -0,0 +1,133 @@
+import time
+from bisect import bisect_left
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
+from core.config import settings_pipeline_timing
+
+
+class StageTimer:
+    """Histogram thời gian của từng giai đoạn xử lý frame, đặt trong bộ nhớ dùng chung để process chính đọc
+    (giống WorkerStatus: không khoá, mỗi giai đoạn chỉ có một process ghi).
+
+    Các giai đoạn: decode (đọc/giải mã frame), resize, inference (model, kể cả thời gian chờ kết quả bất đồng bộ),
+    tracking (tracker và ước lượng vận tốc), post_processing, draw, publish (ghi frame/số liệu cho process chính)
+    do process con ghi, và encode (mã hoá JPEG khi client lấy frame) do process API ghi.
+
+    Mỗi giai đoạn có slots ô thời gian, mỗi ô dài window / slots giây và gồm các bucket tăng theo cấp số nhân
+    (min_ms, 1.5 * min_ms...) cùng tổng thời gian và số lần đo. Ô cũ được xoá khi được dùng lại nên số liệu luôn
+    là của khoảng window giây gần nhất. Ngoài ra mỗi giai đoạn có một hàng cộng dồn từ lúc tạo (không bao giờ
+    bị xoá) để xuất histogram dạng counter cho Prometheus. Mỗi lần add chỉ cộng vài số, chi phí cỡ micro giây.
+
+    Examples:
+        >>> timer = StageTimer()
+        >>> start = time.perf_counter()
+        >>> ...
+        >>> timer.add("inference", time.perf_counter() - start)   # trong process con
+        >>> timer.snapshot()                                       # trong process chính
+    """
+    STAGES = ("decode", "resize", "inference", "tracking", "post_processing", "draw", "publish", "encode")
+    GROWTH = 1.5
+
+    def __init__(self, window: float = settings_pipeline_timing.WINDOW, slots: int = settings_pipeline_timing.SLOTS,
+                 min_ms: float = settings_pipeline_timing.MIN_MS, buckets: int = settings_pipeline_timing.BUCKETS):
+        """
+        Args:
+            window (float): Độ dài (giây) của cửa sổ trượt
+            slots (int): Số ô thời gian của cửa sổ
+            min_ms (float): Cận trên (ms) của bucket nhỏ nhất
+            buckets (int): Số bucket, bucket cuối nhận mọi giá trị lớn hơn
+        """
+        self.window = window
+        self.slots = slots
+        self.slot_seconds = window / slots
+        self.buckets = buckets
+        # Cận trên (giây) của các bucket trừ bucket cuối
+        self.edges = [min_ms / 1000 * self.GROWTH ** i for i in range(buckets - 1)]
+        # Mỗi ô: buckets số đếm, tổng thời gian, số lần đo
+        self.row = buckets + 2
+        self.index = {stage: i for i, stage in enumerate(self.STAGES)}
+        self.values = RawArray('d', len(self.STAGES) * slots * self.row)
+        # Số thứ tự (thời gian / slot_seconds) của khoảng thời gian mà mỗi ô đang giữ
+        self.epochs = RawArray('d', len(self.STAGES) * slots)
+        # Hàng cộng dồn của mỗi giai đoạn (cùng cấu trúc một ô)
+        self.totals = RawArray('d', len(self.STAGES) * self.row)
+
+    def add(self, stage: str, seconds: float, now: float = None):
+        epoch = int((time.time() if now is None else now) / self.slot_seconds)
+        cell = self.index[stage] * self.slots + epoch % self.slots
+        base = cell * self.row
+        if self.epochs[cell] != epoch:
+            for i in range(base, base + self.row):
+                self.values[i] = 0.0
+            self.epochs[cell] = epoch
+        self.values[base + bisect_left(self.edges, seconds)] += 1
+        self.values[base + self.buckets] += seconds
+        self.values[base + self.buckets + 1] += 1
+        total = self.index[stage] * self.row
+        self.totals[total + bisect_left(self.edges, seconds)] += 1
+        self.totals[total + self.buckets] += seconds
+        self.totals[total + self.buckets + 1] += 1
+
+    def histograms(self, now: float = None) -> np.ndarray:
+        """(số giai đoạn, buckets + 2) tổng của các ô còn trong cửa sổ"""
+        epoch = int((time.time() if now is None else now) / self.slot_seconds)
+        values = np.frombuffer(self.values, dtype=np.float64).reshape(len(self.STAGES), self.slots, self.row)
+        epochs = np.frombuffer(self.epochs, dtype=np.float64).reshape(len(self.STAGES), self.slots)
+        current = (epoch - epochs < self.slots) & (epochs > 0)
+        return (values * current[:, :, None]).sum(axis=1)
+
+    def covered_seconds(self, now: float = None) -> np.ndarray:
+        """(số giai đoạn,) số giây thực sự có trong cửa sổ của mỗi giai đoạn: từ đầu ô cũ nhất còn trong cửa sổ
+        tới now. Ô hiện tại mới đầy một phần nên chia cho cả window sẽ làm số lần mỗi giây bị thấp đi và tụt
+        xuống ở mỗi lần sang ô mới. Tối thiểu 1 giây để lúc mới bắt đầu không bị chia cho số quá nhỏ"""
+        now = time.time() if now is None else now
+        epoch = int(now / self.slot_seconds)
+        epochs = np.frombuffer(self.epochs, dtype=np.float64).reshape(len(self.STAGES), self.slots)
+        current = (epoch - epochs < self.slots) & (epochs > 0)
+        oldest = np.where(current, epochs, epoch).min(axis=1)
+        return np.clip(now - oldest * self.slot_seconds, 1.0, self.window)
+
+    def cumulative(self) -> np.ndarray:
+        """(số giai đoạn, buckets + 2) số liệu cộng dồn từ lúc tạo (bản sao)"""
+        return np.frombuffer(self.totals, dtype=np.float64).reshape(len(self.STAGES), self.row).copy()
+
+    def percentile(self, counts: np.ndarray, q: float) -> float:
+        """Phân vị q (0-1) ước lượng từ histogram (nội suy tuyến tính trong bucket), đơn vị giây"""
+        total = counts.sum()
+        target = q * total
+        cumulative = np.cumsum(counts)
+        bucket = min(int(np.searchsorted(cumulative, target)), self.buckets - 1)
+        if bucket == self.buckets - 1:
+            return self.edges[-1]
+        low = self.edges[bucket - 1] if bucket > 0 else 0.0
+        before = cumulative[bucket - 1] if bucket > 0 else 0.0
+        fraction = (target - before) / counts[bucket] if counts[bucket] else 1.0
+        return low + (self.edges[bucket] - low) * fraction
+
+    def snapshot(self, now: float = None) -> dict:
+        """Thống kê của mỗi giai đoạn trong cửa sổ: số lần đo, số lần mỗi giây, thời gian trung bình và p50/p90/p99
+        (ms), tỉ lệ trong tổng thời gian đo được. bottleneck là giai đoạn chiếm nhiều thời gian nhất"""
+        now = time.time() if now is None else now
+        histograms = self.histograms(now)
+        covered = self.covered_seconds(now)
+        totals = histograms[:, self.buckets]
+        stages = {}
+        for stage, i in self.index.items():
+            count = histograms[i, self.buckets + 1]
+            if not count:
+                continue
+            counts = histograms[i, :self.buckets]
+            stages[stage] = {
+                "count": int(count),
+                "per_second": round(count / covered[i], 2),
+                "mean_ms": round(totals[i] / count * 1000, 3),
+                "p50_ms": round(self.percentile(counts, 0.5) * 1000, 3),
+                "p90_ms": round(self.percentile(counts, 0.9) * 1000, 3),
+                "p99_ms": round(self.percentile(counts, 0.99) * 1000, 3),
+                "share": round(totals[i] / totals.sum(), 3),
+            }
+        return {
+            "window": self.window,
+            "stages": stages,
+            "bottleneck": max(stages, key=lambda stage: stages[stage]["share"]) if stages else None,
+        }
@@ -0,0 +1,99 @@
+import os
+import queue
+import time
+from typing import List
+import numpy as np
+from core.config import settings_metric_transport, settings_load_test
+from utils.synthetic_video import synthetic_frame
+from utils.transport_utils import convert_frame_to_byte
+
+
+class StubScheduler:
+    """Thay cho InferenceScheduler khi không có process phân tích: chỉ đếm số người xem của mỗi tuyến đường"""
+    def __init__(self):
+        self.viewers = {}
+
+    def viewer_joined(self, name: str):
+        self.viewers[name] = self.viewers.get(name, 0) + 1
+
+    def viewer_left(self, name: str):
+        self.viewers[name] = max(0, self.viewers.get(name, 0) - 1)
+
+
+class StubAnalyzer:
+    """Thay cho AnalyzeOnRoadForMultiprocessing khi load test API: cùng giao diện names, get_info_road,
+    get_frame_road, get_frame_packet (và scheduler, metric_queue mà các endpoint dùng) nhưng không chạy model hay process con.
+
+    Frame của mỗi tuyến đường đổi frame_fps lần mỗi giây (lấy vòng trong các frame giả lập đã sinh sẵn), số
+    liệu đổi sau mỗi info_interval giây. Giống bản thật, frame được mã hoá JPEG ở mỗi lần get_frame_road nên
+    CPU đo được ở server gần với CPU của API khi chạy thật (trừ phần đọc Manager.dict của process con).
+
+    Examples:
+        >>> v1.state.analyzer = StubAnalyzer(frame_fps=30)   # trước khi server khởi động
+    """
+    def __init__(self, names: List[str] = None, frame_fps: float = settings_load_test.FRAME_FPS,
+                 info_interval: float = settings_load_test.INFO_INTERVAL,
+                 vehicles: tuple = settings_load_test.VEHICLES, frame_count: int = 30):
+        """
+        Args:
+            names (List[str], optional): Tên các tuyến đường, None là tên các video camera trong cấu hình
+            frame_fps (float): Số lần đổi frame mỗi giây
+            info_interval (float): Số giây giữa 2 lần đổi số liệu phương tiện
+            vehicles (tuple): (ô tô, xe máy) trong mỗi frame giả lập
+            frame_count (int): Số frame giả lập sinh sẵn (dùng vòng)
+        """
+        self.names = list(names) if names else \
+            [os.path.splitext(os.path.basename(path))[0] for path in settings_metric_transport.PATH_VIDEOS]
+        self.frame_fps = frame_fps
+        self.info_interval = info_interval
+        self.vehicles = vehicles
+        self.frames = [synthetic_frame(i, *vehicles) for i in range(frame_count)]
+        self.scheduler = StubScheduler()
+        self.metric_queue = queue.Queue()
+        self.started_at = time.time()
+
+    def frame_index(self, road_name: str) -> int:
+        # Mỗi tuyến đường lệch nhau vài frame để không trả về cùng một ảnh
+        return (self.frame_seq() + 7 * self.names.index(road_name)) % len(self.frames)
+
+    def frame_seq(self) -> int:
+        return int((time.time() - self.started_at) * self.frame_fps) + 1
+
+    def get_frame_packet(self, road_name: str):
+        if road_name not in self.names:
+            return b"", {}
+        seq = self.frame_seq()
+        # Frame giả lập được coi như được đọc và ghi cho process chính ngay khi tới lượt
+        captured_at = self.started_at + (seq - 1) / self.frame_fps
+        packet = {"seq": seq, "captured_at": captured_at, "published_at": captured_at}
+        return convert_frame_to_byte(self.frames[self.frame_index(road_name)]), packet
+
+    def get_frame_road(self, road_name: str):
+        return self.get_frame_packet(road_name)[0]
+
+    def get_info_road(self, road_name: str):
+        if road_name not in self.names:
+            return {}
+        window = int((time.time() - self.started_at) / self.info_interval)
+        rng = np.random.default_rng((self.names.index(road_name), window))
+        cars, motors = self.vehicles
+        captured_at = self.started_at + window * self.info_interval
+        return {
+            "count_car": int(rng.integers(0, 2 * cars + 1)),
+            "count_motor": int(rng.integers(0, 2 * motors + 1)),
+            "speed_car": int(rng.integers(10, 60)),
+            "speed_motor": int(rng.integers(10, 50)),
+            "seq": window + 1,
+            "captured_at": captured_at,
+            "published_at": captured_at,
+        }
+
+    def get_workers_health(self):
+        """Trạng thái cho /readyz và API admin: mọi tuyến đường giả lập luôn đang chạy"""
+        now = time.time()
+        frames = int((now - self.started_at) * self.frame_fps) + 1
+        return {name: {"state": "running", "pid": os.getpid(), "alive": True,
+                       "uptime": round(now - self.started_at, 1), "frames": frames} for name in self.names}
+
+    def cleanup_processes(self):
+        pass
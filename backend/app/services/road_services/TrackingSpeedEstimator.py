@@ -0,0 +1,105 @@
+import time
+import numpy as np
+import torch
+from ultralytics import solutions
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+
+def load_tracker_config(tracker: str) -> IterableSimpleNamespace:
+    """Đọc file cấu hình tracker (ví dụ 'bytetrack.yaml') giống cách ultralytics làm trong YOLO.track"""
+    try:
+        from ultralytics.utils import YAML
+        cfg = YAML.load(check_yaml(tracker))
+    except ImportError:
+        from ultralytics.utils import yaml_load
+        cfg = yaml_load(check_yaml(tracker))
+    return IterableSimpleNamespace(**cfg)
+
+
+class TrackingSpeedEstimator(solutions.SpeedEstimator):
+    """SpeedEstimator tách riêng 2 bước phát hiện (YOLO) và theo dõi (ByteTrack).
+
+    YOLO.track gộp 2 bước này nên không thể lấy kết quả phát hiện thô ra để lưu lại hay đưa kết quả đã
+    lưu vào tracker. Lớp này tự chạy model.predict rồi tự cập nhật tracker nên:
+        - last_detections luôn chứa kết quả phát hiện thô của frame vừa xử lý (để ghi DetectionLog)
+        - process(im0, detections=...) bỏ qua bước suy luận và dùng luôn kết quả phát hiện đã lưu
+
+    Kết quả phát hiện là mảng (N, 6) float32: x1, y1, x2, y2, conf, cls trên toạ độ của ảnh đầu vào.
+
+    Examples:
+        >>> speed_tool = TrackingSpeedEstimator(model=model_path, tracker='bytetrack.yaml', meter_per_pixel=0.06)
+        >>> speed_tool.process(frame)                              # suy luận + theo dõi
+        >>> speed_tool.process(frame, detections=cached)           # chỉ theo dõi
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.tracker_cfg = load_tracker_config(self.CFG["tracker"])
+        self.tracker = self.build_tracker()
+        self.predict_args = {k: v for k, v in self.track_add_args.items() if k != "tracker"}
+        self.last_detections = np.empty((0, 6), dtype=np.float32)
+        self._pending_detections = None
+        # Thời gian chạy model của frame vừa xử lý (giây), 0 khi dùng kết quả phát hiện có sẵn
+        self.detect_time = 0.0
+
+    def build_tracker(self):
+        tracker_cls = TRACKER_MAP[self.tracker_cfg.tracker_type]
+        try:
+            return tracker_cls(args=self.tracker_cfg, frame_rate=30)
+        except TypeError:
+            # Các bản ultralytics mới bỏ tham số frame_rate
+            return tracker_cls(args=self.tracker_cfg)
+
+    def reset_tracker(self):
+        """Xoá trạng thái tracker (ví dụ khi chuyển sang phát lại một video khác)"""
+        self.tracker = self.build_tracker()
+
+    def detect(self, im0: np.ndarray) -> np.ndarray:
+        """Chạy model phát hiện trên một ảnh
+
+        Returns:
+            np.ndarray: (N, 6) x1, y1, x2, y2, conf, cls
+        """
+        result = self.model.predict(source=im0, classes=self.classes, verbose=False, **self.predict_args)[0]
+        return result.boxes.data.cpu().numpy().astype(np.float32)
+
+    def process(self, im0, detections: np.ndarray = None):
+        """Xử lý một frame, nếu có detections thì không chạy model
+
+        Args:
+            im0 (np.ndarray): Ảnh đầu vào (chỉ dùng để vẽ khi đã có detections)
+            detections (np.ndarray, optional): Kết quả phát hiện đã lưu (N, 6). Defaults to None.
+        """
+        self._pending_detections = detections
+        try:
+            return super().process(im0)
+        finally:
+            self._pending_detections = None
+
+    def extract_tracks(self, im0):
+        if self._pending_detections is not None:
+            detections = self._pending_detections
+            self.detect_time = 0.0
+        else:
+            start = time.perf_counter()
+            with self.profilers[0]:
+                detections = self.detect(im0)
+            self.detect_time = time.perf_counter() - start
+        self.last_detections = detections
+
+        orig_shape = im0.shape[:2]
+        tracks = self.tracker.update(Boxes(detections, orig_shape), im0)
+        # Cột cuối là vị trí của detection tương ứng, bỏ đi giống ultralytics để còn (x1, y1, x2, y2, id, conf, cls)
+        tracks = tracks[:, :-1] if len(tracks) else np.empty((0, 7), dtype=np.float32)
+        self.tracks = None
+        self.track_data = Boxes(torch.as_tensor(tracks, dtype=torch.float32), orig_shape)
+
+        self.boxes = self.track_data.xyxy
+        self.clss = self.track_data.cls.tolist()
+        self.track_ids = self.track_data.id.int().tolist()
+        self.confs = self.track_data.conf.tolist()
+
+        if hasattr(self, "forget_tracks"):
+            self.forget_tracks([t.track_id for t in getattr(self.tracker, "removed_stracks_frame", [])])
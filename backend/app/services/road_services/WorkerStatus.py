@@ -0,0 +1,110 @@
+import time
+from multiprocessing.sharedctypes import RawArray
+
+
+class WorkerStatus:
+    """Trạng thái của một process phân tích đặt trong bộ nhớ dùng chung để process chính đọc mà không cần
+    đi qua Manager (mỗi frame chỉ ghi vài số double, không khoá vì mỗi trường chỉ có một process ghi).
+
+    Các trường (đơn vị giây theo time.time()):
+        - heartbeat: lần cuối vòng lặp đọc frame còn chạy (kể cả khi xử lý frame bị lỗi)
+        - last_frame: lần cuối một frame được xử lý thành công
+        - frames: tổng số frame đã xử lý thành công từ lúc process khởi động
+        - started_at: thời điểm process được khởi động (do supervisor ghi)
+        - paused, max_fps: lệnh điều khiển do process chính ghi, process con đọc ở mỗi vòng lặp\
+        (tạm dừng xử lý, giới hạn số frame/giây, 0 là không giới hạn)
+        - latency: thời gian xử lý một frame (trung bình trượt, giây) do process con ghi
+        - sched_fps, level: giới hạn fps và mức giảm chất lượng do InferenceScheduler ghi
+        - cascade: lệnh bật cascade model N -> model S do process chính ghi
+        - secondary_frames: số frame đã chạy model S của cascade do process con ghi
+        - imgsz: kích thước ảnh đưa vào model của frame gần nhất do process con ghi
+        - dropped_frames: số frame đã đọc nhưng xử lý bị lỗi (bị bỏ) từ lúc process khởi động
+
+    Examples:
+        >>> status = WorkerStatus()
+        >>> status.beat()          # trong process con, mỗi vòng lặp
+        >>> status.frame_done()    # trong process con, sau mỗi frame xử lý xong
+        >>> status.snapshot()      # trong process chính
+    """
+    FIELDS = ("heartbeat", "last_frame", "frames", "started_at", "paused", "max_fps", "latency", "sched_fps",
+              "level", "cascade", "secondary_frames", "imgsz", "dropped_frames")
+    (HEARTBEAT, LAST_FRAME, FRAMES, STARTED_AT, PAUSED, MAX_FPS, LATENCY, SCHED_FPS, LEVEL, CASCADE,
+     SECONDARY_FRAMES, IMGSZ, DROPPED_FRAMES) = range(len(FIELDS))
+    # Trọng số của frame mới nhất trong trung bình trượt của latency
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self):
+        self.values = RawArray('d', len(self.FIELDS))
+
+    def reset(self):
+        """Gọi bởi supervisor ngay trước khi khởi động (lại) process, giữ nguyên các lệnh điều khiển"""
+        now = time.time()
+        self.values[self.HEARTBEAT] = 0.0
+        self.values[self.LAST_FRAME] = 0.0
+        self.values[self.FRAMES] = 0.0
+        self.values[self.STARTED_AT] = now
+        self.values[self.LATENCY] = 0.0
+        self.values[self.SECONDARY_FRAMES] = 0.0
+        self.values[self.DROPPED_FRAMES] = 0.0
+
+    def beat(self):
+        self.values[self.HEARTBEAT] = time.time()
+
+    def frame_done(self, latency: float = None, imgsz: int = None):
+        now = time.time()
+        if imgsz is not None:
+            self.values[self.IMGSZ] = imgsz
+        self.values[self.HEARTBEAT] = now
+        self.values[self.LAST_FRAME] = now
+        self.values[self.FRAMES] += 1
+        if latency is not None:
+            old = self.values[self.LATENCY]
+            self.values[self.LATENCY] = latency if old == 0 else old + self.LATENCY_ALPHA * (latency - old)
+
+    def frame_dropped(self):
+        self.values[self.DROPPED_FRAMES] += 1
+
+    @property
+    def paused(self) -> bool:
+        return bool(self.values[self.PAUSED])
+
+    @property
+    def max_fps(self) -> float:
+        return self.values[self.MAX_FPS]
+
+    @property
+    def level(self) -> int:
+        return int(self.values[self.LEVEL])
+
+    @property
+    def cascade(self) -> bool:
+        return bool(self.values[self.CASCADE])
+
+    def secondary_done(self):
+        self.values[self.SECONDARY_FRAMES] += 1
+
+    @property
+    def effective_max_fps(self) -> float:
+        """Giới hạn fps thực tế: giới hạn nhỏ hơn giữa lệnh của admin (max_fps) và của scheduler, 0 là không giới hạn"""
+        limits = [fps for fps in (self.values[self.MAX_FPS], self.values[self.SCHED_FPS]) if fps > 0]
+        return min(limits) if limits else 0.0
+
+    def set_schedule(self, fps: float, level: int):
+        """Gọi bởi InferenceScheduler ở process chính"""
+        self.values[self.SCHED_FPS] = max(0.0, float(fps))
+        self.values[self.LEVEL] = float(level)
+
+    def set_control(self, paused: bool = None, max_fps: float = None, cascade: bool = None):
+        """Gọi bởi process chính để tạm dừng/tiếp tục, đổi giới hạn fps hoặc bật/tắt cascade của process con"""
+        if cascade is not None:
+            self.values[self.CASCADE] = 1.0 if cascade else 0.0
+        if max_fps is not None:
+            self.values[self.MAX_FPS] = max(0.0, float(max_fps))
+        if paused is not None:
+            if self.paused and not paused:
+                # Tính thời gian treo từ lúc tiếp tục chứ không phải từ frame cuối trước khi tạm dừng
+                self.values[self.LAST_FRAME] = time.time()
+            self.values[self.PAUSED] = 1.0 if paused else 0.0
+
+    def snapshot(self) -> dict:
+        return {name: self.values[i] for i, name in enumerate(self.FIELDS)}
@@ -0,0 +1,213 @@
+import time
+import threading
+from typing import Callable, Dict
+from multiprocessing import Process
+from core.config import settings_worker_supervisor
+from services.road_services.WorkerStatus import WorkerStatus
+
+
+class WorkerSupervisor:
+    """Giám sát các process phân tích, khởi động lại process bị chết hoặc bị treo với thời gian chờ tăng
+    dần theo cấp số nhân (tránh khởi động lại liên tục khi lỗi lặp lại, ví dụ mất file video).
+
+    Một process bị coi là treo khi quá STALL_TIMEOUT giây không xử lý xong frame nào (ví dụ bộ giải mã bị
+    treo hoặc frame nào cũng lỗi), hoặc quá STARTUP_TIMEOUT giây kể từ khi khởi động mà chưa có frame đầu.
+
+    Examples:
+        >>> supervisor = WorkerSupervisor(start_worker, statuses)
+        >>> supervisor.start(names)        # khởi động các process và luồng giám sát
+        >>> supervisor.health()            # trạng thái từng tuyến đường
+        >>> supervisor.stop()
+    """
+    def __init__(self, start_worker: Callable[[str], Process], statuses: Dict[str, WorkerStatus],
+                 check_interval: float = settings_worker_supervisor.CHECK_INTERVAL,
+                 stall_timeout: float = settings_worker_supervisor.STALL_TIMEOUT,
+                 startup_timeout: float = settings_worker_supervisor.STARTUP_TIMEOUT,
+                 backoff_base: float = settings_worker_supervisor.BACKOFF_BASE,
+                 backoff_max: float = settings_worker_supervisor.BACKOFF_MAX,
+                 healthy_reset: float = settings_worker_supervisor.HEALTHY_RESET):
+        """
+        Args:
+            start_worker (Callable[[str], Process]): Hàm tạo và start process cho một tuyến đường
+            statuses (Dict[str, WorkerStatus]): Trạng thái dùng chung của từng tuyến đường
+            check_interval (float): Số giây giữa 2 lần kiểm tra
+            stall_timeout (float): Số giây không có frame mới thì coi là treo
+            startup_timeout (float): Số giây tối đa để có frame đầu tiên sau khi khởi động
+            backoff_base (float): Thời gian chờ trước lần khởi động lại đầu tiên
+            backoff_max (float): Thời gian chờ tối đa
+            healthy_reset (float): Chạy ổn định chừng này giây thì thời gian chờ được đặt lại
+        """
+        self.start_worker = start_worker
+        self.statuses = statuses
+        self.check_interval = check_interval
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.healthy_reset = healthy_reset
+
+        self.processes: Dict[str, Process] = {}
+        self.restarts: Dict[str, int] = {}
+        self.backoff: Dict[str, float] = {}
+        self.restart_at: Dict[str, float] = {}
+        self.last_failure: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def launch(self, name: str):
+        """Khởi động (lại) process của một tuyến đường. Process được start ngoài khoá: với forkserver
+        Process.start() phải chờ nạp sẵn model xong (có thể vài chục giây), trong lúc đó health() vẫn phải
+        trả lời được"""
+        self.statuses[name].reset()
+        process = self.start_worker(name)
+        with self._lock:
+            removed = name not in self.restarts
+            if not removed:
+                self.processes[name] = process
+                self.restart_at.pop(name, None)
+        if removed:
+            # Tuyến đường bị xoá trong lúc đang khởi động process
+            self.terminate(process)
+
+    def start(self, names, supervise: bool = True):
+        """Khởi động các process và (nếu supervise) luồng giám sát"""
+        for name in names:
+            self.restarts.setdefault(name, 0)
+            self.backoff.setdefault(name, self.backoff_base)
+            self.launch(name)
+        if supervise and self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="worker-supervisor", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"Lỗi khi giám sát các process phân tích: {e}")
+
+    def check_once(self, now: float = None):
+        """Một lần kiểm tra toàn bộ các process: phát hiện process chết/treo và khởi động lại khi đến hạn"""
+        now = time.time() if now is None else now
+        due, failed = [], []
+        with self._lock:
+            for name, process in list(self.processes.items()):
+                if self._stop_event.is_set():
+                    return
+                if name in self.restart_at:
+                    if now >= self.restart_at[name]:
+                        self.restarts[name] += 1
+                        due.append(name)
+                    continue
+
+                if self.statuses[name].paused and process.is_alive():
+                    continue
+
+                reason = self.failure_reason(name, process, now)
+                if reason is None:
+                    status = self.statuses[name].snapshot()
+                    if status["last_frame"] and now - status["started_at"] >= self.healthy_reset:
+                        self.backoff[name] = self.backoff_base
+                    continue
+
+                print(f"Process {name} (pid {process.pid}) {reason}, khởi động lại sau {self.backoff[name]:.0f}s")
+                self.last_failure[name] = reason
+                failed.append(process)
+                self.restart_at[name] = now + self.backoff[name]
+                self.backoff[name] = min(self.backoff[name] * 2, self.backoff_max)
+
+        # terminate chờ process thoát tới vài giây nên làm ngoài khoá để health() không bị chặn
+        for process in failed:
+            self.terminate(process)
+        # Khởi động lại ngoài khoá (xem launch), trạng thái vẫn là "restarting" cho đến khi process mới được start
+        for name in due:
+            if self._stop_event.is_set():
+                return
+            print(f"Khởi động lại process {name} (lần {self.restarts[name]})")
+            self.launch(name)
+
+    def failure_reason(self, name: str, process: Process, now: float):
+        """Trả về lý do process cần được khởi động lại hoặc None nếu process vẫn bình thường"""
+        if not process.is_alive():
+            return f"đã dừng (exit code {process.exitcode})"
+        status = self.statuses[name].snapshot()
+        if status["last_frame"]:
+            if now - status["last_frame"] > self.get_stall_timeout(status):
+                return f"bị treo ({now - status['last_frame']:.0f}s không có frame mới)"
+        elif now - status["started_at"] > self.startup_timeout:
+            return f"không xử lý được frame nào sau {now - status['started_at']:.0f}s"
+        return None
+
+    def get_stall_timeout(self, status: dict) -> float:
+        """Khi bị giới hạn fps thấp thì khoảng cách giữa 2 frame dài hơn nên ngưỡng treo cũng phải dài hơn"""
+        if status["max_fps"] > 0:
+            return max(self.stall_timeout, 3 / status["max_fps"])
+        return self.stall_timeout
+
+    def remove(self, name: str):
+        """Dừng hẳn process của một tuyến đường và bỏ khỏi danh sách giám sát"""
+        with self._lock:
+            process = self.processes.pop(name, None)
+            for data in (self.restarts, self.backoff, self.restart_at, self.last_failure):
+                data.pop(name, None)
+        if process is not None:
+            self.terminate(process)
+
+    @staticmethod
+    def terminate(process: Process, timeout: float = 5):
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.kill()
+                process.join(timeout=1)
+
+    def health(self, now: float = None) -> Dict[str, dict]:
+        """Trạng thái từng tuyến đường cho API admin"""
+        now = time.time() if now is None else now
+        result = {}
+        with self._lock:
+            for name, process in self.processes.items():
+                status = self.statuses[name].snapshot()
+                if name in self.restart_at:
+                    state = "restarting"
+                elif not process.is_alive():
+                    state = "dead"
+                elif status["paused"]:
+                    state = "paused"
+                elif not status["last_frame"]:
+                    state = "starting"
+                elif now - status["last_frame"] > self.get_stall_timeout(status):
+                    state = "stalled"
+                else:
+                    state = "running"
+                result[name] = {
+                    "state": state,
+                    "pid": process.pid,
+                    "alive": process.is_alive(),
+                    "uptime": round(now - status["started_at"], 1),
+                    "heartbeat_age": round(now - status["heartbeat"], 1) if status["heartbeat"] else None,
+                    "last_frame_age": round(now - status["last_frame"], 1) if status["last_frame"] else None,
+                    "frames": int(status["frames"]),
+                    "max_fps": status["max_fps"],
+                    "cascade": bool(status["cascade"]),
+                    "secondary_frames": int(status["secondary_frames"]),
+                    "imgsz": int(status["imgsz"]) or None,
+                    "dropped_frames": int(status["dropped_frames"]),
+                    "restarts": self.restarts.get(name, 0),
+                    "last_failure": self.last_failure.get(name),
+                    "next_restart_in": round(max(0.0, self.restart_at[name] - now), 1)
+                    if name in self.restart_at else None,
+                }
+        return result
+
+    def stop(self):
+        """Dừng luồng giám sát và tất cả process"""
+        self._stop_event.set()
+        with self._lock:
+            processes = list(self.processes.values())
+        for process in processes:
+            if process.is_alive():
+                print(f"Đang terminate process {process.pid}...")
+            self.terminate(process)
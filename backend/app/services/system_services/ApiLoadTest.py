@@ -0,0 +1,209 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from core.config import settings_load_test
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def summarize(latencies: List[float], duration: float, errors: int = 0) -> dict:
+    """Thống kê một loại client
+
+    Args:
+        latencies (List[float]): Thời gian (giây) của từng request hoặc giữa 2 message websocket liên tiếp
+        duration (float): Thời gian đo (giây)
+        errors (int): Số request/kết nối lỗi
+
+    Returns:
+        dict: count, throughput (request hoặc message mỗi giây), latency_ms (p50, p90, p99, max), errors
+    """
+    result = {"count": len(latencies), "throughput": round(len(latencies) / duration, 1) if duration else 0.0,
+              "errors": errors}
+    if latencies:
+        values = np.array(latencies) * 1000
+        result["latency_ms"] = {"p50": round(float(np.percentile(values, 50)), 2),
+                                "p90": round(float(np.percentile(values, 90)), 2),
+                                "p99": round(float(np.percentile(values, 99)), 2),
+                                "max": round(float(values.max()), 2)}
+    return result
+
+
+class ApiLoadTest:
+    """Tạo tải lên API bằng nhiều client đồng thời (asyncio) để ước lượng số người xem dashboard một node API
+    chịu được. Các loại client:
+        - ws_frames, ws_info: giữ kết nối /api/v1/ws/frames|info/{road} (xác thực JWT qua ?token=), đo khoảng
+          cách giữa 2 message liên tiếp và thời gian kết nối
+        - frames, info: gọi liên tục GET /api/v1/frames/{road} (Bearer token) và /api/v1/info/{road}, đo latency
+
+    Tài khoản load test được đăng ký (nếu chưa có) rồi đăng nhập để lấy token. Khi biết pid của server, CPU và
+    RSS của server (gồm process con) được lấy mẫu mỗi giây trong lúc đo.
+
+    Examples:
+        >>> report = ApiLoadTest("http://localhost:8010", {"ws_frames": 50, "info": 10}, duration=30,
+        >>>                      server_pid=pid).run()
+        >>> print(ApiLoadTest.to_markdown(report))
+    """
+    KINDS = ("ws_frames", "ws_info", "frames", "info")
+    EMAIL = "loadtest@example.com"
+    PASSWORD = "loadtest-password"
+
+    def __init__(self, base_url: str, clients: Dict[str, int] = settings_load_test.CLIENTS,
+                 duration: float = settings_load_test.DURATION, server_pid: Optional[int] = None):
+        """
+        Args:
+            base_url (str): Địa chỉ server, vd "http://localhost:8010"
+            clients (Dict[str, int]): Số client đồng thời của mỗi loại trong KINDS
+            duration (float): Thời gian đo (giây)
+            server_pid (int, optional): pid của server để đo CPU/RSS, None là không đo
+        """
+        self.base_url = base_url.rstrip("/")
+        self.clients = {kind: int(clients.get(kind, 0)) for kind in self.KINDS}
+        self.duration = duration
+        self.server_pid = server_pid
+        self.latencies = {kind: [] for kind in self.KINDS}
+        self.connect_latencies = {kind: [] for kind in self.KINDS}
+        self.errors = {kind: 0 for kind in self.KINDS}
+        self.server_samples = []
+
+    async def login(self, http) -> str:
+        await http.post("/api/v1/auth/register", json={"username": "loadtest", "email": self.EMAIL,
+                                                        "phone_number": "0000000000", "password": self.PASSWORD})
+        response = await http.post("/api/v1/auth/login", data={"username": self.EMAIL, "password": self.PASSWORD})
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    async def http_client(self, http, kind: str, road: str, token: str, deadline: float):
+        path = f"/api/v1/{kind}/{road}"
+        headers = {"Authorization": f"Bearer {token}"} if kind == "frames" else None
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await http.get(path, headers=headers)
+                if response.status_code != 200:
+                    raise RuntimeError(response.status_code)
+                self.latencies[kind].append(time.perf_counter() - start)
+            except Exception:
+                self.errors[kind] += 1
+                await asyncio.sleep(0.1)
+
+    async def ws_client(self, kind: str, road: str, token: str, deadline: float):
+        import websockets
+        from urllib.parse import quote
+
+        url = f"{self.base_url.replace('http', 'ws', 1)}/api/v1/ws/{kind[3:]}/{quote(road)}?token={token}"
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(url, max_size=None) as websocket:
+                await websocket.recv()
+                self.connect_latencies[kind].append(time.perf_counter() - start)
+                previous = time.perf_counter()
+                while previous < deadline:
+                    await asyncio.wait_for(websocket.recv(), timeout=max(0.1, deadline - previous + 5))
+                    now = time.perf_counter()
+                    self.latencies[kind].append(now - previous)
+                    previous = now
+        except Exception:
+            self.errors[kind] += 1
+
+    async def sample_server(self, deadline: float):
+        """Lấy mẫu CPU (% của một nhân) và RSS (MB) của server và các process con mỗi giây"""
+        if psutil is None or self.server_pid is None:
+            return
+        try:
+            server = psutil.Process(self.server_pid)
+            processes = {}
+            while time.perf_counter() < deadline:
+                cpu, rss = 0.0, 0
+                for process in [server] + server.children(recursive=True):
+                    # Lần đầu cpu_percent của một process luôn là 0 nên giữ lại đối tượng Process
+                    process = processes.setdefault(process.pid, process)
+                    try:
+                        cpu += process.cpu_percent(interval=None)
+                        rss += process.memory_info().rss
+                    except psutil.NoSuchProcess:
+                        pass
+                self.server_samples.append((cpu, rss / 1024 ** 2))
+                await asyncio.sleep(1)
+        except psutil.NoSuchProcess:
+            pass
+
+    async def run_async(self) -> dict:
+        import httpx
+
+        total_http = self.clients["frames"] + self.clients["info"]
+        limits = httpx.Limits(max_connections=max(1, total_http), max_keepalive_connections=max(1, total_http))
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30) as http:
+            token = await self.login(http)
+            roads = (await http.get("/api/v1/roads_name")).json()["road_names"]
+            client_process = psutil.Process() if psutil is not None else None
+            if client_process is not None:
+                client_process.cpu_percent(interval=None)
+            deadline = time.perf_counter() + self.duration
+            tasks = [self.sample_server(deadline)]
+            for kind, count in self.clients.items():
+                for i in range(count):
+                    road = roads[i % len(roads)]
+                    if kind.startswith("ws_"):
+                        tasks.append(self.ws_client(kind, road, token, deadline))
+                    else:
+                        tasks.append(self.http_client(http, kind, road, token, deadline))
+            started = time.perf_counter()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+
+        results = {}
+        for kind, count in self.clients.items():
+            if not count:
+                continue
+            results[kind] = summarize(self.latencies[kind], elapsed, self.errors[kind])
+            results[kind]["clients"] = count
+            if self.connect_latencies[kind]:
+                results[kind]["connect_ms_p50"] = round(float(np.median(self.connect_latencies[kind])) * 1000, 2)
+        server = None
+        if self.server_samples:
+            cpu = [sample[0] for sample in self.server_samples]
+            server = {"cpu_percent_mean": round(float(np.mean(cpu)), 1), "cpu_percent_max": round(max(cpu), 1),
+                      "rss_mb_max": round(max(sample[1] for sample in self.server_samples), 1)}
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "url": self.base_url,
+            "duration": round(elapsed, 1),
+            "roads": len(roads),
+            "results": results,
+            "server": server,
+            # Khi client chiếm gần hết một nhân, kết quả bị giới hạn bởi client chứ không phải server
+            "client_cpu_percent": round(client_process.cpu_percent(interval=None), 1) if client_process else None,
+        }
+
+    def run(self) -> dict:
+        return asyncio.run(self.run_async())
+
+    @staticmethod
+    def to_markdown(report: dict) -> str:
+        lines = [
+            f"# Load test API {report['created_at']}",
+            "",
+            f"- Server: `{report['url']}` ({report['roads']} tuyến đường, đo {report['duration']} giây)",
+        ]
+        if report["server"]:
+            server = report["server"]
+            lines.append(f"- CPU server: trung bình {server['cpu_percent_mean']}%, đỉnh {server['cpu_percent_max']}%; "
+                         f"RSS đỉnh {server['rss_mb_max']} MB")
+        if report["client_cpu_percent"] is not None:
+            lines.append(f"- CPU client: {report['client_cpu_percent']}%")
+        lines += [
+            "",
+            "| Client | Số client | Số lượng | Mỗi giây | p50 (ms) | p90 (ms) | p99 (ms) | max (ms) | Lỗi |",
+            "|---|---|---|---|---|---|---|---|---|",
+        ]
+        for kind, result in report["results"].items():
+            latency = result.get("latency_ms", {})
+            lines.append(f"| {kind} | {result['clients']} | {result['count']} | {result['throughput']} | "
+                         f"{latency.get('p50', '-')} | {latency.get('p90', '-')} | {latency.get('p99', '-')} | "
+                         f"{latency.get('max', '-')} | {result['errors']} |")
+        return "\n".join(lines) + "\n"
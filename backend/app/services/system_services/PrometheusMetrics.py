@@ -0,0 +1,245 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+from core.config import settings_prometheus
+
+
+def format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    """Histogram trong một process, không khoá: mỗi lần observe chỉ cộng vài số (dưới GIL). Khi nhiều thread
+    cùng ghi thì hiếm khi mất một lần đếm, chấp nhận được với số liệu giám sát.
+
+    Examples:
+        >>> histogram = Histogram((0.001, 0.01, 0.1))
+        >>> histogram.observe(0.004)
+    """
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Args:
+            buckets (Sequence[float]): Cận trên của các bucket (không gồm +Inf)
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class PrometheusMetrics:
+    """Số liệu cho endpoint /metrics theo định dạng text của Prometheus (version 0.0.4).
+
+    Có 2 nguồn số liệu:
+        - Đo trong process API (số client WebSocket, số byte đã gửi, độ trễ từ lúc đọc frame tới client, thời gian
+          trả lời của chatbot...): ghi bằng inc, add_gauge, observe/time, record_delivery vào các dict thường,
+          không khoá
+        - Của các process phân tích: chỉ đọc khi Prometheus scrape (render) từ bộ nhớ dùng chung đã có sẵn
+          (WorkerStatus, StageTimer, bộ đếm snapshot bị bỏ) và từ supervisor, pool kết nối DB. Vòng xử lý frame
+          không phải làm thêm gì
+
+    Examples:
+        >>> metrics = PrometheusMetrics()
+        >>> metrics.inc("traffic_bytes_sent_total", 1024, endpoint="ws_frames")
+        >>> with metrics.time("traffic_chat_seconds", endpoint="chat"):
+        >>>     ...
+        >>> text = metrics.render(analyzer, engine)
+    """
+    # Tên -> (loại, mô tả) theo thứ tự xuất ra
+    METRICS = {
+        "traffic_worker_up": ("gauge", "1 nếu process phân tích của tuyến đường đang xử lý frame"),
+        "traffic_road_fps": ("gauge", "Số frame xử lý mỗi giây (trung bình trong cửa sổ của StageTimer)"),
+        "traffic_road_frames_total": ("counter", "Số frame đã xử lý từ lúc process phân tích khởi động"),
+        "traffic_road_dropped_frames_total": ("counter", "Số frame bị bỏ do xử lý lỗi từ lúc process khởi động"),
+        "traffic_worker_restarts_total": ("counter", "Số lần supervisor khởi động lại process phân tích"),
+        "traffic_road_last_frame_age_seconds": ("gauge", "Số giây từ lúc xử lý xong frame gần nhất của tuyến đường"),
+        "traffic_inference_seconds": ("histogram", "Thời gian suy luận của một frame"),
+        "traffic_stage_seconds": ("summary", "Thời gian từng giai đoạn xử lý frame"),
+        "traffic_metric_snapshots_dropped_total": ("counter", "Số snapshot số liệu bị bỏ khi hàng đợi ghi DB đầy"),
+        "traffic_ipc_read_seconds": ("histogram", "Thời gian đọc frame/số liệu của process phân tích qua Manager"),
+        "traffic_websocket_subscribers": ("gauge", "Số client WebSocket đang kết nối"),
+        "traffic_bytes_sent_total": ("counter", "Số byte frame/số liệu đã gửi cho client"),
+        "traffic_capture_to_publish_seconds": ("histogram", "Từ lúc đọc frame tới lúc ghi cho process chính"),
+        "traffic_capture_to_send_seconds": ("histogram", "Từ lúc đọc frame tới lúc gửi cho client"),
+        "traffic_skipped_seq_total": ("counter", "Số frame/snapshot số liệu client bỏ lỡ (seq bị nhảy giữa 2 lần gửi)"),
+        "traffic_db_pool_size": ("gauge", "Số kết nối tối đa của pool DB (không tính overflow)"),
+        "traffic_db_pool_connections": ("gauge", "Số kết nối của pool DB theo trạng thái"),
+        "traffic_chat_seconds": ("histogram", "Thời gian trả lời của chatbot (gồm gọi LLM)"),
+    }
+    BUCKETS = {
+        "traffic_ipc_read_seconds": settings_prometheus.IPC_BUCKETS,
+        "traffic_chat_seconds": settings_prometheus.CHAT_BUCKETS,
+        "traffic_capture_to_publish_seconds": settings_prometheus.FRESHNESS_BUCKETS,
+        "traffic_capture_to_send_seconds": settings_prometheus.FRESHNESS_BUCKETS,
+    }
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.gauges: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        # seq gần nhất đã tính độ trễ capture -> publish của mỗi (endpoint, tuyến đường)
+        self.published_seq: Dict[Tuple[str, str], int] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(labels.items()))
+        self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def add_gauge(self, name: str, value: float, **labels):
+        key = (name, tuple(labels.items()))
+        self.gauges[key] = self.gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(key, Histogram(self.BUCKETS[name]))
+        histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Đo thời gian của khối lệnh vào histogram name (kể cả khi khối lệnh bị lỗi)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_delivery(self, endpoint: str, road: str, packet: dict, last_seq: Optional[int] = None) -> Optional[int]:
+        """Ghi độ trễ của frame/snapshot số liệu vừa gửi cho client: capture -> publish (mỗi seq một lần),
+        capture -> send (mỗi lần gửi) và số seq bị nhảy so với lần gửi trước cho cùng client
+
+        Args:
+            endpoint (str): Loại endpoint, vd "ws_frames"
+            road (str): Tên tuyến đường
+            packet (dict): seq, captured_at, published_at của frame/số liệu (xem get_frame_packet)
+            last_seq (int, optional): seq của lần gửi trước cho client này, None là không đếm seq bị bỏ lỡ
+
+        Returns:
+            Optional[int]: seq vừa gửi, truyền lại ở lần gửi sau
+        """
+        seq, captured_at = packet.get("seq"), packet.get("captured_at")
+        if not seq or not captured_at:
+            return last_seq
+        if self.published_seq.get((endpoint, road)) != seq:
+            self.published_seq[(endpoint, road)] = seq
+            if packet.get("published_at"):
+                self.observe("traffic_capture_to_publish_seconds", packet["published_at"] - captured_at,
+                             endpoint=endpoint, road=road)
+        self.observe("traffic_capture_to_send_seconds", time.time() - captured_at, endpoint=endpoint, road=road)
+        # seq nhỏ hơn lần trước là process phân tích vừa khởi động lại
+        if last_seq is not None and seq > last_seq + 1:
+            self.inc("traffic_skipped_seq_total", seq - last_seq - 1, endpoint=endpoint, road=road)
+        return seq
+
+    @staticmethod
+    def add_histogram(samples: list, labels: dict, edges: Sequence[float], counts: Sequence[float], total: float):
+        """Thêm các dòng _bucket (cộng dồn, bucket cuối là +Inf), _sum, _count của một histogram"""
+        cumulative = 0.0
+        for edge, count in zip(edges, counts):
+            cumulative += count
+            samples.append(("_bucket", {**labels, "le": format_value(edge)}, cumulative))
+        cumulative = float(sum(counts))
+        samples.append(("_bucket", {**labels, "le": "+Inf"}, cumulative))
+        samples.append(("_sum", labels, total))
+        samples.append(("_count", labels, cumulative))
+
+    def collect_pipeline(self, analyzer, samples: Dict[str, list]):
+        """Số liệu của các process phân tích, đọc từ bộ nhớ dùng chung"""
+        for road, worker in analyzer.get_workers_health().items():
+            labels = {"road": road}
+            samples["traffic_worker_up"].append(("", labels, 1 if worker.get("state") == "running" else 0))
+            samples["traffic_road_frames_total"].append(("", labels, worker.get("frames", 0)))
+            if "dropped_frames" in worker:
+                samples["traffic_road_dropped_frames_total"].append(("", labels, worker["dropped_frames"]))
+            if "restarts" in worker:
+                samples["traffic_worker_restarts_total"].append(("", labels, worker["restarts"]))
+            if worker.get("last_frame_age") is not None:
+                samples["traffic_road_last_frame_age_seconds"].append(("", labels, worker["last_frame_age"]))
+
+        for road, timer in list(getattr(analyzer, "timers", {}).items()):
+            labels = {"road": road}
+            totals = timer.cumulative()
+            now = time.time()
+            publish = timer.index["publish"]
+            # Chia cho khoảng thời gian thực sự có trong cửa sổ (ô hiện tại mới đầy một phần)
+            fps = timer.histograms(now)[publish, timer.buckets + 1] / timer.covered_seconds(now)[publish]
+            samples["traffic_road_fps"].append(("", labels, round(fps, 2)))
+            inference = totals[timer.index["inference"]]
+            if inference[timer.buckets + 1]:
+                self.add_histogram(samples["traffic_inference_seconds"], labels, timer.edges,
+                                   inference[:timer.buckets], inference[timer.buckets])
+            for stage, i in timer.index.items():
+                if totals[i, timer.buckets + 1]:
+                    stage_labels = {"road": road, "stage": stage}
+                    samples["traffic_stage_seconds"].append(("_sum", stage_labels, totals[i, timer.buckets]))
+                    samples["traffic_stage_seconds"].append(("_count", stage_labels, totals[i, timer.buckets + 1]))
+
+        for kind, histogram in list(getattr(analyzer, "ipc_latency", {}).items()):
+            self.add_histogram(samples["traffic_ipc_read_seconds"], {"kind": kind}, histogram.buckets,
+                               histogram.counts, histogram.sum)
+
+        metric_dropped = getattr(analyzer, "metric_dropped", None)
+        if metric_dropped is not None:
+            samples["traffic_metric_snapshots_dropped_total"].append(("", {}, metric_dropped.value))
+
+    @staticmethod
+    def collect_db_pool(engine, samples: Dict[str, list]):
+        """Số kết nối của pool DB (bỏ qua pool không giữ kết nối như NullPool)"""
+        pool = engine.pool
+        if not all(hasattr(pool, name) for name in ("size", "checkedout", "checkedin", "overflow")):
+            return
+        samples["traffic_db_pool_size"].append(("", {}, pool.size()))
+        for state, value in (("checked_out", pool.checkedout()), ("idle", pool.checkedin()),
+                             ("overflow", max(0, pool.overflow()))):
+            samples["traffic_db_pool_connections"].append(("", {"state": state}, value))
+
+    def render(self, analyzer=None, engine=None) -> str:
+        """Toàn bộ số liệu theo định dạng text của Prometheus
+
+        Args:
+            analyzer (optional): AnalyzeOnRoadForMultiprocessing (hoặc StubAnalyzer), None là bỏ qua số liệu
+            của các process phân tích
+            engine (optional): AsyncEngine của SQLAlchemy, None là bỏ qua số liệu pool DB
+        """
+        samples: Dict[str, List[tuple]] = {name: [] for name in self.METRICS}
+        if analyzer is not None:
+            try:
+                self.collect_pipeline(analyzer, samples)
+            except Exception as e:
+                print(f"Lỗi khi lấy số liệu của các process phân tích cho /metrics: {e}")
+        if engine is not None:
+            try:
+                self.collect_db_pool(engine, samples)
+            except Exception as e:
+                print(f"Lỗi khi lấy số liệu pool DB cho /metrics: {e}")
+        for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+            samples[name].append(("", dict(labels), value))
+        for (name, labels), histogram in list(self.histograms.items()):
+            self.add_histogram(samples[name], dict(labels), histogram.buckets, histogram.counts, histogram.sum)
+
+        lines = []
+        for name, (kind, description) in self.METRICS.items():
+            if not samples[name]:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{suffix}{format_labels(labels)} {format_value(value)}"
+                      for suffix, labels, value in samples[name]]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import time
+from typing import Callable, Dict, Optional
+
+
+class ReadinessTracker:
+    """Theo dõi trạng thái khởi động của từng thành phần (database, process phân tích, chatbot...) để trả về
+    cho /healthz và /readyz.
+
+    Các giai đoạn khởi động độc lập được chạy song song bằng run_stage (mỗi giai đoạn là một asyncio.Task)
+    nên server nhận request ngay, còn load balancer chỉ gửi traffic khi /readyz báo sẵn sàng.
+
+    Trạng thái của một thành phần: pending -> starting -> ready | failed. Thành phần có required=False
+    (ví dụ chatbot được tạo khi cần) không ảnh hưởng tới kết quả /readyz.
+
+    Examples:
+        >>> readiness = ReadinessTracker()
+        >>> readiness.run_stage("database", create_tables)
+        >>> readiness.is_ready()
+    """
+    PENDING, STARTING, READY, FAILED = "pending", "starting", "ready", "failed"
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.components: Dict[str, dict] = {}
+        # Giữ tham chiếu tới các task để chúng không bị thu hồi khi đang chạy
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # Thời điểm mỗi tuyến đường xử lý xong frame đầu tiên (tính từ lúc server khởi động)
+        self.first_frames: Dict[str, float] = {}
+
+    def register(self, name: str, required: bool = True):
+        self.components.setdefault(name, {"state": self.PENDING, "required": required, "detail": None,
+                                          "duration": None})
+        self.components[name]["required"] = required
+
+    def set(self, name: str, state: str, detail: str = None):
+        self.register(name, self.components.get(name, {}).get("required", True))
+        component = self.components[name]
+        now = time.time()
+        if state == self.STARTING:
+            component["start"] = now
+        elif state in (self.READY, self.FAILED) and "start" in component:
+            component["duration"] = round(now - component["start"], 2)
+        component["state"] = state
+        component["detail"] = detail
+
+    async def run(self, name: str, stage: Callable, required: bool = True):
+        """Chạy một giai đoạn khởi động và ghi nhận kết quả. stage là hàm async hoặc hàm thường (hàm thường
+        được chạy trong thread riêng để không chặn event loop)"""
+        self.register(name, required)
+        self.set(name, self.STARTING)
+        try:
+            if inspect.iscoroutinefunction(stage):
+                result = await stage()
+            else:
+                result = await asyncio.to_thread(stage)
+            self.set(name, self.READY)
+            return result
+        except Exception as e:
+            print(f"Lỗi khi khởi động {name}: {e}")
+            self.set(name, self.FAILED, str(e))
+            return None
+
+    def run_stage(self, name: str, stage: Callable, required: bool = True,
+                  after: Optional[str] = None) -> asyncio.Task:
+        """Chạy một giai đoạn khởi động ở nền (song song với các giai đoạn khác)
+
+        Args:
+            name (str): Tên thành phần
+            stage (Callable): Hàm async hoặc hàm thường thực hiện giai đoạn này
+            required (bool): /readyz chỉ báo sẵn sàng khi thành phần này đã ready. Defaults to True.
+            after (str, optional): Chờ giai đoạn có tên này chạy xong trước (không cần thành công).
+        """
+        self.register(name, required)
+        wait_for = self.tasks.get(after) if after else None
+
+        async def runner():
+            if wait_for is not None:
+                await asyncio.wait([wait_for])
+            return await self.run(name, stage, required)
+
+        self.tasks[name] = asyncio.create_task(runner())
+        return self.tasks[name]
+
+    def update_roads(self, health: Dict[str, dict], now: float = None):
+        """Ghi nhận frame đầu tiên của từng tuyến đường từ trạng thái của WorkerSupervisor"""
+        now = time.time() if now is None else now
+        for name, worker in health.items():
+            if name not in self.first_frames and worker.get("frames", 0) > 0:
+                self.first_frames[name] = now
+        for name in list(self.first_frames):
+            if name not in health:
+                self.first_frames.pop(name)
+
+    def roads(self, health: Dict[str, dict]) -> Dict[str, dict]:
+        """Một tuyến đường sẵn sàng khi đã xử lý xong ít nhất một frame (hoặc đang bị tạm dừng theo yêu cầu)"""
+        self.update_roads(health)
+        result = {}
+        for name, worker in health.items():
+            ready = name in self.first_frames or worker.get("state") == "paused"
+            result[name] = {
+                "ready": ready,
+                "state": worker.get("state"),
+                "first_frame_after": round(self.first_frames[name] - self.started_at, 1)
+                if name in self.first_frames else None,
+            }
+        return result
+
+    def is_ready(self, roads: Dict[str, dict] = None) -> bool:
+        components_ready = all(c["state"] == self.READY for c in self.components.values() if c["required"])
+        roads_ready = all(road["ready"] for road in (roads or {}).values())
+        return components_ready and roads_ready
+
+    def snapshot(self, roads: Dict[str, dict] = None) -> dict:
+        return {
+            "ready": self.is_ready(roads),
+            "uptime": round(time.time() - self.started_at, 1),
+            "components": {name: {k: v for k, v in c.items() if k != "start"}
+                           for name, c in self.components.items()},
+            "roads": roads or {},
+        }
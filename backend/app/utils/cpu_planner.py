@@ -0,0 +1,178 @@
+import os
+import math
+from typing import List, Optional
+
+
+def get_available_cpus() -> List[int]:
+    """Các CPU mà process hiện tại được phép chạy (đã tính cpuset của Docker/taskset)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """Số CPU tối đa theo quota của cgroup (ví dụ `docker run --cpus=2.5` -> 2.5), None nếu không giới hạn.
+
+    Hỗ trợ cả cgroup v2 (cpu.max) và cgroup v1 (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_core_id(cpu: int, root: str = "/sys/devices/system/cpu") -> tuple:
+    """(socket, core) của một CPU logic, các CPU hyper-thread của cùng một core có cùng giá trị"""
+    try:
+        topology = os.path.join(root, f"cpu{cpu}", "topology")
+        with open(os.path.join(topology, "physical_package_id")) as f:
+            package = int(f.read())
+        with open(os.path.join(topology, "core_id")) as f:
+            core = int(f.read())
+        return package, core
+    except (OSError, ValueError):
+        return -1, cpu
+
+
+def order_by_core(cpus: List[int], core_of=get_core_id) -> List[List[int]]:
+    """Gom các CPU logic theo core vật lý để các hyper-thread của một core không bị chia cho 2 process
+
+    Returns:
+        List[List[int]]: Danh sách core, mỗi core là danh sách CPU logic của nó
+    """
+    cores = {}
+    for cpu in cpus:
+        cores.setdefault(core_of(cpu), []).append(cpu)
+    return sorted(cores.values(), key=lambda c: c[0])
+
+
+def cpus_for_threads(threads: int, cpus: List[int] = None, core_of=get_core_id) -> List[int]:
+    """Chọn threads CPU logic để ghim một process đo tốc độ: mỗi core vật lý một CPU, thiếu thì lấy thêm các
+    hyper-thread. Một số runtime (onnxruntime, MNN, NCNN) không đọc OMP_NUM_THREADS nên chỉ ghim CPU mới giới
+    hạn được số core chúng dùng
+
+    Args:
+        threads (int): Số CPU cần lấy
+        cpus (List[int], optional): Các CPU được phép dùng. Defaults to get_available_cpus().
+    """
+    cores = order_by_core(sorted(cpus if cpus is not None else get_available_cpus()), core_of)
+    ordered = [core[0] for core in cores] + [cpu for core in cores for cpu in core[1:]]
+    return sorted(ordered[:max(1, threads)])
+
+
+def plan_cpus(names: List[str], cpus: List[int] = None, cpu_limit: Optional[float] = None,
+              reserved: int = 1, threads_per_worker: int = 0, core_of=get_core_id) -> dict:
+    """Chia các core cho các process phân tích để chúng không tranh nhau CPU.
+
+    - Mỗi process được ghim (affinity) vào một nhóm core vật lý riêng, liền nhau; khi số process nhiều
+      hơn số core thì các process dùng chung core theo vòng tròn.
+    - Số thread suy luận của mỗi process bằng số core vật lý trong nhóm, nhưng tổng không vượt quá
+      quota CPU của cgroup (Docker --cpus) vì vượt quota chỉ làm các thread bị throttle.
+    - Giữ lại `reserved` core cho process chính (API, encode JPEG) nếu còn đủ core cho mỗi process một core.
+
+    Args:
+        names (List[str]): Tên các tuyến đường (mỗi tuyến đường một process)
+        cpus (List[int], optional): Các CPU được phép dùng. Defaults to get_available_cpus().
+        cpu_limit (float, optional): Quota CPU của cgroup. Defaults to None (không giới hạn).
+        reserved (int): Số core giữ lại cho process chính. Defaults to 1.
+        threads_per_worker (int): Ghi đè số thread mỗi process, 0 là tự tính. Defaults to 0.
+
+    Returns:
+        dict: available_cpus, cpu_limit, budget (số thread tối đa của tất cả process), reserved_cpus và
+        workers: {tên: {"cpus": [...], "threads": int, "streams": int}}
+    """
+    cpus = sorted(cpus if cpus is not None else get_available_cpus())
+    cores = order_by_core(cpus, core_of)
+    n = len(names)
+    plan = {"available_cpus": cpus, "cpu_limit": cpu_limit, "reserved_cpus": [], "workers": {}}
+
+    if n and len(cores) - reserved >= n and reserved > 0:
+        reserved_cores, cores = cores[:reserved], cores[reserved:]
+        plan["reserved_cpus"] = [cpu for core in reserved_cores for cpu in core]
+
+    budget = len(cores)
+    if cpu_limit is not None:
+        budget = max(1, min(budget, math.floor(cpu_limit - (1 if plan["reserved_cpus"] else 0)) or 1))
+    plan["budget"] = budget
+    if n == 0:
+        return plan
+
+    groups = []
+    if n <= len(cores):
+        # Chia đều các core, process đầu nhận phần dư
+        size, extra = divmod(len(cores), n)
+        start = 0
+        for i in range(n):
+            end = start + size + (1 if i < extra else 0)
+            groups.append(cores[start:end])
+            start = end
+    else:
+        groups = [[cores[i % len(cores)]] for i in range(n)]
+
+    share, extra = divmod(budget, n)
+    for i, (name, group) in enumerate(zip(names, groups)):
+        threads = threads_per_worker or max(1, min(len(group), share + (1 if i < extra else 0)))
+        plan["workers"][name] = {
+            "cpus": sorted(cpu for core in group for cpu in core),
+            "threads": threads,
+            # Mỗi process chỉ xử lý 1 frame tại một thời điểm nên 1 stream là đủ
+            "streams": 1,
+        }
+    return plan
+
+
+# Kế hoạch của process hiện tại (được apply_cpu_plan ghi) để các backend suy luận đọc số thread/stream
+current_plan: Optional[dict] = None
+
+
+def apply_cpu_plan(entry: dict, pid: int = 0):
+    """Áp dụng kế hoạch cho process hiện tại: ghim CPU và giới hạn số thread của các thư viện tính toán.
+    Cần gọi trước khi nạp model.
+
+    Args:
+        entry (dict): Một phần tử trong plan["workers"]
+        pid (int): 0 là process hiện tại
+    """
+    global current_plan
+    current_plan = entry
+    if hasattr(os, "sched_setaffinity") and entry.get("cpus"):
+        try:
+            os.sched_setaffinity(pid, entry["cpus"])
+        except OSError as e:
+            print(f"Không thể ghim CPU {entry['cpus']}: {e}")
+
+    threads = str(entry.get("threads", 1))
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = threads
+    try:
+        import cv2
+        cv2.setNumThreads(int(threads))
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(int(threads))
+    except ImportError:
+        pass
+
+
+def get_affinity(pid: int) -> Optional[List[int]]:
+    """Affinity thực tế của một process (dùng để đối chiếu trên API admin)"""
+    try:
+        return sorted(os.sched_getaffinity(pid))
+    except (AttributeError, OSError):
+        return None
@@ -0,0 +1,167 @@
+import os
+import shutil
+from typing import List, Optional
+import numpy as np
+
+# Đuôi file/thư mục bản export của từng định dạng (giống ultralytics)
+EXPORT_SUFFIXES = {"openvino": "_openvino_model", "onnx": ".onnx", "mnn": ".mnn", "ncnn": "_ncnn_model"}
+
+
+def read_metadata(model_dir: str) -> dict:
+    import yaml
+
+    path = os.path.join(model_dir, "metadata.yaml")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def write_metadata(model_dir: str, metadata: dict):
+    import yaml
+
+    with open(os.path.join(model_dir, "metadata.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(metadata, f, allow_unicode=True, sort_keys=False)
+
+
+def is_end2end(model_dir: str) -> bool:
+    """Model đã có NMS trong graph (output (1, max_det, 6) x1, y1, x2, y2, conf, cls)"""
+    metadata = read_metadata(model_dir)
+    return bool(metadata.get("end2end") or metadata.get("args", {}).get("nms"))
+
+
+def find_xml(model_dir: str) -> str:
+    return next(os.path.join(model_dir, f) for f in sorted(os.listdir(model_dir)) if f.endswith(".xml"))
+
+
+def add_nms_to_openvino(model_dir: str, output_dir: str = None, conf: float = 0.2, iou: float = 0.3,
+                        classes: Optional[List[int]] = None, max_det: int = 100) -> str:
+    """Gắn NMS, ngưỡng conf/iou và lọc lớp vào cuối graph của một model OpenVINO đã export
+
+    Output thô (1, 4 + nc, N) gồm N box ứng viên dạng cx, cy, w, h và điểm của từng lớp được thay bằng
+    (1, max_det, 6) x1, y1, x2, y2, conf, cls trên toạ độ ảnh đầu vào model, phần thừa là 0 (conf = 0). Giống
+    NMS của ultralytics: mỗi box chỉ giữ lớp có điểm cao nhất, NMS theo từng lớp, lấy max_det box điểm cao nhất.
+    metadata.yaml được ghi thêm end2end: true nên YOLO(output_dir) của ultralytics cũng đọc đúng output mới.
+
+    Args:
+        model_dir (str): Thư mục model OpenVINO (*_openvino_model) có output thô
+        output_dir (str, optional): Thư mục ghi model mới. Defaults to <tên>_nms_openvino_model cùng thư mục cha.
+        conf (float): Ngưỡng điểm tối thiểu. Defaults to 0.2.
+        iou (float): Ngưỡng IoU của NMS. Defaults to 0.3.
+        classes (List[int], optional): Chỉ giữ các lớp này (theo id của model), None là giữ tất cả.
+        max_det (int): Số box tối đa mỗi ảnh (kích thước cố định của output). Defaults to 100.
+
+    Returns:
+        str: Thư mục model mới
+    """
+    import openvino as ov
+    import openvino.opset13 as opset
+
+    if output_dir is None:
+        output_dir = model_dir.rstrip("/\\")[:-len("_openvino_model")] + "_nms_openvino_model"
+    core = ov.Core()
+    model = core.read_model(find_xml(model_dir))
+    # Nối tiếp vào đầu ra của node cuối cùng (không phải node Result của model cũ)
+    raw = model.get_results()[0].input_value(0)
+    num_classes = raw.get_partial_shape()[1].get_length() - 4
+    classes = list(range(num_classes)) if classes is None else [int(c) for c in classes]
+
+    def i64(values):
+        return opset.constant(np.array(values, dtype=np.int64))
+
+    # (1, 4 + nc, N) -> box (1, N, 4) dạng cx, cy, w, h và điểm (1, k, N) của các lớp được giữ
+    boxes_cxcywh = opset.transpose(opset.slice(raw, i64([0]), i64([4]), i64([1]), i64([1])), i64([0, 2, 1]))
+    scores = opset.gather(opset.slice(raw, i64([4]), i64([4 + num_classes]), i64([1]), i64([1])), i64(classes),
+                          i64(1))
+    # Mỗi box chỉ giữ lớp có điểm cao nhất (NMS của ultralytics với multi_label=False)
+    best = opset.reduce_max(scores, i64([1]), keep_dims=True)
+    scores = opset.multiply(scores, opset.convert(opset.equal(scores, best), "f32"))
+
+    nms = opset.non_max_suppression(boxes_cxcywh, scores, i64([max_det]), np.array([iou], dtype=np.float32),
+                                    np.array([conf], dtype=np.float32), box_encoding="center",
+                                    sort_result_descending=True, output_type="i64")
+    valid = nms.output(2)
+    selected = opset.slice(nms.output(0), i64([0]), valid, i64([1]), i64([0]))            # (M, 3) batch, lớp, box
+    selected_scores = opset.slice(nms.output(1), i64([0]), valid, i64([1]), i64([0]))     # (M, 3) batch, lớp, điểm
+
+    class_index = opset.squeeze(opset.slice(selected, i64([1]), i64([2]), i64([1]), i64([1])), i64([1]))
+    box_index = opset.squeeze(opset.slice(selected, i64([2]), i64([3]), i64([1]), i64([1])), i64([1]))
+    score = opset.slice(selected_scores, i64([2]), i64([3]), i64([1]), i64([1]))           # (M, 1)
+
+    # cx, cy, w, h -> x1, y1, x2, y2 của các box được chọn
+    chosen = opset.gather(opset.squeeze(boxes_cxcywh, i64([0])), box_index, i64(0))       # (M, 4)
+    center = opset.slice(chosen, i64([0]), i64([2]), i64([1]), i64([1]))
+    half = opset.multiply(opset.slice(chosen, i64([2]), i64([4]), i64([1]), i64([1])),
+                          np.array(0.5, dtype=np.float32))
+    cls = opset.convert(opset.unsqueeze(opset.gather(i64(classes), class_index, i64(0)), i64([1])), "f32")
+    detections = opset.concat([opset.subtract(center, half), opset.add(center, half), score, cls], 1)
+
+    # Lấy max_det box điểm cao nhất rồi đệm 0 cho đủ max_det dòng
+    count = opset.minimum(opset.slice(opset.shape_of(detections, "i64"), i64([0]), i64([1]), i64([1])),
+                          i64([max_det]))
+    top = opset.topk(opset.squeeze(score, i64([1])), opset.squeeze(count, i64([0])), 0, "max", "value",
+                     "i64").output(1)
+    detections = opset.gather(detections, top, i64(0))
+    pad = opset.subtract(i64([max_det]), count)
+    detections = opset.pad(detections, i64([0, 0]), opset.concat([pad, i64([0])], 0), "constant",
+                           np.array(0, dtype=np.float32))
+    detections = opset.reshape(detections, i64([1, max_det, 6]), False)
+
+    result = ov.Model([detections.output(0)], model.get_parameters(), "detections_with_nms")
+    result.output(0).get_tensor().set_names({"detections"})
+    os.makedirs(output_dir, exist_ok=True)
+    ov.save_model(result, os.path.join(output_dir, os.path.basename(find_xml(model_dir))), compress_to_fp16=False)
+
+    metadata = read_metadata(model_dir)
+    metadata.setdefault("args", {})["nms"] = True
+    metadata["end2end"] = True
+    metadata["nms"] = {"conf": conf, "iou": iou, "classes": classes, "max_det": max_det}
+    write_metadata(output_dir, metadata)
+    return output_dir
+
+
+def export_from_weights(weights: str, export_format: str, output_dir: str, int8: bool = False, half: bool = False,
+                        dynamic: bool = True, data: str = None, nms: bool = False, conf: float = 0.2,
+                        iou: float = 0.3, classes: Optional[List[int]] = None, max_det: int = 100) -> str:
+    """Export best.pt sang một định dạng và đặt tên theo quy ước của ai_models (best_int8.onnx,
+    best_int8_openvino_model...)
+
+    Với OpenVINO, NMS được gắn bằng add_nms_to_openvino (có lọc lớp) vào một bản riêng. Với ONNX/MNN, NMS do ultralytics export
+    (nms=True, ngưỡng conf/iou) và không lọc lớp trong graph. ONNX INT8 được lượng tử hoá động bằng onnxruntime.
+
+    Returns:
+        str: Đường dẫn bản export
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    args = {"format": export_format, "dynamic": dynamic}
+    if export_format == "openvino":
+        args.update(int8=int8, half=half and not int8, data=data)
+    elif export_format == "mnn":
+        args.update(int8=int8, half=half and not int8)
+    elif export_format == "onnx":
+        args.update(half=half, simplify=True)
+    if nms and export_format != "openvino":
+        args.update(nms=True, conf=conf, iou=iou, max_det=max_det)
+    exported = model.export(**{k: v for k, v in args.items() if v is not None})
+
+    name = "best_int8" if int8 else "best"
+    suffix = EXPORT_SUFFIXES[export_format]
+    if export_format == "onnx" and int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        target = os.path.join(output_dir, name + suffix)
+        quantize_dynamic(model_input=exported, model_output=target, weight_type=QuantType.QUInt8)
+    else:
+        target = os.path.join(output_dir, name + suffix)
+        if os.path.abspath(exported) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.makedirs(output_dir, exist_ok=True)
+            shutil.move(exported, target)
+
+    if nms and export_format == "openvino":
+        # Giữ lại bản output thô (dùng để so sánh/lượng tử hoá lại), bản có NMS là <tên>_nms_openvino_model
+        return add_nms_to_openvino(target, conf=conf, iou=iou, classes=classes, max_det=max_det)
+    return target
@@ -0,0 +1,138 @@
+import os
+import contextlib
+import numpy as np
+from typing import Optional
+
+# Biến môi trường báo cho forkserver biết cần nạp model nào khi import module này (xem start_preload_server)
+PRELOAD_ENV = "SMART_TRAFFIC_PRELOAD_MODEL"
+# Kích thước ảnh dùng để suy luận khởi động, bằng kích thước vùng ROI mà các process phân tích đưa vào model
+WARMUP_SHAPE = (270, 550, 3)
+
+# Model đã được nạp và chạy khởi động trong process cha (forkserver), các process con fork ra dùng chung
+# trọng số theo cơ chế copy-on-write
+preloaded_model = None
+preloaded_path: Optional[str] = None
+
+
+@contextlib.contextmanager
+def openvino_options(cache_dir: str = None, num_threads: int = 0):
+    """Áp dụng thư mục cache model đã biên dịch và số thread suy luận cho mọi ov.Core được tạo trong khối with.
+
+    Ultralytics tự tạo ov.Core khi nạp model OpenVINO (lúc predict lần đầu) và không nhận thêm cấu hình,
+    nên ov.Core được thay tạm thời bằng lớp con có cấu hình. Có cache thì các lần khởi động sau chỉ đọc
+    blob đã biên dịch thay vì biên dịch lại từ IR.
+
+    Args:
+        cache_dir (str, optional): Thư mục cache của OpenVINO (CACHE_DIR). Defaults to None (không cache).
+        num_threads (int): Số thread suy luận trên CPU (INFERENCE_NUM_THREADS), 0 là để OpenVINO tự chọn.
+    """
+    try:
+        import openvino as ov
+    except ImportError:
+        yield
+        return
+    if not cache_dir and not num_threads:
+        yield
+        return
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    core_cls = ov.Core
+
+    class ConfiguredCore(core_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if cache_dir:
+                self.set_property({"CACHE_DIR": cache_dir})
+            if num_threads:
+                self.set_property("CPU", {"INFERENCE_NUM_THREADS": int(num_threads)})
+
+    ov.Core = ConfiguredCore
+    try:
+        yield
+    finally:
+        ov.Core = core_cls
+
+
+def warmup(predict, shape=WARMUP_SHAPE, runs: int = 1):
+    """Chạy suy luận trên ảnh đen để model được nạp/biên dịch và cấp phát bộ nhớ trước frame đầu tiên
+
+    Args:
+        predict (Callable[[np.ndarray], Any]): Hàm suy luận một ảnh
+        shape (tuple): Kích thước ảnh (h, w, c). Defaults to WARMUP_SHAPE.
+        runs (int): Số lần chạy. Defaults to 1.
+    """
+    image = np.zeros(shape, dtype=np.uint8)
+    for _ in range(runs):
+        predict(image)
+
+
+def load_model(model_path: str, device: str = "cpu", cache_dir: str = None, num_threads: int = 0,
+               imgsz: int = 640):
+    """Nạp model YOLO và chạy suy luận khởi động (OpenVINO chỉ thực sự nạp và biên dịch model ở lần
+    predict đầu tiên)
+
+    Returns:
+        YOLO: Model đã sẵn sàng suy luận
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    with openvino_options(cache_dir, num_threads):
+        warmup(lambda image: model.predict(image, device=device, imgsz=imgsz, verbose=False))
+    return model
+
+
+def get_preloaded_model(model_path: str):
+    """Model đã được nạp sẵn trong process cha nếu đúng model cần dùng, ngược lại None"""
+    if preloaded_model is not None and preloaded_path == model_path:
+        return preloaded_model
+    return None
+
+
+def preload_from_env():
+    """Được gọi khi forkserver import module này: nạp model ghi trong PRELOAD_ENV (dạng path|device|cache|threads)"""
+    global preloaded_model, preloaded_path
+    value = os.environ.pop(PRELOAD_ENV, None)
+    if not value or preloaded_model is not None:
+        return
+    model_path, device, cache_dir, num_threads = value.split("|")
+    try:
+        preloaded_model = load_model(model_path, device, cache_dir or None, int(num_threads or 0))
+        preloaded_path = model_path
+        print(f"Đã nạp sẵn model {model_path} (pid {os.getpid()})")
+    except Exception as e:
+        # Không làm chết forkserver, các process con sẽ tự nạp model như bình thường
+        print(f"Lỗi khi nạp sẵn model {model_path}: {e}")
+
+
+def start_preload_server(model_path: Optional[str], device: str = "cpu", cache_dir: str = None, num_threads: int = 0,
+                         modules=("services.road_services.AnalyzeOnRoad",)):
+    """Khởi động forkserver đã nạp sẵn model và các module nặng (ultralytics, torch, openvino).
+
+    Các process tạo từ context trả về được fork từ forkserver nên khởi động gần như tức thì và dùng chung
+    trọng số model (chỉ đọc) với nhau thay vì mỗi process một bản. model_path là None thì chỉ import sẵn
+    các module.
+
+    Returns:
+        multiprocessing.context.ForkServerContext: Context để tạo Process, None nếu hệ điều hành không hỗ trợ
+    """
+    import multiprocessing
+    from multiprocessing import forkserver
+
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        print("Hệ điều hành không hỗ trợ forkserver, các process sẽ tự nạp model")
+        return None
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload([__name__, *modules])
+    # forkserver nhận biến môi trường lúc khởi động, sau đó xoá đi để process hiện tại không bị ảnh hưởng
+    if model_path:
+        os.environ[PRELOAD_ENV] = f"{model_path}|{device}|{cache_dir or ''}|{num_threads}"
+    try:
+        forkserver.ensure_running()
+    finally:
+        os.environ.pop(PRELOAD_ENV, None)
+    return ctx
+
+
+preload_from_env()
@@ -0,0 +1,174 @@
+import csv
+import os
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from utils.transport_utils import avg_none_zero_batch
+
+
+def split_segments(total_frames: int, segment_frames: int, overlap_frames: int) -> List[dict]:
+    """Chia video thành các đoạn liên tiếp để xử lý song song.
+
+    Mỗi đoạn bắt đầu đọc sớm hơn overlap_frames frame so với đoạn chính của nó: phần chồng lấn này
+    dùng để khởi động tracker/bộ ước lượng vận tốc và để nối track với đoạn trước, kết quả của nó không
+    được tính vào số liệu.
+
+    Returns:
+        List[dict]: Mỗi phần tử gồm start_frame, nominal_start, end_frame
+    """
+    segment_frames = max(1, segment_frames)
+    segments = []
+    for nominal_start in range(0, total_frames, segment_frames):
+        segments.append({
+            "start_frame": max(0, nominal_start - overlap_frames),
+            "nominal_start": nominal_start,
+            "end_frame": min(total_frames, nominal_start + segment_frames),
+        })
+    return segments
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Ma trận IoU giữa 2 tập bounding box (x1, y1, x2, y2)"""
+    a = boxes_a.astype(np.float32)[:, None, :]
+    b = boxes_b.astype(np.float32)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def match_tracks(tail: np.ndarray, head: np.ndarray, iou_threshold: float = 0.3,
+                 min_votes: int = 2) -> Dict[int, int]:
+    """Nối track của đoạn sau với track của đoạn trước dựa trên các frame chồng lấn.
+
+    Trên mỗi frame chung, các box của 2 đoạn được ghép tham lam theo IoU; cặp (id sau, id trước) nào
+    được ghép ở nhiều frame nhất thì được chọn, mỗi id chỉ được dùng một lần.
+
+    Args:
+        tail (np.ndarray): (frame, id, x1, y1, x2, y2) của đoạn trước trong vùng chồng lấn
+        head (np.ndarray): (frame, id, x1, y1, x2, y2) của đoạn sau trong vùng chồng lấn
+        iou_threshold (float): IoU tối thiểu để coi 2 box là cùng một phương tiện
+        min_votes (int): Số frame tối thiểu một cặp phải được ghép
+
+    Returns:
+        Dict[int, int]: id của đoạn sau -> id của đoạn trước
+    """
+    votes = {}
+    for frame in np.intersect1d(tail[:, 0], head[:, 0]):
+        rows_a = tail[tail[:, 0] == frame]
+        rows_b = head[head[:, 0] == frame]
+        iou = box_iou(rows_b[:, 2:6], rows_a[:, 2:6])
+        while iou.size and iou.max() >= iou_threshold:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            key = (int(rows_b[i, 1]), int(rows_a[j, 1]))
+            votes[key] = votes.get(key, 0) + 1
+            iou[i, :] = -1
+            iou[:, j] = -1
+
+    mapping, used = {}, set()
+    for (id_b, id_a), count in sorted(votes.items(), key=lambda kv: -kv[1]):
+        if count < min_votes or id_b in mapping or id_a in used:
+            continue
+        mapping[id_b] = id_a
+        used.add(id_a)
+    return mapping
+
+
+def stitch_segments(results: List[dict], iou_threshold: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """Ghép kết quả của các đoạn (AnalyzeOnRoadOffline.process_segment) thành kết quả của cả video.
+
+    Track id của mỗi đoạn được đổi sang id toàn cục; track đi qua ranh giới 2 đoạn được nối về cùng
+    một id để vận tốc của nó không bị tính 2 lần trong cùng một cửa sổ.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: counts (frame, số oto, số xe máy) và
+        speeds (cửa sổ, id toàn cục, class, vận tốc) không trùng lặp (cửa sổ, id)
+    """
+    results = sorted(results, key=lambda r: r["nominal_start"])
+    counts, speeds = [], []
+    prev_tail, next_id = None, 0
+
+    for result in results:
+        local_ids = np.unique(np.concatenate([result["speeds"][:, 1], result["head"][:, 1], result["tail"][:, 1]]))
+        matched = match_tracks(prev_tail, result["head"], iou_threshold) if prev_tail is not None else {}
+        mapping = {}
+        for local_id in local_ids.tolist():
+            if local_id in matched:
+                mapping[local_id] = matched[local_id]
+            else:
+                mapping[local_id] = next_id
+                next_id += 1
+
+        def to_global(ids):
+            return np.array([mapping[i] for i in ids.tolist()], dtype=np.int64)
+
+        counts.append(result["counts"])
+        seg_speeds = result["speeds"].astype(np.int64)
+        if len(seg_speeds):
+            seg_speeds[:, 1] = to_global(seg_speeds[:, 1])
+        speeds.append(seg_speeds)
+        prev_tail = result["tail"].astype(np.int64)
+        if len(prev_tail):
+            prev_tail[:, 1] = to_global(prev_tail[:, 1])
+
+    counts = np.concatenate(counts) if counts else np.empty((0, 3), dtype=np.int32)
+    counts = counts[np.argsort(counts[:, 0], kind="stable")]
+    speeds = np.concatenate(speeds) if speeds else np.empty((0, 4), dtype=np.int64)
+    if len(speeds):
+        # Giữ lần xuất hiện đầu tiên của mỗi cặp (cửa sổ, id)
+        _, first = np.unique(speeds[:, :2], axis=0, return_index=True)
+        speeds = speeds[np.sort(first)]
+    return counts, speeds
+
+
+def aggregate_windows(counts: np.ndarray, speeds: np.ndarray, fps: float, time_step: int,
+                      start_time: datetime, road_name: str) -> List[dict]:
+    """Chia kết quả theo cửa sổ thời gian của video, cùng cách tính trung bình với chế độ realtime.
+
+    Returns:
+        List[dict]: Các snapshot cùng định dạng với AnalyzeOnRoadBase.get_window_snapshot
+    """
+    if len(counts) == 0:
+        return []
+    windows = (counts[:, 0] / fps // time_step).astype(np.int64)
+    last_second = (counts[-1, 0] + 1) / fps
+    rows = []
+    for window in np.unique(windows).tolist():
+        window_counts = counts[windows == window]
+        window_speeds = speeds[speeds[:, 0] == window] if len(speeds) else speeds
+        count_car, speed_car, count_motor, speed_motor = avg_none_zero_batch(
+            window_counts[:, 1].tolist(),
+            window_speeds[window_speeds[:, 2] == 0, 3].tolist() if len(window_speeds) else [],
+            window_counts[:, 2].tolist(),
+            window_speeds[window_speeds[:, 2] == 1, 3].tolist() if len(window_speeds) else [],
+        )
+        rows.append({
+            "road_name": road_name,
+            "window_start": start_time + timedelta(seconds=window * time_step),
+            "window_end": start_time + timedelta(seconds=min((window + 1) * time_step, last_second)),
+            "count_car": count_car,
+            "speed_car": speed_car,
+            "count_motor": count_motor,
+            "speed_motor": speed_motor,
+            "frames": len(window_counts),
+        })
+    return rows
+
+
+def write_windows(rows: List[dict], path: str):
+    """Ghi kết quả theo cửa sổ ra file .csv hoặc .parquet (dựa vào đuôi file)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        return
+
+    fields = list(rows[0].keys()) if rows else ["road_name", "window_start", "window_end"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()})
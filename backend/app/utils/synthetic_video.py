@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+from core.config import settings_metric_transport
+
+# Cùng kích thước frame (w, h) và vị trí vùng ROI (x, y) với AnalyzeOnRoadBase
+FRAME_SIZE = (600, 400)
+ROI_START = settings_metric_transport.ROI_START
+# Kích thước box (w, h) trên ảnh ROI của ô tô (cls 0) và xe máy (cls 1)
+VEHICLE_SIZES = {0: (60, 45), 1: (20, 32)}
+VEHICLE_COLORS = {0: (200, 120, 40), 1: (40, 60, 200)}
+
+
+def synthetic_tracks(frame_index: int, cars: int = 10, motors: int = 20, shape: tuple = None,
+                     seed: int = 0) -> np.ndarray:
+    """Kết quả theo dõi giả lập của một frame: cars ô tô và motors xe máy đi từ trên xuống dưới vùng ROI với vận
+    tốc không đổi, xe đi hết vùng ROI thì quay lại từ đầu với id mới. Cùng seed thì kết quả luôn giống nhau.
+
+    Args:
+        frame_index (int): Số thứ tự frame
+        cars (int): Số ô tô trong mỗi frame
+        motors (int): Số xe máy trong mỗi frame
+        shape (tuple, optional): Kích thước (h, w) ảnh ROI, None là vùng ROI của frame FRAME_SIZE
+        seed (int): Seed sinh vị trí và vận tốc các xe
+
+    Returns:
+        np.ndarray: (N, 7) x1, y1, x2, y2, id, conf, cls (cùng định dạng với track_data của TrackingSpeedEstimator)
+    """
+    height, width = shape or (FRAME_SIZE[1] - ROI_START[1], FRAME_SIZE[0] - ROI_START[0])
+    total = cars + motors
+    rng = np.random.default_rng(seed)
+    classes = np.r_[np.zeros(cars), np.ones(motors)].astype(np.float32)
+    sizes = np.array([VEHICLE_SIZES[int(c)] for c in classes], dtype=np.float32).reshape(-1, 2)
+    x1 = rng.uniform(0, 1, total) * (width - sizes[:, 0])
+    start = rng.uniform(0, height, total)
+    speed = rng.uniform(2, 6, total)
+    conf = rng.uniform(0.5, 0.95, total)
+
+    # Quãng đường đã đi, mỗi vòng qua vùng ROI (dài height + h của xe) là một xe mới
+    travelled = start + speed * frame_index
+    lap = height + sizes[:, 1]
+    y2 = travelled % lap
+    ids = np.arange(total) + 1 + total * (travelled // lap)
+
+    tracks = np.stack([x1, y2 - sizes[:, 1], x1 + sizes[:, 0], y2, ids, conf, classes], axis=1)
+    tracks[:, 1] = np.maximum(tracks[:, 1], 0)
+    tracks[:, 3] = np.minimum(tracks[:, 3], height)
+    return tracks.astype(np.float32)
+
+
+def synthetic_detections(frame_index: int, cars: int = 10, motors: int = 20, shape: tuple = None,
+                         seed: int = 0) -> np.ndarray:
+    """Kết quả phát hiện tương ứng với synthetic_tracks
+
+    Returns:
+        np.ndarray: (N, 6) x1, y1, x2, y2, conf, cls trên toạ độ ảnh ROI
+    """
+    return synthetic_tracks(frame_index, cars, motors, shape, seed)[:, [0, 1, 2, 3, 5, 6]]
+
+
+def synthetic_speeds(tracks: np.ndarray, seed: int = 0) -> dict:
+    """Vận tốc (km/h) giả lập của mỗi id, dạng giống TrackingSpeedEstimator.spd"""
+    rng = np.random.default_rng(seed)
+    return {int(track_id): int(rng.integers(5, 60)) for track_id in tracks[:, 4]}
+
+
+def synthetic_frame(frame_index: int, cars: int = 10, motors: int = 20, seed: int = 0) -> np.ndarray:
+    """Frame BGR cỡ FRAME_SIZE: mặt đường có vạch kẻ và các xe của synthetic_tracks vẽ thành khối màu"""
+    width, height = FRAME_SIZE
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    for x in range(100, width, 150):
+        for y in range(-40 + (frame_index * 4) % 80, height, 80):
+            cv2.rectangle(frame, (x, y), (x + 6, y + 40), (230, 230, 230), -1)
+    for x1, y1, x2, y2, _, _, cls in synthetic_tracks(frame_index, cars, motors, seed=seed):
+        top_left = (int(x1) + ROI_START[0], int(y1) + ROI_START[1])
+        bottom_right = (int(x2) + ROI_START[0], int(y2) + ROI_START[1])
+        cv2.rectangle(frame, top_left, bottom_right, VEHICLE_COLORS[int(cls)], -1)
+        cv2.rectangle(frame, top_left, bottom_right, (20, 20, 20), 2)
+    return frame
+
+
+def write_synthetic_video(path: str, frames: int = 90, cars: int = 10, motors: int = 20, fps: int = 30,
+                          seed: int = 0) -> str:
+    """Ghi video giả lập (mp4) gồm frames frame synthetic_frame, dùng để benchmark khi không có video camera
+
+    Returns:
+        str: path
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, FRAME_SIZE)
+    try:
+        for frame_index in range(frames):
+            writer.write(synthetic_frame(frame_index, cars, motors, seed))
+    finally:
+        writer.release()
+    return path
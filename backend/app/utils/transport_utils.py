@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import cv2
 import time
@@ -21,6 +22,23 @@ def convert_frame_to_byte(img: np.array) -> bytes:
             return None
     return None
 
+def get_road_name(path_video: str, name: str = None) -> str:
+    """Tên tuyến đường của một camera: tên đặt riêng nếu có, nếu không thì lấy tên file video (bỏ phần đuôi)
+
+    Args:
+        path_video (str): Đường dẫn video hoặc URL luồng camera
+        name (str, optional): Tên đặt riêng, bắt buộc với luồng camera không có đuôi file (vd rtsp://host/live)
+
+    Raises:
+        ValueError: Không có tên đặt riêng và đường dẫn không có đuôi file để lấy tên
+    """
+    if name:
+        return name
+    stem, ext = os.path.splitext(os.path.basename(path_video.rstrip('/')))
+    if not stem or not ext:
+        raise ValueError(f"Không lấy được tên tuyến đường từ {path_video}, cần đặt tên cho camera")
+    return stem
+
 def avg_none_zero(lst: list) -> int:
     non_zero = [x for x in lst if x != 0]
     return sum(non_zero) // len(non_zero) if non_zero else 0
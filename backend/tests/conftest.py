@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Các module trong app/ import lẫn nhau theo kiểu "from core.config import ...", giống main.py
+app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
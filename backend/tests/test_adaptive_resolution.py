@@ -0,0 +1,50 @@
+import numpy as np
+
+from services.road_services.AdaptiveResolution import AdaptiveResolution
+
+SHAPE = (270, 550)
+
+
+def boxes(count, side):
+    return np.array([[i * 5, 0, i * 5 + side, side, 0.9, 1] for i in range(count)], dtype=np.float32)
+
+
+def make_resolution(**kwargs):
+    args = {"sizes": [320, 480, 640], "window": 10, "min_object_px": 16, "dense_count": 20, "up_frames": 3,
+            "down_frames": 20, "probe_interval": 0, "margin": 0.25}
+    args.update(kwargs)
+    return AdaptiveResolution(**args)
+
+
+def test_sparse_large_vehicles_step_down_slowly():
+    resolution = make_resolution()
+    assert resolution.size == 640
+    for _ in range(19):
+        resolution.update(boxes(3, 60), SHAPE)
+    assert resolution.size == 640
+    resolution.update(boxes(3, 60), SHAPE)
+    assert resolution.size == 320
+
+
+def test_small_or_dense_vehicles_step_up_quickly():
+    resolution = make_resolution(window=3)
+    resolution.size = 320
+    # Xe máy nhỏ: 20px trên ảnh 550 chỉ còn ~11.6px ở 320, ~17.5px ở 480
+    for _ in range(3):
+        resolution.update(boxes(5, 20), SHAPE)
+    assert resolution.size == 480
+
+    # Cần window frame để trung bình đạt dense_count rồi up_frames frame liên tiếp
+    for _ in range(5):
+        resolution.update(boxes(25, 60), SHAPE)
+    assert resolution.size == 640
+
+
+def test_hysteresis_and_probe_frames():
+    resolution = make_resolution(probe_interval=5)
+    resolution.size = 480
+    # Đủ cho 480 nhưng chưa vượt ngưỡng cao hơn 25% để giảm, cũng không cần tăng
+    for _ in range(50):
+        resolution.update(boxes(3, 20), SHAPE)
+    assert resolution.size == 480 and resolution.switches == 0
+    assert [resolution.next_size() for _ in range(5)] == [480, 480, 480, 480, 640]
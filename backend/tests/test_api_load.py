@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+
+from services.road_services.StubAnalyzer import StubAnalyzer
+from services.system_services.ApiLoadTest import ApiLoadTest, summarize
+
+
+def test_stub_analyzer_serves_synthetic_roads():
+    analyzer = StubAnalyzer(names=["A", "B"], frame_fps=1000, info_interval=0.05, frame_count=5)
+    frame = analyzer.get_frame_road("A")
+    assert frame[:2] == b"\xff\xd8"
+    assert analyzer.get_frame_road("C") == b"" and analyzer.get_info_road("C") == {}
+
+    info = analyzer.get_info_road("A")
+    assert set(info) == {"count_car", "count_motor", "speed_car", "speed_motor", "seq", "captured_at", "published_at"}
+    assert analyzer.get_info_road("A") == info
+    time.sleep(0.06)
+    # Số liệu đổi theo info_interval, frame đổi theo frame_fps
+    assert analyzer.get_info_road("A") != info or analyzer.get_info_road("B") != info
+    assert analyzer.get_frame_road("A") != frame
+
+    analyzer.scheduler.viewer_joined("A")
+    analyzer.scheduler.viewer_left("A")
+    assert analyzer.scheduler.viewers == {"A": 0}
+    assert all(worker["frames"] > 0 for worker in analyzer.get_workers_health().values())
+
+
+def test_summarize_and_markdown():
+    result = summarize(list(np.linspace(0.001, 0.1, 100)), duration=10, errors=2)
+    assert result["count"] == 100 and result["throughput"] == 10.0 and result["errors"] == 2
+    assert result["latency_ms"]["p50"] == 50.5 and result["latency_ms"]["max"] == 100.0
+    assert "latency_ms" not in summarize([], duration=10)
+
+    report = {"created_at": "2026-01-01T00:00:00", "url": "http://localhost:8010", "duration": 10, "roads": 5,
+              "results": {"ws_frames": dict(result, clients=4)},
+              "server": {"cpu_percent_mean": 50.0, "cpu_percent_max": 80.0, "rss_mb_max": 150.0},
+              "client_cpu_percent": 20.0}
+    markdown = ApiLoadTest.to_markdown(report)
+    assert "| ws_frames | 4 | 100 | 10.0 | 50.5 |" in markdown
+
+
+def test_stub_frame_packet_carries_capture_time():
+    analyzer = StubAnalyzer(names=["A"], frame_fps=100, frame_count=5)
+    frame, packet = analyzer.get_frame_packet("A")
+    assert frame[:2] == b"\xff\xd8" and analyzer.get_frame_packet("B") == (b"", {})
+    assert packet["seq"] >= 1 and packet["captured_at"] <= time.time()
+    time.sleep(0.05)
+    assert analyzer.get_frame_packet("A")[1]["seq"] > packet["seq"]
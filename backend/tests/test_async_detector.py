@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+MODEL_PATH = os.path.join(APP_DIR, "ai_models", "model N", "openvino models", "best_int8_openvino_model")
+
+
+@pytest.fixture(scope="module")
+def detector():
+    pytest.importorskip("openvino")
+    if not os.path.exists(os.path.join(MODEL_PATH, "best.bin")):
+        pytest.skip("Không có model OpenVINO INT8")
+    from services.model_services.AsyncDetector import AsyncDetector
+
+    return AsyncDetector(MODEL_PATH, num_requests=2, performance_hint="THROUGHPUT")
+
+
+def test_results_are_returned_by_sequence(detector):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (270, 550, 3), dtype=np.uint8) for _ in range(4)]
+    for seq, frame in enumerate(frames):
+        detector.submit(seq, frame)
+
+    # Lấy ngược thứ tự: mỗi kết quả vẫn thuộc đúng frame của nó
+    results = {seq: detector.result(seq, timeout=30) for seq in reversed(range(4))}
+    assert detector.in_flight() == 0
+    for seq, frame in enumerate(frames):
+        np.testing.assert_allclose(results[seq], detector.detect(frame), atol=1e-4)
+        assert results[seq].shape[1] == 6
+
+    with pytest.raises(KeyError):
+        detector.result(0)
+
+
+@pytest.mark.parametrize("shape", [(270, 550), (400, 600), (100, 640)])
+def test_letterbox_geometry_matches_ultralytics(shape):
+    pytest.importorskip("openvino")
+    from ultralytics.data.augment import LetterBox
+    from services.model_services.AsyncDetector import letterbox_geometry
+
+    for auto in (True, False):
+        new_h, new_w, top, bottom, left, right = letterbox_geometry(*shape, 640, auto)
+        expected = LetterBox((640, 640), auto=auto, stride=32)(image=np.zeros((*shape, 3), dtype=np.uint8))
+        assert (new_h + top + bottom, new_w + left + right) == expected.shape[:2]
+
+
+def test_in_graph_preprocessing_accepts_uint8_crop():
+    pytest.importorskip("openvino")
+    if not os.path.exists(os.path.join(MODEL_PATH, "best.bin")):
+        pytest.skip("Không có model OpenVINO INT8")
+    from services.model_services.AsyncDetector import AsyncDetector
+
+    detector = AsyncDetector(MODEL_PATH, num_requests=1, performance_hint="LATENCY", preprocess_in_graph=True)
+    frame = np.random.default_rng(0).integers(0, 255, (400, 600, 3), dtype=np.uint8)
+    # Vùng ROI là view không liền mạch của frame, giống trong vòng lặp xử lý
+    detections = detector.detect(frame[130:, 50:])
+    assert detector.graph_input_shape == (320, 640)
+    assert detections.ndim == 2 and detections.shape[1] == 6
+    assert detector.compiled.input(0).get_element_type().get_type_name() == "u8"
+
+
+
+def test_graph_switch_keeps_other_requests_in_flight():
+    pytest.importorskip("openvino")
+    if not os.path.exists(os.path.join(MODEL_PATH, "best.bin")):
+        pytest.skip("Không có model OpenVINO INT8")
+    from services.model_services.AsyncDetector import AsyncDetector
+
+    detector = AsyncDetector(MODEL_PATH, num_requests=2, performance_hint="THROUGHPUT", preprocess_in_graph=True)
+    rng = np.random.default_rng(1)
+    frames = [rng.integers(0, 255, (270, 550, 3), dtype=np.uint8) for _ in range(4)]
+    sizes = [640, 320, 640, 320]
+    # Đổi imgsz giữa các frame như frame chạy thử của AdaptiveResolution, không lấy kết quả ở giữa
+    for seq, (frame, size) in enumerate(zip(frames, sizes)):
+        detector.submit(seq, frame, imgsz=size)
+    results = [detector.result(seq, timeout=30) for seq in range(4)]
+    detector.wait_all()
+    for frame, size, result in zip(frames, sizes, results):
+        np.testing.assert_allclose(result, detector.detect(frame, imgsz=size), atol=1e-4)
+
+def test_frames_in_flight_are_processed_when_the_loop_stops(tmp_path):
+    pytest.importorskip("torch")
+    from services.road_services.AnalyzeOnRoadBase import AnalyzeOnRoadBase
+    from utils.synthetic_video import synthetic_detections, write_synthetic_video
+
+    class FakeDetector:
+        num_requests = 3
+
+        def submit(self, seq, frame, imgsz=None):
+            pass
+
+        def result(self, seq, timeout=None):
+            return synthetic_detections(seq, 5, 10)
+
+    class StoppingAnalyzer(AnalyzeOnRoadBase):
+        def __init__(self, **kwargs):
+            super().__init__(meter_per_pixel=0.06, model_path="yolo11n.yaml", detection_mode="off", **kwargs)
+            self.loops = 0
+            self.processed = 0
+
+        def update_for_frame(self):
+            self.processed += 1
+
+        def update_for_vehicle(self):
+            pass
+
+        def heartbeat(self):
+            if self.loops == 8:
+                raise KeyboardInterrupt
+            self.loops += 1
+
+    analyzer = StoppingAnalyzer(path_video=write_synthetic_video(str(tmp_path / "synthetic.mp4"), frames=30))
+    analyzer.async_detector = FakeDetector()
+    analyzer.process_on_single_video()
+    # Dừng khi vẫn còn num_requests frame chờ kết quả: các frame đó vẫn được xử lý trước khi đóng
+    assert not analyzer.async_pending
+    assert analyzer.processed == 8
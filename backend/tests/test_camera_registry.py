@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+
+from services.road_services.CameraRegistry import CameraRegistry
+from services.road_services.WorkerStatus import WorkerStatus
+from services.road_services.WorkerSupervisor import WorkerSupervisor
+
+
+def test_registry_seeded_from_settings_and_persisted(tmp_path):
+    path = str(tmp_path / "cameras.json")
+    registry = CameraRegistry.load(path)
+    assert "Văn Quán" in registry.cameras
+
+    name = registry.add("./video_test/Cầu Giấy.mp4", 0.05, np.array([[0, 400], [0, 200], [600, 400]]))
+    assert name == "Cầu Giấy"
+    with pytest.raises(KeyError):
+        registry.add("./other/Cầu Giấy.mp4", 0.05, [[0, 0], [1, 1], [2, 2]])
+    # Luồng camera không có đuôi file thì phải đặt tên riêng
+    with pytest.raises(ValueError):
+        registry.add("rtsp://10.0.0.5/live", 0.05, [[0, 0], [1, 1], [2, 2]])
+    assert registry.add("rtsp://10.0.0.5/live", 0.05, [[0, 0], [1, 1], [2, 2]], name="Cổng Trường") == "Cổng Trường"
+    registry.update("Văn Quán", paused=True, max_fps=5)
+    registry.remove("Văn Phú")
+    registry.save()
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["Cầu Giấy"]["region"] == [[0, 400], [0, 200], [600, 400]]
+    reloaded = CameraRegistry.load(path)
+    assert "Văn Phú" not in reloaded.cameras
+    assert reloaded.cameras["Văn Quán"]["paused"] is True
+    regions, path_videos, meter_per_pixels, names = reloaded.as_lists()
+    assert len(regions) == len(path_videos) == len(meter_per_pixels) == len(reloaded.cameras)
+    assert names[path_videos.index("rtsp://10.0.0.5/live")] == "Cổng Trường"
+
+
+class _AliveProcess:
+    pid = 1
+    exitcode = None
+
+    def is_alive(self):
+        return True
+
+    def terminate(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+    kill = terminate
+
+
+def test_paused_worker_is_not_restarted_and_resume_resets_stall_clock():
+    status = WorkerStatus()
+    supervisor = WorkerSupervisor(lambda name: _AliveProcess(), {"road": status}, stall_timeout=1)
+    supervisor.start(["road"], supervise=False)
+    status.frame_done()
+    status.set_control(paused=True)
+
+    later = status.snapshot()["last_frame"] + 60
+    supervisor.check_once(later)
+    assert supervisor.health(later)["road"]["state"] == "paused"
+    assert supervisor.restart_at == {}
+
+    status.set_control(paused=False)
+    supervisor.check_once()
+    assert supervisor.health()["road"]["state"] == "running"
+
+
+def test_low_fps_limit_extends_stall_timeout():
+    status = WorkerStatus()
+    supervisor = WorkerSupervisor(lambda name: _AliveProcess(), {"road": status}, stall_timeout=1)
+    supervisor.start(["road"], supervise=False)
+    status.frame_done()
+    status.set_control(max_fps=0.5)
+
+    supervisor.check_once(status.snapshot()["last_frame"] + 5)
+    assert supervisor.restart_at == {}
+    supervisor.check_once(status.snapshot()["last_frame"] + 7)
+    assert "road" in supervisor.restart_at
@@ -0,0 +1,61 @@
+from utils.cpu_planner import plan_cpus, get_cgroup_cpu_limit, order_by_core, cpus_for_threads
+
+
+def _smt_core(cpu):
+    # 8 CPU logic trên 4 core vật lý: cpu i và i + 4 là 2 hyper-thread của cùng core
+    return 0, cpu % 4
+
+
+def test_partition_keeps_hyperthreads_together_and_reserves_api_core():
+    plan = plan_cpus(["a", "b", "c"], cpus=list(range(8)), reserved=1, core_of=_smt_core)
+
+    assert plan["reserved_cpus"] == [0, 4]
+    assigned = [plan["workers"][name]["cpus"] for name in ("a", "b", "c")]
+    assert assigned == [[1, 5], [2, 6], [3, 7]]
+    assert all(worker["threads"] == 1 for worker in plan["workers"].values())
+    assert plan["budget"] == 3
+
+
+def test_cgroup_quota_limits_total_threads():
+    names = ["a", "b"]
+    plan = plan_cpus(names, cpus=list(range(16)), cpu_limit=3.0, reserved=1, core_of=lambda cpu: (0, cpu))
+
+    assert plan["budget"] == 2
+    assert sum(worker["threads"] for worker in plan["workers"].values()) == 2
+    # Các process vẫn được ghim vào các core riêng biệt
+    cpus = [set(plan["workers"][name]["cpus"]) for name in names]
+    assert not cpus[0] & cpus[1]
+
+
+def test_more_workers_than_cores_share_round_robin():
+    plan = plan_cpus(["a", "b", "c", "d", "e"], cpus=[0, 1], reserved=1, core_of=lambda cpu: (0, cpu))
+
+    assert plan["reserved_cpus"] == []
+    assert [plan["workers"][name]["cpus"] for name in "abcde"] == [[0], [1], [0], [1], [0]]
+    assert all(worker["threads"] == 1 for worker in plan["workers"].values())
+    assert order_by_core([3, 1, 2], core_of=lambda cpu: (0, cpu)) == [[1], [2], [3]]
+
+
+def test_cgroup_limit_v2_and_v1(tmp_path):
+    v2 = tmp_path / "v2"
+    v2.mkdir()
+    (v2 / "cpu.max").write_text("250000 100000\n")
+    assert get_cgroup_cpu_limit(str(v2)) == 2.5
+    (v2 / "cpu.max").write_text("max 100000\n")
+    assert get_cgroup_cpu_limit(str(v2)) is None
+
+    v1 = tmp_path / "v1" / "cpu"
+    v1.mkdir(parents=True)
+    (v1 / "cpu.cfs_quota_us").write_text("150000\n")
+    (v1 / "cpu.cfs_period_us").write_text("100000\n")
+    assert get_cgroup_cpu_limit(str(tmp_path / "v1")) == 1.5
+    (v1 / "cpu.cfs_quota_us").write_text("-1\n")
+    assert get_cgroup_cpu_limit(str(tmp_path / "v1")) is None
+
+
+def test_cpus_for_threads_prefers_one_cpu_per_physical_core():
+    assert cpus_for_threads(2, cpus=list(range(8)), core_of=_smt_core) == [0, 1]
+    assert cpus_for_threads(4, cpus=list(range(8)), core_of=_smt_core) == [0, 1, 2, 3]
+    # Nhiều thread hơn số core vật lý thì dùng thêm hyper-thread
+    assert cpus_for_threads(6, cpus=list(range(8)), core_of=_smt_core) == [0, 1, 2, 3, 4, 5]
+    assert cpus_for_threads(16, cpus=[2, 3], core_of=_smt_core) == [2, 3]
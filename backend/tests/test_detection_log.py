@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+
+from services.road_services.DetectionLog import DetectionLogReader, DetectionLogWriter
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "app", "ai_models", "model N",
+                          "openvino models", "best_int8_openvino_model")
+
+
+def _detections(n, x=0.0):
+    return np.array([[x + 10 * i, 20, x + 10 * i + 30, 60, 0.5 + 0.1 * i, i % 2] for i in range(n)],
+                    dtype=np.float32)
+
+
+def test_round_trip_and_conf_filter(tmp_path):
+    path = str(tmp_path / "road.detlog")
+    writer = DetectionLogWriter(path, {"model": "best.xml", "fps": 25})
+    writer.write(0, _detections(3))
+    writer.write(1, np.empty((0, 6), dtype=np.float32))
+    writer.write(5, _detections(2, x=4.5))
+    # Log chưa finalize thì chưa tồn tại
+    assert not os.path.exists(path)
+    writer.finalize()
+
+    log = DetectionLogReader(path)
+    assert log.metadata == {"model": "best.xml", "fps": 25}
+    assert log.frame_indices() == [0, 1, 5]
+    np.testing.assert_allclose(log.get(5), _detections(2, x=4.5), atol=1e-3)
+    assert len(log.get(1)) == 0
+    assert log.get(3) is None
+    assert len(log.get(0, conf=0.65)) == 1
+
+
+def test_truncated_log_keeps_complete_frames(tmp_path):
+    path = str(tmp_path / "road.detlog")
+    writer = DetectionLogWriter(path)
+    writer.write(0, _detections(2))
+    writer.write(1, _detections(2))
+    writer.finalize()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    assert DetectionLogReader(path).frame_indices() == [0]
+
+
+def test_replayed_detections_are_tracked():
+    pytest.importorskip("openvino")
+    from services.road_services.TrackingSpeedEstimator import TrackingSpeedEstimator
+
+    tool = TrackingSpeedEstimator(model=MODEL_PATH, tracker="bytetrack.yaml", verbose=False, show=False,
+                                  meter_per_pixel=0.1, max_hist=5)
+    frame = np.zeros((270, 550, 3), dtype=np.uint8)
+    for i in range(10):
+        box = np.array([[20 + 5 * i, 50, 80 + 5 * i, 100, 0.9, 0]], dtype=np.float32)
+        tool.process(frame, detections=box)
+
+    assert tool.track_data.id is not None and len(tool.track_data.id) == 1
+    track_id = int(tool.track_data.id[0])
+    assert tool.spd.get(track_id, 0) > 0
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+
+from services.road_services.FrameSource import MmapFrameSource, VideoFrameSource, open_frame_source
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "Văn Quán.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (320, 240))
+    for i in range(12):
+        frame = np.full((240, 320, 3), i * 20, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_mmap_matches_decoder_and_loops(video, tmp_path):
+    decoder = VideoFrameSource(video, loop=False)
+    expected = []
+    while True:
+        check, frame = decoder.read()
+        if not check:
+            break
+        expected.append(frame)
+    decoder.release()
+
+    source = MmapFrameSource(video, cache_dir=str(tmp_path / "cache"))
+    assert len(source.frames) == len(expected) == 12
+    for frame in expected:
+        check, cached = source.read()
+        assert check and cached.shape == (400, 600, 3)
+        assert not cached.flags.writeable
+        np.testing.assert_array_equal(cached, frame)
+    # Hết video thì quay lại frame đầu
+    _, first = source.read()
+    np.testing.assert_array_equal(first, expected[0])
+    source.release()
+
+
+def test_cache_is_reused(video, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    MmapFrameSource(video, cache_dir=cache_dir).release()
+    data_path, _ = MmapFrameSource(video, cache_dir=cache_dir).cache_paths()
+    mtime = (tmp_path / "cache" / data_path.split("/")[-1]).stat().st_mtime_ns
+
+    MmapFrameSource(video, cache_dir=cache_dir).release()
+    assert (tmp_path / "cache" / data_path.split("/")[-1]).stat().st_mtime_ns == mtime
+    assert sorted(p.suffix for p in (tmp_path / "cache").iterdir()) == [".json", ".u8"]
+
+
+def test_falls_back_to_decoder_when_cache_too_large(video, tmp_path, monkeypatch):
+    with pytest.raises(MemoryError):
+        MmapFrameSource(video, cache_dir=str(tmp_path / "cache"), max_cache_mb=0)
+    assert list((tmp_path / "cache").iterdir()) == []
+
+    def too_large(*args, **kwargs):
+        raise MemoryError("too large")
+
+    monkeypatch.setattr("services.road_services.FrameSource.MmapFrameSource", too_large)
+    source = open_frame_source(video, mode="mmap")
+    assert source.isOpened()
+    assert isinstance(source, VideoFrameSource)
+    source.release()
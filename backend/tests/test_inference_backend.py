@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from services.model_services.InferenceBackend import BackendSelector, detection_agreement, discover_backends
+
+
+def make_exports(root):
+    openvino = root / "openvino models" / "best_int8_openvino_model"
+    openvino.mkdir(parents=True)
+    (openvino / "best.xml").write_text("")
+    (openvino / "best.bin").write_text("")
+    # Bản export thiếu file trọng số
+    ncnn = root / "bench marks" / "best_ncnn_model"
+    ncnn.mkdir(parents=True)
+    (ncnn / "model.ncnn.param").write_text("")
+    (root / "onnx models").mkdir()
+    (root / "onnx models" / "best_int8.onnx").write_text("")
+    return openvino
+
+
+def test_discover_backends_reports_missing_files(tmp_path):
+    make_exports(tmp_path)
+    backends = {b.name: b for b in discover_backends(str(tmp_path))}
+    assert set(backends) == {"openvino-int8", "ncnn-fp", "onnxruntime-int8"}
+    assert "*.bin" in backends["ncnn-fp"].missing()
+    assert "*.xml" not in backends["openvino-int8"].missing()
+
+
+def test_detection_agreement():
+    reference = np.array([[0, 0, 10, 10, 0.9, 2], [20, 20, 40, 40, 0.8, 3]], dtype=np.float32)
+    assert detection_agreement(reference, reference) == 1.0
+    assert detection_agreement(reference[:0], reference[:0]) == 1.0
+    assert detection_agreement(reference, reference[:1]) == pytest.approx(2 / 3)
+
+    # Cùng vị trí nhưng khác lớp thì không khớp
+    wrong_class = reference.copy()
+    wrong_class[1, 5] = 2
+    assert detection_agreement(reference, wrong_class) == pytest.approx(0.5)
+
+
+def test_forced_runtime_skips_benchmark(tmp_path):
+    pytest.importorskip("openvino")
+    openvino = make_exports(tmp_path)
+    selector = BackendSelector(models_dir=str(tmp_path), reference_path=str(openvino),
+                               selection_path=str(tmp_path / "selection.json"))
+    selection = selector.select("openvino")
+    assert selection["selected"]["path"] == str(openvino)
+    assert selector.select("ncnn")["selected"] is None
+
+
+def test_selector_measures_with_the_workers_inference_settings():
+    from core.config import settings_metric_transport
+
+    # Đo với đúng imgsz/conf/iou mà các process phân tích dùng
+    args = BackendSelector().predict_args
+    assert (args["imgsz"], args["conf"], args["iou"]) == (settings_metric_transport.IMGSZ,
+                                                         settings_metric_transport.CONF,
+                                                         settings_metric_transport.IOU)
@@ -0,0 +1,132 @@
+import pytest
+
+from services.road_services.InferenceScheduler import InferenceScheduler, allocate_budget
+from services.road_services.WorkerStatus import WorkerStatus
+
+
+def make_scheduler(statuses, budget=2.0):
+    return InferenceScheduler(statuses, get_budget=lambda: budget, interval=1, latency_slo=0.25, min_fps=5,
+                              max_fps=30, viewer_weight=1.0, degrade_after=2, restore_after=3,
+                              restore_ratio=0.6, max_level=3)
+
+
+def run_frames(status, frames, latency):
+    for _ in range(frames):
+        status.frame_done(latency=latency)
+
+
+def test_allocate_budget_is_max_min_fair():
+    # a cần ít hơn phần của mình, phần dư được chia cho b và c
+    allocation = allocate_budget({"a": 0.5, "b": 3, "c": 3}, {"a": 1, "b": 1, "c": 1}, 3)
+    assert allocation["a"] == pytest.approx(0.5)
+    assert allocation["b"] == pytest.approx(1.25)
+    assert allocation["c"] == pytest.approx(1.25)
+
+    # Trọng số gấp đôi thì được gấp đôi khi thiếu budget, trọng số 0 không được cấp
+    allocation = allocate_budget({"a": 3, "b": 3, "c": 3}, {"a": 2, "b": 1, "c": 0}, 3)
+    assert allocation["a"] == pytest.approx(2)
+    assert allocation["b"] == pytest.approx(1)
+    assert "c" not in allocation
+
+
+def test_viewer_gets_larger_share_when_oversubscribed():
+    statuses = {"a": WorkerStatus(), "b": WorkerStatus()}
+    scheduler = make_scheduler(statuses, budget=1.0)
+    scheduler.tick(now=0)
+    for status in statuses.values():
+        run_frames(status, 10, latency=0.04)
+    scheduler.viewer_joined("a")
+    scheduler.viewer_joined("không có")
+    scheduler.tick(now=1)
+
+    report = scheduler.snapshot()["roads"]
+    # Mỗi tuyến đường cần 1 core (0.04s * 30fps, tối đa bằng số thread), budget 1 core chia theo trọng số 2:1
+    assert report["a"]["cores"] == pytest.approx(2 / 3, abs=0.01)
+    assert statuses["a"].effective_max_fps == pytest.approx(16.7, abs=0.1)
+    assert statuses["b"].effective_max_fps == pytest.approx(8.3, abs=0.1)
+    # Tên không phải tuyến đường đang chạy thì bị bỏ qua
+    assert scheduler.viewers == {"a": 1}
+
+    scheduler.viewer_left("a")
+    scheduler.set_priority("b", 3)
+    scheduler.tick(now=2)
+    assert statuses["b"].effective_max_fps > statuses["a"].effective_max_fps
+
+
+def test_pinned_roads_only_share_cores_within_their_group():
+    # 3 core, mỗi process ghim 1 core riêng (như plan_cpus), d và e dùng chung core 3
+    workers = {"a": {"cpus": [0], "threads": 1}, "b": {"cpus": [1], "threads": 1}, "c": {"cpus": [2], "threads": 1},
+               "d": {"cpus": [3], "threads": 1}, "e": {"cpus": [3], "threads": 1}}
+    statuses = {name: WorkerStatus() for name in workers}
+    scheduler = make_scheduler(statuses, budget=3.0)
+    scheduler.get_workers = lambda: workers
+    scheduler.tick(now=0)
+    for status in statuses.values():
+        run_frames(status, 10, latency=0.1)
+    scheduler.viewer_joined("a")
+    scheduler.viewer_joined("a")
+    scheduler.viewer_joined("d")
+    scheduler.tick(now=1)
+
+    report = scheduler.snapshot()["roads"]
+    # Người xem không lấy được core của process khác: a, b, c đều đủ core của mình nên không bị giới hạn fps
+    for name in ("a", "b", "c"):
+        assert report[name]["cores"] == pytest.approx(1)
+        assert statuses[name].values[WorkerStatus.SCHED_FPS] == 0
+    # d và e chia core 3 theo trọng số 2:1
+    assert statuses["d"].effective_max_fps == pytest.approx(6.7, abs=0.1)
+    assert statuses["e"].effective_max_fps == pytest.approx(5, abs=0.1)
+
+    # Process 2 thread cần gấp đôi số core cho cùng fps
+    workers["a"] = {"cpus": [0, 4], "threads": 2}
+    scheduler.tick(now=2)
+    assert scheduler.snapshot()["roads"]["a"]["cores"] == pytest.approx(2)
+    assert statuses["a"].values[WorkerStatus.SCHED_FPS] == 0
+
+
+def test_road_with_enough_budget_is_not_capped():
+    statuses = {"a": WorkerStatus()}
+    statuses["a"].set_control(max_fps=12)
+    scheduler = make_scheduler(statuses, budget=4.0)
+    run_frames(statuses["a"], 1, latency=0.05)
+    scheduler.tick(now=0)
+    assert statuses["a"].values[WorkerStatus.SCHED_FPS] == 0
+    # Giới hạn fps do admin đặt vẫn được giữ
+    assert statuses["a"].effective_max_fps == 12
+
+
+def test_degrade_on_slo_misses_and_restore_with_headroom():
+    statuses = {"a": WorkerStatus()}
+    scheduler = make_scheduler(statuses, budget=4.0)
+    status = statuses["a"]
+    run_frames(status, 1, latency=0.4)
+
+    scheduler.tick(now=0)
+    assert status.level == 0
+    scheduler.tick(now=1)
+    assert status.level == 1
+    scheduler.tick(now=2)
+    scheduler.tick(now=3)
+    assert status.level == 2
+
+    # Latency giảm hẳn dưới SLO: khôi phục từng mức sau restore_after chu kỳ liên tiếp
+    status.values[WorkerStatus.LATENCY] = 0.05
+    for now in range(4, 7):
+        run_frames(status, 20, latency=0.05)
+        scheduler.tick(now=now)
+    assert status.level == 1
+    for now in range(7, 10):
+        run_frames(status, 20, latency=0.05)
+        scheduler.tick(now=now)
+    assert status.level == 0
+
+
+def test_removed_road_is_forgotten():
+    statuses = {"a": WorkerStatus(), "b": WorkerStatus()}
+    scheduler = make_scheduler(statuses)
+    run_frames(statuses["a"], 1, latency=0.1)
+    run_frames(statuses["b"], 1, latency=0.1)
+    scheduler.tick(now=0)
+    statuses.pop("b")
+    scheduler.tick(now=1)
+    assert set(scheduler.snapshot()["roads"]) == {"a"}
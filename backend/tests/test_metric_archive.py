@@ -0,0 +1,66 @@
+from datetime import date, datetime, timedelta
+
+from services.metric_services.MetricArchive import MetricArchive
+
+
+def _window(road, start, count_car=10, speed_car=30):
+    return {
+        "road_name": road,
+        "window_start": start,
+        "window_end": start + timedelta(seconds=30),
+        "count_car": count_car,
+        "speed_car": speed_car,
+        "count_motor": 5,
+        "speed_motor": 0,
+        "frames": 300,
+    }
+
+
+def test_append_flush_and_query_by_partition(tmp_path):
+    archive = MetricArchive(str(tmp_path), row_group_size=3, flush_interval=3600)
+    t0 = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(4):
+        archive.append(_window("Văn Quán", t0 + timedelta(seconds=30 * i), count_car=i))
+    archive.append(_window("Ngã Tư Sở", t0))
+    # 3 dòng đủ một row group nên đã được ghi, 2 dòng còn lại vẫn nằm trong bộ đệm
+    assert archive.query().num_rows == 3
+    archive.flush()
+
+    table = archive.query(roads=["Văn Quán"], columns=["count_car"])
+    assert table.column_names == ["road", "window_start", "count_car"]
+    assert table["count_car"].to_pylist() == [0, 1, 2, 3]
+
+    table = archive.query(start=t0 + timedelta(seconds=60), end=t0 + timedelta(seconds=90))
+    assert table["road"].to_pylist() == ["Văn Quán"]
+
+
+def test_aggregate_ignores_zero_speeds(tmp_path):
+    archive = MetricArchive(str(tmp_path))
+    t0 = datetime(2025, 1, 1, 8, 0, 0)
+    archive.append(_window("Văn Phú", t0, count_car=10, speed_car=20))
+    archive.append(_window("Văn Phú", t0 + timedelta(minutes=1), count_car=20, speed_car=0))
+    archive.append(_window("Văn Phú", t0 + timedelta(hours=1), count_car=4, speed_car=40))
+    archive.flush()
+
+    rows = archive.aggregate(bucket="hour")
+    assert [r["windows"] for r in rows] == [2, 1]
+    assert rows[0]["count_car"] == 15 and rows[0]["count_car_max"] == 20
+    assert rows[0]["speed_car"] == 20
+    assert rows[0]["speed_motor"] == 0
+
+
+def test_compact_merges_closed_partitions(tmp_path):
+    archive = MetricArchive(str(tmp_path))
+    t0 = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(3):
+        archive.append(_window("Văn Quán", t0 + timedelta(minutes=i)))
+        archive.flush()
+    archive.append(_window("Văn Quán", datetime.combine(date.today(), t0.time())))
+    archive.flush()
+
+    assert archive.compact() == 1
+    files = list(tmp_path.glob("date=2025-01-01/road=*/*.parquet"))
+    assert len(files) == 1
+    assert archive.query().num_rows == 4
+    # Partition của hôm nay vẫn đang được ghi nên không được gộp
+    assert len(list(tmp_path.glob(f"date={date.today().isoformat()}/road=*/*.parquet"))) == 1
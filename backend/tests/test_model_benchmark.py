@@ -0,0 +1,35 @@
+import pytest
+
+from services.model_services.ModelBenchmark import ModelBenchmark
+
+
+def make_report(fps_by_cell, host="cpu|4 cpu|0 thread"):
+    cells = []
+    for (model, imgsz), fps in fps_by_cell.items():
+        cell = {"backend": "openvino-int8", "model": model, "threads": 1, "imgsz": imgsz, "batch": 1}
+        if fps is None:
+            cell["error"] = "Thiếu *.bin"
+        else:
+            cell.update(latency_ms={"p50": 1000 / fps, "p90": 1000 / fps, "p99": 1000 / fps, "mean": 1000 / fps},
+                        fps=fps, peak_rss_mb=500.0)
+        cells.append(cell)
+    return {"created_at": "2025-11-20T08:00:00", "host": host, "video": "demo.mp4", "frames": 8, "runs": 10,
+            "cells": cells}
+
+
+def test_compare_flags_regressions_against_baseline():
+    baseline = make_report({("a", 640): 20.0, ("a", 320): 40.0, ("b", 640): None})
+    report = make_report({("a", 640): 19.0, ("a", 320): 30.0, ("b", 640): 25.0, ("c", 640): 10.0})
+
+    regressions = ModelBenchmark.compare(report, baseline, tolerance=0.1)
+    # Chỉ ô chậm hơn quá 10%; ô mới hoặc baseline lỗi thì không so sánh
+    assert [(cell["model"], cell["imgsz"]) for cell in regressions] == [("a", 320)]
+    assert report["cells"][0]["fps_change"] == pytest.approx(-0.05)
+    assert "fps_change" not in report["cells"][2]
+
+
+def test_markdown_lists_every_cell():
+    report = make_report({("a", 640): 20.0, ("b", 640): None})
+    markdown = ModelBenchmark.to_markdown(report)
+    assert "| openvino-int8 | a | 1 | 640 | 1 | 50.0 |" in markdown
+    assert "Thiếu *.bin" in markdown
@@ -0,0 +1,46 @@
+import numpy as np
+
+from services.model_services.ModelCascade import ModelCascade, merge_detections
+
+
+def make_cascade(primary, **kwargs):
+    calls = []
+
+    def secondary_detect(image):
+        calls.append(image)
+        return np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32)
+
+    args = {"keyframe_interval": 5, "min_interval": 2, "uncertain_conf": 0.45, "max_uncertain_ratio": 0.5}
+    args.update(kwargs)
+    return ModelCascade(lambda image: primary, secondary_detect, **args), calls
+
+
+def test_secondary_runs_on_keyframes_only_when_primary_is_confident():
+    confident = np.array([[0, 0, 10, 10, 0.8, 0]], dtype=np.float32)
+    cascade, calls = make_cascade(confident)
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    for _ in range(11):
+        cascade.refine(image)
+    # Frame đầu, rồi mỗi 5 frame
+    assert len(calls) == 3
+    assert cascade.as_dict()["secondary_frames"] == 3
+
+
+def test_secondary_runs_when_primary_is_uncertain_but_not_more_than_min_interval():
+    uncertain = np.array([[0, 0, 10, 10, 0.3, 0], [20, 20, 30, 30, 0.8, 1]], dtype=np.float32)
+    cascade, calls = make_cascade(uncertain)
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    for _ in range(10):
+        cascade.refine(image)
+    assert len(calls) == 5
+
+
+def test_merge_keeps_secondary_and_confident_primary_misses():
+    secondary = np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32)
+    primary = np.array([[1, 1, 10, 10, 0.6, 0],      # trùng box của model S
+                        [50, 50, 60, 60, 0.7, 1],    # model S bỏ sót, đủ chắc chắn
+                        [80, 80, 90, 90, 0.3, 1]],   # model S bỏ sót, không chắc chắn
+                       dtype=np.float32)
+    merged = merge_detections(secondary, primary, iou_threshold=0.5, keep_conf=0.5)
+    np.testing.assert_array_equal(merged, np.concatenate([secondary, primary[1:2]]))
+    assert len(merge_detections(secondary[:0], primary, keep_conf=0.5)) == 2
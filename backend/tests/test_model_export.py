@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+MODEL_PATH = os.path.join(APP_DIR, "ai_models", "model N", "openvino models", "best_int8_openvino_model")
+
+
+@pytest.fixture(scope="module")
+def source_model(tmp_path_factory):
+    pytest.importorskip("openvino")
+    if not os.path.exists(os.path.join(MODEL_PATH, "best.bin")):
+        pytest.skip("Không có model OpenVINO INT8")
+    model_dir = tmp_path_factory.mktemp("models") / "best_int8_openvino_model"
+    shutil.copytree(MODEL_PATH, model_dir)
+    return str(model_dir)
+
+
+def sample_image():
+    import cv2
+
+    image = cv2.imread(os.path.join(APP_DIR, "..", "..", ".github", "demo.png"))
+    if image is None:
+        pytest.skip("Không có ảnh mẫu")
+    return cv2.resize(image, (600, 400))[130:, 50:].copy()
+
+
+def test_nms_in_graph_matches_raw_model(source_model):
+    from services.model_services.AsyncDetector import AsyncDetector
+    from services.model_services.InferenceBackend import detection_agreement
+    from utils.model_export import add_nms_to_openvino, is_end2end
+
+    exported = add_nms_to_openvino(source_model, conf=0.2, iou=0.3, max_det=50)
+    assert exported.endswith("best_int8_nms_openvino_model")
+    assert is_end2end(exported) and not is_end2end(source_model)
+
+    raw = AsyncDetector(source_model, num_requests=1, performance_hint="LATENCY")
+    end2end = AsyncDetector(exported, num_requests=1, performance_hint="LATENCY")
+    assert end2end.end2end and not raw.end2end
+    assert tuple(end2end.compiled.output(0).get_partial_shape().to_shape()) == (1, 50, 6)
+
+    image = sample_image()
+    reference, detections = raw.detect(image), end2end.detect(image)
+    assert len(reference) > 0
+    assert detection_agreement(reference, detections) == 1.0
+
+
+def test_class_filter_in_graph(source_model, tmp_path):
+    from services.model_services.AsyncDetector import AsyncDetector
+    from utils.model_export import add_nms_to_openvino
+
+    exported = add_nms_to_openvino(source_model, str(tmp_path / "motor_nms_openvino_model"), classes=[1])
+    reference = AsyncDetector(source_model, num_requests=1).detect(sample_image())
+    detections = AsyncDetector(exported, num_requests=1).detect(sample_image())
+    assert set(detections[:, 5]) == {1.0}
+    assert len(detections) == int((reference[:, 5] == 1).sum())
@@ -0,0 +1,33 @@
+import pytest
+
+from utils import model_preload
+from utils.model_preload import openvino_options, get_preloaded_model, warmup
+
+
+def test_openvino_options_configures_and_restores_core(tmp_path):
+    ov = pytest.importorskip("openvino")
+    original = ov.Core
+    cache_dir = str(tmp_path / "ov_cache")
+
+    with openvino_options(cache_dir, num_threads=1):
+        core = ov.Core()
+        assert core.get_property("CACHE_DIR") == cache_dir
+        assert core.get_property("CPU", "INFERENCE_NUM_THREADS") == 1
+
+    assert ov.Core is original
+    assert ov.Core().get_property("CACHE_DIR") == ""
+
+
+def test_preloaded_model_only_returned_for_same_path(monkeypatch):
+    model = object()
+    monkeypatch.setattr(model_preload, "preloaded_model", model)
+    monkeypatch.setattr(model_preload, "preloaded_path", "./models/a")
+
+    assert get_preloaded_model("./models/a") is model
+    assert get_preloaded_model("./models/b") is None
+
+
+def test_warmup_runs_on_blank_image():
+    shapes = []
+    warmup(lambda image: shapes.append((image.shape, int(image.max()))), shape=(10, 20, 3), runs=2)
+    assert shapes == [((10, 20, 3), 0), ((10, 20, 3), 0)]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import numpy as np
+
+from utils.offline_utils import aggregate_windows, split_segments, stitch_segments
+
+
+def _segment(nominal_start, counts, speeds, head, tail):
+    return {
+        "nominal_start": nominal_start,
+        "counts": np.array(counts, dtype=np.int32).reshape(-1, 3),
+        "speeds": np.array(speeds, dtype=np.int32).reshape(-1, 4),
+        "head": np.array(head, dtype=np.int32).reshape(-1, 6),
+        "tail": np.array(tail, dtype=np.int32).reshape(-1, 6),
+    }
+
+
+def test_split_segments_overlap():
+    segments = split_segments(total_frames=250, segment_frames=100, overlap_frames=10)
+    assert segments == [
+        {"start_frame": 0, "nominal_start": 0, "end_frame": 100},
+        {"start_frame": 90, "nominal_start": 100, "end_frame": 200},
+        {"start_frame": 190, "nominal_start": 200, "end_frame": 250},
+    ]
+
+
+def test_stitch_dedupes_track_crossing_boundary():
+    box = [10, 10, 50, 50]
+    # Track 7 của đoạn đầu chính là track 3 của đoạn sau (cùng box ở vùng chồng lấn)
+    first = _segment(0, [(0, 1, 0), (1, 1, 0)], [(0, 7, 0, 40)], [],
+                     [(0, 7, *box), (1, 7, *box)])
+    second = _segment(2, [(2, 1, 0), (3, 1, 1)], [(0, 3, 0, 42), (0, 4, 1, 25)],
+                      [(0, 3, *box), (1, 3, *box)], [])
+
+    counts, speeds = stitch_segments([second, first])
+
+    assert counts[:, 0].tolist() == [0, 1, 2, 3]
+    # Chỉ còn một vận tốc oto trong cửa sổ 0 (của đoạn đầu), xe máy có id toàn cục mới
+    assert sorted(speeds[:, 2].tolist()) == [0, 1]
+    assert speeds[speeds[:, 2] == 0, 3].tolist() == [40]
+    assert len(np.unique(speeds[:, 1])) == 2
+
+
+def test_aggregate_windows_uses_video_time():
+    counts = np.array([(f, 2, 1) for f in range(40)], dtype=np.int32)
+    speeds = np.array([(0, 1, 0, 30), (1, 2, 0, 50), (1, 3, 1, 20)], dtype=np.int64)
+    start = datetime(2025, 1, 1, 8, 0, 0)
+
+    rows = aggregate_windows(counts, speeds, fps=10, time_step=2, start_time=start, road_name="Văn Quán")
+
+    assert [r["window_start"] for r in rows] == [
+        datetime(2025, 1, 1, 8, 0, 0), datetime(2025, 1, 1, 8, 0, 2)]
+    assert rows[0]["frames"] == 20 and rows[0]["count_car"] == 2
+    assert rows[0]["speed_car"] == 30 and rows[0]["speed_motor"] == 0
+    assert rows[1]["speed_car"] == 50 and rows[1]["speed_motor"] == 20
@@ -0,0 +1,153 @@
+"""Benchmark vòng lặp xử lý frame trên dữ liệu giả lập (utils.synthetic_video), không cần video hay model.
+
+Lưu kết quả làm mốc rồi so sánh, lệnh thứ hai thất bại khi có benchmark chậm đi quá 15%:
+    pytest tests/test_pipeline_benchmark.py --benchmark-autosave
+    pytest tests/test_pipeline_benchmark.py --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+torch = pytest.importorskip("torch")
+
+from ultralytics.engine.results import Boxes
+
+from services.road_services.AnalyzeOnRoadBase import AnalyzeOnRoadBase
+from utils.synthetic_video import synthetic_detections, synthetic_frame, synthetic_speeds, synthetic_tracks, \
+    write_synthetic_video
+from utils.transport_utils import avg_none_zero_batch, convert_frame_to_byte
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "app")
+MODEL_PATH = os.path.join(APP_DIR, "ai_models", "model N", "openvino models", "best_int8_openvino_model")
+# (ô tô, xe máy) mỗi frame: đường vắng và giờ cao điểm
+TRAFFIC = [(5, 10), (30, 60)]
+
+
+class BenchmarkAnalyzer(AnalyzeOnRoadBase):
+    def __init__(self, stop_after=None, **kwargs):
+        # Kết quả phát hiện được truyền vào nên model không chạy, chỉ cần dựng YOLO từ file cấu hình
+        kwargs.setdefault("model_path", "yolo11n.yaml")
+        super().__init__(meter_per_pixel=0.06, detection_mode="off", **kwargs)
+        self.stop_after = stop_after
+        self.frames = 0
+
+    def update_for_frame(self):
+        pass
+
+    def update_for_vehicle(self):
+        pass
+
+    def heartbeat(self):
+        if self.stop_after is not None and self.frames >= self.stop_after:
+            raise KeyboardInterrupt
+        self.frames += 1
+
+
+def load_tracks(analyzer, frame_index, cars, motors):
+    tracks = synthetic_tracks(frame_index, cars, motors)
+    analyzer.speed_tool.track_data = Boxes(torch.as_tensor(tracks), tracks.shape[:2])
+    analyzer.speed_tool.spd = synthetic_speeds(tracks)
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return BenchmarkAnalyzer(path_video="synthetic.mp4")
+
+
+@pytest.mark.parametrize("cars,motors", TRAFFIC)
+def test_post_processing(benchmark, analyzer, cars, motors):
+    load_tracks(analyzer, 10, cars, motors)
+
+    def setup():
+        analyzer.ids_old.clear()
+        analyzer.list_speed_car.clear()
+        analyzer.list_speed_motor.clear()
+
+    benchmark.pedantic(analyzer.post_processing, setup=setup, rounds=300, warmup_rounds=10)
+    assert analyzer.list_count_car[-1] == cars and analyzer.list_count_motor[-1] == motors
+    assert len(analyzer.list_speed_car) + len(analyzer.list_speed_motor) == cars + motors
+
+
+@pytest.mark.parametrize("cars,motors", TRAFFIC)
+def test_draw_info_to_frame_output(benchmark, analyzer, cars, motors):
+    load_tracks(analyzer, 10, cars, motors)
+    analyzer.post_processing()
+    frame = synthetic_frame(10, cars, motors)
+
+    def setup():
+        analyzer.frame_output = frame.copy()
+        analyzer.frame_predict = analyzer.frame_output[analyzer.roi_y_start:, analyzer.roi_x_start:]
+
+    benchmark.pedantic(analyzer.draw_info_to_frame_output, setup=setup, rounds=300, warmup_rounds=10)
+    assert not np.array_equal(analyzer.frame_output, frame)
+
+
+def test_avg_none_zero_batch(benchmark):
+    # Một cửa sổ 30 giây ở 30 fps
+    rng = np.random.default_rng(0)
+    lists = [rng.integers(0, 60, 900).tolist() for _ in range(4)]
+    result = benchmark(avg_none_zero_batch, *lists)
+    assert all(value > 0 for value in result)
+
+
+def test_convert_frame_to_byte(benchmark):
+    frame = synthetic_frame(0, 30, 60)
+    data = benchmark(convert_frame_to_byte, frame)
+    assert data[:2] == b"\xff\xd8"
+
+
+def test_update_data(benchmark, analyzer):
+    # time_step = 0 nên mỗi lần gọi đều đóng một cửa sổ thống kê (nhánh tốn nhất của update_data)
+    analyzer.time_step = 0
+    rng = np.random.default_rng(0)
+    values = [rng.integers(0, 60, 900).tolist() for _ in range(4)]
+
+    def setup():
+        for target, source in zip((analyzer.list_count_car, analyzer.list_speed_car, analyzer.list_count_motor,
+                                   analyzer.list_speed_motor), values):
+            target[:] = source
+
+    benchmark.pedantic(analyzer.update_data, setup=setup, rounds=300, warmup_rounds=10)
+    assert analyzer.last_window is not None and analyzer.count_car_display > 0
+
+
+@pytest.mark.parametrize("cars,motors", TRAFFIC)
+def test_process_single_frame(benchmark, cars, motors):
+    analyzer = BenchmarkAnalyzer(path_video="synthetic.mp4")
+    frames = [synthetic_frame(i, cars, motors) for i in range(30)]
+    detections = [synthetic_detections(i, cars, motors) for i in range(30)]
+    frame_index = iter(range(10 ** 9))
+
+    def setup():
+        i = next(frame_index) % len(frames)
+        return (frames[i].copy(), None, detections[i]), {}
+
+    benchmark.pedantic(analyzer.process_single_frame, setup=setup, rounds=200, warmup_rounds=30)
+    assert analyzer.ids is not None and len(analyzer.ids) > 0
+
+
+def test_end_to_end_fps(benchmark, tmp_path):
+    """fps của cả vòng lặp đọc video, suy luận và theo dõi trên video giả lập, tính cả thời gian nạp model
+    (cần model OpenVINO)"""
+    pytest.importorskip("openvino")
+    if not os.path.isdir(MODEL_PATH):
+        pytest.skip("Không có model OpenVINO INT8")
+    path = write_synthetic_video(str(tmp_path / "synthetic.mp4"), frames=60)
+    frames = 60
+
+    elapsed = []
+
+    def run():
+        # Tự đo thời gian vì benchmark.stats là None khi chạy với --benchmark-disable
+        start = time.perf_counter()
+        analyzer = BenchmarkAnalyzer(path_video=path, model_path=MODEL_PATH, stop_after=frames)
+        analyzer.process_on_single_video()
+        elapsed.append(time.perf_counter() - start)
+        return analyzer
+
+    analyzer = benchmark.pedantic(run, rounds=1, iterations=1)
+    benchmark.extra_info["fps"] = round(frames / elapsed[-1], 1)
+    assert analyzer.frames == frames
@@ -0,0 +1,110 @@
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from services.road_services.StageTimer import StageTimer
+from services.system_services.PrometheusMetrics import Histogram, PrometheusMetrics
+
+
+def parse(text):
+    """{dòng mẫu không gồm giá trị: giá trị}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def test_api_side_metrics():
+    metrics = PrometheusMetrics()
+    metrics.add_gauge("traffic_websocket_subscribers", 1, stream="frames", road="Đường Láng")
+    metrics.add_gauge("traffic_websocket_subscribers", 1, stream="frames", road="Đường Láng")
+    metrics.add_gauge("traffic_websocket_subscribers", -1, stream="frames", road="Đường Láng")
+    metrics.inc("traffic_bytes_sent_total", 1000, endpoint="ws_frames")
+    metrics.inc("traffic_bytes_sent_total", 500, endpoint="ws_frames")
+    for value in (0.3, 1.5, 100):
+        metrics.observe("traffic_chat_seconds", value, endpoint="chat")
+    with metrics.time("traffic_chat_seconds", endpoint="ws_chat"):
+        pass
+
+    text = metrics.render()
+    samples = parse(text)
+    assert "# TYPE traffic_chat_seconds histogram" in text
+    assert samples['traffic_websocket_subscribers{stream="frames",road="Đường Láng"}'] == 1
+    assert samples['traffic_bytes_sent_total{endpoint="ws_frames"}'] == 1500
+    assert samples['traffic_chat_seconds_bucket{endpoint="chat",le="0.25"}'] == 0
+    assert samples['traffic_chat_seconds_bucket{endpoint="chat",le="2"}'] == 2
+    assert samples['traffic_chat_seconds_bucket{endpoint="chat",le="+Inf"}'] == 3
+    assert samples['traffic_chat_seconds_count{endpoint="chat"}'] == 3
+    assert samples['traffic_chat_seconds_sum{endpoint="chat"}'] == 101.8
+    assert samples['traffic_chat_seconds_count{endpoint="ws_chat"}'] == 1
+    # Chưa có số liệu thì không xuất
+    assert "traffic_inference_seconds" not in text
+
+
+def test_pipeline_metrics_from_shared_memory():
+    timer = StageTimer(window=60, slots=6)
+    for latency in (0.01, 0.02, 0.04, 5.0):
+        timer.add("inference", latency)
+    # 2 frame mỗi giây đều đặn trong 90 giây vừa qua
+    now = time.time()
+    for i in range(180):
+        timer.add("publish", 0.001, now=now - 90 + i * 0.5)
+    ipc = Histogram((0.001, 0.01))
+    ipc.observe(0.0005)
+    metric_dropped = multiprocessing.Value('L', 3)
+    health = {"A": {"state": "running", "frames": 120, "dropped_frames": 2, "restarts": 1},
+              "B": {"state": "dead", "frames": 0, "dropped_frames": 0, "restarts": 4}}
+    analyzer = SimpleNamespace(get_workers_health=lambda: health, timers={"A": timer}, ipc_latency={"frame": ipc},
+                               metric_dropped=metric_dropped)
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+
+    with engine.connect():
+        samples = parse(PrometheusMetrics().render(analyzer, engine))
+    assert samples['traffic_worker_up{road="A"}'] == 1 and samples['traffic_worker_up{road="B"}'] == 0
+    assert samples['traffic_road_frames_total{road="A"}'] == 120
+    assert samples['traffic_road_dropped_frames_total{road="A"}'] == 2
+    assert samples['traffic_worker_restarts_total{road="B"}'] == 4
+    assert abs(samples['traffic_road_fps{road="A"}'] - 2.0) < 0.1
+    assert samples['traffic_metric_snapshots_dropped_total'] == 3
+
+    buckets = [(float(name.split('le="')[1][:-2]), value) for name, value in samples.items()
+               if name.startswith('traffic_inference_seconds_bucket{road="A"') and "+Inf" not in name]
+    assert [value for _, value in sorted(buckets)] == sorted(value for _, value in buckets)
+    assert max(value for edge, value in buckets if edge < 0.05) == 3
+    assert samples['traffic_inference_seconds_bucket{road="A",le="+Inf"}'] == 4
+    assert abs(samples['traffic_inference_seconds_sum{road="A"}'] - 5.07) < 1e-9
+    assert samples['traffic_stage_seconds_count{road="A",stage="publish"}'] == 180
+    assert 'traffic_stage_seconds_count{road="A",stage="decode"}' not in samples
+
+    assert samples['traffic_ipc_read_seconds_bucket{kind="frame",le="0.001"}'] == 1
+    assert samples['traffic_db_pool_size'] == 3
+    assert samples['traffic_db_pool_connections{state="checked_out"}'] == 1
+
+
+
+def test_record_delivery_freshness_and_skipped_seq():
+    metrics = PrometheusMetrics()
+    now = time.time()
+    last_seq = None
+    # Client nhận seq 1, 1, 4 (bỏ lỡ 2 và 3), rồi process phân tích khởi động lại (seq quay về 1)
+    for seq in (1, 1, 4, 1):
+        packet = {"seq": seq, "captured_at": now - 0.4, "published_at": now - 0.2}
+        last_seq = metrics.record_delivery("ws_frames", "A", packet, last_seq)
+    assert last_seq == 1
+    assert metrics.record_delivery("ws_frames", "A", {}, last_seq) == 1
+
+    samples = parse(metrics.render())
+    labels = 'endpoint="ws_frames",road="A"'
+    assert samples[f"traffic_skipped_seq_total{{{labels}}}"] == 2
+    assert samples[f"traffic_capture_to_send_seconds_count{{{labels}}}"] == 4
+    assert samples[f'traffic_capture_to_send_seconds_bucket{{{labels},le="0.25"}}'] == 0
+    assert samples[f'traffic_capture_to_send_seconds_bucket{{{labels},le="0.5"}}'] == 4
+    # Cùng một frame gửi nhiều lần chỉ tính capture -> publish một lần
+    assert samples[f"traffic_capture_to_publish_seconds_count{{{labels}}}"] == 3
+    assert samples[f'traffic_capture_to_publish_seconds_bucket{{{labels},le="0.1"}}'] == 0
+    assert samples[f'traffic_capture_to_publish_seconds_bucket{{{labels},le="0.25"}}'] == 3
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from services.model_services.QuantizationPipeline import QuantizationPipeline, average_precision_50, \
+    sample_video_frames
+
+
+def test_average_precision_50():
+    ground_truth = [np.array([[0, 0, 10, 10, 1, 0], [20, 20, 30, 30, 1, 0], [40, 40, 50, 50, 1, 0],
+                              [60, 60, 70, 70, 1, 0]], dtype=np.float32)]
+    detections = [np.array([[0, 0, 10, 10, 0.9, 0], [100, 100, 110, 110, 0.8, 0], [20, 20, 30, 30, 0.7, 0],
+                            [40, 40, 50, 50, 0.6, 0], [200, 200, 210, 210, 0.5, 0]], dtype=np.float32)]
+    # Cùng giá trị với ap_per_class của ultralytics
+    assert average_precision_50(ground_truth, detections) == pytest.approx(0.62)
+    assert average_precision_50(ground_truth, ground_truth) == pytest.approx(0.995)
+    assert average_precision_50(ground_truth, [detections[0][:0]]) == 0.0
+
+    # Sai lớp thì không được tính
+    wrong_class = ground_truth[0].copy()
+    wrong_class[:, 5] = 1
+    assert average_precision_50(ground_truth, [wrong_class]) == 0.0
+
+
+def test_gate_rejects_slow_or_inaccurate_int8(tmp_path):
+    pipeline = QuantizationPipeline("best.pt", work_dir=str(tmp_path), min_speedup=1.1, max_fps_regression=0.1,
+                                    min_fps=0, max_map_drop=0.05)
+    fp = {"fps": 20.0, "map50": 0.99}
+    assert pipeline.check({"fps": 30.0, "map50": 0.97}, fp, {"fps": 31.0}, 1.0) == []
+
+    # "Tối ưu" nhưng chậm hơn bản FP và bản đang dùng
+    failures = pipeline.check({"fps": 21.0, "map50": 0.97}, fp, {"fps": 30.0}, 1.0)
+    assert len(failures) == 2
+    assert len(pipeline.check({"fps": 30.0, "map50": 0.9}, fp, None, 1.0)) == 1
+
+
+def test_held_out_frames_are_not_used_for_calibration(tmp_path):
+    cv2 = pytest.importorskip("cv2")
+    path = str(tmp_path / "road.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (600, 400))
+    for i in range(50):
+        writer.write(np.full((400, 600, 3), i * 5, dtype=np.uint8))
+    writer.release()
+
+    calibration = sample_video_frames([path], 10, 0.0, 0.8)
+    evaluation = sample_video_frames([path], 5, 0.8, 1.0)
+    assert len(calibration) == 10 and len(evaluation) == 5
+    # Ảnh là vùng ROI mà pipeline đưa vào model
+    assert calibration[0].shape == (270, 550, 3)
+    assert max(frame.mean() for frame in calibration) < min(frame.mean() for frame in evaluation)
+    assert sample_video_frames([str(tmp_path / "missing.mp4")], 5) == []
+
+
+def test_publish_swaps_the_live_model_in_place(tmp_path):
+    pipeline = QuantizationPipeline("best.pt", work_dir=str(tmp_path / "work"), models_dir=str(tmp_path / "models"))
+    for version in ("v1", "v2"):
+        export = tmp_path / "work" / version / "best_int8_openvino_model"
+        export.mkdir(parents=True)
+        (export / "best.xml").write_text(version)
+        target = pipeline.publish("openvino", str(export), {"version": version})
+    with open(f"{target}/best.xml") as f:
+        assert f.read() == "v2"
+    # Không còn bản tạm hay bản cũ bên cạnh model đang dùng
+    assert sorted(p.name for p in (tmp_path / "models" / "openvino models").iterdir()) == \
+        ["best_int8_openvino_model", "quantization_report.json"]
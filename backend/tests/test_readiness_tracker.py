@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from services.system_services.ReadinessTracker import ReadinessTracker
+
+
+def test_stages_run_concurrently_and_report_state():
+    async def scenario():
+        readiness = ReadinessTracker()
+
+        async def slow_async():
+            await asyncio.sleep(0.3)
+
+        def slow_blocking():
+            time.sleep(0.3)
+
+        def broken():
+            raise RuntimeError("no database")
+
+        start = time.monotonic()
+        readiness.run_stage("database", slow_async)
+        readiness.run_stage("analyzer", slow_blocking)
+        readiness.run_stage("chatbot", broken, required=False)
+        assert not readiness.is_ready()
+        await asyncio.gather(*readiness.tasks.values())
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 0.55
+        assert readiness.components["database"]["state"] == "ready"
+        assert readiness.components["analyzer"]["state"] == "ready"
+        assert readiness.components["chatbot"]["state"] == "failed"
+        assert readiness.components["chatbot"]["detail"] == "no database"
+        # Chatbot không bắt buộc nên server vẫn sẵn sàng
+        assert readiness.is_ready()
+
+    asyncio.run(scenario())
+
+
+def test_stage_can_wait_for_another_stage():
+    async def scenario():
+        readiness = ReadinessTracker()
+        order = []
+
+        async def first():
+            await asyncio.sleep(0.1)
+            order.append("first")
+
+        async def second():
+            order.append("second")
+
+        readiness.run_stage("first", first)
+        readiness.run_stage("second", second, after="first")
+        await asyncio.gather(*readiness.tasks.values())
+        assert order == ["first", "second"]
+
+    asyncio.run(scenario())
+
+
+def test_roads_ready_after_first_frame():
+    readiness = ReadinessTracker()
+    readiness.set("database", readiness.READY)
+
+    health = {"a": {"state": "starting", "frames": 0}, "b": {"state": "paused", "frames": 0}}
+    roads = readiness.roads(health)
+    assert roads["a"]["ready"] is False and roads["b"]["ready"] is True
+    assert not readiness.is_ready(roads)
+
+    health["a"] = {"state": "running", "frames": 3}
+    assert readiness.is_ready(readiness.roads(health))
+
+    # Process bị khởi động lại (frames về 0) không làm tuyến đường mất trạng thái sẵn sàng
+    health["a"] = {"state": "restarting", "frames": 0}
+    roads = readiness.roads(health)
+    assert roads["a"]["ready"] is True
+    assert readiness.snapshot(roads)["roads"]["a"]["state"] == "restarting"
@@ -0,0 +1,76 @@
+import asyncio
+import queue
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db.base import Base
+from models.road_metric import RoadMetric
+from services.metric_services.RoadMetricWriter import RoadMetricWriter
+
+
+def _snapshot(i):
+    start = datetime(2025, 1, 1, 8, 0, 0) + timedelta(seconds=30 * i)
+    return {
+        "road_name": "Văn Quán",
+        "window_start": start,
+        "window_end": start + timedelta(seconds=30),
+        "count_car": i,
+        "speed_car": 30,
+        "count_motor": 2,
+        "speed_motor": 25,
+        "frames": 300,
+    }
+
+
+async def _count_rows(engine):
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(RoadMetric.__table__))).scalar()
+
+
+def test_writer_flushes_in_batches_and_on_stop():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[RoadMetric.__table__])
+
+        source = queue.Queue()
+        for i in range(7):
+            source.put(_snapshot(i))
+        writer = RoadMetricWriter(source, engine=engine, batch_size=3, flush_interval=60, max_pending=100)
+        writer.start()
+        await asyncio.sleep(0.5)
+        # Đã ghi 2 batch đầy, phần còn lại chờ tới hạn flush_interval
+        assert await _count_rows(engine) == 6
+        assert writer.get_stats()["pending"] == 1
+
+        await writer.stop()
+        assert await _count_rows(engine) == 7
+        assert writer.get_stats()["flushes"] == 3
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_writer_applies_backpressure_and_keeps_rows_on_failure():
+    async def scenario():
+        source = queue.Queue()
+        for i in range(10):
+            source.put(_snapshot(i))
+        writer = RoadMetricWriter(source, batch_size=2, flush_interval=60, max_pending=4)
+
+        async def failing_write(batch):
+            raise ConnectionError("database is down")
+
+        writer._write_batch = failing_write
+        writer.start()
+        await asyncio.sleep(0.3)
+        stats = writer.get_stats()
+        # Khi DB lỗi chỉ lấy tối đa max_pending dòng ra khỏi hàng đợi
+        assert stats["pending"] == 4
+        assert source.qsize() == 6
+        assert stats["failed_flushes"] >= 1 and stats["written"] == 0
+        writer._task.cancel()
+
+    asyncio.run(scenario())
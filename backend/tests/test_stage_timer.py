@@ -0,0 +1,68 @@
+import multiprocessing
+
+from services.road_services.StageTimer import StageTimer
+
+
+def record_inference(timer):
+    for _ in range(10):
+        timer.add("inference", 0.05)
+
+
+def test_snapshot_percentiles_and_bottleneck():
+    timer = StageTimer(window=60, slots=6)
+    now = 1_000_000.0
+    for i in range(100):
+        timer.add("decode", 0.001 + i * 0.00001, now=now)
+        timer.add("inference", 0.030, now=now)
+    timer.add("inference", 0.300, now=now)
+
+    snapshot = timer.snapshot(now=now)
+    decode, inference = snapshot["stages"]["decode"], snapshot["stages"]["inference"]
+    assert decode["count"] == 100 and inference["count"] == 101
+    assert abs(decode["mean_ms"] - 1.495) < 1e-3
+    # Phân vị lấy từ bucket (rộng 50%) nên chỉ gần đúng
+    assert 1.0 <= decode["p50_ms"] <= 2.2
+    assert 20 <= inference["p50_ms"] <= 45 and inference["p99_ms"] <= 45
+    assert snapshot["bottleneck"] == "inference"
+    assert "encode" not in snapshot["stages"]
+
+
+def test_old_slots_leave_the_window():
+    timer = StageTimer(window=60, slots=6)
+    timer.add("draw", 0.002, now=1000.0)
+    timer.add("draw", 0.002, now=1035.0)
+    assert timer.snapshot(now=1035.0)["stages"]["draw"]["count"] == 2
+    assert timer.snapshot(now=1065.0)["stages"]["draw"]["count"] == 1
+    # Ô được dùng lại sau một vòng bắt đầu từ 0
+    timer.add("draw", 0.002, now=1060.0)
+    assert timer.snapshot(now=1060.0)["stages"]["draw"]["count"] == 2
+
+
+def test_child_process_writes_are_visible():
+    timer = StageTimer()
+    process = multiprocessing.get_context("spawn").Process(target=record_inference, args=(timer,))
+    process.start()
+    process.join(timeout=60)
+    assert timer.snapshot()["stages"]["inference"]["count"] == 10
+
+
+def test_stage_timer_totals_survive_window():
+    timer = StageTimer(window=60, slots=6)
+    timer.add("inference", 0.03, now=1_000_000.0)
+    timer.add("inference", 0.03, now=1_000_500.0)
+    # Cửa sổ trượt chỉ còn lần đo sau, số liệu cộng dồn giữ cả hai
+    assert timer.histograms(now=1_000_500.0)[timer.index["inference"], timer.buckets + 1] == 1
+    assert timer.cumulative()[timer.index["inference"], timer.buckets + 1] == 2
+
+
+def test_per_second_uses_the_span_covered_by_the_window():
+    timer = StageTimer(window=60, slots=6)
+    start = 1_000_000.0
+    frames = 0
+    # 10 frame mỗi giây đều đặn: ngay sau khi sang ô mới và ở cuối ô đều ra 10, không bị tụt theo phần đã đầy
+    # của ô hiện tại
+    for now in (110.05, 119.95, 120.05):
+        while start + frames * 0.1 <= start + now:
+            timer.add("publish", 0.001, now=start + frames * 0.1)
+            frames += 1
+        assert abs(timer.snapshot(now=start + now)["stages"]["publish"]["per_second"] - 10) < 0.1
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Chỉ process phân tích (ultralytics/torch/openvino), chatbot (langchain/langgraph) và job lưu trữ (pyarrow)
+# cần các thư viện này, chúng phải được import ở nơi dùng đến
+HEAVY_MODULES = ("ultralytics", "torch", "openvino", "langchain", "langchain_core", "langchain_google_genai",
+                 "langgraph", "pyarrow")
+
+
+def import_times(module: str) -> dict:
+    """Chạy `python -X importtime -c "import <module>"` trong thư mục app
+
+    Returns:
+        dict: {tên module: thời gian import tích luỹ (micro giây)}
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=APP_DIR, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        pytest.skip(f"Không import được {module}: {result.stderr.strip().splitlines()[-1:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["core.config", "api.v1.state", "main"])
+def test_startup_does_not_import_heavy_dependencies(module):
+    times = import_times(module)
+    assert module in times
+    loaded = sorted(name for name in HEAVY_MODULES if name in times)
+    assert loaded == [], f"import {module} kéo theo {loaded}"
+
+
+def test_config_imports_quickly():
+    # Trước đây import config tạo luôn client Gemini (hơn 1 giây); ngưỡng rộng để không phụ thuộc máy chạy test
+    times = import_times("core.config")
+    assert times["core.config"] < 1_000_000
@@ -0,0 +1,142 @@
+import threading
+import time
+from multiprocessing import Process
+
+from services.road_services.WorkerStatus import WorkerStatus
+from services.road_services.WorkerSupervisor import WorkerSupervisor
+
+
+def _healthy_worker(status):
+    while True:
+        status.frame_done()
+        time.sleep(0.01)
+
+
+def _hung_worker(status):
+    status.frame_done()
+    time.sleep(60)
+
+
+def _crashing_worker(status):
+    raise SystemExit(1)
+
+
+def _supervisor(targets, **kwargs):
+    statuses = {name: WorkerStatus() for name in targets}
+
+    def start_worker(name):
+        p = Process(target=targets[name], args=(statuses[name],), daemon=True)
+        p.start()
+        return p
+
+    options = dict(stall_timeout=0.5, startup_timeout=5, backoff_base=1, backoff_max=4, healthy_reset=60)
+    options.update(kwargs)
+    return WorkerSupervisor(start_worker, statuses, **options)
+
+
+def test_restarts_dead_worker_with_backoff():
+    supervisor = _supervisor({"crash": _crashing_worker})
+    supervisor.start(["crash"], supervise=False)
+    try:
+        supervisor.processes["crash"].join(timeout=5)
+        now = time.time()
+        supervisor.check_once(now)
+        assert supervisor.health(now)["crash"]["state"] == "restarting"
+        assert "exit code 1" in supervisor.last_failure["crash"]
+
+        # Chưa đến hạn thì chưa khởi động lại
+        supervisor.check_once(now + 0.5)
+        assert supervisor.restarts["crash"] == 0
+        supervisor.check_once(now + 1)
+        assert supervisor.restarts["crash"] == 1
+
+        supervisor.processes["crash"].join(timeout=5)
+        now = time.time()
+        supervisor.check_once(now)
+        # Lỗi liên tiếp thì thời gian chờ tăng gấp đôi
+        assert supervisor.health(now)["crash"]["next_restart_in"] == 2
+    finally:
+        supervisor.stop()
+
+
+def test_detects_stalled_worker_but_keeps_healthy_one():
+    supervisor = _supervisor({"ok": _healthy_worker, "hung": _hung_worker})
+    supervisor.start(["ok", "hung"], supervise=False)
+    try:
+        time.sleep(1.0)
+        hung_pid = supervisor.processes["hung"].pid
+        ok_pid = supervisor.processes["ok"].pid
+
+        supervisor.check_once()
+        health = supervisor.health()
+        assert health["ok"]["state"] == "running" and health["ok"]["frames"] > 0
+        assert health["hung"]["state"] == "restarting"
+        assert "bị treo" in supervisor.last_failure["hung"]
+
+        supervisor.check_once(time.time() + 1)
+        assert supervisor.processes["hung"].pid != hung_pid
+        assert supervisor.processes["ok"].pid == ok_pid
+        assert supervisor.restarts == {"ok": 0, "hung": 1}
+    finally:
+        supervisor.stop()
+    assert not any(p.is_alive() for p in supervisor.processes.values())
+
+
+def test_health_answers_while_a_worker_is_starting():
+    supervisor = _supervisor({"crash": _crashing_worker})
+    supervisor.start(["crash"], supervise=False)
+    supervisor.processes["crash"].join(timeout=5)
+    now = time.time()
+    supervisor.check_once(now)
+
+    # Giống forkserver: start() chờ nạp sẵn model xong mới trả về
+    started = threading.Event()
+    release = threading.Event()
+    start_worker = supervisor.start_worker
+
+    def slow_start_worker(name):
+        started.set()
+        release.wait(10)
+        return start_worker(name)
+
+    supervisor.start_worker = slow_start_worker
+    restart = threading.Thread(target=supervisor.check_once, args=(now + 1,))
+    restart.start()
+    try:
+        assert started.wait(5)
+        health = {}
+        reader = threading.Thread(target=lambda: health.update(supervisor.health()))
+        reader.start()
+        reader.join(timeout=1)
+        assert not reader.is_alive()
+        assert health["crash"]["state"] == "restarting"
+    finally:
+        release.set()
+        restart.join(timeout=10)
+        supervisor.stop()
+    assert supervisor.restarts["crash"] == 1
+
+
+def test_health_answers_while_a_stalled_worker_is_terminated():
+    supervisor = _supervisor({"hung": _hung_worker})
+    supervisor.start(["hung"], supervise=False)
+    # Process không chịu thoát khi bị terminate: chỉ bị kill sau khi hết thời gian chờ
+    terminating = threading.Event()
+    terminate = supervisor.terminate
+
+    def slow_terminate(process, timeout=5):
+        terminating.set()
+        time.sleep(1.5)
+        terminate(process)
+
+    supervisor.terminate = slow_terminate
+    checker = threading.Thread(target=supervisor.check_once, args=(time.time() + 10,))
+    checker.start()
+    try:
+        assert terminating.wait(5)
+        start = time.perf_counter()
+        assert supervisor.health()["hung"]["state"] == "restarting"
+        assert time.perf_counter() - start < 1
+    finally:
+        checker.join(timeout=10)
+        supervisor.stop()